@@ -1,23 +1,45 @@
 from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
-from src.receipt_processing import process_pdf, extract_receipt_data
-from src.sql_query import write_query, execute_query, generate_answer
+from src.receipt_processing import (process_pdf_receipts, extract_receipts_data, identify_receipt,
+                                    drop_stored_receipts, already_stored_message)
+from src.sql_query import write_query, execute_query_with_cost, generate_answer, lookup_cached_query, cache_query
 from src.database import insert_sql_query
+from src.invoice_rows import parse_insert_query
+from src.product_dictionary import learn_saved_rows
+from src.receipt_files import Upload
+from src.receipt_validation import normalize_dates, validate_receipts
+from src.config import RECEIPT_AUTO_APPROVE
+from src.tracing import traced_node
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import interrupt, Command
 from typing import Literal
 
 class GraphState(TypedDict):
     path: str
+    # An upload processed from memory instead of a path
+    file_name: str
+    file_bytes: bytes
     receipt: str
+    receipts: list
     result: str
+    duplicate: bool
+    # Validation problems of the extraction; without any it is saved without approval
+    problems: list
+    auto_approved: bool
+    # Outcome of insert_data: whether every receipt was saved, and why not
+    saved: bool
+    save_error: str
     process_data: bool
     question: str
     query: str
     answer: str
+    # The planner's cost estimate of the query, shown with the answer (None off PostgreSQL)
+    plan_cost: float
+    cache_hit: bool
+    llm_calls: int
 
 def router(state: GraphState) -> GraphState:
-    if state.get("path"):
+    if state.get("path") or state.get("file_bytes"):
         return {"process_data": True}
     elif state.get("question"):
         return {"process_data": False}
@@ -27,31 +49,80 @@ def router(state: GraphState) -> GraphState:
 def check_condition(state: GraphState) -> str:
     return "process_pdf_receipt" if state["process_data"] else "write_query"
 
+def receipt_source(state: GraphState):
+    if state.get("file_bytes"):
+        return Upload(state.get("file_name") or "receipt.pdf", state["file_bytes"])
+    return state["path"]
+
 # Node definitions
 def process_pdf_node(state: GraphState) -> GraphState:
-    return {"receipt": process_pdf(state["path"])}
+    source = receipt_source(state)
+    # Stored receipts and receipts with an XML in the drop folder are not converted
+    identified = identify_receipt(source)
+    # The upload is not needed after conversion; drop it from the checkpointed state
+    done = {"receipts": [], "receipt": "", "file_bytes": b"", "problems": [], "auto_approved": False,
+            "saved": False, "save_error": ""}
+    if identified:
+        return {"duplicate": False, **identified, **done}
+    converted = process_pdf_receipts(source)
+    receipts, stored = drop_stored_receipts(converted)
+    if converted and not receipts:
+        return {**done, "duplicate": True, "result": already_stored_message(stored)}
+    return {**done, "duplicate": False, "result": "", "receipts": receipts, "receipt": "\n\n".join(receipts)}
+
+def after_processing(state: GraphState) -> str:
+    if state.get("duplicate"):
+        return END
+    # An XML-backed receipt already has its INSERT
+    return "validate_data" if state.get("result") else "extract_data"
 
 def extract_data_node(state: GraphState) -> GraphState:
-    return {"result": extract_receipt_data(state["receipt"])}
+    return {"result": extract_receipts_data(state.get("receipts") or [state["receipt"]])}
+
+def make_validate_data_node(auto_approve: bool):
+    def validate_data_node(state: GraphState) -> GraphState:
+        result = normalize_dates(state["result"])
+        problems = validate_receipts(result, state.get("receipts"))
+        return {"result": result, "problems": problems, "auto_approved": auto_approve and not problems}
+    return validate_data_node
+
+def after_validation(state: GraphState) -> str:
+    return "insert_data" if state.get("auto_approved") else "human_approval"
 
 def insert_data_node(state: GraphState) -> GraphState:
-    insert_sql_query(state["result"])
-    return {}
+    # Retried inside insert_sql_query; what is still failing is reported, not raised
+    try:
+        insert_sql_query(state["result"])
+    except Exception as e:
+        return {"saved": False, "save_error": f"{type(e).__name__}: {e}"}
+    # The approved products are reused by the next receipts without reloading the table
+    learn_saved_rows(parse_insert_query(state["result"]))
+    return {"saved": True, "save_error": ""}
 
 def write_query_node(state: GraphState) -> GraphState:
-    return {"query": write_query(state["question"])}
+    query = lookup_cached_query(state["question"])
+    if query is not None:
+        return {"query": query, "cache_hit": True, "llm_calls": 0}
+    return {"query": write_query(state["question"]), "cache_hit": False, "llm_calls": 1}
 
 def execute_query_node(state: GraphState) -> GraphState:
-    return {"result": execute_query(state["query"])}
+    result, plan_cost = execute_query_with_cost(state["query"])
+    if not state.get("cache_hit") and not str(result).startswith("Error"):
+        cache_query(state["question"], state["query"])
+    return {"result": result, "plan_cost": plan_cost}
 
 def generate_answer_node(state: GraphState) -> GraphState:
-    return {"answer": generate_answer(state["question"], state["query"], state["result"])}
+    return {
+        "answer": generate_answer(state["question"], state["query"], state["result"]),
+        "llm_calls": state.get("llm_calls", 0) + 1,
+    }
 
 def human_approval(state: GraphState) -> Command[Literal["insert_data", END]]:
     is_approved = interrupt(
         {
             "question": "Is this correct?",
-            "llm_output": state["result"]
+            "llm_output": state["result"],
+            "problems": state.get("problems") or [],
         }
     )
 
@@ -60,21 +131,23 @@ def human_approval(state: GraphState) -> Command[Literal["insert_data", END]]:
     else:
         return Command(goto=END)
 
-def build_graph():
+def build_graph(auto_approve: bool = RECEIPT_AUTO_APPROVE):
     workflow = StateGraph(GraphState)
-    workflow.add_node("router", router)
-    workflow.add_node("process_pdf_receipt", process_pdf_node)
-    workflow.add_node("extract_data", extract_data_node)
-    workflow.add_node("human_approval", human_approval)
-    workflow.add_node("insert_data", insert_data_node)
-    workflow.add_node("write_query", write_query_node)
-    workflow.add_node("execute_query", execute_query_node)
-    workflow.add_node("generate_answer", generate_answer_node)
+    workflow.add_node("router", traced_node("router", router))
+    workflow.add_node("process_pdf_receipt", traced_node("process_pdf_receipt", process_pdf_node))
+    workflow.add_node("extract_data", traced_node("extract_data", extract_data_node))
+    workflow.add_node("validate_data", traced_node("validate_data", make_validate_data_node(auto_approve)))
+    workflow.add_node("human_approval", traced_node("human_approval", human_approval))
+    workflow.add_node("insert_data", traced_node("insert_data", insert_data_node))
+    workflow.add_node("write_query", traced_node("write_query", write_query_node))
+    workflow.add_node("execute_query", traced_node("execute_query", execute_query_node))
+    workflow.add_node("generate_answer", traced_node("generate_answer", generate_answer_node))
 
     workflow.add_edge(START, "router")
     workflow.add_conditional_edges("router", check_condition)
-    workflow.add_edge("process_pdf_receipt", "extract_data")
-    workflow.add_edge("extract_data", "human_approval")
+    workflow.add_conditional_edges("process_pdf_receipt", after_processing)
+    workflow.add_edge("extract_data", "validate_data")
+    workflow.add_conditional_edges("validate_data", after_validation)
     # workflow.add_edge("extract_data", "insert_data")
     workflow.add_edge("insert_data", END)
     workflow.add_edge("write_query", "execute_query")
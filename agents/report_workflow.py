@@ -1,11 +1,12 @@
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Dict, Any
-import sqlalchemy
 import functools
 from agents.sql_agent import SQLAgent
 from agents.supervisor_agent import SupervisorPlanner
 from agents.report_writer_agent import ReportWriterAgent
 from src.config import DATABASE_URL
+from src.database import get_schema
+from src.tracing import traced_node
 
 class GraphState(TypedDict):
     user_query: str
@@ -19,17 +20,6 @@ class GraphState(TypedDict):
     full_report: str
     info: str
 
-def get_schema(db_url):
-    engine = sqlalchemy.create_engine(db_url)
-    inspector = sqlalchemy.inspect(engine)
-    schema = {}
-    for table in inspector.get_table_names():
-        schema[table] = [
-            {"name": col["name"], "type": str(col["type"])}
-            for col in inspector.get_columns(table)
-        ]
-    return schema
-
 def create_sql_agent(state: GraphState, db_url)-> GraphState:
     schema_description = get_schema(db_url)
     agent = SQLAgent(db_url, schema_description, state)
@@ -61,9 +51,9 @@ sql_agent_node = functools.partial(create_sql_agent, db_url=DATABASE_URL)
 
 def build_report_graph():
     workflow = StateGraph(GraphState)
-    workflow.add_node("Supervisor", supervisor_node)
-    workflow.add_node("SQLAgent", sql_agent_node)
-    workflow.add_node("ReportWriter", report_writer_node)
+    workflow.add_node("Supervisor", traced_node("Supervisor", supervisor_node))
+    workflow.add_node("SQLAgent", traced_node("SQLAgent", sql_agent_node))
+    workflow.add_node("ReportWriter", traced_node("ReportWriter", report_writer_node))
 
     for worker_agent in ["SQLAgent", "ReportWriter"]:
         workflow.add_edge(worker_agent, "Supervisor")
@@ -1,12 +1,17 @@
+import logging
 import re
-import openai
-from src.config import OPENAI_API_KEY, MODEL
+from src.tracing import set_attributes
+from src import llm_usage
+from src.llm_client import get_llm_client
+from src.logging_utils import truncate
+
+logger = logging.getLogger(__name__)
 
 
 class ReportWriterAgent:
     def __init__(self, state, max_iterations=2):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        self.model = MODEL
+        self.client = get_llm_client("report")
+        self.model = self.client.model
         self.state = state
         self.max_iterations = max_iterations
         self.error_history = []
@@ -41,12 +46,11 @@ class ReportWriterAgent:
         The report content will start after a specific keyword to allow for easy extraction.
         """
         for iteration in range(self.max_iterations):
+            set_attributes(agent__attempts=iteration + 1)
             msgs = []
             # Prepare the information retrieved so far
             information_retrieved = self._prepare_information_retrieved()
-            print("###################################")
-            print(information_retrieved)
-            print("###################################")
+            logger.debug("Report input: %s", truncate(information_retrieved))
             if "full_report" not in self.state:
                 self.state["full_report"] = "No report generated so far"
             report = self.state["full_report"]
@@ -75,9 +79,8 @@ class ReportWriterAgent:
             msgs.append({"role": "user", "content": prompt})
 
             try:
-                chat_completion = self.client.chat.completions.create(model=self.model, messages=msgs)
-                report_text = chat_completion.choices[0].message.content
-                print(f"report_text:\n{report_text}")
+                report_text = self.client.chat("report_writer", msgs, model=self.model, attempt=iteration + 1)
+                logger.debug("Report writer response: %s", truncate(report_text))
 
                 # Check for markdown header (e.g., # Report Title)
                 pattern = r"(?:report[_\s]*start[:\s]*)?(# .*)"
@@ -86,11 +89,15 @@ class ReportWriterAgent:
                 if match:
                     report_content = match.group(1).strip()
                     self.state["full_report"] = report_content
+                    logger.info("Report generated (%d chars)", len(report_content))
                     return {"full_report": report_content}
                 else:
                     self.error_history.append(
                         "No report content found after 'REPORT_START' or no markdown header detected.")
+            except llm_usage.BudgetExceededError:
+                raise
             except Exception as e:
+                logger.warning("Report generation failed: %s", e)
                 self.error_history.append(f"Error generating report: {e}")
 
         # If the loop completes without a successful response, return an error message
@@ -1,26 +1,41 @@
+import logging
 import sqlalchemy
 import re
-import openai
 import datetime
-import pandas as pd
-from src.config import OPENAI_API_KEY, MODEL
+from src.sql_cache import get_sql_cache
+from src.query_engine import run_query
+from src.tracing import set_attributes
+from src import llm_usage
+from src.llm_client import get_llm_client
+from src.logging_utils import truncate
+
+logger = logging.getLogger(__name__)
 
 
 class SQLAgent:
     def __init__(self, db_url, schema_description, agent_state, max_iterations=2):
         self.engine = sqlalchemy.create_engine(db_url)
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        self.model = MODEL
+        self.client = get_llm_client("sql")
+        self.model = self.client.model
         self.schema_description = schema_description
         self.max_iterations = max_iterations
         self.error_history = []
         self.agent_state = agent_state
+        self.cache = get_sql_cache()
+        self.cache_context = f"{schema_description}\nToday's date is {datetime.date.today()}"
 
-    def _generate_sql(self, user_query, **kwargs):
+    def _generate_sql(self, user_query, attempt=None, **kwargs):
         """
         Use OpenAI API to generate SQL from a natural language query.
         """
         # openai.api_key = self.openai_api_key
+        if not self.error_history:
+            cached_sql = self.cache.get(user_query, self.cache_context, namespace="sql_agent")
+            if cached_sql is not None:
+                logger.info("SQL from cache: %s", truncate(cached_sql))
+                set_attributes(sql_cache__hit=True)
+                return cached_sql
+
         msgs = []
         system_prompt = (
             """
@@ -52,9 +67,8 @@ class SQLAgent:
         prompt += f"Convert the following natural language query to SQL:\n'{user_query}'"
         msgs.append({"role": "user", "content": prompt})
         try:
-            chat_completion = self.client.chat.completions.create(model=self.model, messages=msgs, **kwargs)
-            generated_text = chat_completion.choices[0].message.content
-            print(f"generated_text:\n{generated_text}")
+            generated_text = self.client.chat("sql_agent", msgs, model=self.model, attempt=attempt, **kwargs)
+            logger.debug("SQL agent response: %s", truncate(generated_text))
 
             pattern = r"```sql\s*(.*?)\s*```"
             match = re.search(pattern, generated_text, re.DOTALL)
@@ -65,18 +79,20 @@ class SQLAgent:
                 # If the pattern is not found, assume the entire text is the SQL code
                 sql_query = generated_text.strip()
 
-            print(f"sql_query after filtering:\n{sql_query}")
+            logger.info("Generated SQL: %s", truncate(sql_query))
             return sql_query
+        except llm_usage.BudgetExceededError:
+            raise
         except Exception as e:
+            logger.warning("SQL generation failed: %s", e)
             self.error_history.append({"sql_query": None, "error_message": f"OpenAI API error: {e}"})
             return None
     def _execute_sql(self, sql_query):
         """
-        Execute the SQL query using SQLAlchemy and return the results as a DataFrame.
+        Execute the SQL query on the configured engine through the read-only guard and return the results as a DataFrame.
         """
         try:
-            with self.engine.connect() as connection:
-                df = pd.read_sql(sql_query, connection)
+            df = run_query(self.engine, sql_query)
             return df, None
         except Exception as e:
             return None, str(e)
@@ -85,17 +101,21 @@ class SQLAgent:
         Convert natural language query to SQL, execute it, and return the results as a DataFrame.
         """
         user_query = self.agent_state["query_for_agent"]
-        for _ in range(self.max_iterations):
-            sql_query = self._generate_sql(user_query)
+        for iteration in range(self.max_iterations):
+            set_attributes(agent__attempts=iteration + 1)
+            sql_query = self._generate_sql(user_query, attempt=iteration + 1)
             if sql_query:
                 df, error = self._execute_sql(sql_query)
                 if df is not None:
+                    self.cache.put(self.agent_state["query_for_agent"], self.cache_context, sql_query,
+                                   namespace="sql_agent")
                     # if user_query not in self.agent_state["sql_results"]:
                     #     self.agent_state["sql_results"][user_query] = []
                     # self.agent_state["sql_results"][user_query].append(user_query)
                     return {"sql_results": {f"{user_query}": df}}
                 else:
                     # Append the error and the generated SQL to the history for correction
+                    logger.warning("SQL failed, asking for a correction: %s", truncate(error))
                     self.error_history.append({"sql_query": sql_query, "error_message": error})
                     # append_sql_errors(self.state, error)
                     user_query += f"\nNote: The following error occurred while executing the SQL: {error}"
@@ -1,12 +1,17 @@
 import json
+import logging
 import re
-import openai
-from src.config import OPENAI_API_KEY, MODEL
+from src.tracing import set_attributes
+from src import llm_usage
+from src.llm_client import get_llm_client
+from src.logging_utils import truncate
+
+logger = logging.getLogger(__name__)
 
 class SupervisorPlanner:
     def __init__(self, state, max_iterations=2):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        self.model = MODEL
+        self.client = get_llm_client("report")
+        self.model = self.client.model
         self.state = state
         self.max_iterations = max_iterations
         self.error_history = []
@@ -45,6 +50,7 @@ class SupervisorPlanner:
         user_query = self.state["user_query"]
         if user_query:
             for iteration in range(self.max_iterations):
+                set_attributes(agent__attempts=iteration + 1)
                 msgs = []
                 # Prepare the information retrieved so far
                 information_retrieved = self._prepare_information_retrieved()
@@ -84,7 +90,7 @@ class SupervisorPlanner:
                 )
                 msgs.append({"role": "system", "content": system_prompt})
                 # Full prompt including the user query and the information retrieved so far
-                print(f"**********************information_retrieved:\n {information_retrieved}")
+                logger.debug("Information retrieved so far: %s", truncate(information_retrieved))
                 prompt = f"Main user query: '{user_query}'\n\nInformation retrieved so far:\n{information_retrieved}\n\n Report generated so far:\n{report}\n\n Analyze if the report answer all the main user query and generate a detailed plan:"
                 if self.state["user_query"]:
                     prompt += "You may now think of the next step of the plan.\n"
@@ -94,9 +100,8 @@ class SupervisorPlanner:
                 msgs.append({"role": "user", "content": prompt})
 
                 try:
-                    chat_completion = self.client.chat.completions.create(model=self.model, messages=msgs)
-                    plan_text = chat_completion.choices[0].message.content
-                    print(f"plan_text:\n{plan_text}")
+                    plan_text = self.client.chat("supervisor", msgs, model=self.model, attempt=iteration + 1)
+                    logger.debug("Planner response: %s", truncate(plan_text))
 
                     # Extract JSON from the response
                     pattern = r"```json\s*(.*?)\s*```|({.*?})"
@@ -119,12 +124,17 @@ class SupervisorPlanner:
                         if response_dict and "plan" in response_dict and "next_agent" in response_dict and "query_for_agent" in response_dict:
                             response_dict["sql_results"] = {}
                             response_dict["info"] = information_retrieved
+                            logger.info("Next step: %s - %s", response_dict["next_agent"],
+                                        truncate(response_dict["query_for_agent"], 200))
                             return response_dict
                         else:
                             self.error_history.append("Invalid JSON structure: Missing required keys")
                     else:
                         self.error_history.append("No JSON was found in the response")
+                except llm_usage.BudgetExceededError:
+                    raise
                 except Exception as e:
+                    logger.warning("Plan generation failed: %s", e)
                     self.error_history.append(f"Error generating plan: {e}")
 
             # If the loop completes without a successful response, raise an error or handle it accordingly
@@ -0,0 +1,205 @@
+"""
+Load test of the headless HTTP API (src/api.py) with the fake LLM.
+
+The API is served in this process on a free port, with a seeded SQLite invoices table, and
+--clients concurrent clients send a mix of requests for --seconds at each client count:
+chat questions and reports (streamed, so the time to the first event is reported next to the
+total), and receipt uploads followed by their approval. Receipts are processed inline by the
+API; point JOB_QUEUE_DB at a queue to measure the 202 path instead. Per request kind p50/p95
+latency, throughput and the share rejected with 503 are reported and saved as JSON.
+
+    python -m benchmarks.bench_api --clients 1,8,32 --max-concurrency 8 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Share of each request kind in the mix
+MIX = {"question": 0.6, "receipt": 0.3, "report": 0.1}
+
+
+class CombinedResponder:
+    """Receipt prompts get the receipt's INSERT, everything else the recorded chat and report answers."""
+
+    def __init__(self, receipt_responder, recorded_responder):
+        self.receipt_responder = receipt_responder
+        self.recorded_responder = recorded_responder
+
+    def __call__(self, prompt: str) -> str:
+        return self.receipt_responder(prompt) or self.recorded_responder(prompt)
+
+
+def locked_inserter(db_path: str):
+    """Returns an insert_sql_query replacement that runs each INSERT on SQLite, one at a time."""
+    lock = threading.Lock()
+
+    def insert_sql_query(query: str):
+        with lock, sqlite3.connect(db_path, timeout=30) as db:
+            db.executescript(query)
+    return insert_sql_query
+
+
+def start_server(app, port: int):
+    """Serves app from a background thread with its own event loop."""
+    ready = threading.Event()
+
+    def serve():
+        async def run():
+            app.listen(port, address="127.0.0.1")
+            ready.set()
+            await asyncio.Event().wait()
+        asyncio.run(run())
+
+    threading.Thread(target=serve, daemon=True, name="api-server").start()
+    ready.wait(30)
+
+
+async def timed_fetch(client, url: str, method: str = "GET", body=None) -> dict:
+    """Fetches url; the time to the first body chunk is recorded for streamed responses."""
+    import tornado.httpclient
+    start = time.perf_counter()
+    chunks, first = [], []
+
+    def on_chunk(chunk):
+        if not first:
+            first.append(time.perf_counter() - start)
+        chunks.append(chunk)
+
+    request = tornado.httpclient.HTTPRequest(url, method=method, body=body, streaming_callback=on_chunk,
+                                             request_timeout=600)
+    response = await client.fetch(request, raise_error=False)
+    return {"code": response.code, "latency_s": time.perf_counter() - start,
+            "first_event_s": first[0] if first else None, "body": b"".join(chunks)}
+
+
+async def client_loop(client, base: str, deadline: float, rng, questions, reports, receipts, runs: list):
+    while time.perf_counter() < deadline:
+        kind = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        if kind == "question":
+            result = await timed_fetch(client, f"{base}/questions", "POST",
+                                       json.dumps({"question": rng.choice(questions)}))
+        elif kind == "report":
+            result = await timed_fetch(client, f"{base}/reports", "POST", json.dumps({"request": rng.choice(reports)}))
+        else:
+            name, data = next(receipts)
+            result = await timed_fetch(client, f"{base}/receipts?name={name}", "POST", data)
+            if result["code"] in (200, 202):
+                receipt = json.loads(result["body"])
+                if receipt["status"] == "awaiting_approval":
+                    approval = await timed_fetch(client, f"{base}/receipts/{receipt['id']}/approval", "POST",
+                                                 json.dumps({"approved": True}))
+                    result["latency_s"] += approval["latency_s"]
+                    result["code"] = approval["code"] if approval["code"] != 200 else result["code"]
+        result.pop("body")
+        runs.append({"kind": kind, **result})
+
+
+async def run_level(base: str, clients: int, seconds: float, seed: int, questions, reports, receipts) -> list:
+    import tornado.httpclient
+    client = tornado.httpclient.AsyncHTTPClient(max_clients=clients)
+    runs = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client_loop(client, base, deadline, random.Random(seed + n), questions, reports,
+                                       receipts, runs)
+                           for n in range(clients)))
+    client.close()
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,8,32", help="comma-separated concurrent client counts")
+    parser.add_argument("--seconds", type=float, default=20, help="load duration per client count")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="the API's graph runs in flight")
+    parser.add_argument("--acquire-timeout", type=float, default=5, help="seconds a request waits for a slot")
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic invoice rows to seed")
+    parser.add_argument("--receipts", type=int, default=200, help="distinct receipts to upload (then repeated)")
+    parser.add_argument("--items", type=int, default=10, help="line items per receipt")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    client_counts = [int(clients) for clients in args.clients.split(",") if clients.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "invoices.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SQL_CACHE_PATH"] = ""
+    os.environ["QUERY_ENGINE"] = "postgres"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+    os.environ["PDF_WORKERS"] = "1"
+    os.environ.setdefault("JOB_QUEUE_DB", "")
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    import agents.invoice_agent as invoice_agent
+    from benchmarks.bench_report_chat import recorded_sql, seed_invoices
+    from benchmarks.common import save_results, summarize
+    from benchmarks.fakes import ReceiptResponder, RecordedResponder
+    from benchmarks.synthetic import synthetic_receipts, write_text_pdf
+    from src.api import make_app
+    from src.database import create_db_engine
+    from src.llm_client import build_llm_client, set_llm_client
+
+    engine = create_db_engine()
+    seed_invoices(engine, args.rows, args.seed)
+    chat_sql, report_steps = recorded_sql(engine.dialect.name)
+    generated = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    responder = CombinedResponder(ReceiptResponder(generated), RecordedResponder(chat_sql, report_steps))
+    set_llm_client(build_llm_client("fake", responder=responder, latency_s=args.llm_latency, seed=args.seed))
+    invoice_agent.insert_sql_query = locked_inserter(db_path)
+
+    files = []
+    for n, receipt in enumerate(generated):
+        path = os.path.join(tmp.name, f"receipt_{n}.pdf")
+        write_text_pdf([line for line in receipt.markdown.splitlines() if not line.startswith("|---")], path)
+        with open(path, "rb") as f:
+            files.append((f"receipt_{n}.pdf", f.read()))
+    receipts = itertools.cycle(files)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    start_server(make_app(max_concurrency=args.max_concurrency, acquire_timeout_s=args.acquire_timeout), port)
+    base = f"http://127.0.0.1:{port}"
+
+    results = {"config": vars(args), "clients": {}}
+    for clients in client_counts:
+        runs = asyncio.run(run_level(base, clients, args.seconds, args.seed, list(chat_sql), list(report_steps),
+                                     receipts))
+        level = {}
+        for kind in MIX:
+            selected = [run for run in runs if run["kind"] == kind]
+            served = [run for run in selected if run["code"] < 500]
+            level[kind] = {
+                **summarize([run["latency_s"] for run in served]),
+                "first_event": summarize([run["first_event_s"] for run in served if run["first_event_s"] is not None
+                                          and kind != "receipt"]),
+                "rejected": sum(run["code"] == 503 for run in selected),
+                "errors": sum(run["code"] >= 400 and run["code"] != 503 for run in selected),
+                "per_sec": len(served) / args.seconds,
+            }
+        results["clients"][clients] = level
+
+    print(f"API with {args.max_concurrency} graph runs in flight, fake LLM latency {args.llm_latency}s")
+    print(f"{'clients':>7} {'kind':<9}{'req/s':>7}{'p50 s':>8}{'p95 s':>8}{'first p50':>10}{'503':>6}{'errors':>7}")
+    for clients, level in results["clients"].items():
+        for kind, stats in level.items():
+            first = f"{stats['first_event']['p50_s']:10.3f}" if stats["first_event"]["count"] else f"{'-':>10}"
+            print(f"{clients:7d} {kind:<9}{stats['per_sec']:7.2f}{stats['p50_s']:8.2f}{stats['p95_s']:8.2f}"
+                  f"{first}{stats['rejected']:6d}{stats['errors']:7d}")
+    print(f"Results saved to {save_results('api', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Accuracy and latency of each LLM backend on the two high-volume stages: receipt extraction
+(extract_receipt_data) and SQL writing (write_query).
+
+Extraction runs on synthetic receipts and is scored against the rows each receipt was generated
+from: a receipt counts as exact when every row matches, items as the share of expected rows found.
+SQL writing runs the chat questions of bench_report_chat against a seeded SQLite table and is
+scored by comparing the result set of the generated query with that of the recorded one.
+
+'fake' answers with the expected output and checks the harness itself; 'local' needs the
+OpenAI-compatible server at LOCAL_LLM_BASE_URL, 'openai' needs OPENAI_API_KEY.
+
+    python -m benchmarks.bench_backends --backends fake
+    python -m benchmarks.bench_backends --backends local,openai --receipts 20 --rows 20000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+STAGES = ("extraction", "sql")
+
+
+def normalize_value(value):
+    """Makes values from different sources comparable: text trimmed, numbers to 15 significant digits."""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value).strip()
+    # SQLite keeps the unquoted 44-digit access key of an INSERT only as a REAL
+    return float(f"{number:.15g}")
+
+
+def normalize_row(row) -> tuple:
+    return tuple(normalize_value(value) for value in row)
+
+
+def extracted_rows(insert_sql: str):
+    """Runs an extracted INSERT on an empty SQLite table and returns its rows, or None if it fails."""
+    from benchmarks.bench_ingestion import SQLITE_SCHEMA
+    from src.database import INVOICE_COLUMNS
+
+    if not insert_sql.strip():
+        return None
+    connection = sqlite3.connect(":memory:")
+    try:
+        connection.execute(SQLITE_SCHEMA)
+        connection.executescript(insert_sql)
+        return connection.execute(f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices").fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+
+
+def score_extraction(receipt, insert_sql: str) -> dict:
+    rows = extracted_rows(insert_sql)
+    expected = Counter(normalize_row(row) for row in receipt.rows)
+    if rows is None:
+        return {"valid": False, "exact": False, "items_found": 0, "items_expected": sum(expected.values())}
+    found = Counter(normalize_row(row) for row in rows)
+    items_found = sum((expected & found).values())
+    return {"valid": True, "exact": found == expected, "items_found": items_found,
+            "items_expected": sum(expected.values())}
+
+
+def result_set(engine, sql: str):
+    """The query's rows as a sorted list of normalized tuples, or None if it fails."""
+    import sqlalchemy
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(sqlalchemy.text(sql)).fetchall()
+    except Exception:
+        return None
+    return sorted((normalize_row(row) for row in rows), key=repr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="fake", help="comma-separated: fake, local, openai")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated: extraction, sql")
+    parser.add_argument("--receipts", type=int, default=10)
+    parser.add_argument("--items", type=int, default=15, help="line items per receipt")
+    parser.add_argument("--rows", type=int, default=20_000, help="synthetic invoice rows for the SQL questions")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fixed latency of the fake backend")
+    parser.add_argument("--no-fast-path", action="store_true", help="extract with the full LLM prompt only")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    # Read at import: point the app at the seeded database and keep the SQL cache, usage rows and
+    # traces of the benchmark out of the app's .cache
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'invoices.db')}"
+    os.environ["SQL_CACHE_PATH"] = ""
+    # Every item goes to the model being measured
+    os.environ["PRODUCT_DICTIONARY"] = "false"
+    os.environ["RECEIPT_FAST_PATH"] = "false" if args.no_fast_path else "true"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    import src.sql_query as sql_query
+    from benchmarks.bench_report_chat import recorded_sql, seed_invoices
+    from benchmarks.common import save_results, summarize
+    from benchmarks.fakes import ReceiptResponder, RecordedResponder
+    from benchmarks.synthetic import synthetic_receipts
+    from src.database import create_db_engine
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.llm_usage import usage_scope
+    from src.logging_utils import configure_logging
+    from src.receipt_processing import extract_receipt_data
+
+    configure_logging()
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    engine = create_db_engine()
+    chat_sql = {}
+    if "sql" in stages:
+        seed_invoices(engine, args.rows, args.seed)
+        chat_sql, _ = recorded_sql(engine.dialect.name)
+        expected_results = {question: result_set(engine, sql) for question, sql in chat_sql.items()}
+        sql_query.get_query_prompt_template()
+        sql_query.get_table_info()
+
+    results = {"config": vars(args), "backends": {}}
+    for backend in backends:
+        if backend == "fake":
+            recorded = RecordedResponder(chat_sql, {})
+            extract = ReceiptResponder(receipts)
+            client = build_llm_client("fake", responder=lambda prompt: extract(prompt) or recorded(prompt),
+                                      latency_s=args.llm_latency, seed=args.seed)
+        else:
+            client = build_llm_client(backend)
+        set_llm_client(client)
+        backend_results = {"model": client.model}
+
+        if "extraction" in stages:
+            durations, scores = [], []
+            with usage_scope("benchmark", budget_usd=0) as usage:
+                for receipt in receipts:
+                    start = time.perf_counter()
+                    try:
+                        insert_sql = extract_receipt_data(receipt.markdown)
+                    except Exception as e:
+                        print(f"{backend}: extraction failed: {e}")
+                        insert_sql = ""
+                    durations.append(time.perf_counter() - start)
+                    scores.append(score_extraction(receipt, insert_sql))
+            items_expected = sum(score["items_expected"] for score in scores)
+            backend_results["extraction"] = {
+                **summarize(durations),
+                "valid_sql": sum(score["valid"] for score in scores) / len(scores),
+                "exact_receipts": sum(score["exact"] for score in scores) / len(scores),
+                "item_accuracy": sum(score["items_found"] for score in scores) / max(items_expected, 1),
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cost_usd": usage.cost_usd,
+            }
+
+        if "sql" in stages:
+            durations, correct, failed = [], 0, 0
+            with usage_scope("benchmark", budget_usd=0) as usage:
+                for question, expected in expected_results.items():
+                    start = time.perf_counter()
+                    try:
+                        generated = result_set(engine, sql_query.write_query(question))
+                    except Exception as e:
+                        print(f"{backend}: write_query failed: {e}")
+                        generated = None
+                    durations.append(time.perf_counter() - start)
+                    failed += generated is None
+                    correct += generated is not None and generated == expected
+            backend_results["sql"] = {
+                **summarize(durations),
+                "accuracy": correct / len(expected_results),
+                "failed_queries": failed,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cost_usd": usage.cost_usd,
+            }
+        results["backends"][backend] = backend_results
+
+    print(f"{'backend':<8} {'stage':<11} {'p50 ms':>9} {'p95 ms':>9} {'accuracy':>9} {'tokens':>8} {'cost $':>8}")
+    for backend, backend_results in results["backends"].items():
+        for stage in STAGES:
+            stats = backend_results.get(stage)
+            if stats is None:
+                continue
+            accuracy = stats["exact_receipts"] if stage == "extraction" else stats["accuracy"]
+            print(f"{backend:<8} {stage:<11} {stats['p50_s'] * 1000:9.1f} {stats['p95_s'] * 1000:9.1f} "
+                  f"{accuracy:9.0%} {stats['prompt_tokens'] + stats['completion_tokens']:8d} {stats['cost_usd']:8.4f}")
+    print(f"Results saved to {save_results('backends', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
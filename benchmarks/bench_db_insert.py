@@ -0,0 +1,179 @@
+"""
+Bulk throughput of receipt inserts (src.database.insert_receipts) under transient failures.
+
+Synthetic receipts are saved into a SQLite stand-in by several writer threads while faults are
+injected at --fault-rates: a failure inside the transaction (nothing is committed) or a
+connection lost right after the commit (saved, but the writer does not know). Each rate is run
+three ways:
+- legacy: the INSERT in autocommit with errors logged and dropped, as insert_sql_query did;
+- legacy-retry: the same INSERT retried by the caller on any error, as a job retry would;
+- upsert: one transaction per receipt into the normalized tables, keyed on the access key and
+  line number, retried on transient errors.
+Receipts/s, rows/s, retries and how far the stored table is from the receipts (lost receipts
+and duplicated rows) are reported.
+
+    python -m benchmarks.bench_db_insert --receipts 400 --writers 4 --fault-rates 0,0.05,0.2
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from benchmarks.bench_ingestion import SQLITE_SCHEMA
+from benchmarks.common import save_results
+from benchmarks.synthetic import synthetic_receipts
+from src.database import InsertError, insert_receipts
+from src.sql_commands import sql_commands, sqlite_commands
+
+MODES = ("legacy", "legacy-retry", "upsert")
+
+sqlite3.register_adapter(Decimal, str)
+
+
+class FaultyConnection(sqlite3.Connection):
+    """A SQLite connection failing like a flaky network link: before or right after a commit."""
+    rate = 0.0
+    rng = random.Random()
+    lock = threading.Lock()
+
+    def maybe_fail(self, when: str):
+        with self.lock:
+            fail = self.rng.random() < self.rate / 2
+        if fail:
+            raise sqlite3.OperationalError(f"server closed the connection unexpectedly ({when} commit)")
+
+    def executescript(self, script):
+        self.maybe_fail("before")
+        super().executescript(script)
+        self.maybe_fail("after")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            try:
+                self.maybe_fail("before")
+            except sqlite3.Error:
+                self.rollback()
+                raise
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.maybe_fail("after")
+        return result
+
+
+def connect(db_path: str):
+    return sqlite3.connect(db_path, timeout=30, factory=FaultyConnection, check_same_thread=False)
+
+
+def quote_keys(query: str) -> str:
+    """Quotes the access keys of an INSERT, so SQLite keeps them as text instead of rounding them to REAL."""
+    return re.sub(r"^\((\d{44}),", r"('\1',", query, flags=re.MULTILINE)
+
+
+def legacy_insert(db_path: str, query: str, max_retries: int) -> int:
+    """The previous insert: one autocommitted script; errors are dropped, or retried as a whole. Returns the retries."""
+    for retry in range(max_retries + 1):
+        connection = connect(db_path)
+        connection.isolation_level = None
+        try:
+            connection.executescript(query)
+            return retry
+        except sqlite3.Error:
+            if retry < max_retries:
+                time.sleep(0.01 * 2 ** retry)
+        finally:
+            connection.close()
+    return max_retries
+
+
+def run_mode(mode: str, receipts, db_path: str, writers: int, fault_rate: float, seed: int) -> dict:
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    with sqlite3.connect(db_path) as db:
+        for command in sqlite_commands(sql_commands) if mode == "upsert" else [SQLITE_SCHEMA]:
+            db.execute(command)
+    FaultyConnection.rate, FaultyConnection.rng = fault_rate, random.Random(seed)
+    counters = {"retries": 0, "failed": 0}
+    pending = list(receipts)
+    lock = threading.Lock()
+
+    def writer():
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                if not pending:
+                    return
+                receipt = pending.pop()
+            retries, failed = 0, 0
+            if mode == "upsert":
+                try:
+                    retries = insert_receipts(receipt.insert_sql(), lambda: connect(db_path), placeholder="?",
+                                              max_retries=3, retry_base_s=0.01, rng=rng)["retries"]
+                except InsertError:
+                    retries, failed = 3, 1
+            else:
+                retries = legacy_insert(db_path, quote_keys(receipt.insert_sql()), 3 if mode == "legacy-retry" else 0)
+            with lock:
+                counters["retries"] += retries
+                counters["failed"] += failed
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed_s = time.perf_counter() - start
+
+    expected = {receipt.access_key: len(receipt.items) for receipt in receipts}
+    with sqlite3.connect(db_path) as db:
+        stored = dict(db.execute("SELECT invoice_id, COUNT(*) FROM invoices GROUP BY invoice_id").fetchall())
+    rows = sum(expected.values())
+    return {
+        "elapsed_s": elapsed_s,
+        "receipts_per_s": len(receipts) / elapsed_s,
+        "rows_per_s": rows / elapsed_s,
+        "retries": counters["retries"],
+        "failed": counters["failed"],
+        "lost_receipts": sum(1 for key in expected if key not in stored),
+        "duplicate_rows": sum(max(stored.get(key, 0) - count, 0) for key, count in expected.items()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=400)
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--writers", type=int, default=4, help="threads saving receipts at once")
+    parser.add_argument("--fault-rates", default="0,0.05,0.2", help="comma-separated shares of failing statements")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    fault_rates = [float(rate) for rate in args.fault_rates.split(",") if rate.strip()]
+    # One warning per retry would flood the table
+    logging.getLogger("src.database").setLevel(logging.ERROR)
+
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    results = {"config": vars(args), "runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "invoices.db")
+        for fault_rate in fault_rates:
+            for mode in MODES:
+                stats = run_mode(mode, receipts, db_path, args.writers, fault_rate, args.seed)
+                results["runs"].append({"mode": mode, "fault_rate": fault_rate, **stats})
+
+    print(f"{len(receipts)} receipts of {args.items} items, {args.writers} writers")
+    print(f"{'faults':>6} {'mode':>12} {'receipts/s':>11} {'rows/s':>9} {'retries':>8} {'failed':>7} {'lost':>5} "
+          f"{'dup rows':>9}")
+    for run in results["runs"]:
+        print(f"{run['fault_rate']:6.2f} {run['mode']:>12} {run['receipts_per_s']:11.1f} {run['rows_per_s']:9.0f} "
+              f"{run['retries']:8d} {run['failed']:7d} {run['lost_receipts']:5d} {run['duplicate_rows']:9d}")
+    print(f"Results saved to {save_results('db_insert', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Per-image latency and memory of the photo receipt path (preprocessing plus OCR) at several photo
+resolutions.
+
+Synthetic receipts are rendered as phone-style photos (rotated paper on a darker background,
+with noise) at each width. Every resolution runs in a fresh process so its peak memory can be
+read from its resident set high-water mark (Linux). Preprocessing is always measured; OCR runs
+with --engine (tesseract needs the tesseract command line, docling its OCR models) and is scored
+by the share of item lines read back correctly.
+
+    python -m benchmarks.bench_image_ocr --widths 800,1600,3000,4000
+    python -m benchmarks.bench_image_ocr --engine tesseract --images 5
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def memory_mb(field: str) -> float:
+    """VmRSS (current) or VmHWM (peak) of this process from /proc; ru_maxrss would include the parent's peak."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(paths, engine: str, max_side: int) -> dict:
+    """Runs in a fresh process: preprocesses (and OCRs) the images and returns timings and peak memory."""
+    import numpy  # noqa: F401 - loaded before the baseline so only the images count
+    from PIL import Image
+    from src.image_receipts import ocr_docling, ocr_tesseract, preprocess_image, skew_angle
+    from src.receipt_parser import split_receipt_lines
+
+    baseline_mb = memory_mb("VmRSS")
+    preprocess_s, ocr_s, residual_angles, items_found = [], [], [], []
+    for path in paths:
+        start = time.perf_counter()
+        with Image.open(path) as image:
+            prepared = preprocess_image(image, max_side)
+        preprocess_s.append(time.perf_counter() - start)
+        residual_angles.append(abs(skew_angle(prepared)))
+        if engine != "none":
+            start = time.perf_counter()
+            text = ocr_tesseract(prepared) if engine == "tesseract" else ocr_docling(prepared)
+            ocr_s.append(time.perf_counter() - start)
+            items_found.append(len(split_receipt_lines(text)[1]))
+    peak_mb = memory_mb("VmHWM")
+    return {"preprocess_s": preprocess_s, "ocr_s": ocr_s, "residual_angles": residual_angles,
+            "items_found": items_found, "peak_mb": peak_mb, "peak_increase_mb": peak_mb - baseline_mb,
+            "prepared_size": list(prepared.size)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--widths", default="800,1600,3000,4000", help="comma-separated photo widths in pixels")
+    parser.add_argument("--images", type=int, default=3, help="photos per width")
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--engine", default="tesseract" if shutil.which("tesseract") else "none",
+                        choices=["none", "tesseract", "docling"], help="OCR engine; none measures preprocessing only")
+    parser.add_argument("--max-side", type=int, default=2000, help="longest side after preprocessing")
+    parser.add_argument("--max-angle", type=float, default=3.0, help="photos are rotated by up to this many degrees")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    widths = [int(width) for width in args.widths.split(",") if width.strip()]
+
+    import random
+    from benchmarks.common import save_results, summarize
+    from benchmarks.synthetic import render_receipt_image, synthetic_receipts
+
+    tmp = tempfile.TemporaryDirectory()
+    rng = random.Random(args.seed)
+    receipts = list(synthetic_receipts(args.images, seed=args.seed, items_per_receipt=args.items, layouts=("text",)))
+    angles = [rng.uniform(-args.max_angle, args.max_angle) for _ in receipts]
+
+    results = {"config": vars(args), "widths": {}}
+    for width in widths:
+        paths = []
+        for n, (receipt, angle) in enumerate(zip(receipts, angles)):
+            path = os.path.join(tmp.name, f"receipt_{width}_{n}.jpg")
+            render_receipt_image(receipt, path, width=width, angle=angle, seed=args.seed + n)
+            paths.append(path)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            measured = pool.submit(measure, paths, args.engine, args.max_side).result()
+        width_results = {
+            "photo_mb": sum(os.path.getsize(path) for path in paths) / len(paths) / 2 ** 20,
+            "prepared_size": measured["prepared_size"],
+            "preprocess": summarize(measured["preprocess_s"]),
+            "max_residual_angle": max(measured["residual_angles"]),
+            "peak_mb": measured["peak_mb"],
+            "peak_increase_mb": measured["peak_increase_mb"],
+        }
+        if measured["ocr_s"]:
+            width_results["ocr"] = summarize(measured["ocr_s"])
+            width_results["item_lines_found"] = sum(measured["items_found"]) / (args.items * len(paths))
+        results["widths"][width] = width_results
+
+    print(f"engine: {args.engine}")
+    print(f"{'width':>6} {'photo MB':>9} {'prep p50 ms':>12} {'ocr p50 ms':>11} {'peak MB':>8} {'+MB':>7} "
+          f"{'items':>6} {'angle':>6}")
+    for width, stats in results["widths"].items():
+        ocr = f"{stats['ocr']['p50_s'] * 1000:11.1f}" if "ocr" in stats else f"{'-':>11}"
+        items = f"{stats['item_lines_found']:6.0%}" if "item_lines_found" in stats else f"{'-':>6}"
+        print(f"{width:6d} {stats['photo_mb']:9.2f} {stats['preprocess']['p50_s'] * 1000:12.1f} {ocr} "
+              f"{stats['peak_mb']:8.0f} {stats['peak_increase_mb']:7.0f} {items} {stats['max_residual_angle']:6.1f}")
+    print(f"Results saved to {save_results('image_ocr', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Offline throughput benchmark for the receipt ingestion nodes of agents/invoice_agent.
+
+Synthetic NFC-e receipts are written as text PDFs, the LLM is replaced by a deterministic fake
+with configurable latency, and rows are inserted into a SQLite stand-in (or the configured
+PostgreSQL with --postgres). p50/p95 latency per node and receipts/sec are reported
+and saved as JSON; pass --baseline with a previous results file to see the change.
+
+Receipts with a known item table take the parser fast path (only product enrichment goes to
+the LLM); the share of receipts that did and the extraction latency of each path are reported.
+Run with --no-fast-path to send every receipt through the full LLM extraction. The product
+dictionary learns from the inserted rows as in the app; its hit rate is reported too.
+
+    python -m benchmarks.bench_ingestion --receipts 50 --llm-latency 2.0
+    python -m benchmarks.bench_ingestion --skip-docling --llm-latency 0.5 --llm-per-output-token 0.01
+    python -m benchmarks.bench_ingestion --skip-docling --baseline benchmarks/results/ingestion-....json
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+NODES = ("process_pdf_receipt", "extract_data", "insert_data")
+
+SQLITE_SCHEMA = """
+CREATE TABLE invoices (
+    invoice_id TEXT NOT NULL, supermarket_name TEXT NOT NULL, datetime DATE NOT NULL, description TEXT NOT NULL,
+    quantity NUMERIC NOT NULL, unit TEXT NOT NULL, unitary_value NUMERIC NOT NULL, total_value NUMERIC NOT NULL,
+    product TEXT NOT NULL, full_product_name TEXT NOT NULL, volume TEXT, category TEXT NOT NULL
+)
+"""
+
+
+def sqlite_inserter(connection):
+    """Returns an insert_sql_query replacement that runs the INSERT on SQLite."""
+    def insert_sql_query(query: str):
+        connection.executescript(query)
+        connection.commit()
+    return insert_sql_query
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=20)
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--llm-per-token", type=float, default=0.0, help="extra fake latency per prompt token")
+    parser.add_argument("--llm-per-output-token", type=float, default=0.0,
+                        help="extra fake latency per completion token")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="uniform random extra latency in seconds")
+    parser.add_argument("--layouts", default="standard,compact,text",
+                        help="comma-separated synthetic layouts; 'text' has no item table and needs the LLM")
+    parser.add_argument("--no-fast-path", action="store_true", help="extract every receipt with the full LLM prompt")
+    parser.add_argument("--no-dictionary", action="store_true", help="ask the LLM for every item's product fields")
+    parser.add_argument("--skip-docling", action="store_true", help="feed the synthetic markdown directly")
+    parser.add_argument("--postgres", action="store_true", help="insert into the configured PostgreSQL database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["RECEIPT_FAST_PATH"] = "false" if args.no_fast_path else "true"
+    os.environ["PRODUCT_DICTIONARY"] = "false" if args.no_dictionary else "true"
+    # Keep the benchmark's usage rows and traces out of the app's .cache
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp, "traces.jsonl"))
+    # Every receipt is converted, not read back from a previous run
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+    if not args.postgres:
+        # The product dictionary reads the approved rows back through DATABASE_URL
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'invoices.db')}"
+
+    import agents.invoice_agent as invoice_agent
+    from benchmarks.common import compare_with_baseline, save_results, summarize
+    from benchmarks.fakes import ReceiptResponder
+    from benchmarks.synthetic import synthetic_receipts, write_text_pdf
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.logging_utils import configure_logging
+    from src.product_dictionary import get_product_dictionary
+
+    configure_logging()
+
+    layouts = tuple(layout.strip() for layout in args.layouts.split(","))
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items, layouts=layouts))
+    responder = ReceiptResponder(receipts)
+    client = build_llm_client("fake", responder=responder, latency_s=args.llm_latency,
+                              per_token_s=args.llm_per_token, per_output_token_s=args.llm_per_output_token,
+                              jitter_s=args.llm_jitter, seed=args.seed)
+    set_llm_client(client)
+    fake_llm = client.chat_model
+    if args.postgres:
+        db = None
+    else:
+        db = sqlite3.connect(os.path.join(tmp, "invoices.db"))
+        # Throwaway file: skip the fsync on every commit so insert_data stays comparable to :memory:
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute(SQLITE_SCHEMA)
+        invoice_agent.insert_sql_query = sqlite_inserter(db)
+
+    durations = {node: [] for node in NODES}
+    extract_by_path = {"parser": [], "llm": []}
+    end_to_end = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, receipt in enumerate(receipts):
+            path = os.path.join(tmp, f"receipt_{n}.pdf")
+            write_text_pdf([line for line in receipt.markdown.splitlines() if not line.startswith("|---")], path)
+            state = {"path": path}
+            start = time.perf_counter()
+
+            if args.skip_docling:
+                state["receipt"] = receipt.markdown
+            else:
+                t0 = time.perf_counter()
+                state.update(invoice_agent.process_pdf_node(state))
+                durations["process_pdf_receipt"].append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            full_extractions = responder.calls_by_role["extraction"]
+            state.update(invoice_agent.extract_data_node(state))
+            durations["extract_data"].append(time.perf_counter() - t0)
+            path = "llm" if responder.calls_by_role["extraction"] > full_extractions else "parser"
+            extract_by_path[path].append(durations["extract_data"][-1])
+
+            t0 = time.perf_counter()
+            state.update(invoice_agent.insert_data_node(state))
+            durations["insert_data"].append(time.perf_counter() - t0)
+
+            end_to_end.append(time.perf_counter() - start)
+
+    results = {
+        "config": vars(args),
+        "nodes": {node: summarize(values) for node, values in durations.items() if values},
+        "end_to_end": summarize(end_to_end),
+        "receipts_per_sec": len(end_to_end) / sum(end_to_end) if end_to_end else 0.0,
+        "fast_path_share": len(extract_by_path["parser"]) / len(receipts) if receipts else 0.0,
+        "extract_data_by_path": {path: summarize(values) for path, values in extract_by_path.items() if values},
+        "product_hit_rate": get_product_dictionary().hit_rate if not args.no_dictionary else 0.0,
+        "enrichment_calls": responder.calls_by_role["enrichment"],
+        "llm_calls": fake_llm.calls,
+        "prompt_tokens": fake_llm.prompt_tokens,
+        "completion_tokens": fake_llm.completion_tokens,
+    }
+    if db is not None:
+        results["rows_inserted"] = db.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+        results["rows_expected"] = sum(len(receipt.items) for receipt in receipts)
+
+    for node, stats in results["nodes"].items():
+        print(f"{node:<24} p50 {stats['p50_s'] * 1000:8.1f} ms   p95 {stats['p95_s'] * 1000:8.1f} ms")
+    print(f"{'end_to_end':<24} p50 {results['end_to_end']['p50_s'] * 1000:8.1f} ms   "
+          f"p95 {results['end_to_end']['p95_s'] * 1000:8.1f} ms")
+    for path, stats in results["extract_data_by_path"].items():
+        print(f"{'extract_data[' + path + ']':<24} p50 {stats['p50_s'] * 1000:8.1f} ms   "
+              f"p95 {stats['p95_s'] * 1000:8.1f} ms   ({stats['count']} receipts)")
+    print(f"receipts/sec: {results['receipts_per_sec']:.2f}")
+    print(f"fast path share: {results['fast_path_share']:.0%}")
+    print(f"product dictionary hit rate: {results['product_hit_rate']:.0%} "
+          f"({results['enrichment_calls']} enrichment calls)")
+    print(f"Results saved to {save_results('ingestion', results, args.output)}")
+    if args.baseline:
+        compare_with_baseline(args.baseline, results)
+
+
+if __name__ == "__main__":
+    main()
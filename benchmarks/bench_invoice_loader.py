@@ -0,0 +1,94 @@
+"""
+Peak-memory benchmark for load_invoice_data.
+
+Compares the old behaviour (fetch every row, then build an object-dtype DataFrame, as
+pd.read_sql does) with the chunked, typed loader. Each case runs in a fresh process so
+the peak RSS of one case does not hide the next.
+
+    python -m benchmarks.bench_invoice_loader --rows 1000000 10000000
+    python -m benchmarks.bench_invoice_loader --postgres   # against the configured database
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_case(case: str, n_rows: int, chunksize: int) -> dict:
+    import pandas as pd
+    from benchmarks.synthetic import SyntheticInvoiceCursor
+    from src.database import INVOICE_COLUMNS, concat_invoice_frames, frames_from_cursor
+
+    cursor = SyntheticInvoiceCursor(n_rows)
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    if case == "fetchall":
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=INVOICE_COLUMNS, coerce_float=True)
+        df["datetime"] = pd.to_datetime(df["datetime"])
+    else:
+        df = concat_invoice_frames(frames_from_cursor(cursor, INVOICE_COLUMNS, chunksize), INVOICE_COLUMNS)
+    elapsed = time.perf_counter() - start
+    return {
+        "case": case,
+        "rows": n_rows,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(_peak_rss_mb() - rss_before, 1),
+        "frame_mb": round(float(df.memory_usage(deep=True).sum()) / 2**20, 1),
+    }
+
+
+def _run_postgres_case(case: str, chunksize: int) -> dict:
+    import pandas as pd
+    from src.database import create_db_engine, load_invoice_data
+
+    engine = create_db_engine()
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    if case == "read_sql":
+        df = pd.read_sql("SELECT * FROM invoices;", engine)
+        df["datetime"] = pd.to_datetime(df["datetime"])
+    else:
+        df = load_invoice_data(engine, chunksize=chunksize)
+    elapsed = time.perf_counter() - start
+    return {
+        "case": case,
+        "rows": len(df),
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(_peak_rss_mb() - rss_before, 1),
+        "frame_mb": round(float(df.memory_usage(deep=True).sum()) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--postgres", action="store_true", help="load the real invoices table instead")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    from benchmarks.common import save_results
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        if args.postgres:
+            for case in ("read_sql", "streaming"):
+                results.append(pool.apply(_run_postgres_case, (case, args.chunksize)))
+                print(results[-1])
+        else:
+            for n_rows in args.rows:
+                for case in ("fetchall", "streaming"):
+                    results.append(pool.apply(_run_case, (case, n_rows, args.chunksize)))
+                    print(results[-1])
+
+    print(f"Results saved to {save_results('invoice_loader', {'runs': results}, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Throughput, wait times and worker utilization of the background receipt job queue.
+
+A burst of synthetic receipts (text PDFs) is enqueued as the app does on upload, and worker
+processes run them through the invoice graph with the fake LLM until every job is saved (those
+that pass validation) or waits for approval; the others are then approved and inserted into a
+SQLite stand-in. The time the page spends
+enqueuing an upload is reported next to the time a worker spends on it, which is what the page
+used to block on. Run with several worker counts to see how throughput scales while the LLM
+latency dominates.
+
+    python -m benchmarks.bench_job_queue --receipts 24 --workers 1,2,4 --llm-latency 0.5
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+
+def bench_worker(receipts: int, items: int, seed: int, llm_latency: float, db_path: str):
+    """A queue worker with the benchmark's fake LLM and SQLite inserts (runs in a spawned process)."""
+    import agents.invoice_agent as invoice_agent
+    from benchmarks.bench_ingestion import sqlite_inserter
+    from benchmarks.fakes import ReceiptResponder
+    from benchmarks.synthetic import synthetic_receipts
+    from src.job_worker import worker_loop
+    from src.llm_client import build_llm_client, set_llm_client
+
+    generated = list(synthetic_receipts(receipts, seed=seed, items_per_receipt=items))
+    set_llm_client(build_llm_client("fake", responder=ReceiptResponder(generated), latency_s=llm_latency, seed=seed))
+    db = sqlite3.connect(db_path, timeout=30)
+    invoice_agent.insert_sql_query = sqlite_inserter(db)
+    worker_loop(poll_s=0.05)
+
+
+def wait_for(queue, job_ids, statuses, timeout_s: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout_s:
+        if all(queue.get(job_id)["status"] in statuses for job_id in job_ids):
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    raise TimeoutError(f"Jobs not {'/'.join(statuses)} after {timeout_s}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=24)
+    parser.add_argument("--items", type=int, default=20, help="line items per receipt")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for each phase")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    worker_counts = [int(workers) for workers in args.workers.split(",") if workers.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+    os.environ["PDF_WORKERS"] = "1"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    from benchmarks.bench_ingestion import SQLITE_SCHEMA
+    from benchmarks.common import save_results, summarize
+    from benchmarks.synthetic import synthetic_receipts, write_text_pdf
+    from src.job_queue import JobQueue
+    from src.job_worker import stop_workers
+    import multiprocessing
+
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    files = []
+    for n, receipt in enumerate(receipts):
+        path = os.path.join(tmp.name, f"receipt_{n}.pdf")
+        write_text_pdf([line for line in receipt.markdown.splitlines() if not line.startswith("|---")], path)
+        with open(path, "rb") as f:
+            files.append((f"receipt_{n}.pdf", f.read()))
+
+    context = multiprocessing.get_context("spawn")
+    results = {"config": vars(args), "workers": {}}
+    for workers in worker_counts:
+        queue_path = os.path.join(tmp.name, f"jobs-{workers}.sqlite")
+        db_path = os.path.join(tmp.name, f"invoices-{workers}.db")
+        with sqlite3.connect(db_path) as db:
+            db.execute(SQLITE_SCHEMA)
+        os.environ["JOB_QUEUE_DB"] = queue_path
+        # The workers' access key lookup reads the same table they insert into
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        queue = JobQueue(path=queue_path, lease_s=600)
+        processes = [context.Process(target=bench_worker, args=(args.receipts, args.items, args.seed,
+                                                                args.llm_latency, db_path))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        try:
+            # Process start-up and model loading are not part of the burst
+            start = time.perf_counter()
+            while queue.metrics()["workers"] < workers:
+                if time.perf_counter() - start > args.timeout:
+                    raise TimeoutError("Workers did not start")
+                time.sleep(0.05)
+            job_ids, enqueue_s = [], []
+            for name, data in files:
+                start = time.perf_counter()
+                job_ids.append(queue.enqueue(name, data))
+                enqueue_s.append(time.perf_counter() - start)
+            extract_s = wait_for(queue, job_ids, ("awaiting_approval", "done", "duplicate", "failed"), args.timeout)
+            auto_saved = sum(queue.get(job_id)["status"] == "done" for job_id in job_ids)
+            for job_id in job_ids:
+                queue.approve(job_id)
+            insert_s = wait_for(queue, job_ids, ("done", "duplicate", "failed"), args.timeout)
+            metrics = queue.metrics()
+        finally:
+            stop_workers(processes)
+        with sqlite3.connect(db_path) as db:
+            stored = db.execute("SELECT COUNT(DISTINCT invoice_id) FROM invoices").fetchone()[0]
+        results["workers"][workers] = {
+            "enqueue": summarize(enqueue_s),
+            "extract_s": extract_s,
+            "insert_s": insert_s,
+            "receipts_per_sec": len(files) / extract_s if extract_s else 0.0,
+            "receipts_stored": stored,
+            "auto_saved": auto_saved,
+            "failed": metrics["depth"]["failed"],
+            **{key: metrics[key] for key in ("wait_p50_s", "wait_p95_s", "run_p50_s", "run_p95_s", "utilization")},
+        }
+
+    print(f"{len(files)} receipts, fake LLM latency {args.llm_latency}s")
+    print(f"{'workers':>7} {'enqueue ms':>11} {'run p50 s':>10} {'wait p95 s':>11} {'receipts/s':>11} "
+          f"{'util':>6} {'stored':>7} {'auto':>5}")
+    for workers, stats in results["workers"].items():
+        print(f"{workers:7d} {stats['enqueue']['p50_s'] * 1000:11.2f} {stats['run_p50_s']:10.2f} "
+              f"{stats['wait_p95_s']:11.2f} {stats['receipts_per_sec']:11.2f} {stats['utilization']:6.0%} "
+              f"{stats['receipts_stored']:7d} {stats['auto_saved']:5d}")
+    print(f"Results saved to {save_results('job_queue', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Storage and query time of the wide invoices table vs. the normalized tables behind the invoices view.
+
+Synthetic invoice rows are loaded into the wide table (src.sql_commands.invoices_table) of a SQLite
+stand-in, the database is copied and migrated with the same statements `python -m src.database
+migrate` runs, and both files are vacuumed. The file sizes and rows per table are reported, then
+report queries are timed on the wide table, on the invoices view (what the agents' SQL runs on) and,
+for the group-bys, written against the normalized tables (grouped on the integer keys, names joined
+afterwards). The migration time is reported too.
+
+    python -m benchmarks.bench_normalized_schema --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+from benchmarks.common import save_results
+from benchmarks.synthetic import synthetic_invoice_rows
+from src.database import INVOICE_COLUMNS
+from src.sql_commands import invoices_table, normalize_migrations, sqlite_commands
+
+TABLES = ("invoices", "stores", "categories", "products", "receipts", "line_items")
+# The same question on the wide table or view, and on the normalized tables (None: not rewritten);
+# {key} is the access key of the first synthetic receipt
+QUERIES = {
+    "total_per_supermarket": (
+        "SELECT supermarket_name, SUM(total_value) AS total_spent FROM invoices "
+        "GROUP BY supermarket_name ORDER BY total_spent DESC",
+        "SELECT s.name, t.total_spent FROM (SELECT r.store_id, SUM(l.total_value) AS total_spent "
+        "FROM line_items l JOIN receipts r ON r.receipt_id = l.receipt_id GROUP BY r.store_id) t "
+        "JOIN stores s ON s.store_id = t.store_id ORDER BY t.total_spent DESC",
+    ),
+    "total_per_category": (
+        "SELECT category, SUM(total_value) AS total_spent, COUNT(*) AS items FROM invoices "
+        "GROUP BY category ORDER BY total_spent DESC",
+        "SELECT c.name, SUM(t.total_spent) AS total_spent, SUM(t.items) AS items FROM (SELECT product_id, "
+        "SUM(total_value) AS total_spent, COUNT(*) AS items FROM line_items GROUP BY product_id) t "
+        "JOIN products p ON p.product_id = t.product_id JOIN categories c ON c.category_id = p.category_id "
+        "GROUP BY c.name ORDER BY total_spent DESC",
+    ),
+    "monthly_per_supermarket": (
+        "SELECT substr(datetime, 1, 7) AS month, supermarket_name, SUM(total_value) AS total_spent "
+        "FROM invoices GROUP BY month, supermarket_name ORDER BY month, supermarket_name",
+        "SELECT t.month, s.name, t.total_spent FROM (SELECT substr(r.datetime, 1, 7) AS month, r.store_id, "
+        "SUM(l.total_value) AS total_spent FROM line_items l JOIN receipts r ON r.receipt_id = l.receipt_id "
+        "GROUP BY month, r.store_id) t JOIN stores s ON s.store_id = t.store_id ORDER BY t.month, s.name",
+    ),
+    "top_products": (
+        "SELECT full_product_name, SUM(total_value) AS total_spent, SUM(quantity) AS quantity FROM invoices "
+        "GROUP BY full_product_name ORDER BY total_spent DESC LIMIT 10",
+        "SELECT p.full_product_name, SUM(t.total_spent) AS total_spent, SUM(t.quantity) AS quantity FROM "
+        "(SELECT product_id, SUM(total_value) AS total_spent, SUM(quantity) AS quantity FROM line_items "
+        "GROUP BY product_id) t JOIN products p ON p.product_id = t.product_id "
+        "GROUP BY p.full_product_name ORDER BY total_spent DESC LIMIT 10",
+    ),
+    "receipts_in_a_month": (
+        "SELECT COUNT(DISTINCT invoice_id) FROM invoices WHERE datetime BETWEEN '2024-03-01' AND '2024-03-31'",
+        "SELECT COUNT(*) FROM receipts WHERE datetime BETWEEN '2024-03-01' AND '2024-03-31'",
+    ),
+    "one_receipt": (
+        "SELECT * FROM invoices WHERE invoice_id = '{key}'",
+        None,
+    ),
+    "full_load": (
+        f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices",
+        None,
+    ),
+}
+
+
+def load_wide(path: str, n_rows: int, seed: int, items: int):
+    """Creates the wide invoices table and fills it with synthetic rows, numbered per receipt."""
+    with sqlite3.connect(path) as db:
+        db.execute(sqlite_commands([invoices_table])[0])
+        # The same secondary index a database used for reports would have on the wide table
+        db.execute("CREATE INDEX invoices_datetime ON invoices (datetime)")
+        previous_key, line_number, batch = None, 0, []
+        for row in synthetic_invoice_rows(n_rows, seed, items_per_receipt=items):
+            line_number = line_number + 1 if row[0] == previous_key else 1
+            previous_key = row[0]
+            row = (str(row[0]), row[1], row[2].isoformat()) + tuple(
+                float(value) if isinstance(value, Decimal) else value for value in row[3:])
+            batch.append(row + (line_number,))
+            if len(batch) == 50_000:
+                db.executemany(f"INSERT INTO invoices VALUES ({', '.join(['?'] * 13)})", batch)
+                batch = []
+        if batch:
+            db.executemany(f"INSERT INTO invoices VALUES ({', '.join(['?'] * 13)})", batch)
+
+
+def migrate(path: str) -> float:
+    start = time.perf_counter()
+    with sqlite3.connect(path) as db:
+        for command in sqlite_commands(normalize_migrations):
+            db.execute(command)
+    return time.perf_counter() - start
+
+
+def table_rows(path: str) -> dict:
+    with sqlite3.connect(path) as db:
+        existing = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        return {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES
+                if table in existing}
+
+
+def vacuumed_mb(path: str) -> float:
+    with sqlite3.connect(path) as db:
+        db.execute("VACUUM")
+    return os.path.getsize(path) / 1e6
+
+
+def time_query(path: str, query: str, repeat: int) -> dict:
+    durations, rows = [], 0
+    with sqlite3.connect(path) as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(db.execute(query).fetchall())
+            durations.append(time.perf_counter() - start)
+    return {"rows": rows, "median_s": round(statistics.median(durations), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wide_path, normalized_path = os.path.join(tmp, "wide.db"), os.path.join(tmp, "normalized.db")
+        load_wide(wide_path, args.rows, args.seed, args.items)
+        shutil.copyfile(wide_path, normalized_path)
+        migrate_s = migrate(normalized_path)
+        results = {
+            "config": vars(args),
+            "migrate_s": round(migrate_s, 3),
+            "size_mb": {"wide": round(vacuumed_mb(wide_path), 2), "normalized": round(vacuumed_mb(normalized_path), 2)},
+            "rows": {"wide": table_rows(wide_path), "normalized": table_rows(normalized_path)},
+            "queries": {},
+        }
+        key = str(next(synthetic_invoice_rows(1, args.seed))[0])
+        for name, (query, normalized_query) in QUERIES.items():
+            query = query.format(key=key)
+            results["queries"][name] = {
+                "wide": time_query(wide_path, query, args.repeat),
+                "view": time_query(normalized_path, query, args.repeat),
+                "normalized": time_query(normalized_path, normalized_query, args.repeat) if normalized_query else None,
+            }
+
+    sizes = results["size_mb"]
+    print(f"{args.rows} rows: wide {sizes['wide']:.1f} MB, normalized {sizes['normalized']:.1f} MB "
+          f"({1 - sizes['normalized'] / sizes['wide']:.0%} smaller), migrated in {results['migrate_s']:.1f}s")
+    print("Rows per table:", ", ".join(f"{table} {rows}" for table, rows in results["rows"]["normalized"].items()))
+    print(f"{'query':<26} {'wide s':>8} {'view s':>8} {'normalized s':>13}")
+    for name, timings in results["queries"].items():
+        normalized = f"{timings['normalized']['median_s']:13.4f}" if timings["normalized"] else f"{'-':>13}"
+        print(f"{name:<26} {timings['wide']['median_s']:8.4f} {timings['view']['median_s']:8.4f} {normalized}")
+    print(f"Results saved to {save_results('normalized_schema', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Prompt size, latency and accuracy of partial extraction against the full extraction prompt on
+receipts whose share of already approved items is controlled.
+
+Synthetic receipts in the plain-text layout (no item table, so the parser fast path does not
+apply) are generated for each repeat ratio: that share of their items comes from products the
+product dictionary already knows, the rest are new. Each receipt is extracted twice, once with
+only the unknown lines sent to the LLM and once with the whole receipt, and scored against the
+rows it was generated from. The fake LLM's latency grows with prompt and completion tokens, so
+the latency follows the prompt and answer sizes.
+
+    python -m benchmarks.bench_partial_extraction
+    python -m benchmarks.bench_partial_extraction --ratios 0,0.5,0.83,1 --items 30 --llm-per-output-token 0.02
+"""
+import argparse
+import os
+import tempfile
+import time
+
+MODES = ("partial", "full")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ratios", default="0,0.5,0.83,1", help="comma-separated shares of known items")
+    parser.add_argument("--receipts", type=int, default=5, help="receipts per ratio")
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--llm-per-token", type=float, default=0.0002, help="extra fake latency per prompt token")
+    parser.add_argument("--llm-per-output-token", type=float, default=0.005,
+                        help="extra fake latency per completion token")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    ratios = [float(ratio) for ratio in args.ratios.split(",") if ratio.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["PRODUCT_DICTIONARY"] = "true"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    from benchmarks.bench_backends import score_extraction
+    from benchmarks.common import save_results, summarize
+    from benchmarks.fakes import ReceiptResponder
+    from benchmarks.synthetic import PRODUCTS, SUPERMARKETS, synthetic_receipts
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.llm_usage import usage_scope
+    from src.logging_utils import configure_logging
+    from src.product_dictionary import ProductDictionary, set_product_dictionary
+    from src.receipt_processing import extract_receipt_data
+
+    configure_logging()
+    # The known products, as if approved at every store before
+    dictionary = ProductDictionary()
+    dictionary.learn((store, description, product, full_name, volume, category)
+                     for store in SUPERMARKETS
+                     for description, _, _, product, full_name, volume, category in PRODUCTS)
+    set_product_dictionary(dictionary)
+
+    results = {"config": vars(args), "ratios": {}}
+    for ratio in ratios:
+        receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items,
+                                           layouts=("text",), repeat_ratio=ratio))
+        responder = ReceiptResponder(receipts)
+        client = build_llm_client("fake", responder=responder, latency_s=args.llm_latency,
+                                  per_token_s=args.llm_per_token, per_output_token_s=args.llm_per_output_token,
+                                  seed=args.seed)
+        set_llm_client(client)
+        ratio_results = {}
+        for mode in MODES:
+            durations, scores = [], []
+            calls = client.chat_model.calls
+            with usage_scope("benchmark", budget_usd=0) as usage:
+                for receipt in receipts:
+                    start = time.perf_counter()
+                    insert_sql = extract_receipt_data(receipt.markdown, partial=mode == "partial")
+                    durations.append(time.perf_counter() - start)
+                    scores.append(score_extraction(receipt, insert_sql))
+            items_expected = sum(score["items_expected"] for score in scores)
+            ratio_results[mode] = {
+                **summarize(durations),
+                "llm_calls": client.chat_model.calls - calls,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cost_usd": usage.cost_usd,
+                "exact_receipts": sum(score["exact"] for score in scores) / len(scores),
+                "item_accuracy": sum(score["items_found"] for score in scores) / max(items_expected, 1),
+            }
+        results["ratios"][f"{ratio:g}"] = ratio_results
+    set_llm_client(None)
+    set_product_dictionary(None)
+
+    print(f"{'known':>6} {'mode':<8} {'p50 ms':>9} {'p95 ms':>9} {'calls':>6} {'prompt tok':>11} "
+          f"{'compl. tok':>11} {'exact':>6}")
+    for ratio, ratio_results in results["ratios"].items():
+        for mode, stats in ratio_results.items():
+            print(f"{float(ratio):6.0%} {mode:<8} {stats['p50_s'] * 1000:9.1f} {stats['p95_s'] * 1000:9.1f} "
+                  f"{stats['llm_calls']:6d} {stats['prompt_tokens']:11d} {stats['completion_tokens']:11d} "
+                  f"{stats['exact_receipts']:6.0%}")
+    print(f"Results saved to {save_results('partial_extraction', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Pages/sec of page-level PDF conversion with worker pools of different sizes, and how well a
+scanned batch is split back into its receipts.
+
+Synthetic receipts are written into one batch PDF, each starting on a new page and spanning
+several pages when it has more lines than --lines-per-page. The batch is converted with each
+worker count (after a warm-up run, so model loading in new workers is not counted) and split;
+a receipt counts as found when a split document carries its access key and all its item lines.
+
+    python -m benchmarks.bench_pdf_splitting --receipts 10 --items 40 --workers 1,2,4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=10, help="receipts in the batch PDF")
+    parser.add_argument("--items", type=int, default=40, help="line items per receipt")
+    parser.add_argument("--lines-per-page", type=int, default=30)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--repeats", type=int, default=3, help="timed conversions per worker count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    worker_counts = [int(workers) for workers in args.workers.split(",") if workers.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+
+    import src.pdf_splitting as pdf_splitting
+    from benchmarks.common import save_results, summarize
+    from benchmarks.synthetic import synthetic_receipts, write_batch_pdf
+    from src.receipt_parser import parse_header, split_receipt_lines
+
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items,
+                                       layouts=("text",)))
+    path = os.path.join(tmp.name, "batch.pdf")
+    pages = write_batch_pdf(receipts, path, args.lines_per_page)
+
+    results = {"config": vars(args), "pages": pages, "workers": {}}
+    for workers in worker_counts:
+        pdf_splitting.shutdown_pool()
+        pdf_splitting.convert_pages(path, workers=workers)
+        durations = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            markdown = pdf_splitting.convert_pages(path, workers=workers)
+            durations.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        documents = pdf_splitting.split_receipts(markdown)
+        split_s = time.perf_counter() - start
+
+        by_key = {parse_header(document)["invoice_id"]: document for document in documents}
+        found = sum(
+            receipt.access_key in by_key
+            and len(split_receipt_lines(by_key[receipt.access_key])[1]) == len(receipt.items)
+            for receipt in receipts
+        )
+        stats = summarize(durations)
+        results["workers"][workers] = {
+            **stats,
+            "pages_per_sec": pages / stats["p50_s"] if stats["p50_s"] else 0.0,
+            "split_ms": split_s * 1000,
+            "documents": len(documents),
+            "receipts_found": found / len(receipts),
+        }
+    pdf_splitting.shutdown_pool()
+
+    print(f"{pages} pages, {len(receipts)} receipts")
+    print(f"{'workers':>7} {'p50 ms':>9} {'pages/sec':>10} {'split ms':>9} {'documents':>10} {'found':>6}")
+    for workers, stats in results["workers"].items():
+        print(f"{workers:7d} {stats['p50_s'] * 1000:9.1f} {stats['pages_per_sec']:10.1f} {stats['split_ms']:9.1f} "
+              f"{stats['documents']:10d} {stats['receipts_found']:6.0%}")
+    print(f"Results saved to {save_results('pdf_splitting', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
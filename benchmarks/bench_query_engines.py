@@ -0,0 +1,96 @@
+"""
+Common report queries on PostgreSQL vs. the embedded DuckDB engine.
+
+Without --postgres, a synthetic dataset is written to a temporary Parquet snapshot and only
+DuckDB is measured. With --postgres, the configured invoices table is exported to a temporary
+snapshot and each query runs on both engines through the same read-only guard.
+
+    python -m benchmarks.bench_query_engines --rows 1000000
+    python -m benchmarks.bench_query_engines --postgres
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Queries in the shape the SQL agents generate for the spending report
+REPORT_QUERIES = {
+    "total_per_supermarket": (
+        "SELECT supermarket_name, SUM(total_value) AS total_spent FROM invoices "
+        "GROUP BY supermarket_name ORDER BY total_spent DESC"
+    ),
+    "total_per_category": (
+        "SELECT category, SUM(total_value) AS total_spent, COUNT(*) AS items FROM invoices "
+        "GROUP BY category ORDER BY total_spent DESC"
+    ),
+    "monthly_per_supermarket": (
+        "SELECT TO_CHAR(datetime, 'YYYY-MM') AS month, supermarket_name, SUM(total_value) AS total_spent "
+        "FROM invoices GROUP BY month, supermarket_name ORDER BY month, supermarket_name"
+    ),
+    "monthly_trend_date_trunc": (
+        "SELECT DATE_TRUNC('month', datetime) AS month, SUM(total_value) AS total_spent "
+        "FROM invoices WHERE datetime >= CURRENT_DATE - INTERVAL '5 years' GROUP BY 1 ORDER BY 1"
+    ),
+    "top_products": (
+        "SELECT full_product_name, SUM(total_value) AS total_spent, SUM(quantity) AS quantity FROM invoices "
+        "GROUP BY full_product_name ORDER BY total_spent DESC LIMIT 10"
+    ),
+    "avg_price_per_product_and_store": (
+        "SELECT product, supermarket_name, AVG(unitary_value) AS avg_price, MIN(unitary_value) AS min_price "
+        "FROM invoices GROUP BY product, supermarket_name ORDER BY product, avg_price"
+    ),
+    "receipts_per_year": (
+        "SELECT EXTRACT(YEAR FROM datetime) AS year, COUNT(DISTINCT invoice_id) AS receipts "
+        "FROM invoices GROUP BY 1 ORDER BY 1"
+    ),
+}
+
+
+def _time(func, repeat: int) -> dict:
+    durations, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(func())
+        durations.append(time.perf_counter() - start)
+    return {"rows": rows, "median_s": round(statistics.median(durations), 4), "min_s": round(min(durations), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--postgres", action="store_true", help="also run the queries on the configured database")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    from benchmarks.common import save_results
+    from benchmarks.synthetic import SyntheticInvoiceCursor
+    from src.database import INVOICE_COLUMNS, create_db_engine, export_invoice_snapshot, frames_from_cursor, \
+        write_invoice_snapshot
+    from src.query_engine import DuckDBEngine
+    from src.sql_guard import run_readonly_query
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        if args.postgres:
+            engine = create_db_engine()
+            info = export_invoice_snapshot(engine, path)
+        else:
+            info = write_invoice_snapshot(frames_from_cursor(SyntheticInvoiceCursor(args.rows), INVOICE_COLUMNS), path)
+        duckdb_engine = DuckDBEngine(source="parquet", database=":memory:", snapshot_path=path)
+        duckdb_engine.refresh()
+        results["rows"] = info["rows"]
+
+        for name, sql_query in REPORT_QUERIES.items():
+            results[name] = {"duckdb": _time(lambda: duckdb_engine.query(sql_query), args.repeat)}
+            if args.postgres:
+                results[name]["postgres"] = _time(lambda: run_readonly_query(engine, sql_query), args.repeat)
+            print(f"{name:<35} {results[name]}")
+
+    print(f"Results saved to {save_results('query_engines', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
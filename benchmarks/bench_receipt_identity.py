@@ -0,0 +1,123 @@
+"""
+Latency of ingesting receipts that are already stored, that have their XML in the drop folder,
+and that are new, with the access key read up front against converting every file.
+
+Synthetic receipts are written as text-layer PDFs. A third of them are saved into a SQLite
+stand-in of the receipt tables first and a third get their authorized XML in a drop folder; the rest are new.
+Each file goes through the ingestion steps the graph runs (identification, then conversion,
+splitting and extraction when needed) with and without the key lookup. The fake LLM answers
+extraction and enrichment prompts. With --known-products the product dictionary knows every
+synthetic product, as for a returning user, so XML receipts need no LLM call at all; without it
+they still need one enrichment call. Conversion time depends on the docling install.
+
+    python -m benchmarks.bench_receipt_identity --receipts 15 --items 30
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from decimal import Decimal
+
+KINDS = ("stored", "xml", "new")
+MODES = ("lookup", "convert")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=15, help="receipts, split evenly between the kinds")
+    parser.add_argument("--items", type=int, default=30, help="line items per receipt")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--llm-per-output-token", type=float, default=0.005,
+                        help="extra fake latency per completion token")
+    parser.add_argument("--known-products", action=argparse.BooleanOptionalAction, default=True,
+                        help="seed the product dictionary with the synthetic products")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    xml_dir = os.path.join(tmp.name, "xml")
+    os.makedirs(xml_dir)
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["PRODUCT_DICTIONARY"] = "true"
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+    os.environ["XML_DROP_DIR"] = xml_dir
+    db_path = os.path.join(tmp.name, "invoices.sqlite")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    import sqlalchemy
+    from benchmarks.common import save_results, summarize
+    from benchmarks.fakes import ReceiptResponder
+    from benchmarks.synthetic import PRODUCTS, SUPERMARKETS, synthetic_receipts, write_batch_pdf, write_nfe_xml
+    from src.database import insert_receipts
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.product_dictionary import ProductDictionary, set_product_dictionary
+    from src.receipt_identity import get_engine
+    from src.sql_commands import sql_commands, sqlite_commands
+    from src.receipt_processing import (drop_stored_receipts, extract_receipts_data, identify_receipt,
+                                        process_pdf_receipts)
+
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    kinds = {receipt.access_key: KINDS[n % len(KINDS)] for n, receipt in enumerate(receipts)}
+    paths = {}
+    for receipt in receipts:
+        paths[receipt.access_key] = os.path.join(tmp.name, f"{receipt.access_key}.pdf")
+        write_batch_pdf([receipt], paths[receipt.access_key])
+        if kinds[receipt.access_key] == "xml":
+            write_nfe_xml(receipt, os.path.join(xml_dir, f"{receipt.access_key}-procNFe.xml"))
+
+    with get_engine().begin() as connection:
+        for command in sqlite_commands(sql_commands):
+            connection.execute(sqlalchemy.text(command))
+    sqlite3.register_adapter(Decimal, str)
+    for receipt in receipts:
+        if kinds[receipt.access_key] == "stored":
+            insert_receipts(receipt.insert_sql(), lambda: sqlite3.connect(db_path), placeholder="?")
+
+    dictionary = ProductDictionary()
+    if args.known_products:
+        dictionary.learn((store, description, product, full_name, volume, category)
+                         for store in SUPERMARKETS
+                         for description, _, _, product, full_name, volume, category in PRODUCTS)
+    set_product_dictionary(dictionary)
+    client = build_llm_client("fake", responder=ReceiptResponder(receipts), latency_s=args.llm_latency,
+                              per_output_token_s=args.llm_per_output_token, seed=args.seed)
+    set_llm_client(client)
+
+    def ingest(path, lookup):
+        identified = identify_receipt(path) if lookup else {}
+        if identified:
+            return identified
+        converted = process_pdf_receipts(path)
+        documents = drop_stored_receipts(converted)[0] if lookup else converted
+        return {"result": extract_receipts_data(documents)} if documents else {"duplicate": True}
+
+    results = {"config": vars(args), "kinds": {}}
+    for kind in KINDS:
+        keys = [key for key in kinds if kinds[key] == kind]
+        results["kinds"][kind] = {}
+        for mode in MODES:
+            durations = []
+            calls = client.chat_model.calls
+            for key in keys:
+                start = time.perf_counter()
+                ingest(paths[key], lookup=mode == "lookup")
+                durations.append(time.perf_counter() - start)
+            results["kinds"][kind][mode] = {**summarize(durations), "llm_calls": client.chat_model.calls - calls}
+    set_llm_client(None)
+    set_product_dictionary(None)
+
+    print(f"{'receipt':<8} {'mode':<8} {'p50 ms':>9} {'p95 ms':>9} {'LLM calls':>10}")
+    for kind, kind_results in results["kinds"].items():
+        for mode, stats in kind_results.items():
+            print(f"{kind:<8} {mode:<8} {stats['p50_s'] * 1000:9.1f} {stats['p95_s'] * 1000:9.1f} "
+                  f"{stats['llm_calls']:10d}")
+    print(f"Results saved to {save_results('receipt_identity', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
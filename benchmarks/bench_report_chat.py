@@ -0,0 +1,265 @@
+"""
+Offline benchmark for the chat Q&A branch (write_query -> execute_query -> generate_answer)
+and the report workflow (Supervisor -> SQLAgent ... -> ReportWriter).
+
+A synthetic invoices table of --rows rows is seeded into a SQLite file (or into an empty
+scratch database given with --database-url), a fixed set of chat questions and report requests
+is replayed against recorded LLM answers, and for every question the number of LLM calls,
+prompt/completion tokens, DB time and end-to-end latency are reported and saved as JSON.
+Later --repeat passes show the effect of the SQL cache.
+
+    python -m benchmarks.bench_report_chat --rows 100000
+    python -m benchmarks.bench_report_chat --rows 10000000 --db /tmp/invoices_10m.db --llm-latency 1.5
+"""
+import argparse
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+SEED_BATCH = 20_000
+
+# Date expressions differ between the dialects the recorded SQL is replayed on
+DIALECT_SQL = {
+    "sqlite": {"month": "strftime('%Y-%m', datetime)", "year": "strftime('%Y', datetime)",
+               "since": "date((SELECT MAX(datetime) FROM invoices), '-90 day')"},
+    "postgresql": {"month": "TO_CHAR(datetime, 'YYYY-MM')", "year": "EXTRACT(YEAR FROM datetime)",
+                   "since": "(SELECT MAX(datetime) FROM invoices) - INTERVAL '90 days'"},
+}
+
+CHAT_QUESTIONS = {
+    "How much did I spend in total?": "SELECT SUM(total_value) AS total_spent FROM invoices",
+    "How much did I spend at each supermarket?": (
+        "SELECT supermarket_name, SUM(total_value) AS total_spent FROM invoices "
+        "GROUP BY supermarket_name ORDER BY total_spent DESC"
+    ),
+    "What are the 10 products I spend the most on?": (
+        "SELECT full_product_name, SUM(total_value) AS total_spent FROM invoices "
+        "GROUP BY full_product_name ORDER BY total_spent DESC LIMIT 10"
+    ),
+    "How much did I spend on Bebidas per month?": (
+        "SELECT {month} AS month, SUM(total_value) AS total_spent FROM invoices "
+        "WHERE category = 'Bebidas' GROUP BY 1 ORDER BY 1"
+    ),
+    "Which supermarket has the cheapest Leite on average?": (
+        "SELECT supermarket_name, AVG(unitary_value) AS avg_price FROM invoices "
+        "WHERE product = 'Leite' GROUP BY supermarket_name ORDER BY avg_price LIMIT 1"
+    ),
+    "How many receipts did I register in the last 90 days?": (
+        "SELECT COUNT(DISTINCT invoice_id) AS receipts FROM invoices WHERE datetime >= {since}"
+    ),
+}
+
+# The request the report page sends, plus a shorter one
+REPORT_REQUESTS = {
+    "Generate a detailed financial report based on my supermarket purchases.": [
+        ("What is the total spending per supermarket?",
+         "SELECT supermarket_name, SUM(total_value) AS total_spent FROM invoices "
+         "GROUP BY supermarket_name ORDER BY total_spent DESC"),
+        ("What is the spending breakdown by product category?",
+         "SELECT category, SUM(total_value) AS total_spent FROM invoices GROUP BY category ORDER BY total_spent DESC"),
+        ("What are the monthly spending trends for each supermarket?",
+         "SELECT {month} AS month, supermarket_name, SUM(total_value) AS total_spent FROM invoices "
+         "GROUP BY 1, 2 ORDER BY 1, 2"),
+    ],
+    "Write a short report on my yearly grocery spending.": [
+        ("What is the total spending per year?",
+         "SELECT {year} AS year, SUM(total_value) AS total_spent FROM invoices GROUP BY 1 ORDER BY 1"),
+    ],
+}
+
+
+def recorded_sql(dialect: str):
+    """Returns the chat and report recordings with the date expressions of the dialect filled in."""
+    parts = DIALECT_SQL["postgresql" if dialect == "postgresql" else "sqlite"]
+    chat = {question: sql.format(**parts) for question, sql in CHAT_QUESTIONS.items()}
+    reports = {request: [(question, sql.format(**parts)) for question, sql in steps]
+               for request, steps in REPORT_REQUESTS.items()}
+    return chat, reports
+
+
+def seed_invoices(engine, n_rows: int, seed: int) -> int:
+    """Creates and fills the invoices table unless it already holds n_rows; returns the row count."""
+    import sqlalchemy
+    from benchmarks.synthetic import synthetic_invoice_rows
+    from src.database import INVOICE_COLUMNS
+    from src.sql_commands import invoices_table, sqlite_commands
+
+    if sqlalchemy.inspect(engine).has_table("invoices"):
+        with engine.connect() as connection:
+            existing = connection.execute(sqlalchemy.text("SELECT COUNT(*) FROM invoices")).scalar()
+        if existing == n_rows:
+            return existing
+        if existing:
+            raise SystemExit(f"invoices already holds {existing} rows; use an empty database or --rows {existing}")
+    else:
+        with engine.begin() as connection:
+            # The wide table, filled directly; the app writes through the normalized tables instead
+            schema = sqlite_commands([invoices_table])[0] if engine.dialect.name == "sqlite" else invoices_table
+            connection.execute(sqlalchemy.text(schema))
+
+    columns = INVOICE_COLUMNS + ["line_number"]
+    insert = sqlalchemy.text(
+        f"INSERT INTO invoices ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+    )
+    sqlite = engine.dialect.name == "sqlite"
+    batch, previous_key, line_number = [], None, 0
+    with engine.begin() as connection:
+        for row in synthetic_invoice_rows(n_rows, seed):
+            # The rows of a receipt come one after the other
+            line_number = line_number + 1 if row[0] == previous_key else 1
+            previous_key = row[0]
+            if sqlite:
+                # No DECIMAL in SQLite: the access key is stored as text and the amounts as REAL
+                row = (str(row[0]),) + tuple(float(v) if isinstance(v, Decimal) else v for v in row[1:])
+            batch.append(dict(zip(columns, row + (line_number,))))
+            if len(batch) == SEED_BATCH:
+                connection.execute(insert, batch)
+                batch = []
+        if batch:
+            connection.execute(insert, batch)
+    return n_rows
+
+
+def timed(func, durations: list):
+    """Wraps func so the time of every call is appended to durations."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic invoice rows to seed (10k-10M)")
+    parser.add_argument("--db", help="SQLite file to seed and reuse (default: a temporary file)")
+    parser.add_argument("--database-url", help="empty scratch database to seed instead of SQLite")
+    parser.add_argument("--repeat", type=int, default=2, help="passes over the questions; later passes hit the cache")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--llm-per-token", type=float, default=0.0, help="extra fake latency per prompt token")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="uniform random extra latency in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{args.db or os.path.join(tmp.name, 'invoices.db')}"
+    # Everything below reads these at import: point the app at the seeded database, keep the
+    # SQL cache in memory so the first pass starts cold, and query through the read-only guard
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SQL_CACHE_PATH"] = ""
+    os.environ["QUERY_ENGINE"] = "postgres"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    from langchain_core.messages import HumanMessage
+    import agents.invoice_agent as invoice_agent
+    import agents.report_workflow as report_workflow
+    import agents.sql_agent as sql_agent
+    import src.sql_query as sql_query
+    from benchmarks.common import compare_with_baseline, save_results, summarize
+    from benchmarks.fakes import RecordedResponder
+    from src.database import create_db_engine
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.logging_utils import configure_logging, flush_logs, log_bytes
+    from src.llm_usage import usage_scope
+    from src.tracing import span
+
+    configure_logging()
+    engine = create_db_engine()
+    start = time.perf_counter()
+    rows = seed_invoices(engine, args.rows, args.seed)
+    print(f"Seeded {rows} rows into {engine.dialect.name} in {time.perf_counter() - start:.1f}s")
+
+    chat_sql, report_steps = recorded_sql(engine.dialect.name)
+    responder = RecordedResponder(chat_sql, report_steps)
+    client = build_llm_client("fake", responder=responder, latency_s=args.llm_latency,
+                              per_token_s=args.llm_per_token, jitter_s=args.llm_jitter, seed=args.seed)
+    set_llm_client(client)
+    fake_llm = client.chat_model
+    db_durations = []
+    sql_query.run_query = timed(sql_query.run_query, db_durations)
+    sql_agent.run_query = timed(sql_agent.run_query, db_durations)
+
+    # Read before timing, as the app does on its first question: the hub prompt (once per process)
+    # and the table info (every SQL_SCHEMA_REFRESH_SECONDS)
+    sql_query.get_query_prompt_template()
+    sql_query.get_table_info()
+    chat_graph = invoice_agent.build_graph()
+    report_graph = report_workflow.build_report_graph()
+
+    def measure(kind, run) -> dict:
+        calls, prompt_tokens, completion_tokens = fake_llm.calls, fake_llm.prompt_tokens, fake_llm.completion_tokens
+        db_start = len(db_durations)
+        start = time.perf_counter()
+        error = None
+        try:
+            with span(f"bench.{kind}") as root, usage_scope(kind) as usage:
+                run()
+        except Exception as e:
+            error = str(e)
+        latency = time.perf_counter() - start
+        flush_logs()
+        return {
+            "latency_s": latency,
+            "db_s": sum(db_durations[db_start:]),
+            "queries": len(db_durations) - db_start,
+            "llm_calls": fake_llm.calls - calls,
+            "prompt_tokens": fake_llm.prompt_tokens - prompt_tokens,
+            "completion_tokens": fake_llm.completion_tokens - completion_tokens,
+            "cost_usd": usage.cost_usd,
+            "log_bytes": log_bytes(root.trace_id),
+            "error": error,
+        }
+
+    runs = []
+    for n in range(args.repeat):
+        for i, question in enumerate(chat_sql):
+            config = {"configurable": {"thread_id": f"chat-{n}-{i}"}}
+            stats = measure("chat", lambda: chat_graph.invoke({"question": [HumanMessage(content=question)]}, config=config))
+            runs.append({"path": "chat", "pass": n + 1, "question": question, **stats})
+        for request in report_steps:
+            config = {"configurable": {"thread_id": f"report-{n}"}, "recursion_limit": 50}
+            stats = measure("report", lambda: report_graph.invoke({"user_query": request}, config=config))
+            runs.append({"path": "report", "pass": n + 1, "question": request, **stats})
+
+    print(f"\n{'path':<7}{'pass':>5}{'LLM':>5}{'prompt tok':>12}{'compl tok':>11}{'DB ms':>10}{'total ms':>10}"
+          f"{'cost $':>8}{'log B':>8}  question")
+    for run in runs:
+        print(f"{run['path']:<7}{run['pass']:>5}{run['llm_calls']:>5}{run['prompt_tokens']:>12}"
+              f"{run['completion_tokens']:>11}{run['db_s'] * 1000:>10.1f}{run['latency_s'] * 1000:>10.1f}"
+              f"{run['cost_usd']:>8.4f}{run['log_bytes']:>8}  "
+              f"{run['question'][:60]}{'  ERROR: ' + run['error'] if run['error'] else ''}")
+
+    summary = {}
+    for path in ("chat", "report"):
+        for n in range(1, args.repeat + 1):
+            selected = [run for run in runs if run["path"] == path and run["pass"] == n]
+            summary[f"{path}_pass{n}"] = {
+                **summarize([run["latency_s"] for run in selected]),
+                "db_s": sum(run["db_s"] for run in selected),
+                "llm_calls": sum(run["llm_calls"] for run in selected),
+                "prompt_tokens": sum(run["prompt_tokens"] for run in selected),
+                "completion_tokens": sum(run["completion_tokens"] for run in selected),
+                "cost_usd": sum(run["cost_usd"] for run in selected),
+                "log_bytes": sum(run["log_bytes"] for run in selected),
+            }
+    results = {
+        "config": {**vars(args), "dialect": engine.dialect.name, "rows": rows},
+        "summary": summary,
+        "llm_calls_by_role": dict(responder.calls_by_role),
+        "runs": runs,
+    }
+    print(f"\nResults saved to {save_results('report_chat', results, args.output)}")
+    if args.baseline:
+        compare_with_baseline(args.baseline, results, section="summary")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
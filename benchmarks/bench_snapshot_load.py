@@ -0,0 +1,79 @@
+"""
+Load-time comparison between load_invoice_data and the Parquet snapshot.
+
+By default a synthetic dataset is written to a temporary snapshot and the cursor-based
+loader runs against an in-process synthetic cursor (no network). With --postgres the real
+invoices table is loaded with load_invoice_data and exported to a temporary snapshot.
+
+    python -m benchmarks.bench_snapshot_load --rows 1000000
+    python -m benchmarks.bench_snapshot_load --postgres
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+DASHBOARD_COLUMNS = ["invoice_id", "supermarket_name", "datetime", "description", "unitary_value",
+                     "total_value", "product", "full_product_name", "category"]
+
+
+def _time(func, repeat: int) -> dict:
+    durations, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(func())
+        durations.append(time.perf_counter() - start)
+    return {"rows": rows, "median_s": round(statistics.median(durations), 4), "min_s": round(min(durations), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--postgres", action="store_true", help="compare against the configured database")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    from benchmarks.common import save_results
+    from benchmarks.synthetic import SyntheticInvoiceCursor
+    from src.database import (INVOICE_COLUMNS, concat_invoice_frames, create_db_engine, export_invoice_snapshot,
+                              frames_from_cursor, load_invoice_data, load_invoice_snapshot, write_invoice_snapshot)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        if args.postgres:
+            engine = create_db_engine()
+            info = export_invoice_snapshot(engine, path)
+            cases = {
+                "load_invoice_data": lambda: load_invoice_data(engine),
+                "load_invoice_data_dashboard_columns": lambda: load_invoice_data(engine, columns=DASHBOARD_COLUMNS),
+            }
+        else:
+            info = write_invoice_snapshot(
+                frames_from_cursor(SyntheticInvoiceCursor(args.rows), INVOICE_COLUMNS), path)
+            cases = {
+                "cursor_loader_in_process": lambda: concat_invoice_frames(
+                    frames_from_cursor(SyntheticInvoiceCursor(args.rows), INVOICE_COLUMNS), INVOICE_COLUMNS),
+            }
+
+        max_date = datetime.date.fromisoformat(info["max_date"])
+        month_start = max_date.replace(day=1)
+        cases.update({
+            "snapshot_all": lambda: load_invoice_snapshot(path),
+            "snapshot_dashboard_columns": lambda: load_invoice_snapshot(path, columns=DASHBOARD_COLUMNS),
+            "snapshot_last_month_dashboard_columns": lambda: load_invoice_snapshot(
+                path, start_date=month_start, end_date=max_date, columns=DASHBOARD_COLUMNS),
+        })
+
+        results = {"snapshot": info, "cases": {}}
+        for name, func in cases.items():
+            results["cases"][name] = _time(func, args.repeat)
+            print(f"{name:<40} {results['cases'][name]}")
+
+    print(f"Results saved to {save_results('snapshot_load', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Throughput of the watch-folder ingestion daemon (src/watch_folder.py) with the fake LLM.
+
+Synthetic receipts are dropped into a folder as text PDFs while the daemon watches it: most
+arrive in one write, some are written in chunks to exercise the debounce, and --bad-share of
+them print a total that does not match their items, so they are left for review instead of
+being saved. Rows go to a SQLite stand-in. For each worker count the files/min, the time from
+the last file dropped to the last one processed and the saved/review split are reported; the
+daemon is then restarted on the same folder to check that nothing is processed twice.
+
+    python -m benchmarks.bench_watch_folder --receipts 40 --workers 1,2,4 --llm-latency 0.5
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+def drop_files(files, folder: str, chunked_share: float, rng):
+    """Writes the files into the folder; some in several chunks, as a slow copy would."""
+    for name, data in files:
+        path = os.path.join(folder, name)
+        if rng.random() < chunked_share:
+            with open(path, "wb") as f:
+                for start in range(0, len(data), max(len(data) // 4, 1)):
+                    f.write(data[start:start + max(len(data) // 4, 1)])
+                    f.flush()
+                    time.sleep(0.05)
+        else:
+            with open(path + ".part", "wb") as f:
+                f.write(data)
+            os.rename(path + ".part", path)
+
+
+def run_daemon(folder: str, checkpoint, workers: int, args, expected: int, timeout_s: float):
+    """Runs the daemon until expected files are finished (or timeout_s); returns the files it processed."""
+    from src.watch_folder import watch
+    stop = threading.Event()
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(processed=watch(
+        folder, checkpoint, workers=workers, batch_size=args.batch_size, debounce_s=args.debounce, poll_s=0.2,
+        auto_approve=True, mode=args.mode, stop=stop)))
+    thread.start()
+    start = time.perf_counter()
+    while sum(checkpoint.counts().get(status, 0) for status in ("saved", "review", "duplicate", "failed")) < expected:
+        if time.perf_counter() - start > timeout_s:
+            break
+        time.sleep(0.05)
+    stop.set()
+    thread.join()
+    return outcome.get("processed", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=40)
+    parser.add_argument("--items", type=int, default=15, help="line items per receipt")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker thread counts")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--debounce", type=float, default=0.5, help="seconds a file must stay unchanged")
+    parser.add_argument("--bad-share", type=float, default=0.1, help="share of receipts whose total does not add up")
+    parser.add_argument("--chunked-share", type=float, default=0.2, help="share of files written in chunks")
+    parser.add_argument("--mode", choices=("auto", "inotify", "poll"), default="auto")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fixed fake LLM latency in seconds")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for each run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    worker_counts = [int(workers) for workers in args.workers.split(",") if workers.strip()]
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "invoices.db")
+    # The access key lookup and the product dictionary read the table the receipts are inserted into
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["CONVERSION_CACHE_DIR"] = ""
+    os.environ["PDF_WORKERS"] = "1"
+    os.environ.setdefault("LLM_USAGE_DB", os.path.join(tmp.name, "llm_usage.sqlite"))
+    os.environ.setdefault("TRACE_PATH", os.path.join(tmp.name, "traces.jsonl"))
+
+    import agents.invoice_agent as invoice_agent
+    from benchmarks.bench_api import locked_inserter
+    from benchmarks.bench_ingestion import SQLITE_SCHEMA
+    from benchmarks.common import save_results
+    from benchmarks.fakes import ReceiptResponder
+    from benchmarks.synthetic import synthetic_receipts, write_text_pdf
+    from src.llm_client import build_llm_client, set_llm_client
+    from src.product_dictionary import invalidate_product_dictionary
+    from src.watch_folder import FileCheckpoint
+
+    rng = random.Random(args.seed)
+    receipts = list(synthetic_receipts(args.receipts, seed=args.seed, items_per_receipt=args.items))
+    set_llm_client(build_llm_client("fake", responder=ReceiptResponder(receipts), latency_s=args.llm_latency,
+                                    seed=args.seed))
+    files = []
+    for n, receipt in enumerate(receipts):
+        markdown = receipt.markdown
+        if rng.random() < args.bad_share:
+            # A misprinted total: the parser rejects it and the extracted items do not reconcile
+            markdown = markdown.replace("Valor total R$ ", "Valor total R$ 1")
+        path = os.path.join(tmp.name, f"receipt_{n}.pdf")
+        write_text_pdf([line for line in markdown.splitlines() if not line.startswith("|---")], path)
+        with open(path, "rb") as f:
+            files.append((f"receipt_{n}.pdf", f.read()))
+
+    with sqlite3.connect(db_path) as db:
+        db.execute(SQLITE_SCHEMA)
+    invoice_agent.insert_sql_query = locked_inserter(db_path)
+    results = {"config": vars(args), "workers": {}}
+    for workers in worker_counts:
+        folder = os.path.join(tmp.name, f"inbox-{workers}")
+        os.makedirs(folder)
+        # Every run starts from an empty table
+        with sqlite3.connect(db_path) as db:
+            db.execute("DELETE FROM invoices")
+        invalidate_product_dictionary()
+        checkpoint = FileCheckpoint(os.path.join(tmp.name, f"watch-{workers}.sqlite"))
+
+        writer = threading.Thread(target=drop_files, args=(files, folder, args.chunked_share, random.Random(args.seed)))
+        start = time.perf_counter()
+        writer.start()
+        daemon = threading.Thread(target=lambda: results["workers"].setdefault(workers, {}).update(
+            processed=run_daemon(folder, checkpoint, workers, args, len(files), args.timeout)))
+        daemon.start()
+        writer.join()
+        dropped_s = time.perf_counter() - start
+        daemon.join()
+        elapsed_s = time.perf_counter() - start
+        counts = checkpoint.counts()
+
+        # A restart on the same folder: everything is in the checkpoint
+        restarted = FileCheckpoint(checkpoint.path)
+        reprocessed = run_daemon(folder, restarted, workers, args, len(files) + 1, timeout_s=3 * args.debounce + 1)
+        with sqlite3.connect(db_path) as db:
+            stored = db.execute("SELECT COUNT(DISTINCT invoice_id) FROM invoices").fetchone()[0]
+        results["workers"][workers].update({
+            "elapsed_s": elapsed_s,
+            "drain_s": elapsed_s - dropped_s,
+            "files_per_min": len(files) * 60 / elapsed_s,
+            "statuses": counts,
+            "receipts_stored": stored,
+            "reprocessed_after_restart": reprocessed,
+        })
+        shutil.rmtree(folder)
+
+    print(f"{len(files)} receipts, fake LLM latency {args.llm_latency}s, debounce {args.debounce}s")
+    print(f"{'workers':>7} {'files/min':>10} {'drain s':>8} {'saved':>6} {'review':>7} {'failed':>7} {'stored':>7} "
+          f"{'rerun':>6}")
+    for workers, stats in results["workers"].items():
+        statuses = stats["statuses"]
+        print(f"{workers:7d} {stats['files_per_min']:10.1f} {stats['drain_s']:8.2f} {statuses.get('saved', 0):6d} "
+              f"{statuses.get('review', 0):7d} {statuses.get('failed', 0):7d} {stats['receipts_stored']:7d} "
+              f"{stats['reprocessed_after_restart']:6d}")
+    print(f"Results saved to {save_results('watch_folder', results, args.output)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
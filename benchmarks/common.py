@@ -0,0 +1,60 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import statistics
+import time
+
+
+def percentile(values, pct: float) -> float:
+    """Returns the pct-th percentile (0-100) using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(durations) -> dict:
+    """Returns count, mean, p50 and p95 (in seconds) for a list of durations."""
+    return {
+        "count": len(durations),
+        "mean_s": statistics.fmean(durations) if durations else 0.0,
+        "p50_s": percentile(durations, 50),
+        "p95_s": percentile(durations, 95),
+    }
+
+
+def save_results(name: str, results: dict, output: str | None = None) -> str:
+    """Writes benchmark results plus run metadata to a JSON file and returns its path."""
+    output = output or os.path.join("benchmarks", "results", f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    payload = {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+    return output
+
+
+def compare_with_baseline(baseline_path: str, results: dict, section: str = "nodes"):
+    """Prints the change in p50/p95 for every entry of results[section] against a previous run."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"].get(section, {})
+    print(f"\nChange vs. {baseline_path}:")
+    for name, stats in results.get(section, {}).items():
+        old = baseline.get(name)
+        if not old:
+            print(f"  {name:<24} (new)")
+            continue
+        deltas = []
+        for key in ("p50_s", "p95_s"):
+            if old.get(key):
+                deltas.append(f"{key[:3]} {100 * (stats[key] - old[key]) / old[key]:+.1f}%")
+        print(f"  {name:<24} {'  '.join(deltas)}")
@@ -0,0 +1,98 @@
+"""Responders that make the fake LLM backend answer like the real model for the benchmarks."""
+import json
+import re
+from collections import Counter
+
+
+class ReceiptResponder:
+    """
+    Answers extraction prompts with the exact INSERT of the receipt whose access key appears in
+    the prompt (only the items whose line is in the prompt), and item enrichment prompts with the product fields of each listed description.
+    Calls are counted per role.
+    """
+
+    def __init__(self, receipts):
+        self.by_key = {receipt.access_key: receipt for receipt in receipts}
+        self.by_description = {item["description"]: item for receipt in receipts for item in receipt.items}
+        self.calls_by_role = Counter()
+
+    def __call__(self, prompt: str) -> str:
+        if "Itens:" in prompt:
+            self.calls_by_role["enrichment"] += 1
+            descriptions = re.findall(r"^\s*\d+\. (.+)$", prompt.split("Itens:", 1)[1], re.MULTILINE)
+            return json.dumps([
+                {field: self.by_description.get(description, {}).get(field, "Outros")
+                 for field in ("product", "full_product_name", "category")}
+                for description in descriptions
+            ], ensure_ascii=False)
+        for match in re.finditer(r"3525(?:\s?\d){40}", prompt):
+            receipt = self.by_key.get(re.sub(r"\s", "", match.group(0)))
+            if receipt is not None:
+                self.calls_by_role["extraction"] += 1
+                # Items whose line is in the prompt, not its examples: the code followed by the description
+                return receipt.insert_sql([
+                    item for item in receipt.items
+                    if re.search(re.escape(item["code"]) + r"\W+" + re.escape(item["description"]), prompt)
+                ])
+        return ""
+
+
+class RecordedResponder:
+    """
+    Replays recorded answers for the chat and report paths, recognising each caller by its prompt.
+
+    chat_sql maps chat questions to SQL, report_steps maps report requests to the ordered
+    (question, SQL) steps the planner hands to the SQL agent. Calls are counted per role.
+    """
+
+    REPORT_TITLE = "# Grocery Spending Report"
+
+    def __init__(self, chat_sql: dict, report_steps: dict):
+        self.chat_sql = chat_sql
+        self.report_steps = report_steps
+        self.report_sql = {question: sql for steps in report_steps.values() for question, sql in steps}
+        self.calls_by_role = Counter()
+
+    def __call__(self, prompt: str) -> str:
+        if "report planner" in prompt:
+            self.calls_by_role["supervisor"] += 1
+            return self._plan(prompt)
+        if "You are a SQL expert" in prompt:
+            self.calls_by_role["sql_agent"] += 1
+            return self._find(self.report_sql, prompt, "```sql\n{}\n```", "SELECT 1")
+        if "report writer" in prompt:
+            self.calls_by_role["report_writer"] += 1
+            return self._report(prompt)
+        if "SQL Result:" in prompt:
+            self.calls_by_role["chat_answer"] += 1
+            result = prompt.split("SQL Result:", 1)[1].splitlines()[0].strip()
+            return f"Here is what I found: {result[:400]}"
+        self.calls_by_role["chat_sql"] += 1
+        return json.dumps({"query": self._find(self.chat_sql, prompt, "{}", "SELECT 1")})
+
+    @staticmethod
+    def _find(recorded: dict, prompt: str, template: str, default: str) -> str:
+        # Longest first so a question that contains another one wins
+        for question in sorted(recorded, key=len, reverse=True):
+            if question in prompt:
+                return template.format(recorded[question])
+        return template.format(default)
+
+    def _plan(self, prompt: str) -> str:
+        request = next((r for r in self.report_steps if r in prompt), None)
+        steps = self.report_steps.get(request, [])
+        pending = [question for question, _ in steps if f"Query: {question}" not in prompt]
+        if pending:
+            plan = {"plan": f"Retrieve data: {pending[0]}", "next_agent": "SQLAgent", "query_for_agent": pending[0]}
+        elif self.REPORT_TITLE not in prompt:
+            plan = {"plan": "All data retrieved, write the report", "next_agent": "ReportWriterAgent",
+                    "query_for_agent": "Write the spending report from the retrieved results"}
+        else:
+            plan = {"plan": "The report answers the request", "next_agent": "FINISH", "query_for_agent": ""}
+        return f"```json\n{json.dumps(plan)}\n```"
+
+    def _report(self, prompt: str) -> str:
+        sections = re.findall(r"Query: (.+)", prompt)
+        body = "\n".join(f"## {question}\n- Key figures summarised from the retrieved rows." for question in
+                         dict.fromkeys(sections))
+        return f"{self.REPORT_TITLE}\n\n{body or 'No data retrieved.'}"
@@ -0,0 +1,313 @@
+"""Deterministic synthetic data shared by the benchmarks."""
+import datetime
+import random
+from decimal import Decimal
+
+SUPERMARKETS = ["SuperNova Alimentos", "VivaBem Supermarket", "Mercado Central", "Assai Atacadista",
+                "CIA BRASILEIRA DE DISTRIBUICAO"]
+
+# (description, unit, unitary value, product, full product name, volume, category)
+PRODUCTS = [
+    ("LTE ITALAC ZERO 1L", "Un", 5.89, "Leite", "Leite Italac", "1L", "Laticínios"),
+    ("P QJ SIBERI 1kg TRAD", "PC", 14.10, "Pão de Queijo", "Pão de Queijo Siberi", "1KG", "Padaria e Confeitaria"),
+    ("SASSAMI SADIA 1kg", "PC", 20.90, "Frango", "Frango Sadia", "1KG", "Carnes e Aves"),
+    ("CERV BLUE MOON 350ML", "Un", 8.99, "Cerveja", "Cerveja Blue Moon", "350ML", "Bebidas"),
+    ("ORFEU TM INT 250G", "Un", 38.99, "Cafe", "Cafe Orfeu", "250G", "Bebidas"),
+    ("DET YPE NEUTRO 500ML", "Un", 2.79, "Detergente", "Detergente Ypê", "500ML", "Limpeza"),
+    ("ARROZ CAMIL T1 5KG", "Un", 27.90, "Arroz", "Arroz Camil", "5KG", "Mercearia"),
+    ("FEIJAO KICALDO 1KG", "Un", 8.49, "Feijão", "Feijão Kicaldo", "1KG", "Mercearia"),
+    ("BANANA PRATA KG", "Kg", 6.98, "Banana", "Banana", None, "Hortifruti"),
+    ("TOMATE ITALIANO KG", "Kg", 9.98, "Tomate", "Tomate", None, "Hortifruti"),
+    ("IOG NESTLE GREGO 100G", "Un", 3.29, "Iogurte", "Iogurte Nestlé", "100G", "Laticínios"),
+    ("REFRIG COCA COLA 2L", "Un", 10.99, "Refrigerante", "Refrigerante Coca-Cola", "2L", "Bebidas"),
+    ("PAPEL HIG NEVE 12UN", "Un", 21.90, "Papel Higiênico", "Papel Higiênico Neve", "12UN", "Higiene"),
+    ("CARNE MOIDA PATINHO KG", "Kg", 42.90, "Carne Moída", "Carne Moída", None, "Carnes e Aves"),
+    ("OVOS BRANCOS 12UN", "Un", 11.49, "Ovos", "Ovos", "12UN", "Mercearia"),
+]
+
+
+def access_key(rng: random.Random) -> int:
+    """Returns a random 44-digit NFC-e access key starting with 3525, with a valid check digit."""
+    from src.receipt_identity import check_digit
+    key = "3525" + "".join(str(rng.randint(0, 9)) for _ in range(39))
+    # Same draws as before for the rest of the data: the 40th random digit is replaced by the check digit
+    rng.randint(0, 9)
+    return int(key + str(check_digit(key)))
+
+
+def synthetic_invoice_rows(n_rows: int, seed: int = 42, items_per_receipt: int = 30,
+                           start=datetime.date(2023, 1, 1), days: int = 730):
+    """Yields invoice rows (in INVOICE_COLUMNS order) shaped like the values psycopg2 returns."""
+    rng = random.Random(seed)
+    produced = 0
+    while produced < n_rows:
+        invoice_id = Decimal(access_key(rng))
+        supermarket = rng.choice(SUPERMARKETS)
+        date = start + datetime.timedelta(days=rng.randrange(days))
+        for _ in range(min(items_per_receipt, n_rows - produced)):
+            description, unit, price, product, full_name, volume, category = rng.choice(PRODUCTS)
+            quantity = Decimal(rng.randint(1, 4)) if unit != "Kg" else Decimal(f"{rng.uniform(0.2, 2.5):.4f}")
+            unitary_value = Decimal(f"{price * rng.uniform(0.85, 1.2):.2f}")
+            total_value = (quantity * unitary_value).quantize(Decimal("0.01"))
+            yield (invoice_id, supermarket, date, description, quantity, unit, unitary_value, total_value,
+                   product, full_name, volume, category)
+            produced += 1
+
+
+class SyntheticInvoiceCursor:
+    """Minimal DB-API cursor that serves synthetic invoice rows without a database."""
+
+    def __init__(self, n_rows: int, seed: int = 42):
+        self._rows = synthetic_invoice_rows(n_rows, seed)
+
+    def fetchmany(self, size):
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+CNPJS = {name: f"{47 + i}.508.411/{2714 + i}-27" for i, name in enumerate(SUPERMARKETS)}
+
+
+def _brl(value) -> str:
+    return f"{value:.2f}".replace(".", ",")
+
+
+def _qty(value) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".").replace(".", ",")
+
+
+def _sql_text(value) -> str:
+    return "NULL" if value is None else "'" + str(value).replace("'", "''") + "'"
+
+
+class SyntheticReceipt:
+    """A generated NFC-e receipt: its line items, docling-style markdown and the expected INSERT."""
+
+    def __init__(self, key: int, store: str, date: datetime.date, items: list, layout: str):
+        self.access_key = str(key)
+        self.store = store
+        self.date = date
+        self.items = items
+        self.layout = layout
+        self.markdown = render_receipt_markdown(self)
+
+    @property
+    def rows(self) -> list:
+        """Invoice rows in INVOICE_COLUMNS order."""
+        return self.item_rows(self.items)
+
+    def item_rows(self, items) -> list:
+        return [
+            (self.access_key, self.store, self.date.isoformat(), item["description"], item["quantity"], item["unit"],
+             item["unitary_value"], item["total_value"], item["product"], item["full_product_name"],
+             item["volume"], item["category"])
+            for item in items
+        ]
+
+    @property
+    def total(self) -> Decimal:
+        return sum((item["total_value"] for item in self.items), Decimal("0.00"))
+
+    def insert_sql(self, items=None) -> str:
+        """The INSERT statement a perfect extraction would produce, for all items or the given ones."""
+        values = ",\n".join(
+            f"({row[0]}, {_sql_text(row[1])}, '{row[2]}', {_sql_text(row[3])}, {row[4]}, {_sql_text(row[5])}, "
+            f"{row[6]}, {row[7]}, {_sql_text(row[8])}, {_sql_text(row[9])}, {_sql_text(row[10])}, {_sql_text(row[11])})"
+            for row in self.item_rows(self.items if items is None else items)
+        )
+        return ("INSERT INTO invoices (invoice_id, supermarket_name, datetime, description, quantity, unit, "
+                "unitary_value, total_value, product, full_product_name, volume, category) VALUES\n" + values + ";")
+
+
+def render_receipt_markdown(receipt: SyntheticReceipt) -> str:
+    """Renders a receipt the way docling exports NFC-e PDFs to markdown."""
+    key = receipt.access_key
+    grouped_key = " ".join(key[i:i + 4] for i in range(0, len(key), 4))
+    if receipt.layout == "text":
+        # Scanned receipts come out of docling as plain lines rather than a table
+        header = "ITEM CÓDIGO DESCRIÇÃO QTD UN VL UNIT VL TOTAL"
+        lines = [
+            f"{n:03d} {item['code']} {item['description']} {_qty(item['quantity'])} {item['unit']} X "
+            f"{_brl(item['unitary_value'])} {_brl(item['total_value'])}"
+            for n, item in enumerate(receipt.items, 1)
+        ]
+    elif receipt.layout == "compact":
+        header = "| Item | Cód | Descrição | Qtd | Un | Vl Unit R$ | Vl Total R$ |\n|---|---|---|---|---|---|---|"
+        lines = [
+            f"| {n:03d} | {item['code']} | {item['description']} | {_qty(item['quantity'])} | {item['unit']} "
+            f"| {_brl(item['unitary_value'])} | {_brl(item['total_value'])} |"
+            for n, item in enumerate(receipt.items, 1)
+        ]
+    else:
+        header = "| Código | Descrição | Qtde | UN | Vl Unit | Vl Total |\n|---|---|---|---|---|---|"
+        lines = [
+            f"| {item['code']} | {item['description']} | {_qty(item['quantity'])} | {item['unit']} "
+            f"| {_brl(item['unitary_value'])} | {_brl(item['total_value'])} |"
+            for item in receipt.items
+        ]
+    return "\n".join([
+        f"## {receipt.store}",
+        "",
+        f"CNPJ: {CNPJS[receipt.store]} AV PAULISTA, 1000, BELA VISTA, SAO PAULO, SP",
+        "",
+        "Documento Auxiliar da Nota Fiscal de Consumidor Eletrônica",
+        "",
+        header,
+        *lines,
+        "",
+        f"Qtd. total de itens {len(receipt.items)}",
+        "",
+        f"Valor total R$ {_brl(receipt.total)}",
+        "",
+        f"Valor a pagar R$ {_brl(receipt.total)}",
+        "",
+        f"NFC-e nº {key[25:34]} Série {key[22:25]} Emissão {receipt.date:%d/%m/%Y} 10:21:33 - Via Consumidor",
+        "",
+        "Consulte pela Chave de Acesso em https://www.nfce.fazenda.sp.gov.br/consulta",
+        "",
+        grouped_key,
+    ])
+
+
+CATEGORIES = sorted({product[6] for product in PRODUCTS})
+SIZES = ["200G", "500G", "1KG", "350ML", "1L", None]
+
+
+def novel_product(rng: random.Random):
+    """A product never seen before, shaped like PRODUCTS, with a random description."""
+    words = ["".join(rng.choice("ABCDEFGHIJKLMNOPRSTUVZ") for _ in range(rng.randint(4, 7))) for _ in range(3)]
+    volume = rng.choice(SIZES)
+    name = " ".join(words[:2]).title()
+    return (" ".join(words + [volume or "KG"]), "Un" if volume else "Kg", round(rng.uniform(2, 40), 2),
+            words[0].title(), name, volume, rng.choice(CATEGORIES))
+
+
+def synthetic_receipts(n_receipts: int, seed: int = 42, items_per_receipt: int = 30,
+                       layouts=("standard", "compact"), start=datetime.date(2024, 1, 1), days: int = 365,
+                       repeat_ratio=None):
+    """
+    Yields deterministic SyntheticReceipt objects. With repeat_ratio, that share of the items of
+    each receipt comes from PRODUCTS and the rest are products never seen before.
+    """
+    rng = random.Random(seed)
+    for _ in range(n_receipts):
+        items = []
+        repeats = items_per_receipt if repeat_ratio is None else round(items_per_receipt * repeat_ratio)
+        novel = rng.sample(range(items_per_receipt), items_per_receipt - repeats)
+        for position in range(items_per_receipt):
+            index = rng.randrange(len(PRODUCTS))
+            description, unit, price, product, full_name, volume, category = (
+                novel_product(rng) if position in novel else PRODUCTS[index])
+            quantity = Decimal(rng.randint(1, 4)) if unit != "Kg" else Decimal(f"{rng.uniform(0.2, 2.5):.3f}")
+            unitary_value = Decimal(f"{price * rng.uniform(0.85, 1.2):.2f}")
+            items.append({
+                "code": f"789{index:010d}",
+                "description": description,
+                "quantity": quantity,
+                "unit": unit,
+                "unitary_value": unitary_value,
+                "total_value": (quantity * unitary_value).quantize(Decimal("0.01")),
+                "product": product,
+                "full_product_name": full_name,
+                "volume": volume,
+                "category": category,
+            })
+        yield SyntheticReceipt(access_key(rng), rng.choice(SUPERMARKETS),
+                               start + datetime.timedelta(days=rng.randrange(days)), items, rng.choice(layouts))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(lines, path: str, lines_per_page: int = 60):
+    """Writes a minimal text-layer PDF (Helvetica, one line per text row) like printed NFC-e receipts."""
+    write_pages_pdf([lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]], path)
+
+
+def write_batch_pdf(receipts, path: str, lines_per_page: int = 60) -> int:
+    """Writes several receipts into one PDF, each starting on a new page, like a scanned batch; returns the pages."""
+    pages = []
+    for receipt in receipts:
+        lines = [line for line in receipt.markdown.splitlines() if not line.startswith("|---")]
+        pages += [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    write_pages_pdf(pages, path)
+    return len(pages)
+
+
+def write_pages_pdf(pages, path: str):
+    """Writes a text-layer PDF with the given lines on each page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for page_lines in pages:
+        commands = ["BT", "/F1 8 Tf", "10 TL", "20 820 Td"]
+        commands += [f"({_pdf_escape(line)}) '" for line in page_lines]
+        commands.append("ET")
+        stream = "\n".join(commands).encode("cp1252", errors="replace")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        body = body if isinstance(body, bytes) else body.encode()
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def write_nfe_xml(receipt: SyntheticReceipt, path: str):
+    """Writes the authorized NFC-e XML (nfeProc) of a receipt, with the fields the XML path reads."""
+    from xml.sax.saxutils import escape
+    items = "".join(
+        f'<det nItem="{n}"><prod><cProd>{item["code"]}</cProd><xProd>{escape(item["description"])}</xProd>'
+        f'<uCom>{item["unit"]}</uCom><qCom>{Decimal(item["quantity"]):.4f}</qCom>'
+        f'<vUnCom>{Decimal(item["unitary_value"]):.10f}</vUnCom><vProd>{item["total_value"]}</vProd></prod></det>'
+        for n, item in enumerate(receipt.items, 1)
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00"><NFe>'
+                f'<infNFe Id="NFe{receipt.access_key}" versao="4.00">'
+                f'<ide><mod>65</mod><dhEmi>{receipt.date.isoformat()}T10:21:33-03:00</dhEmi></ide>'
+                f'<emit><CNPJ>{"".join(c for c in CNPJS[receipt.store] if c.isdigit())}</CNPJ>'
+                f'<xNome>{escape(receipt.store)}</xNome></emit>{items}'
+                f'<total><ICMSTot><vNF>{receipt.total}</vNF></ICMSTot></total></infNFe></NFe></nfeProc>\n')
+
+
+def render_receipt_image(receipt: SyntheticReceipt, path: str, width: int = 1600, angle: float = 2.0,
+                         seed: int = 42):
+    """
+    Writes a JPEG that looks like a phone photo of a thermal receipt: the text on a narrow paper
+    strip, on a darker background, rotated by angle degrees, with sensor noise.
+    """
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    lines = [line.lstrip("#").strip() for line in receipt.markdown.splitlines() if not line.startswith("|---")]
+    lines = [line.replace("|", " ").strip() for line in lines]
+    font = ImageFont.load_default(size=max(width // 70, 8))
+    line_height = int(font.size * 1.4)
+    paper_width = int(width * 0.75)
+    paper = Image.new("L", (paper_width, line_height * (len(lines) + 4)), 235)
+    draw = ImageDraw.Draw(paper)
+    for n, line in enumerate(lines, 2):
+        draw.text((font.size, n * line_height), line, fill=40, font=font)
+    paper = paper.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=90)
+    photo = Image.new("L", (width, int(paper.height * 1.15)), 90)
+    photo.paste(paper, ((width - paper.width) // 2, (photo.height - paper.height) // 2))
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(photo, dtype=np.int16) + rng.normal(0, 6, (photo.height, photo.width)).astype(np.int16)
+    Image.fromarray(np.clip(pixels, 0, 255).astype("uint8")).convert("RGB").save(path, quality=90)
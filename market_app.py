@@ -1,4 +1,7 @@
 import streamlit as st
+from src.logging_utils import configure_logging
+
+configure_logging()
 
 pages={
     "Market App": [
@@ -6,6 +9,7 @@ pages={
         st.Page('pages/dashboard.py', title='Dashboard'),
         st.Page('pages/report.py', title='Supermarket Spending Report'),
         st.Page('pages/smart_cart.py', title='Smart Cart'),
+        st.Page('pages/diagnostics.py', title='Diagnostics'),
     ]
 }
 
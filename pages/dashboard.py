@@ -1,12 +1,19 @@
+import datetime
 import streamlit as st
-from src.database import create_db_engine, load_invoice_data
+from src.config import DASHBOARD_SOURCE, SNAPSHOT_MAX_AGE_HOURS
+from src.database import create_db_engine, load_invoice_data, load_invoice_snapshot, readable_snapshot_info
 from src.dashboard_utils import (date_range_filter,
+                                 date_range_inputs,
+                                 show_snapshot_freshness,
                                  plot_unitary_prices,
                                  plot_total_spend,
                                  plot_price_comparison,
                                  plot_monthly_spend,
                                  plot_price_comparison_by_month)
 
+DASHBOARD_COLUMNS = ["invoice_id", "supermarket_name", "datetime", "description", "unitary_value",
+                     "total_value", "product", "full_product_name", "category"]
+
 def main():
     """Main Streamlit application."""
     st.set_page_config(
@@ -16,9 +23,19 @@ def main():
     st.title("🛒 Supermarket Dashboard")
 
     # Load data
-    engine = create_db_engine()
-    df = load_invoice_data(engine)
-    df_filtered = date_range_filter(df)
+    info = readable_snapshot_info() if DASHBOARD_SOURCE == "parquet" else None
+    if info:
+        # Read only the selected date range and columns from the Parquet snapshot
+        start_date, end_date = date_range_inputs(datetime.date.fromisoformat(info["min_date"]),
+                                                 datetime.date.fromisoformat(info["max_date"]))
+        df_filtered = load_invoice_snapshot(start_date=start_date, end_date=end_date, columns=DASHBOARD_COLUMNS)
+        show_snapshot_freshness(info, SNAPSHOT_MAX_AGE_HOURS)
+    else:
+        if DASHBOARD_SOURCE == "parquet":
+            st.sidebar.warning("No Parquet snapshot with rows found, reading from PostgreSQL.")
+        engine = create_db_engine()
+        df = load_invoice_data(engine, columns=DASHBOARD_COLUMNS)
+        df_filtered = date_range_filter(df)
 
     # --- Unitary Prices ---
     st.header("📈 Unitary Product Prices Over Time")
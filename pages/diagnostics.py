@@ -0,0 +1,143 @@
+import datetime
+import json
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from src.config import TRACE_PATH, TRACING_ENABLED
+from src.tracing import read_spans
+from src.logging_utils import log_bytes
+from src.llm_usage import get_usage_store
+from src.job_queue import get_job_queue
+
+st.set_page_config(page_title="Diagnostics", layout="wide")
+st.title("🩺 Diagnostics")
+st.markdown("Where the time goes in receipt ingestion, chat questions and reports: per-step timings, "
+            f"LLM token usage, retries and database time, read from `{TRACE_PATH}`.")
+
+if not TRACING_ENABLED:
+    st.info("Tracing is disabled. Set TRACING_ENABLED=true in your .env to record new traces.")
+
+# --- LLM usage and cost ---
+st.subheader("LLM usage and cost")
+store = get_usage_store()
+if store is None:
+    st.info("LLM usage accounting is disabled. Set LLM_USAGE_DB in your .env to record it.")
+else:
+    days = st.selectbox("Period", options=[1, 7, 30, 90], index=1, format_func=lambda d: f"Last {d} day(s)")
+    since = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="seconds")
+    by_scope = store.summary(since, "scope_kind")
+    if by_scope.empty:
+        st.caption("No LLM calls recorded in this period.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("LLM calls", f"{by_scope['calls'].sum():,}")
+        col2.metric("Tokens", f"{(by_scope['prompt_tokens'] + by_scope['completion_tokens']).sum():,}")
+        col3.metric("Estimated cost", f"${by_scope['cost_usd'].sum():,.2f}")
+        st.markdown("**Per receipt, chat turn and report**")
+        st.dataframe(by_scope.rename(columns={"scope_kind": "scope"}), use_container_width=True, hide_index=True)
+        st.markdown("**Per call site**")
+        st.dataframe(store.summary(since, "call_name"), use_container_width=True, hide_index=True)
+        daily = store.query(
+            "SELECT substr(ts, 1, 10) AS day, COALESCE(scope_kind, 'other') AS scope, SUM(cost_usd) AS cost_usd "
+            "FROM llm_calls WHERE ts >= ? GROUP BY 1, 2 ORDER BY 1", params=(since,))
+        st.plotly_chart(px.bar(daily, x="day", y="cost_usd", color="scope", title="Estimated cost per day (USD)"),
+                        use_container_width=True)
+
+# --- Receipt job queue ---
+st.subheader("Receipt job queue")
+job_queue = get_job_queue()
+if job_queue is None:
+    st.info("Receipts are processed inline. Set JOB_QUEUE_DB in your .env to process them in background workers.")
+else:
+    metrics = job_queue.metrics(since_s=24 * 3600)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queue depth", metrics["queued"], help=f"Oldest waiting {metrics['oldest_queued_s']:.0f}s")
+    col2.metric("Wait p50 / p95", f"{metrics['wait_p50_s']:.1f}s / {metrics['wait_p95_s']:.1f}s")
+    col3.metric("Run p50 / p95", f"{metrics['run_p50_s']:.1f}s / {metrics['run_p95_s']:.1f}s")
+    col4.metric("Worker utilization", f"{metrics['utilization']:.0%}",
+                help=f"{metrics['busy_workers']} of {metrics['workers']} worker(s) busy")
+    st.dataframe(pd.DataFrame([metrics["depth"]]), use_container_width=True, hide_index=True)
+
+# --- Traces ---
+max_traces = st.slider("Requests to load", min_value=10, max_value=1000, value=200, step=10)
+spans = read_spans(TRACE_PATH, max_traces)
+if not spans:
+    st.info("No traces recorded yet. Upload a receipt, ask a question or generate a report first.")
+    st.stop()
+
+df = pd.DataFrame(spans)
+df["start"] = pd.to_datetime(df["start_ns"], unit="ns")
+df["end"] = df["start"] + pd.to_timedelta(df["duration_ms"], unit="ms")
+df["input_tokens"] = df["attributes"].map(lambda attrs: attrs.get("gen_ai.usage.input_tokens", 0))
+df["output_tokens"] = df["attributes"].map(lambda attrs: attrs.get("gen_ai.usage.output_tokens", 0))
+df["attempt"] = df["attributes"].map(lambda attrs: attrs.get("llm.attempt") or 1)
+df["db_ms"] = df["duration_ms"].where(df["name"].str.startswith("db."), 0.0)
+
+# --- Recent requests ---
+st.subheader("Recent requests")
+per_trace = df.groupby("trace_id").agg(
+    input_tokens=("input_tokens", "sum"), output_tokens=("output_tokens", "sum"), db_ms=("db_ms", "sum"),
+    llm_calls=("name", lambda names: names.str.startswith("llm.").sum()),
+)
+roots = df[df["parent_span_id"].isna()].join(per_trace, on="trace_id", rsuffix="_trace")
+roots = roots.sort_values("start", ascending=False)
+# Known only for requests served by this process since it started
+roots["log_bytes"] = roots["trace_id"].map(log_bytes)
+st.dataframe(
+    roots[["start", "name", "duration_ms", "llm_calls", "input_tokens_trace", "output_tokens_trace", "db_ms_trace",
+           "log_bytes", "status", "status_message"]].rename(columns={
+        "input_tokens_trace": "input_tokens", "output_tokens_trace": "output_tokens", "db_ms_trace": "db_ms"}),
+    use_container_width=True, hide_index=True,
+)
+
+# --- Time per step ---
+st.subheader("Time per step")
+summary = df.groupby("name").agg(
+    calls=("span_id", "count"),
+    p50_ms=("duration_ms", "median"),
+    p95_ms=("duration_ms", lambda durations: durations.quantile(0.95)),
+    total_s=("duration_ms", lambda durations: durations.sum() / 1000),
+    input_tokens=("input_tokens", "sum"),
+    output_tokens=("output_tokens", "sum"),
+    retries=("attempt", lambda attempts: (attempts > 1).sum()),
+    errors=("status", lambda statuses: (statuses == "ERROR").sum()),
+).sort_values("total_s", ascending=False)
+st.dataframe(summary.round(1), use_container_width=True)
+
+# --- Receipt extraction ---
+extractions = df[df["name"] == "node.extract_data"]
+if not extractions.empty:
+    st.subheader("Receipt extraction")
+    paths = extractions["attributes"].map(lambda attrs: attrs.get("extraction.path", "llm"))
+    lookups = extractions["attributes"].map(lambda attrs: attrs.get("products.lookups", 0)).sum()
+    hits = extractions["attributes"].map(lambda attrs: attrs.get("products.hits", 0)).sum()
+    col1, col2 = st.columns(2)
+    col1.metric("Parsed without the extraction prompt", f"{(paths == 'parser').mean():.0%}")
+    col2.metric("Items found in the product dictionary", f"{hits / lookups:.0%}" if lookups else "–")
+    st.dataframe(
+        extractions.assign(path=paths).groupby("path").agg(
+            receipts=("span_id", "count"),
+            p50_ms=("duration_ms", "median"),
+            p95_ms=("duration_ms", lambda durations: durations.quantile(0.95)),
+        ).round(1),
+        use_container_width=True,
+    )
+
+# --- Trace timeline ---
+st.subheader("Request timeline")
+labels = {row.trace_id: f"{row.start:%Y-%m-%d %H:%M:%S} · {row.name} · {row.duration_ms:,.0f} ms"
+          for row in roots.itertuples()}
+selected = st.selectbox("Request", options=list(labels), format_func=labels.get)
+trace = df[df["trace_id"] == selected].sort_values("start")
+fig = px.timeline(trace, x_start="start", x_end="end", y="name", color="status",
+                  hover_data=["duration_ms", "input_tokens", "output_tokens"],
+                  color_discrete_map={"OK": "#2E86AB", "ERROR": "#E4572E"})
+fig.update_yaxes(categoryorder="array", categoryarray=list(dict.fromkeys(trace["name"]))[::-1])
+st.plotly_chart(fig, use_container_width=True)
+
+with st.expander("Span attributes"):
+    st.dataframe(
+        trace.assign(attributes=trace["attributes"].map(lambda attrs: json.dumps(attrs, default=str)))
+        [["name", "duration_ms", "status", "attributes"]],
+        use_container_width=True, hide_index=True,
+    )
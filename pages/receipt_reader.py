@@ -1,34 +1,108 @@
+import time
+import uuid
 import streamlit as st
 from src.database import insert_sql_query
 from agents.invoice_agent import build_graph
 from datetime import datetime
 from langchain_core.messages import HumanMessage
 from langgraph.types import Command
+from src.tracing import span
+from src.llm_usage import usage_scope
+from src.image_receipts import IMAGE_TYPES
+from src.config import JOB_WORKERS
+from src.job_queue import ACTIVE_STATUSES, get_job_queue
+from src.job_worker import start_workers
 
 st.title("🛒 Smart Receipt Assistant")
 st.divider()
 
 graph = build_graph()
-config = {"configurable": {"thread_id": 42}}
+# One graph thread per browser session, so concurrent uploads do not share state
+config = {"configurable": {"thread_id": st.session_state.setdefault("thread_id", str(uuid.uuid4()))}}
+
+job_queue = get_job_queue()
+
+
+@st.cache_resource
+def receipt_workers():
+    """The app's job worker processes, started once per server."""
+    return start_workers(JOB_WORKERS) if JOB_WORKERS > 0 else []
+
+
+@st.fragment(run_every=2)
+def receipt_jobs():
+    """Status of the queued receipts, polled; receipts awaiting approval are listed until decided."""
+    session_jobs = st.session_state.setdefault("job_ids", [])
+    jobs = {job["id"]: job for job in job_queue.jobs(ACTIVE_STATUSES)}
+    jobs.update({job_id: job for job_id in session_jobs if job_id not in jobs
+                 and (job := job_queue.get(job_id)) is not None})
+    for job in sorted(jobs.values(), key=lambda job: job["created_at"]):
+        name = job["file_name"]
+        if job["status"] == "awaiting_approval":
+            with st.expander(f"🧾 {name}: ready for review", expanded=True):
+                st.write(job["result"])
+                save, discard = st.columns(2)
+                if save.button("Save", key=f"save_{job['id']}"):
+                    job_queue.approve(job["id"])
+                if discard.button("Discard", key=f"discard_{job['id']}"):
+                    job_queue.approve(job["id"], approved=False)
+        elif job["status"] in ("queued", "running", "approved"):
+            retry = f" (attempt {job['attempts']})" if job["attempts"] > 1 else ""
+            st.progress(job["progress"], text=f"{name}: {job['stage'].replace('_', ' ')}{retry}")
+        elif job["status"] == "done":
+            st.success(f"✅ {name}: receipt processed and saved successfully!")
+        elif job["status"] == "duplicate":
+            st.info(f"{name}: {job['result']}")
+        elif job["status"] == "failed":
+            st.error(f"❌ {name}: {job['error']}")
+
 
 # --- Feature 1: Upload Receipt ---
 st.header("📤 Upload Your Receipt")
-st.markdown("Upload a supermarket receipt in **PDF** format.")
+st.markdown("Upload a supermarket receipt as a **PDF** or a **photo** (JPEG or PNG).")
 
-uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"])
+uploaded_file = st.file_uploader("Choose a PDF or an image", type=["pdf", *IMAGE_TYPES])
 
-if uploaded_file:
+if uploaded_file and job_queue is not None:
+    st.session_state.uploaded_file = uploaded_file
+    receipt_workers()
+    # Reruns keep the uploaded file: queue each upload once
+    if st.session_state.get("queued_upload") != uploaded_file.file_id:
+        with span("receipt.enqueue", file__name=uploaded_file.name, file__bytes=uploaded_file.size):
+            job_id = job_queue.enqueue(uploaded_file.name, uploaded_file.getvalue())
+        st.session_state.queued_upload = uploaded_file.file_id
+        st.session_state.setdefault("job_ids", []).append(job_id)
+elif uploaded_file:
     st.session_state.uploaded_file = uploaded_file
-    path = "temp_receipt.pdf"
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
 
     with st.spinner("Processing your receipt..."):
-        result = graph.invoke({"path": path}, config=config)
-        st.write(result['result'])
-        if st.button("Save"):
-            result = graph.invoke(Command(resume=True), config=config)
-            st.success("✅ Receipt processed and saved successfully!")
+        with span("receipt.ingest", file__name=uploaded_file.name, file__bytes=uploaded_file.size), \
+                usage_scope("receipt"):
+            # Processed from memory: no shared temp file between sessions
+            result = graph.invoke({"file_name": uploaded_file.name, "file_bytes": uploaded_file.getvalue()},
+                                  config=config)
+        if result.get("duplicate"):
+            st.info(result["result"])
+        else:
+            st.write(result['result'])
+        if result.get("auto_approved") and result.get("saved"):
+            st.success("✅ Receipt checked and saved automatically!")
+        elif result.get("auto_approved"):
+            st.error(f"❌ Failed to save the receipt: {result.get('save_error')}")
+        elif not result.get("duplicate"):
+            # Why the receipt was not saved right away
+            for problem in result.get("problems") or []:
+                st.warning(problem)
+        if not result.get("duplicate") and not result.get("auto_approved") and st.button("Save"):
+            with span("receipt.save"):
+                result = graph.invoke(Command(resume=True), config=config)
+            if result.get("saved"):
+                st.success("✅ Receipt processed and saved successfully!")
+            else:
+                st.error(f"❌ Failed to save the receipt: {result.get('save_error')}")
+
+if job_queue is not None:
+    receipt_jobs()
 
 # --- Feature 2: Add Purchase Details Manually ---
 st.divider()
@@ -66,7 +140,8 @@ with st.form("add_purchase_form"):
 
     if submitted:
         try:
-            insert_sql_query(query)
+            # Added after the lines already stored under this access key
+            insert_sql_query(query, append=True)
             st.success("✅ Purchase saved successfully!")
         except Exception as e:
             st.error(f"❌ Failed to save purchase: {e}")
@@ -107,12 +182,21 @@ if prompt := st.chat_input("What do you want to know about your purchases?"):
 
         # Use the agent to get the response
         try:
-            response = graph.invoke({"question": [HumanMessage(content=prompt)]}, config=config)
+            start = time.perf_counter()
+            with span("chat.question", chat__question=prompt), usage_scope("chat") as usage:
+                response = graph.invoke({"question": [HumanMessage(content=prompt)]}, config=config)
+            elapsed = time.perf_counter() - start
             sql_query = response['query']
             answer = response['answer']
             message = f"**Response:**\n{answer}"
             # Display the constructed message
             message_placeholder.markdown(message)
+            st.caption(
+                f"⏱️ {elapsed:.2f}s · {response.get('llm_calls', 0)} LLM call(s) · "
+                f"SQL cache {'hit' if response.get('cache_hit') else 'miss'} · "
+                f"{usage.prompt_tokens + usage.completion_tokens} tokens · ${usage.cost_usd:.4f}"
+                + (f" · plan cost {response['plan_cost']:,.0f}" if response.get("plan_cost") is not None else "")
+            )
 
         except Exception as e:
             error_message = f"Error: {str(e)}"
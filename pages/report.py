@@ -1,5 +1,7 @@
 import streamlit as st
 from agents.report_workflow import build_report_graph
+from src.tracing import span
+from src.llm_usage import usage_scope, BudgetExceededError
 
 st.title("🧾 Supermarket Spending Report")
 st.markdown("""
@@ -30,11 +32,19 @@ if st.button("Generate Report"):
             "(3) monthly spending trends for each supermarket, and "
             "Highlight key insights, top spending areas, and any anomalies or patterns."
         )
-        response = graph.invoke({"user_query": user_query}, config=config)
-        full_report = response.get("full_report", "No report found.")
-        st.session_state.full_report = response.get("full_report", "No report found.")
-        st.subheader("📊 Full Report")
-        st.markdown(full_report)
+        try:
+            with span("report.generate"), usage_scope("report") as usage:
+                response = graph.invoke({"user_query": user_query}, config=config)
+        except BudgetExceededError as e:
+            st.error(f"Report generation stopped: {e}. Raise LLM_BUDGET_USD_REPORT or LLM_MAX_CALLS_REPORT "
+                     "in your .env if this report legitimately needs more.")
+        else:
+            full_report = response.get("full_report", "No report found.")
+            st.session_state.full_report = response.get("full_report", "No report found.")
+            st.subheader("📊 Full Report")
+            st.markdown(full_report)
+            st.caption(f"{usage.calls} LLM calls · {usage.prompt_tokens + usage.completion_tokens} tokens · "
+                       f"${usage.cost_usd:.4f}")
 
 
 # graph = build_report_graph()
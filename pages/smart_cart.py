@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
-from src.database import create_db_engine, load_invoice_data
+from src.config import DASHBOARD_SOURCE
+from src.database import create_db_engine, load_invoice_data, load_invoice_snapshot, readable_snapshot_info
+
+CART_COLUMNS = ['supermarket_name', 'product', 'full_product_name', 'unitary_value', 'datetime', 'volume', 'category']
 
 # Sample data: replace this with your actual DataFrame loading
-engine = create_db_engine()
-df = load_invoice_data(engine)
+if DASHBOARD_SOURCE == "parquet" and readable_snapshot_info():
+    df = load_invoice_snapshot(columns=CART_COLUMNS)
+else:
+    engine = create_db_engine()
+    df = load_invoice_data(engine, columns=CART_COLUMNS)
 df = df.sort_values('datetime', ascending=False)
 df = (
     df.drop_duplicates(subset=['supermarket_name', 'full_product_name'])
@@ -54,7 +60,7 @@ if user_cart:
     for tab, name in zip(tabs, supermarket_names):
         with (tab):
             if name == 'SUMMARY':
-                summary = merged.groupby('supermarket_name')['estimated_cost'].sum().sort_values().reset_index()
+                summary = merged.groupby('supermarket_name', observed=True)['estimated_cost'].sum().sort_values().reset_index()
                 st.dataframe(summary)
             else:
                 shopping_list = merged[merged['supermarket_name'] == name]
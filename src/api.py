@@ -0,0 +1,360 @@
+"""
+Headless HTTP API over the graphs in agents/, for integrations and load tests.
+
+    POST /receipts?name=receipt.pdf   the PDF or photo as the body (or a multipart upload)
+    GET  /receipts/<id>               status, stage, progress, the extracted INSERT and why it needs review
+    POST /receipts/<id>/approval      {"approved": true} saves the receipt, false discards it
+    POST /questions                   {"question": "..."}: the chat graph's steps, then the answer
+    POST /reports                     {"request": "..."} (optional): the report graph's steps and report
+    GET  /health, GET /metrics
+
+Questions and reports are streamed as newline-delimited JSON, one event per graph step, so a
+client sees the SQL before the answer and each report step as it finishes. Graph runs block,
+so they run on a pool of API_MAX_CONCURRENCY threads; a request that gets no slot within
+API_ACQUIRE_TIMEOUT_S is answered 503 with Retry-After. Uploads go to the job queue when
+JOB_QUEUE_DB is set (the same queue and workers as the app) and are answered 202; otherwise they
+are processed in the API process and wait in its memory for approval.
+
+    python -m src.api --port 8000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import tornado.iostream
+import tornado.web
+from src.config import API_HOST, API_PORT, API_MAX_CONCURRENCY, API_ACQUIRE_TIMEOUT_S, API_MAX_UPLOAD_MB
+from src.job_queue import get_job_queue
+from src.job_worker import approval_command, check_saved
+from src.llm_usage import usage_scope, BudgetExceededError
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# The report page's request, used when a report request names none
+DEFAULT_REPORT_REQUEST = (
+    "Generate a detailed financial report based on my supermarket purchases. "
+    "The report should include: (1) total spending per supermarket, "
+    "(2) spending breakdown by product category, "
+    "(3) monthly spending trends for each supermarket, and "
+    "Highlight key insights, top spending areas, and any anomalies or patterns."
+)
+
+
+class ConcurrencyLimiter:
+    """Caps the graph runs in flight; waiting requests give up after acquire_timeout_s."""
+
+    def __init__(self, limit: int = API_MAX_CONCURRENCY, acquire_timeout_s: float = API_ACQUIRE_TIMEOUT_S):
+        self.limit = limit
+        self.acquire_timeout_s = acquire_timeout_s
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.acquire_timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise tornado.web.HTTPError(503, reason="Too many requests in flight")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting,
+                "completed": self.completed, "rejected": self.rejected}
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="The body is not JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="The body must be a JSON object")
+        return body
+
+    def write_json(self, payload: dict, status: int = 200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(payload, default=str))
+
+    def write_error(self, status_code: int, **kwargs):
+        if status_code == 503:
+            self.set_header("Retry-After", "1")
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": self._reason}))
+
+    async def run_blocking(self, func, *args):
+        """Runs a blocking graph call on the pool, within a concurrency slot."""
+        async with self.settings["limiter"].slot():
+            return await asyncio.get_running_loop().run_in_executor(self.settings["executor"], func, *args)
+
+    async def stream_events(self, run):
+        """
+        Runs run(emit) on the pool within a concurrency slot and writes every emitted event as a
+        JSON line as soon as it is emitted. A client that disconnects does not stop the run.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        def worker():
+            try:
+                run(emit)
+            except BudgetExceededError as e:
+                emit({"event": "error", "error": str(e), "budget_exceeded": True})
+            except Exception as e:
+                logger.exception("Streamed request failed")
+                emit({"event": "error", "error": f"{type(e).__name__}: {e}"})
+            finally:
+                emit(None)
+
+        async with self.settings["limiter"].slot():
+            self.set_header("Content-Type", "application/x-ndjson")
+            self.set_header("Cache-Control", "no-cache")
+            future = loop.run_in_executor(self.settings["executor"], worker)
+            connected = True
+            while (event := await events.get()) is not None:
+                if not connected:
+                    continue
+                try:
+                    self.write(json.dumps(event, default=str) + "\n")
+                    await self.flush()
+                except tornado.iostream.StreamClosedError:
+                    connected = False
+            await future
+        if connected:
+            self.finish()
+
+
+class ReceiptsHandler(BaseHandler):
+    async def post(self):
+        files = [f for uploads in self.request.files.values() for f in uploads]
+        if files:
+            name, data = files[0]["filename"], files[0]["body"]
+        else:
+            name, data = self.get_query_argument("name", "receipt.pdf"), self.request.body
+        if not data:
+            raise tornado.web.HTTPError(400, reason="No file in the request")
+
+        queue = self.settings["job_queue"]
+        if queue is not None:
+            job_id = queue.enqueue(name, data)
+            self.write_json({"id": job_id, **queue.get(job_id)}, status=202)
+            return
+
+        receipt_id = uuid.uuid4().hex
+        receipts = self.settings["receipts"]
+        receipts[receipt_id] = {"id": receipt_id, "file_name": name, "status": "running"}
+        try:
+            state = await self.run_blocking(process_receipt_inline, self.settings["graph"], receipt_id, name, data)
+        except tornado.web.HTTPError:
+            receipts.pop(receipt_id)
+            raise
+        except Exception as e:
+            logger.exception("Receipt %s failed", receipt_id)
+            receipts[receipt_id].update(status="failed", error=f"{type(e).__name__}: {e}")
+        else:
+            status = "duplicate" if state.get("duplicate") else "done" if state.get("saved") else "awaiting_approval"
+            receipts[receipt_id].update(status=status, result=state.get("result"), problems=state.get("problems") or [])
+        self.write_json(receipts[receipt_id])
+
+
+class ReceiptHandler(BaseHandler):
+    def get(self, receipt_id: str):
+        queue = self.settings["job_queue"]
+        receipt = queue.get(receipt_id) if queue is not None else self.settings["receipts"].get(receipt_id)
+        if receipt is None:
+            raise tornado.web.HTTPError(404, reason="No such receipt")
+        self.write_json(receipt)
+
+
+class ApprovalHandler(BaseHandler):
+    async def post(self, receipt_id: str):
+        approved = bool(self.json_body().get("approved", True))
+        queue = self.settings["job_queue"]
+        if queue is not None:
+            if queue.get(receipt_id) is None:
+                raise tornado.web.HTTPError(404, reason="No such receipt")
+            if not queue.approve(receipt_id, approved):
+                raise tornado.web.HTTPError(409, reason="The receipt is not awaiting approval")
+            self.write_json(queue.get(receipt_id), status=202)
+            return
+
+        receipt = self.settings["receipts"].get(receipt_id)
+        if receipt is None:
+            raise tornado.web.HTTPError(404, reason="No such receipt")
+        if receipt["status"] != "awaiting_approval":
+            raise tornado.web.HTTPError(409, reason="The receipt is not awaiting approval")
+        receipt["status"] = "approved" if approved else "rejected"
+        try:
+            state = await self.run_blocking(answer_approval, self.settings["graph"], receipt_id, approved)
+        except tornado.web.HTTPError:
+            receipt["status"] = "awaiting_approval"
+            raise
+        except Exception as e:
+            logger.exception("Saving receipt %s failed", receipt_id)
+            receipt.update(status="awaiting_approval", error=f"{type(e).__name__}: {e}")
+            raise tornado.web.HTTPError(500, reason=receipt["error"])
+        if approved and not state.get("saved"):
+            # The approval was answered; the receipt has to be uploaded again
+            receipt.update(status="failed", error=state.get("save_error") or "The receipt was not saved")
+            raise tornado.web.HTTPError(500, reason=receipt["error"])
+        if approved:
+            receipt["status"] = "done"
+        self.write_json(receipt)
+
+
+class QuestionsHandler(BaseHandler):
+    async def post(self):
+        question = str(self.json_body().get("question") or "").strip()
+        if not question:
+            raise tornado.web.HTTPError(400, reason="No question")
+        await self.stream_events(lambda emit: answer_question(self.settings["graph"], question, emit))
+
+
+class ReportsHandler(BaseHandler):
+    async def post(self):
+        request = str(self.json_body().get("request") or "").strip() or DEFAULT_REPORT_REQUEST
+        await self.stream_events(lambda emit: generate_report(self.settings["report_graph"], request, emit))
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.write_json({"status": "ok"})
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        queue = self.settings["job_queue"]
+        self.write_json({
+            "requests": self.settings["limiter"].stats(),
+            "uptime_s": time.time() - self.settings["started_at"],
+            "job_queue": queue.metrics() if queue is not None else None,
+        })
+
+
+def process_receipt_inline(graph, receipt_id: str, name: str, data: bytes) -> dict:
+    """Runs the receipt through the invoice graph up to the approval, on a thread of its own."""
+    config = {"configurable": {"thread_id": receipt_id}}
+    with span("api.receipt", file__name=name, file__bytes=len(data)), usage_scope("receipt"):
+        graph.invoke({"file_name": name, "file_bytes": data}, config=config)
+    snapshot = graph.get_state(config)
+    # Stored before, or validated and saved (or not saved): nothing waits for an approval
+    if snapshot.values.get("duplicate") or not snapshot.next:
+        graph.checkpointer.delete_thread(receipt_id)
+        if not snapshot.values.get("duplicate"):
+            check_saved(snapshot.values)
+    return snapshot.values
+
+
+def answer_approval(graph, receipt_id: str, approved: bool) -> dict:
+    """Answers the receipt's approval; returns the graph's final state (saved tells if it was stored)."""
+    config = {"configurable": {"thread_id": receipt_id}}
+    with span("api.receipt_approval", receipt__approved=approved):
+        graph.invoke(approval_command(approved), config=config)
+    values = graph.get_state(config).values
+    graph.checkpointer.delete_thread(receipt_id)
+    return values
+
+
+def question_input(question: str) -> dict:
+    from langchain_core.messages import HumanMessage
+    return {"question": [HumanMessage(content=question)]}
+
+
+def answer_question(graph, question: str, emit):
+    thread_id = uuid.uuid4().hex
+    config = {"configurable": {"thread_id": thread_id}}
+    try:
+        with span("api.question", chat__question=question), usage_scope("chat") as usage:
+            for update in graph.stream(question_input(question), config, stream_mode="updates"):
+                for node, values in update.items():
+                    emit({"event": node, **(values or {})})
+            emit({"event": "usage", "llm_calls": usage.calls,
+                  "tokens": usage.prompt_tokens + usage.completion_tokens, "cost_usd": usage.cost_usd})
+    finally:
+        graph.checkpointer.delete_thread(thread_id)
+
+
+def generate_report(graph, request: str, emit):
+    config = {"recursion_limit": 100}
+    with span("api.report"), usage_scope("report") as usage:
+        for update in graph.stream({"user_query": request}, config, stream_mode="updates"):
+            for node, values in update.items():
+                emit({"event": node, **(values or {})})
+        emit({"event": "usage", "llm_calls": usage.calls,
+              "tokens": usage.prompt_tokens + usage.completion_tokens, "cost_usd": usage.cost_usd})
+
+
+def make_app(graph=None, report_graph=None, job_queue=None, max_concurrency: int = API_MAX_CONCURRENCY,
+             acquire_timeout_s: float = API_ACQUIRE_TIMEOUT_S) -> tornado.web.Application:
+    """The API application; the graphs and the queue default to the app's."""
+    if graph is None:
+        from agents.invoice_agent import build_graph
+        graph = build_graph()
+    if report_graph is None:
+        from agents.report_workflow import build_report_graph
+        report_graph = build_report_graph()
+    return tornado.web.Application(
+        [
+            (r"/receipts", ReceiptsHandler),
+            (r"/receipts/([0-9a-f]+)", ReceiptHandler),
+            (r"/receipts/([0-9a-f]+)/approval", ApprovalHandler),
+            (r"/questions", QuestionsHandler),
+            (r"/reports", ReportsHandler),
+            (r"/health", HealthHandler),
+            (r"/metrics", MetricsHandler),
+        ],
+        graph=graph,
+        report_graph=report_graph,
+        job_queue=job_queue if job_queue is not None else get_job_queue(),
+        receipts={},
+        limiter=ConcurrencyLimiter(max_concurrency, acquire_timeout_s),
+        executor=ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="api"),
+        started_at=time.time(),
+    )
+
+
+async def serve(host: str = API_HOST, port: int = API_PORT, **app_options):
+    app = make_app(**app_options)
+    app.listen(port, address=host, max_body_size=API_MAX_UPLOAD_MB * 1024 * 1024)
+    logger.info("API listening on http://%s:%d", host, port)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY)
+    args = parser.parse_args()
+    from src.logging_utils import configure_logging
+    configure_logging()
+    try:
+        asyncio.run(serve(args.host, args.port, max_concurrency=args.max_concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 import os
 
 load_dotenv()
@@ -11,8 +10,107 @@ DB_USER = os.getenv("USER")
 DB_PASSWORD = os.getenv("PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 MODEL = "gpt-4o"
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-llm = ChatOpenAI(model=MODEL,
-                 api_key=OPENAI_API_KEY,
-                 temperature=0.1)
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Receipt inserts: retries of a receipt's transaction on transient errors (lost connection,
+# deadlock, serialization failure) and the first retry delay, doubled on each retry
+DB_MAX_RETRIES = int(os.getenv("DB_MAX_RETRIES", "3"))
+DB_RETRY_BASE_S = float(os.getenv("DB_RETRY_BASE_S", "0.5"))
+# Question -> SQL cache: a cached question is reused when it has the same filter values (categories,
+# stores, periods, sort order, negations) and its wording scores at least the threshold
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", ".cache/sql_cache.json")
+SQL_CACHE_THRESHOLD = float(os.getenv("SQL_CACHE_THRESHOLD", "0.8"))
+# How often the table info given to the SQL prompt, and fingerprinted by the SQL cache, is re-read
+SQL_SCHEMA_REFRESH_SECONDS = float(os.getenv("SQL_SCHEMA_REFRESH_SECONDS", "300"))
+QUERY_TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", "15000"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "5000"))
+QUERY_MAX_COST = float(os.getenv("QUERY_MAX_COST", "1000000"))
+DASHBOARD_SOURCE = os.getenv("DASHBOARD_SOURCE", "postgres")
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "data/invoices_snapshot")
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "24"))
+QUERY_ENGINE = os.getenv("QUERY_ENGINE", "postgres")
+DUCKDB_SOURCE = os.getenv("DUCKDB_SOURCE", "parquet")
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", ":memory:")
+DUCKDB_REFRESH_SECONDS = float(os.getenv("DUCKDB_REFRESH_SECONDS", "300"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_PATH = os.getenv("TRACE_PATH", ".cache/traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_PATH = os.getenv("LOG_PATH", "")
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "500"))
+LLM_USAGE_DB = os.getenv("LLM_USAGE_DB", ".cache/llm_usage.sqlite")
+LLM_BUDGET_USD_RECEIPT = float(os.getenv("LLM_BUDGET_USD_RECEIPT", "0.25"))
+LLM_BUDGET_USD_CHAT = float(os.getenv("LLM_BUDGET_USD_CHAT", "0.10"))
+LLM_BUDGET_USD_REPORT = float(os.getenv("LLM_BUDGET_USD_REPORT", "1.00"))
+LLM_MAX_CALLS_REPORT = int(os.getenv("LLM_MAX_CALLS_REPORT", "40"))
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "1"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "30"))
+# Parse receipts with a known item layout directly and ask the LLM only for product and category
+RECEIPT_FAST_PATH = os.getenv("RECEIPT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Reuse the product fields of already approved descriptions instead of asking the LLM again;
+# descriptions at least this similar (trigram Jaccard, ignoring the size) count as the same product
+PRODUCT_DICTIONARY = os.getenv("PRODUCT_DICTIONARY", "true").lower() in ("1", "true", "yes")
+PRODUCT_MATCH_THRESHOLD = float(os.getenv("PRODUCT_MATCH_THRESHOLD", "0.75"))
+# Saved receipts are added to the dictionary in place; it is reloaded from the invoices table this
+# often (seconds) to pick up rows saved by other processes or a migrated schema. 0 loads it once
+PRODUCT_DICTIONARY_RELOAD_S = float(os.getenv("PRODUCT_DICTIONARY_RELOAD_S", "3600"))
+# For other layouts, resolve the item lines found in the product dictionary locally and send
+# only the unknown ones (with the header and totals) to the extraction prompt
+PARTIAL_EXTRACTION = os.getenv("PARTIAL_EXTRACTION", "true").lower() in ("1", "true", "yes")
+# Worker processes converting the pages of multi-page PDFs; 1 converts them in the app process
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Photo receipts: OCR engine (docling or tesseract), its language and the longest image side after preprocessing
+IMAGE_OCR_ENGINE = os.getenv("IMAGE_OCR_ENGINE", "docling")
+IMAGE_OCR_LANG = os.getenv("IMAGE_OCR_LANG", "por")
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2000"))
+# Converted PDFs and OCR'd images by content hash; empty disables the cache
+CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", ".cache/conversions")
+# Folder of authorized NFC-e XMLs (as downloaded from SEFAZ); receipts found there are read from
+# the XML instead of being converted and extracted. Empty disables the lookup
+XML_DROP_DIR = os.getenv("XML_DROP_DIR", "")
+# Read the access key (text layer or QR code) before converting, to skip stored receipts and use XMLs
+RECEIPT_KEY_LOOKUP = os.getenv("RECEIPT_KEY_LOOKUP", "true").lower() in ("1", "true", "yes")
+# Save receipts whose extraction passes the checks of src/receipt_validation.py (valid access key,
+# ISO date, item amounts and receipt total) without asking; only the others wait for approval
+RECEIPT_AUTO_APPROVE = os.getenv("RECEIPT_AUTO_APPROVE", "true").lower() in ("1", "true", "yes")
+# Background receipt jobs: SQLite queue (off by default: empty processes uploads inline), worker
+# processes started by the app (0: run `python -m src.job_worker` separately), attempts per
+# step, lease after which a silent worker's job is taken over, first retry delay and polling interval
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "300"))
+JOB_RETRY_BASE_S = float(os.getenv("JOB_RETRY_BASE_S", "5"))
+JOB_POLL_S = float(os.getenv("JOB_POLL_S", "0.5"))
+# Watch-folder ingestion daemon (python -m src.watch_folder): folder to watch, progress file
+# (so restarts skip processed files), worker threads, files per batch, seconds a file must stay
+# unchanged before it is read, polling interval when inotify is not available, and whether
+# receipts that pass validation are saved without review (as RECEIPT_AUTO_APPROVE does in the app)
+WATCH_DIR = os.getenv("WATCH_DIR", "")
+WATCH_STATE_DB = os.getenv("WATCH_STATE_DB", ".cache/watch.sqlite")
+WATCH_WORKERS = int(os.getenv("WATCH_WORKERS", "2"))
+WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", "8"))
+WATCH_DEBOUNCE_S = float(os.getenv("WATCH_DEBOUNCE_S", "2"))
+WATCH_POLL_S = float(os.getenv("WATCH_POLL_S", "1"))
+WATCH_AUTO_APPROVE = os.getenv("WATCH_AUTO_APPROVE", "true").lower() in ("1", "true", "yes")
+# Headless HTTP API (python -m src.api): address, graph runs in flight, seconds a request waits
+# for a free slot before a 503, and the largest accepted upload
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))
+API_ACQUIRE_TIMEOUT_S = float(os.getenv("API_ACQUIRE_TIMEOUT_S", "5"))
+API_MAX_UPLOAD_MB = int(os.getenv("API_MAX_UPLOAD_MB", "20"))
+# Backend per stage (openai, local or fake); empty uses LLM_BACKEND
+LLM_BACKEND_EXTRACTION = os.getenv("LLM_BACKEND_EXTRACTION", "")
+LLM_BACKEND_SQL = os.getenv("LLM_BACKEND_SQL", "")
+LLM_BACKEND_REPORT = os.getenv("LLM_BACKEND_REPORT", "")
+# The 'local' backend: an OpenAI-compatible model server such as llama.cpp's llama-server or Ollama
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:11434/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "qwen2.5:7b-instruct")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "local")
+LOCAL_LLM_MAX_CONCURRENCY = int(os.getenv("LOCAL_LLM_MAX_CONCURRENCY", "1"))
@@ -0,0 +1,57 @@
+"""
+On-disk cache of converted documents (page markdown), keyed by the file's content hash and the
+conversion settings, so a receipt that is uploaded again, or re-run by a Streamlit rerun, is not
+converted or OCR'd twice. Shared by the PDF and image paths.
+"""
+import hashlib
+import json
+import logging
+import os
+from src.config import CONVERSION_CACHE_DIR
+from src.receipt_files import Upload
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(source, variant: str) -> str:
+    digest = hashlib.sha256()
+    if isinstance(source, Upload):
+        digest.update(source.data)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    digest.update(variant.encode())
+    return digest.hexdigest()
+
+
+def _cache_file(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, key[:2], f"{key}.json")
+
+
+def get_cached(key: str, cache_dir=CONVERSION_CACHE_DIR):
+    """The cached page markdown for a key, or None (also when caching is disabled)."""
+    if not cache_dir:
+        return None
+    try:
+        with open(_cache_file(key, cache_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable conversion cache entry %s: %s", key, e)
+        return None
+
+
+def put_cached(key: str, pages, cache_dir=CONVERSION_CACHE_DIR):
+    if not cache_dir:
+        return
+    path = _cache_file(key, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(pages), f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("Could not write the conversion cache: %s", e)
@@ -1,12 +1,19 @@
+import datetime
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from src.query_engine import group_sum
+
+def date_range_inputs(min_date, max_date):
+    """Displays date filter on sidebar and returns the selected (start, end) dates."""
+    st.sidebar.header("Filters")
+    start_date = st.sidebar.date_input("Start date", value=min_date)
+    end_date = st.sidebar.date_input("End date", value=max_date)
+    return start_date, end_date
 
 def date_range_filter(df: pd.DataFrame) -> pd.DataFrame:
     """Displays date filter on sidebar and returns the filtered dataframe."""
-    st.sidebar.header("Filters")
-    start_date = st.sidebar.date_input("Start date", value=df['datetime'].min())
-    end_date = st.sidebar.date_input("End date", value=df['datetime'].max())
+    start_date, end_date = date_range_inputs(df['datetime'].min(), df['datetime'].max())
 
     filtered_df = df[
         (df['datetime'] >= pd.to_datetime(start_date)) &
@@ -14,12 +21,23 @@ def date_range_filter(df: pd.DataFrame) -> pd.DataFrame:
     ]
     return filtered_df
 
+def show_snapshot_freshness(info: dict, max_age_hours: float):
+    """Shows when the Parquet snapshot was exported, warning when it is stale."""
+    exported_at = datetime.datetime.fromisoformat(info["exported_at"])
+    age = datetime.datetime.now(datetime.timezone.utc) - exported_at
+    hours = age.total_seconds() / 3600
+    message = f"📦 Snapshot from {exported_at:%Y-%m-%d %H:%M} UTC ({hours:.1f}h ago, {info['rows']:,} rows)"
+    if hours > max_age_hours:
+        st.sidebar.warning(f"{message}. Run `python -m src.database snapshot` to refresh it.")
+    else:
+        st.sidebar.caption(message)
+
 def plot_unitary_prices(df: pd.DataFrame, category: str):
     """Plots unitary product prices over time for a category."""
     if df.empty:
         st.warning(f"No data for category {category}")
         return
-    df = df.groupby(['invoice_id', 'supermarket_name', 'datetime', 'description']).last().reset_index()
+    df = df.groupby(['invoice_id', 'supermarket_name', 'datetime', 'description'], observed=True).last().reset_index()
 
     fig = px.line(
         df, x='datetime', y='unitary_value', color='full_product_name',
@@ -30,7 +48,7 @@ def plot_unitary_prices(df: pd.DataFrame, category: str):
 
 def plot_total_spend(df: pd.DataFrame, group_col: str, title: str):
     """Plots total spend grouped by a specified column."""
-    group_df = df.groupby(group_col)['total_value'].sum().reset_index()
+    group_df = group_sum(df, group_col, 'total_value')
     fig = px.bar(
         group_df, x=group_col, y='total_value', title=title, text_auto=True
     )
@@ -40,7 +58,7 @@ def plot_total_spend(df: pd.DataFrame, group_col: str, title: str):
 def plot_monthly_spend(df: pd.DataFrame):
     """Plots monthly spend per supermarket."""
     df['month'] = df['datetime'].dt.strftime('%B')
-    group_df = df.groupby(['month', 'supermarket_name'])['total_value'].sum().reset_index()
+    group_df = group_sum(df, ['month', 'supermarket_name'], 'total_value')
 
     fig = px.bar(
         group_df,
@@ -78,7 +96,7 @@ def plot_price_comparison_by_month(df: pd.DataFrame):
 
     # Group to get latest price per month-product-supermarket
     group_df = (
-        df.groupby(['month_product', 'month', 'full_product_name', 'supermarket_name'])['unitary_value']
+        df.groupby(['month_product', 'month', 'full_product_name', 'supermarket_name'], observed=True)['unitary_value']
         .last()
         .reset_index()
     )
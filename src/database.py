@@ -1,12 +1,48 @@
+import datetime
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import time
+from collections import defaultdict
 import psycopg2
 from psycopg2 import sql, OperationalError, DatabaseError
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from src.sql_commands import sql_commands
+from src.sql_commands import sql_commands, migrations
 from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
-from src.config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from src.config import (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DATABASE_URL, SNAPSHOT_PATH,
+                        DB_MAX_RETRIES, DB_RETRY_BASE_S)
 import pandas as pd
-from sqlalchemy import create_engine
+from pandas.api.types import union_categoricals
+from sqlalchemy import create_engine, inspect as sqlalchemy_inspect
+from src.tracing import span
+from src.logging_utils import configure_logging, truncate
+
+INVOICE_COLUMNS = [
+    "invoice_id", "supermarket_name", "datetime", "description", "quantity", "unit",
+    "unitary_value", "total_value", "product", "full_product_name", "volume", "category",
+]
+# invoice_id is kept as the exact 44-digit string (float64 cannot hold it) and, since it
+# repeats on every line of a receipt, as a categorical.
+CATEGORICAL_COLUMNS = ("invoice_id", "supermarket_name", "category", "unit")
+# Summed columns stay float64 so totals keep their cents; the others only need float32.
+FLOAT32_COLUMNS = ("quantity", "unitary_value")
+FLOAT64_COLUMNS = ("total_value",)
+LOAD_CHUNKSIZE = 50_000
+# What makes a product distinct in the products table
+PRODUCT_KEY = ["product", "full_product_name", "volume", "category_id"]
+# Columns of the line_items table, in the order upsert_receipt writes them
+LINE_ITEM_COLUMNS = ["receipt_id", "line_number", "description", "quantity", "unit", "unitary_value", "total_value",
+                     "product_id"]
+# Errors after which a receipt's transaction is retried on a new connection; matched by name so
+# SQLite (used by the benchmarks) and psycopg2 errors are handled alike
+TRANSIENT_ERRORS = ("OperationalError", "InterfaceError", "AppendConflict")
+# serialization_failure, deadlock_detected
+TRANSIENT_PGCODES = ("40001", "40P01")
+
+logger = logging.getLogger(__name__)
 
 def create_postgres_database(db_name, host, port, user, password):
     # Connect to PostgreSQL server
@@ -20,9 +56,9 @@ def create_postgres_database(db_name, host, port, user, password):
 
     try:
         cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(db_name)))
-        print(f"Database {db_name} dropped successfully (if it existed).")
+        logger.info("Database %s dropped (if it existed)", db_name)
     except psycopg2.Error as e:
-        print(f"An error occurred while dropping the database: {e}")
+        logger.error("Could not drop database %s: %s", db_name, e)
         # If we can't drop the database, we shouldn't continue trying to create it
         cursor.close()
         conn.close()
@@ -32,9 +68,9 @@ def create_postgres_database(db_name, host, port, user, password):
     try:
         cursor.execute(sql.SQL("CREATE DATABASE {}").format(
             sql.Identifier(db_name)))
-        print(f"Database {db_name} created successfully.")
+        logger.info("Database %s created", db_name)
     except psycopg2.Error as e:
-        print(f"An error occurred: {e}")
+        logger.error("Could not create database %s: %s", db_name, e)
     finally:
         cursor.close()
         conn.close()
@@ -44,9 +80,9 @@ def execute_sql(connection, sql_script):
     try:
         cursor.execute(sql_script)
         connection.commit()
-        print("Query executed successfully")
+        logger.debug("Executed SQL: %s", truncate(sql_script))
     except psycopg2.Error as e:
-        print(f"An error occurred: {e}")
+        logger.error("SQL failed: %s\n%s", e, truncate(sql_script))
     finally:
         cursor.close()
 
@@ -62,62 +98,441 @@ def run_sql_commands(db_name, host, port, user, password, sql_commands):
             port=port
         )
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        print("Connection established successfully.")
+        logger.debug("Connected to %s on %s:%s", db_name, host, port)
 
         # Execute each SQL command
         for n, command in enumerate(sql_commands):
             try:
-                print(f"Executing command {n + 1}/{len(sql_commands)}...")
+                logger.debug("Executing command %d/%d", n + 1, len(sql_commands))
                 execute_sql(conn, command)
             except DatabaseError as e:
-                print(f"Error executing SQL command #{n + 1}: {e}")
+                logger.error("Error executing SQL command #%d: %s", n + 1, e)
 
     except OperationalError as conn_err:
-        print(f"Database connection error: {conn_err}")
+        logger.error("Database connection error: %s", conn_err)
 
     finally:
         if conn is not None:
             conn.close()
-            print("Database connection closed.")
 
 def get_database_url():
-    return f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    return DATABASE_URL
 
 def get_sql_database():
-    return SQLDatabase.from_uri(get_database_url())
+    # Imported lazily so the dashboard pages don't pay for loading LangChain
+    from langchain_community.utilities import SQLDatabase
+    # Only the invoices view (a table before the migration): the agents' prompts and cached
+    # queries are written against it, not the normalized tables behind it
+    return SQLDatabase.from_uri(get_database_url(), include_tables=["invoices"], view_support=True)
+
+def get_schema(db_url, include_tables=("invoices",)):
+    """Column names and types of the tables and views the report agents' SQL is written against."""
+    engine = create_engine(db_url)
+    inspector = sqlalchemy_inspect(engine)
+    schema = {}
+    # Like get_sql_database: the invoices view, which get_table_names() does not list
+    for table in inspector.get_table_names() + inspector.get_view_names():
+        if table in include_tables:
+            schema[table] = [
+                {"name": col["name"], "type": str(col["type"])}
+                for col in inspector.get_columns(table)
+            ]
+    engine.dispose()
+    return schema
+
+class InsertError(RuntimeError):
+    """A receipt that could not be saved; receipts committed before it stay saved."""
+
+
+class AppendConflict(RuntimeError):
+    """Lines appended to the same receipt by another transaction took the line numbers read."""
+
+
+def is_transient_db_error(error: BaseException) -> bool:
+    if getattr(error, "pgcode", None) in TRANSIENT_PGCODES:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
 
-def insert_sql_query(query: str):
+
+def receipt_rows(query: str) -> dict:
+    """The rows of an INSERT INTO invoices statement grouped by access key, in statement order."""
+    # Imported here: src.invoice_rows imports INVOICE_COLUMNS from this module
+    from src.invoice_rows import parse_insert_query
+    receipts = defaultdict(list)
+    for row in parse_insert_query(query):
+        receipts[str(row["invoice_id"])].append(row)
+    return dict(receipts)
+
+
+def dimension_ids(cursor, table: str, id_column: str, key_columns, keys, placeholder="%s") -> dict:
+    """
+    The ids of the given keys (tuples of key_columns) in a dimension table, adding the keys
+    it does not have yet.
+    """
+    keys = list(dict.fromkeys(keys))
+    columns = ", ".join(key_columns)
+    row = "(" + ", ".join([placeholder] * len(key_columns)) + ")"
+    cursor.execute(f"INSERT INTO {table} ({columns}) VALUES {', '.join([row] * len(keys))} "
+                   f"ON CONFLICT ({columns}) DO NOTHING", [value for key in keys for value in key])
+    # Narrowed on the first key column, matched on the whole key here
+    first_values = list(dict.fromkeys(key[0] for key in keys))
+    cursor.execute(f"SELECT {id_column}, {columns} FROM {table} "
+                   f"WHERE {key_columns[0]} IN ({', '.join([placeholder] * len(first_values))})", first_values)
+    found = {tuple(stored[1:]): stored[0] for stored in cursor.fetchall()}
+    return {key: found[key] for key in keys}
+
+
+def upsert_receipt(connection, invoice_id: str, rows, append=False, placeholder="%s") -> int:
+    """
+    Writes one receipt into the normalized tables (src/sql_commands.py): its store, categories
+    and products are looked up or added, its header is upserted on the access key and its lines,
+    numbered from 1 in order, replace the lines stored under the same numbers; stored lines past
+    the last one are dropped, so saving a receipt again leaves it as it was saved once. With
+    append the rows are numbered after the stored lines instead (a purchase added by hand), and
+    AppendConflict is raised if another append took those numbers first.
+    Runs on the caller's transaction; returns the rows written.
+    """
+    cursor = connection.cursor()
     try:
-        run_sql_commands(DB_NAME, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, [query])
-    except Exception as e:
-        print(f'Error: {e}')
-        raise
+        header = rows[0]
+        store = (header.get("supermarket_name"),)
+        store_id = dimension_ids(cursor, "stores", "store_id", ["name"], [store], placeholder)[store]
+        category_ids = dimension_ids(cursor, "categories", "category_id", ["name"],
+                                     [(row.get("category"),) for row in rows], placeholder)
+        product_keys = [(row.get("product"), row.get("full_product_name"), row.get("volume") or "",
+                         category_ids[(row.get("category"),)]) for row in rows]
+        product_ids = dimension_ids(cursor, "products", "product_id", PRODUCT_KEY, product_keys, placeholder)
+
+        cursor.execute(f"INSERT INTO receipts (invoice_id, store_id, datetime) "
+                       f"VALUES ({placeholder}, {placeholder}, {placeholder}) ON CONFLICT (invoice_id) "
+                       f"DO UPDATE SET store_id = EXCLUDED.store_id, datetime = EXCLUDED.datetime",
+                       (invoice_id, store_id, header.get("datetime")))
+        cursor.execute(f"SELECT receipt_id FROM receipts WHERE invoice_id = {placeholder}", (invoice_id,))
+        receipt_id = cursor.fetchone()[0]
+
+        first = 1
+        if append:
+            cursor.execute(f"SELECT COALESCE(MAX(line_number), 0) FROM line_items WHERE receipt_id = {placeholder}",
+                           (receipt_id,))
+            first += cursor.fetchone()[0]
+        values = ", ".join("(" + ", ".join([placeholder] * len(LINE_ITEM_COLUMNS)) + ")" for _ in rows)
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in LINE_ITEM_COLUMNS[2:])
+        params = []
+        for n, (row, product_key) in enumerate(zip(rows, product_keys), first):
+            params += [receipt_id, n, row.get("description"), row.get("quantity"), row.get("unit"),
+                       row.get("unitary_value"), row.get("total_value"), product_ids[product_key]]
+        # Appended lines never replace stored ones: a line number taken since MAX was read (another
+        # append to the same receipt) rolls the transaction back to be retried with a new MAX
+        conflict = "DO NOTHING" if append else f"DO UPDATE SET {updates}"
+        cursor.execute(f"INSERT INTO line_items ({', '.join(LINE_ITEM_COLUMNS)}) VALUES {values} "
+                       f"ON CONFLICT (receipt_id, line_number) {conflict}", params)
+        if append and cursor.rowcount != len(rows):
+            raise AppendConflict(f"Line numbers from {first} of receipt {invoice_id} were taken by another append")
+        if not append:
+            cursor.execute(f"DELETE FROM line_items WHERE receipt_id = {placeholder} AND line_number > {placeholder}",
+                           (receipt_id, len(rows)))
+        return len(rows)
+    finally:
+        cursor.close()
+
+
+def insert_receipts(query: str, connect, append=False, placeholder="%s", max_retries=DB_MAX_RETRIES,
+                    retry_base_s=DB_RETRY_BASE_S, sleep=time.sleep, rng=None) -> dict:
+    """
+    Saves the receipts of an INSERT INTO invoices statement through connections from connect,
+    one transaction per receipt (see upsert_receipt). A transaction failing on a transient error
+    is rolled back and retried on a new connection with exponential backoff and full jitter.
+    Returns the receipts and rows saved and the retries taken; raises ValueError when the
+    statement cannot be parsed and InsertError when a receipt could not be saved.
+    """
+    receipts = receipt_rows(query)
+    rng = rng or random.Random()
+    summary = {"receipts": 0, "rows": 0, "retries": 0}
+    connection = None
+    try:
+        for invoice_id, rows in receipts.items():
+            for retry in range(max_retries + 1):
+                try:
+                    if connection is None:
+                        connection = connect()
+                    # Commits the receipt, or rolls it back on any error
+                    with connection:
+                        written = upsert_receipt(connection, invoice_id, rows, append, placeholder)
+                    summary["receipts"] += 1
+                    summary["rows"] += written
+                    break
+                except Exception as e:
+                    if connection is not None:
+                        try:
+                            connection.close()
+                        except Exception:
+                            pass
+                        connection = None
+                    if retry == max_retries or not is_transient_db_error(e):
+                        detail = " ".join(str(e).split())
+                        raise InsertError(f"Receipt {invoice_id} was not saved ({summary['receipts']} of "
+                                          f"{len(receipts)} saved): {type(e).__name__}: {detail}") from e
+                    delay = rng.uniform(0, retry_base_s * 2 ** retry)
+                    logger.warning("Saving receipt %s failed (%s), retry %d/%d in %.2fs", invoice_id,
+                                   type(e).__name__, retry + 1, max_retries, delay)
+                    summary["retries"] += 1
+                    sleep(delay)
+    finally:
+        if connection is not None:
+            connection.close()
+    return summary
+
+
+def migrate_database(connection) -> bool:
+    """
+    Runs the migrations of src/sql_commands.py in one transaction, so a failure leaves the
+    database as it was. Returns False when the database already has the normalized tables.
+    """
+    with connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT to_regclass('line_items')")
+            if cursor.fetchone()[0] is not None:
+                return False
+            for n, command in enumerate(migrations):
+                logger.info("Migration step %d/%d", n + 1, len(migrations))
+                cursor.execute(command)
+            return True
+        finally:
+            cursor.close()
+
+
+def connect_postgres():
+    return psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT)
+
+
+def insert_sql_query(query: str, append=False) -> dict:
+    """Saves the receipts of an extracted INSERT on PostgreSQL; see insert_receipts."""
+    with span("db.insert", db__system="postgresql", db__statement_bytes=len(query)) as current:
+        try:
+            summary = insert_receipts(query, connect_postgres, append=append)
+        except Exception:
+            logger.exception("Could not insert receipt rows")
+            raise
+        current.set_attributes(db__receipts=summary["receipts"], db__rows=summary["rows"],
+                               db__retries=summary["retries"])
+        return summary
 
 
 def create_db_engine():
-    """Creates a PostgreSQL SQLAlchemy engine."""
+    """Creates a SQLAlchemy engine for DATABASE_URL (PostgreSQL unless overridden)."""
     try:
-        engine = create_engine(
-            f'postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-        )
+        engine = create_engine(DATABASE_URL)
         return engine
     except Exception as e:
         raise ConnectionError("Failed to create database engine") from e
 
 
-def load_invoice_data(engine) -> pd.DataFrame:
-    """Loads invoice data from the PostgreSQL database."""
+def apply_invoice_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts invoice columns to compact dtypes (categoricals, float32, datetime64)."""
+    for column in df.columns:
+        if column == "invoice_id":
+            df[column] = df[column].astype(str).astype("category")
+        elif column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif column in FLOAT32_COLUMNS:
+            df[column] = pd.to_numeric(df[column]).astype("float32")
+        elif column in FLOAT64_COLUMNS:
+            df[column] = pd.to_numeric(df[column]).astype("float64")
+        elif column == "datetime":
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def frames_from_cursor(cursor, columns, chunksize=LOAD_CHUNKSIZE):
+    """Yields typed DataFrames of at most chunksize rows from an executed DB-API cursor."""
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            break
+        yield apply_invoice_dtypes(pd.DataFrame.from_records(rows, columns=columns))
+
+
+def concat_invoice_frames(frames, columns) -> pd.DataFrame:
+    """Concatenates typed chunks, merging categoricals instead of falling back to object."""
+    frames = list(frames)
+    if not frames:
+        return apply_invoice_dtypes(pd.DataFrame(columns=columns))
+    categories = {
+        column: union_categoricals([frame[column] for frame in frames]).categories
+        for column in columns if column in CATEGORICAL_COLUMNS
+    }
+    for frame in frames:
+        for column, values in categories.items():
+            frame[column] = frame[column].cat.set_categories(values)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_invoice_data(engine, columns=None, chunksize=LOAD_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Loads invoice data from the PostgreSQL database.
+    Rows are streamed through a server-side cursor in chunks, so only one chunk is held
+    as Python objects at a time, and only the requested columns are fetched.
+    """
+    columns = list(columns or INVOICE_COLUMNS)
+    query = sql.SQL("SELECT {} FROM invoices").format(sql.SQL(", ").join(map(sql.Identifier, columns)))
+    connection = engine.raw_connection()
     try:
-        query = "SELECT * FROM invoices;"
-        df = pd.read_sql(query, engine)
-        df['datetime'] = pd.to_datetime(df['datetime'])
+        cursor = connection.cursor(name="load_invoice_data")
+        cursor.itersize = chunksize
+        cursor.execute(query)
+        df = concat_invoice_frames(frames_from_cursor(cursor, columns, chunksize), columns)
+        cursor.close()
         return df
     except Exception as e:
         raise RuntimeError("Failed to load or parse data from the database") from e
+    finally:
+        connection.close()
+
+SNAPSHOT_INFO_FILE = "_snapshot.json"
+
+
+def _snapshot_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("invoice_id", pa.string()),
+        ("supermarket_name", pa.string()),
+        ("datetime", pa.date32()),
+        ("description", pa.string()),
+        ("quantity", pa.float32()),
+        ("unit", pa.string()),
+        ("unitary_value", pa.float32()),
+        ("total_value", pa.float64()),
+        ("product", pa.string()),
+        ("full_product_name", pa.string()),
+        ("volume", pa.string()),
+        ("category", pa.string()),
+        ("month", pa.string()),
+    ])
+
+
+def write_invoice_snapshot(frames, path: str = SNAPSHOT_PATH) -> dict:
+    """
+    Writes typed invoice chunks to Parquet partitioned by month (month=YYYY-MM/...).
+    The new snapshot is built next to the old one and swapped in when complete.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = _snapshot_schema()
+    stats = {"rows": 0, "min_date": None, "max_date": None}
+
+    def batches():
+        for frame in frames:
+            frame = frame.assign(month=frame["datetime"].dt.strftime("%Y-%m"))
+            frame["datetime"] = frame["datetime"].dt.date
+            for column in CATEGORICAL_COLUMNS:
+                frame[column] = frame[column].astype(str)
+            stats["rows"] += len(frame)
+            low, high = frame["datetime"].min(), frame["datetime"].max()
+            stats["min_date"] = low if stats["min_date"] is None else min(stats["min_date"], low)
+            stats["max_date"] = high if stats["max_date"] is None else max(stats["max_date"], high)
+            yield pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(
+        batches(), tmp_path, schema=schema, format="parquet",
+        partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+    )
+    info = {
+        "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "rows": stats["rows"],
+        "min_date": stats["min_date"].isoformat() if stats["min_date"] else None,
+        "max_date": stats["max_date"].isoformat() if stats["max_date"] else None,
+    }
+    # An empty table writes no Parquet files, nor the directory
+    os.makedirs(tmp_path, exist_ok=True)
+    with open(os.path.join(tmp_path, SNAPSHOT_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return info
 
-if __name__ == '__main__':
-    # Create database
-    create_postgres_database(DB_NAME, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD)
-    run_sql_commands(DB_NAME, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, sql_commands)
 
+def export_invoice_snapshot(engine, path: str = SNAPSHOT_PATH, chunksize=LOAD_CHUNKSIZE) -> dict:
+    """Exports the invoices table to a month-partitioned Parquet snapshot."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor(name="export_invoice_snapshot")
+        cursor.itersize = chunksize
+        cursor.execute(sql.SQL("SELECT {} FROM invoices").format(
+            sql.SQL(", ").join(map(sql.Identifier, INVOICE_COLUMNS))))
+        info = write_invoice_snapshot(frames_from_cursor(cursor, INVOICE_COLUMNS, chunksize), path)
+        cursor.close()
+        return info
+    finally:
+        connection.close()
+
+
+def snapshot_info(path: str = SNAPSHOT_PATH) -> dict | None:
+    """Returns the snapshot metadata (export time, rows, date range), or None if there is no snapshot."""
+    try:
+        with open(os.path.join(path, SNAPSHOT_INFO_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def readable_snapshot_info(path: str = SNAPSHOT_PATH) -> dict | None:
+    """Like snapshot_info, but None as well for a snapshot exported from an empty table."""
+    info = snapshot_info(path)
+    if info is None or not info.get("rows") or not info.get("min_date") or not info.get("max_date"):
+        return None
+    return info
 
+
+def load_invoice_snapshot(path: str = SNAPSHOT_PATH, start_date=None, end_date=None, columns=None) -> pd.DataFrame:
+    """
+    Loads invoices from the Parquet snapshot through Arrow.
+    The date range prunes month partitions and row groups before reading, only the requested
+    columns are read, and files are memory-mapped.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    columns = list(columns or INVOICE_COLUMNS)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    conditions = []
+    if start_date is not None:
+        conditions += [ds.field("month") >= f"{start_date:%Y-%m}", ds.field("datetime") >= start_date]
+    if end_date is not None:
+        conditions += [ds.field("month") <= f"{end_date:%Y-%m}", ds.field("datetime") <= end_date]
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    try:
+        table = dataset.to_table(columns=columns, filter=expression)
+    except Exception as e:
+        raise RuntimeError("Failed to load the invoice snapshot") from e
+    return apply_invoice_dtypes(table.to_pandas())
+
+
+if __name__ == '__main__':
+    configure_logging()
+    if sys.argv[1:] == ["snapshot"]:
+        # Export invoices to the Parquet snapshot read by the dashboard
+        print(export_invoice_snapshot(create_db_engine()))
+    elif sys.argv[1:] == ["migrate"]:
+        # Update a database created by an earlier version
+        connection = connect_postgres()
+        try:
+            print("Migrated" if migrate_database(connection) else "Already up to date")
+        finally:
+            connection.close()
+    else:
+        # Create database
+        create_postgres_database(DB_NAME, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD)
+        run_sql_commands(DB_NAME, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, sql_commands)
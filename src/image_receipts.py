@@ -0,0 +1,172 @@
+"""
+Photo receipts: preprocessing tuned for thermal paper, then OCR.
+
+Phone photos of receipts are large, slightly rotated and mostly background. Before OCR the image
+is turned upright from its EXIF orientation, converted to grayscale with stretched contrast
+(faded thermal print), cropped to the paper and then to the printed area, deskewed by the angle that gives the
+sharpest text rows and downscaled so its longest side is at most IMAGE_MAX_SIDE. Large photos
+are reduced while decoding so the steps before the final downscale stay cheap.
+
+Two OCR engines are available (IMAGE_OCR_ENGINE):
+- docling: docling's OCR pipeline with layout analysis, the same converter as the PDF path;
+- tesseract: the tesseract command line on the preprocessed image, much faster as it skips the
+  layout models; plain text lines are enough for the line-based extraction.
+"""
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from src.config import IMAGE_OCR_ENGINE, IMAGE_MAX_SIDE, IMAGE_OCR_LANG
+from src.conversion_cache import cache_key, get_cached, put_cached
+from src.receipt_files import open_source, source_name
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TYPES = ("jpg", "jpeg", "png")
+OCR_ENGINES = ("docling", "tesseract")
+# Pixels this much darker than the background count as print
+INK_THRESHOLD = 60
+DESKEW_MAX_DEGREES = 6
+DESKEW_STEP_DEGREES = 0.5
+
+
+def is_image(source) -> bool:
+    return os.path.splitext(source_name(source))[1].lower().lstrip(".") in IMAGE_TYPES
+
+
+def ink_mask(gray):
+    """Boolean array of the printed pixels of a grayscale image."""
+    import numpy as np
+    pixels = np.asarray(gray)
+    # A subsample is enough for the background level and avoids sorting every pixel
+    background = np.percentile(pixels[::4, ::4], 90)
+    return pixels < max(background - INK_THRESHOLD, 0)
+
+
+def otsu_threshold(pixels) -> int:
+    """The gray level that best separates the two brightness classes of an image (paper and background)."""
+    import numpy as np
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    mean = np.cumsum(histogram * levels)
+    total_weight, total_mean = weight[-1], mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weight - mean * total_weight) ** 2 / (weight * (total_weight - weight))
+    return int(np.nanargmax(between))
+
+
+def crop_to_paper(gray):
+    """Crops a photo to the receipt paper: the rows and columns that are mostly brighter than the background."""
+    import numpy as np
+    pixels = np.asarray(gray)
+    paper = pixels > otsu_threshold(pixels)
+    rows = np.flatnonzero(paper.mean(axis=1) > 0.5)
+    cols = np.flatnonzero(paper.mean(axis=0) > 0.5)
+    # Nothing to crop when the paper fills the frame (or no paper was found)
+    if not len(rows) or not len(cols) or paper.mean() > 0.9:
+        return gray
+    return gray.crop((cols[0], rows[0], cols[-1] + 1, rows[-1] + 1))
+
+
+def crop_to_content(gray, margin: int = 12):
+    """Crops a grayscale image to the bounding box of its print plus a margin."""
+    import numpy as np
+    mask = ink_mask(gray)
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    if not len(rows) or not len(cols):
+        return gray
+    return gray.crop((max(cols[0] - margin, 0), max(rows[0] - margin, 0),
+                      min(cols[-1] + margin + 1, gray.width), min(rows[-1] + margin + 1, gray.height)))
+
+
+def skew_angle(gray) -> float:
+    """
+    The rotation (degrees) that straightens the text: the angle whose row profile of print has
+    the largest variance, searched on a small copy of the image.
+    """
+    import numpy as np
+    small = gray.copy()
+    small.thumbnail((600, 600))
+    mask = ink_mask(small)
+    if not mask.any():
+        return 0.0
+    from PIL import Image
+    ink = Image.fromarray((mask * 255).astype("uint8"))
+    best_angle, best_score = 0.0, -1.0
+    angle = -DESKEW_MAX_DEGREES
+    while angle <= DESKEW_MAX_DEGREES:
+        profile = np.asarray(ink.rotate(angle, resample=Image.NEAREST, expand=True), dtype=np.float32).sum(axis=1)
+        score = float(np.var(profile))
+        if score > best_score:
+            best_angle, best_score = angle, score
+        angle += DESKEW_STEP_DEGREES
+    return best_angle
+
+
+def preprocess_image(image, max_side: int = IMAGE_MAX_SIDE):
+    """The upright, grayscale, cropped, deskewed and downscaled version of a receipt photo."""
+    from PIL import Image, ImageOps
+    # Work at up to twice the final size: JPEGs are decoded at a reduced scale directly, which
+    # saves most of the time and memory on phone photos; the paper is cropped out of that
+    working_side = 2 * max_side
+    if image.format == "JPEG":
+        image.draft("L", (working_side, working_side))
+    image = ImageOps.exif_transpose(image).convert("L")
+    if max(image.size) > working_side:
+        image.thumbnail((working_side, working_side), Image.BILINEAR)
+    gray = ImageOps.autocontrast(image, cutoff=1)
+    gray = crop_to_content(crop_to_paper(gray))
+    angle = skew_angle(gray)
+    if angle:
+        gray = crop_to_content(gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255))
+    if max(gray.size) > max_side:
+        gray.thumbnail((max_side, max_side), Image.LANCZOS)
+    return gray
+
+
+def ocr_tesseract(image, lang: str = IMAGE_OCR_LANG) -> str:
+    """Plain text of an image from the tesseract command line (page segmentation for one column of text)."""
+    import io
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    try:
+        result = subprocess.run(["tesseract", "stdin", "stdout", "-l", lang, "--psm", "4"],
+                                input=buffer.getvalue(), capture_output=True, check=True, timeout=120)
+    except FileNotFoundError:
+        raise RuntimeError("IMAGE_OCR_ENGINE=tesseract needs the tesseract command line installed")
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def ocr_docling(image) -> str:
+    """Markdown of an image from docling's OCR pipeline, with the converter shared with the PDF path."""
+    from src.pdf_splitting import page_converter
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "receipt.png")
+        image.save(path)
+        return page_converter().convert(path).document.export_to_markdown()
+
+
+def process_image(source, engine: str = IMAGE_OCR_ENGINE, max_side: int = IMAGE_MAX_SIDE) -> str:
+    """Convert a receipt photo (path or upload) to text with the configured OCR engine."""
+    if engine not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine {engine!r}; expected one of {', '.join(OCR_ENGINES)}")
+    from PIL import Image
+    with span("image.ocr", ocr__engine=engine) as current:
+        key = cache_key(source, f"image:{engine}:{max_side}")
+        cached = get_cached(key)
+        if cached is not None:
+            current.set_attributes(conversion__cache_hit=True)
+            return cached[0]
+        start = time.perf_counter()
+        with Image.open(open_source(source)) as image:
+            current.set_attributes(image__width=image.width, image__height=image.height)
+            prepared = preprocess_image(image, max_side)
+        current.set_attributes(image__prepared_width=prepared.width, image__prepared_height=prepared.height,
+                               image__preprocess_ms=(time.perf_counter() - start) * 1000)
+        text = ocr_tesseract(prepared) if engine == "tesseract" else ocr_docling(prepared)
+        current.set_attributes(document__markdown_chars=len(text), conversion__cache_hit=False)
+    put_cached(key, [text])
+    return text
@@ -0,0 +1,113 @@
+import re
+from decimal import Decimal, InvalidOperation
+from src.database import INVOICE_COLUMNS
+
+INSERT_PATTERN = re.compile(r"INSERT\s+INTO\s+invoices\s*\(([^)]*)\)\s*VALUES\s*(.*)", re.IGNORECASE | re.DOTALL)
+STATEMENT_START = re.compile(r"INSERT\s+INTO\s+invoices\b", re.IGNORECASE)
+NUMERIC_COLUMNS = {"quantity", "unitary_value", "total_value"}
+
+
+def sql_literal(value) -> str:
+    """Formats a value the way the extraction prompt writes it: numbers bare, text quoted, NULL for None."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_insert_query(rows) -> str:
+    """
+    Builds the INSERT INTO invoices statement for rows given as dicts keyed by INVOICE_COLUMNS,
+    in the same shape the LLM extraction produces so both paths are reviewed and inserted alike.
+    """
+    if not rows:
+        raise ValueError("A receipt needs at least one item")
+    values = ",\n".join(
+        "(" + ", ".join(
+            # The 44-digit access key is written unquoted, like the extraction prompt does
+            str(row[column]) if column == "invoice_id" else sql_literal(row.get(column))
+            for column in INVOICE_COLUMNS
+        ) + ")"
+        for row in rows
+    )
+    return f"INSERT INTO invoices ({', '.join(INVOICE_COLUMNS)}) VALUES\n{values};"
+
+
+def _value(token: str, quoted: bool, column: str):
+    if quoted and column not in NUMERIC_COLUMNS:
+        return token
+    token = token.strip()
+    if not quoted and (token.upper() == "NULL" or not token):
+        return None
+    if column in NUMERIC_COLUMNS:
+        try:
+            return Decimal(token)
+        except InvalidOperation:
+            raise ValueError(f"{column} is not a number: {token}")
+    # Unquoted text such as a store name; the access key stays text like in load_invoice_data
+    return token.strip("'\"")
+
+
+def parse_insert_statements(query: str) -> list:
+    """
+    Parses every INSERT INTO invoices statement of a query (one per receipt when a file held
+    several) into its rows, as dicts keyed by column. Raises ValueError when there is none or a
+    row is malformed.
+    """
+    starts = [match.start() for match in STATEMENT_START.finditer(query)]
+    if not starts:
+        raise ValueError("Not an INSERT INTO invoices statement")
+    return [_parse_statement(query[start:end]) for start, end in zip(starts, starts[1:] + [len(query)])]
+
+
+def parse_insert_query(query: str):
+    """
+    Parses the INSERT INTO invoices statements of a query (as produced by the LLM or
+    build_insert_query) back into dicts keyed by column, the rows of every statement in order.
+    Raises ValueError when there is none or a row is malformed.
+    """
+    return [row for rows in parse_insert_statements(query) for row in rows]
+
+
+def _parse_statement(statement: str) -> list:
+    match = INSERT_PATTERN.match(statement)
+    if match is None:
+        raise ValueError("Not an INSERT INTO invoices statement")
+    columns = [column.strip() for column in match.group(1).split(",")]
+    rows, values, token, quoted = [], None, "", False
+    text, i = match.group(2), 0
+    while i < len(text):
+        char = text[i]
+        if values is None:
+            if char == "(":
+                values, token, quoted = [], "", False
+            elif char == ";":
+                break
+        elif char == "'" and not token.strip():
+            # A quoted literal; '' inside it is an escaped quote
+            end = i + 1
+            while True:
+                end = text.find("'", end)
+                if end == -1:
+                    raise ValueError("Unterminated text literal")
+                if text[end + 1:end + 2] != "'":
+                    break
+                end += 2
+            token, quoted, i = text[i + 1:end].replace("''", "'"), True, end
+        elif char in ",)":
+            values.append(_value(token, quoted, columns[min(len(values), len(columns) - 1)]))
+            token, quoted = "", False
+            if char == ")":
+                if len(values) != len(columns):
+                    raise ValueError(f"Row {len(rows) + 1} has {len(values)} values for {len(columns)} columns")
+                rows.append(dict(zip(columns, values)))
+                values = None
+        elif not quoted:
+            token += char
+        i += 1
+    if values is not None:
+        raise ValueError("Unterminated row")
+    if not rows:
+        raise ValueError("The INSERT has no rows")
+    return rows
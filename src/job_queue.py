@@ -0,0 +1,342 @@
+"""
+SQLite-backed queue of receipt jobs, shared by the app and the worker processes (src/job_worker.py).
+
+A job holds the uploaded file and moves through:
+queued -> running -> awaiting_approval -> approved -> running -> done
+(or duplicate, rejected, failed). A running job holds a lease that its worker renews while it
+reports progress; a job whose worker died is claimed again once the lease expires. Failed
+attempts are retried with exponential backoff up to JOB_MAX_ATTEMPTS. The extracted INSERT of a
+job awaiting approval is kept in the table, so approvals survive app and worker restarts.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from src.config import JOB_QUEUE_DB, JOB_MAX_ATTEMPTS, JOB_LEASE_S, JOB_RETRY_BASE_S
+
+logger = logging.getLogger(__name__)
+
+# Jobs that still need a worker or the user
+ACTIVE_STATUSES = ("queued", "running", "awaiting_approval", "approved")
+FINAL_STATUSES = ("done", "duplicate", "rejected", "failed")
+
+
+def _now() -> float:
+    return time.time()
+
+
+class JobQueue:
+    """The jobs table and the workers' heartbeat table, with the queue operations and metrics."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        file_name TEXT,
+        file_bytes BLOB,
+        content_hash TEXT,
+        stage TEXT,
+        progress REAL NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        state TEXT,
+        result TEXT,
+        error TEXT,
+        worker TEXT,
+        created_at REAL NOT NULL,
+        available_at REAL NOT NULL,
+        started_at REAL,
+        lease_until REAL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+    CREATE INDEX IF NOT EXISTS jobs_hash ON jobs (content_hash);
+    CREATE TABLE IF NOT EXISTS job_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        worker TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        wait_s REAL NOT NULL,
+        run_s REAL,
+        status TEXT,
+        started_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS job_runs_started ON job_runs (started_at);
+    CREATE TABLE IF NOT EXISTS workers (
+        id TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at REAL NOT NULL,
+        heartbeat REAL NOT NULL,
+        busy_s REAL NOT NULL DEFAULT 0,
+        current_job TEXT
+    );
+    """
+
+    def __init__(self, path=JOB_QUEUE_DB, max_attempts=JOB_MAX_ATTEMPTS, lease_s=JOB_LEASE_S,
+                 retry_base_s=JOB_RETRY_BASE_S):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self.retry_base_s = retry_base_s
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit; claims use explicit BEGIN IMMEDIATE so only one process takes a job
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                               timeout=30)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def _execute(self, sql_query: str, params=()):
+        with self._lock:
+            return self._connect().execute(sql_query, params).fetchall()
+
+    # --- App side ---
+
+    def enqueue(self, file_name: str, file_bytes: bytes, kind: str = "receipt") -> str:
+        """Adds a receipt job and returns its id; an upload already being processed returns the existing job."""
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        now = _now()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                active = connection.execute(
+                    f"SELECT id FROM jobs WHERE content_hash = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+                    (content_hash, *ACTIVE_STATUSES)).fetchone()
+                if active is not None:
+                    connection.execute("COMMIT")
+                    return active["id"]
+                job_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO jobs (id, kind, status, file_name, file_bytes, content_hash, stage, max_attempts, "
+                    "created_at, available_at) VALUES (?, ?, 'queued', ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, file_name, file_bytes, content_hash, self.max_attempts, now, now))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        logger.info("Queued job %s for %s", job_id, file_name)
+        return job_id
+
+    def submit_for_approval(self, file_name: str, file_bytes: bytes, result: str, state: dict,
+                            kind: str = "receipt") -> str:
+        """
+        Adds a receipt extracted elsewhere (e.g. by the watch-folder daemon) straight to the
+        approval list; once approved a worker inserts it like any other job.
+        """
+        now = _now()
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, file_name, file_bytes, content_hash, stage, progress, max_attempts, "
+            "state, result, created_at, available_at) "
+            "VALUES (?, ?, 'awaiting_approval', ?, ?, ?, 'awaiting_approval', 0.9, ?, ?, ?, ?, ?)",
+            (job_id, kind, file_name, file_bytes, hashlib.sha256(file_bytes).hexdigest(), self.max_attempts,
+             json.dumps(state, default=str), result, now, now))
+        logger.info("Job %s for %s awaits approval", job_id, file_name)
+        return job_id
+
+    def get(self, job_id: str):
+        """The job as a dict (without the file), or None."""
+        rows = self._execute(
+            "SELECT id, kind, status, file_name, stage, progress, attempts, max_attempts, result, error, worker, "
+            "created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def jobs(self, statuses=None, limit: int = 50) -> list:
+        """The most recent jobs, optionally only those in the given statuses."""
+        where, params = "", ()
+        if statuses:
+            where, params = f"WHERE status IN ({', '.join('?' * len(statuses))})", tuple(statuses)
+        rows = self._execute(
+            "SELECT id, kind, status, file_name, stage, progress, attempts, result, error, created_at, finished_at "
+            f"FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit))
+        return [dict(row) for row in rows]
+
+    def approve(self, job_id: str, approved: bool = True) -> bool:
+        """Records the user's decision on a job awaiting approval; False if it is not awaiting one."""
+        now = _now()
+        if approved:
+            rows = self._execute(
+                "UPDATE jobs SET status = 'approved', stage = 'approved', available_at = ?, attempts = 0 "
+                "WHERE id = ? AND status = 'awaiting_approval' RETURNING id", (now, job_id))
+        else:
+            rows = self._execute(
+                "UPDATE jobs SET status = 'rejected', stage = 'rejected', finished_at = ?, file_bytes = NULL "
+                "WHERE id = ? AND status = 'awaiting_approval' RETURNING id", (now, job_id))
+        return bool(rows)
+
+    # --- Worker side ---
+
+    def claim(self, worker: str):
+        """
+        Takes the oldest runnable job (queued, approved, or running with an expired lease) for a
+        worker and returns it with its file and saved state, or None.
+        """
+        now = _now()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # A job whose worker kept dying (e.g. killed for memory) is not retried forever
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'Worker stopped during the job'), "
+                    "finished_at = ? WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, now))
+                row = connection.execute(
+                    "SELECT * FROM jobs WHERE (status IN ('queued', 'approved') AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY available_at LIMIT 1",
+                    (now, now)).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                job = dict(row)
+                # The insert after approval is its own step; a lost lease resumes the step it was in
+                step = "insert" if job["status"] == "approved" or job["stage"] == "insert" else "extract"
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', stage = ?, worker = ?, attempts = attempts + 1, "
+                    "started_at = COALESCE(started_at, ?), lease_until = ? WHERE id = ?",
+                    (step, worker, now, now + self.lease_s, job["id"]))
+                connection.execute(
+                    "INSERT INTO job_runs (job_id, worker, kind, wait_s, started_at) VALUES (?, ?, ?, ?, ?)",
+                    (job["id"], worker, step, max(now - job["available_at"], 0.0), now))
+                connection.execute("UPDATE workers SET current_job = ?, heartbeat = ? WHERE id = ?",
+                                   (job["id"], now, worker))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        job.update(step=step, attempts=job["attempts"] + 1,
+                   state=json.loads(job["state"]) if job["state"] else None)
+        return job
+
+    def report_progress(self, job_id: str, stage: str, progress: float):
+        """Updates the stage shown to the user and renews the job's lease."""
+        now = _now()
+        self._execute("UPDATE jobs SET stage = ?, progress = ?, lease_until = ? WHERE id = ? AND status = 'running'",
+                      (stage, progress, now + self.lease_s, job_id))
+
+    def renew_lease(self, job_id: str):
+        self._execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                      (_now() + self.lease_s, job_id))
+
+    def await_approval(self, job_id: str, result: str, state: dict):
+        self._finish_step(job_id, "awaiting_approval", result=result, state=json.dumps(state, default=str))
+
+    def hold_for_insert(self, job_id: str, result: str, state: dict):
+        """Keeps an extraction whose insert is about to fail, so the retry only repeats the insert."""
+        self._execute("UPDATE jobs SET stage = 'insert', result = ?, state = ? WHERE id = ? AND status = 'running'",
+                      (result, json.dumps(state, default=str), job_id))
+
+    def complete(self, job_id: str, status: str = "done", result=None):
+        self._finish_step(job_id, status, result=result, finished=True)
+
+    def fail(self, job_id: str, error: str) -> str:
+        """Records a failed attempt: the job is retried after a backoff, or fails for good. Returns its new status."""
+        now = _now()
+        rows = self._execute("SELECT attempts, max_attempts, stage FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return "failed"
+        attempts, max_attempts, stage = rows[0]
+        if attempts < max_attempts:
+            # An insert that failed goes back to approved, anything else to the start
+            status = "approved" if stage == "insert" else "queued"
+            delay = self.retry_base_s * 2 ** (attempts - 1)
+            self._execute("UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_until = NULL, "
+                          "worker = NULL WHERE id = ?", (status, error, now + delay, job_id))
+            logger.warning("Job %s failed (attempt %d of %d), retrying in %.0fs: %s",
+                           job_id, attempts, max_attempts, delay, error)
+        else:
+            status = "failed"
+            self._execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                          "WHERE id = ?", (error, now, job_id))
+            logger.error("Job %s failed after %d attempts: %s", job_id, attempts, error)
+        self._end_run(job_id, status)
+        return status
+
+    def _finish_step(self, job_id: str, status: str, result=None, state=None, finished: bool = False):
+        now = _now()
+        self._execute(
+            "UPDATE jobs SET status = ?, stage = ?, progress = 1, result = COALESCE(?, result), "
+            "state = COALESCE(?, state), error = NULL, lease_until = NULL, finished_at = ?, "
+            "file_bytes = CASE WHEN ? THEN NULL ELSE file_bytes END WHERE id = ?",
+            (status, status, result, state, now if finished else None, finished, job_id))
+        self._end_run(job_id, status)
+
+    def _end_run(self, job_id: str, status: str):
+        now = _now()
+        self._execute(
+            "UPDATE job_runs SET run_s = ? - started_at, status = ? "
+            "WHERE id = (SELECT MAX(id) FROM job_runs WHERE job_id = ?)", (now, status, job_id))
+
+    def register_worker(self, worker: str):
+        now = _now()
+        self._execute("INSERT OR REPLACE INTO workers (id, pid, started_at, heartbeat) VALUES (?, ?, ?, ?)",
+                      (worker, os.getpid(), now, now))
+
+    def worker_heartbeat(self, worker: str, busy_s: float = 0.0, current_job=None):
+        self._execute("UPDATE workers SET heartbeat = ?, busy_s = busy_s + ?, current_job = ? WHERE id = ?",
+                      (_now(), busy_s, current_job, worker))
+
+    # --- Metrics ---
+
+    def metrics(self, since_s: float = 3600.0) -> dict:
+        """
+        Queue depth per status, wait and run times of the steps started in the last since_s
+        seconds, and the utilization of the workers seen recently (busy time over lifetime).
+        """
+        now = _now()
+        depth = {row["status"]: row["jobs"] for row in self._execute(
+            "SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status")}
+        runs = self._execute("SELECT wait_s, run_s FROM job_runs WHERE started_at >= ? ORDER BY wait_s",
+                             (now - since_s,))
+        waits = [row["wait_s"] for row in runs]
+        run_times = sorted(row["run_s"] for row in runs if row["run_s"] is not None)
+        workers = self._execute("SELECT id, started_at, heartbeat, busy_s, current_job FROM workers "
+                                "WHERE heartbeat >= ?", (now - max(self.lease_s, 60),))
+        alive_s = sum(max(row["heartbeat"] - row["started_at"], 0.0) for row in workers)
+
+        def percentile(values, q):
+            return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+        oldest = self._execute("SELECT MIN(available_at) FROM jobs WHERE status IN ('queued', 'approved')")[0][0]
+        return {
+            "depth": {status: depth.get(status, 0) for status in (*ACTIVE_STATUSES, *FINAL_STATUSES)},
+            "queued": depth.get("queued", 0) + depth.get("approved", 0),
+            "oldest_queued_s": max(now - oldest, 0.0) if oldest else 0.0,
+            "steps": len(runs),
+            "wait_p50_s": percentile(waits, 0.5),
+            "wait_p95_s": percentile(waits, 0.95),
+            "run_p50_s": percentile(run_times, 0.5),
+            "run_p95_s": percentile(run_times, 0.95),
+            "workers": len(workers),
+            "busy_workers": sum(row["current_job"] is not None for row in workers),
+            "utilization": sum(row["busy_s"] for row in workers) / alive_s if alive_s else 0.0,
+        }
+
+
+_job_queue = None
+
+
+def get_job_queue():
+    """The process-wide job queue, or None when JOB_QUEUE_DB is empty (receipts are processed inline)."""
+    global _job_queue
+    if _job_queue is None and JOB_QUEUE_DB:
+        _job_queue = JobQueue()
+    return _job_queue
+
+
+def set_job_queue(queue):
+    global _job_queue
+    _job_queue = queue
@@ -0,0 +1,182 @@
+"""
+Worker processes for the receipt job queue (src/job_queue.py).
+
+Each worker claims jobs and runs them through the invoice graph in two steps:
+- extract: the receipt is identified, converted, extracted and validated; a receipt that
+  passes validation is saved right away, any other one stops at human_approval and its INSERT
+  is saved on the job for the user;
+- insert: once the user approves, the saved state is put back before human_approval on a
+  fresh graph thread and the approval is resumed, so insert_data runs as in the inline flow.
+A receipt insert_data could not save fails the step, which is retried like any other failure; an
+auto-approved receipt keeps its extraction on the job, so its retry is an insert step.
+Progress is reported after each graph node, and a background thread keeps the job's lease
+while a long conversion runs.
+
+The app starts JOB_WORKERS of them; with JOB_WORKERS=0 run them separately:
+
+    python -m src.job_worker --workers 2
+"""
+import argparse
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from src.config import JOB_WORKERS, JOB_POLL_S
+from src.job_queue import get_job_queue
+from src.llm_usage import usage_scope
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Stage and progress shown to the user once each node of the extract step has finished
+NODE_PROGRESS = {
+    "router": ("converting", 0.1),
+    "process_pdf_receipt": ("extracting", 0.5),
+    "extract_data": ("validating", 0.8),
+    "validate_data": ("validated", 0.9),
+}
+# What the insert step needs of the extract step's state
+APPROVAL_FIELDS = ("process_data", "duplicate", "result", "problems")
+
+
+def run_extract(queue, graph, job):
+    config = {"configurable": {"thread_id": f"{job['id']}:{job['attempts']}"}}
+    inputs = {"file_name": job["file_name"], "file_bytes": job["file_bytes"]}
+    with usage_scope("receipt"):
+        for update in graph.stream(inputs, config, stream_mode="updates"):
+            for node in update:
+                if node in NODE_PROGRESS:
+                    queue.report_progress(job["id"], *NODE_PROGRESS[node])
+    snapshot = graph.get_state(config)
+    values = snapshot.values
+    graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+    if values.get("duplicate"):
+        queue.complete(job["id"], "duplicate", values["result"])
+    elif not snapshot.next:
+        # Validated and saved without approval
+        if not values.get("saved"):
+            queue.hold_for_insert(job["id"], values["result"], {field: values.get(field) for field in APPROVAL_FIELDS})
+        check_saved(values)
+        queue.complete(job["id"], "done", values["result"])
+    else:
+        queue.await_approval(job["id"], values["result"], {field: values.get(field) for field in APPROVAL_FIELDS})
+
+
+def check_saved(values: dict):
+    if not values.get("saved"):
+        raise RuntimeError(values.get("save_error") or "The receipt was not saved")
+
+
+def approval_command(approved: bool):
+    from langgraph.types import Command
+    return Command(resume=approved)
+
+
+def run_insert(queue, graph, job):
+    config = {"configurable": {"thread_id": f"{job['id']}:{job['attempts']}:insert"}}
+    queue.report_progress(job["id"], "insert", 0.95)
+    # The user's approval replaces the automatic one: validate_data routes to human_approval
+    graph.update_state(config, {**job["state"], "auto_approved": False}, as_node="validate_data")
+    # Runs up to the human_approval interrupt, then answers it
+    graph.invoke(None, config)
+    graph.invoke(approval_command(True), config)
+    values = graph.get_state(config).values
+    graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+    check_saved(values)
+    queue.complete(job["id"], "done")
+
+
+def keep_lease(queue, job_id: str, stop: threading.Event):
+    while not stop.wait(queue.lease_s / 3):
+        queue.renew_lease(job_id)
+
+
+def run_job(queue, graph, job, worker: str):
+    """Runs one claimed step of a job; failures are recorded on the job for a retry."""
+    stop = threading.Event()
+    threading.Thread(target=keep_lease, args=(queue, job["id"], stop), daemon=True).start()
+    try:
+        with span(f"job.{job['step']}", job__id=job["id"], job__attempt=job["attempts"], job__worker=worker):
+            if job["step"] == "insert":
+                run_insert(queue, graph, job)
+            else:
+                run_extract(queue, graph, job)
+    except Exception as e:
+        logger.exception("Job %s failed", job["id"])
+        queue.fail(job["id"], f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+
+
+def worker_loop(worker: str = None, poll_s: float = JOB_POLL_S, stop: threading.Event = None, max_jobs=None):
+    """Claims and runs jobs until stopped (or after max_jobs steps)."""
+    from agents.invoice_agent import build_graph
+    queue = get_job_queue()
+    worker = worker or f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    queue.register_worker(worker)
+    graph = build_graph()
+    logger.info("Worker %s started", worker)
+    done = 0
+    while not (stop and stop.is_set()) and (max_jobs is None or done < max_jobs):
+        job = queue.claim(worker)
+        if job is None:
+            queue.worker_heartbeat(worker)
+            time.sleep(poll_s)
+            continue
+        start = time.perf_counter()
+        run_job(queue, graph, job, worker)
+        queue.worker_heartbeat(worker, busy_s=time.perf_counter() - start)
+        done += 1
+
+
+def _worker_main(poll_s: float):
+    from src.logging_utils import configure_logging
+    configure_logging()
+    try:
+        worker_loop(poll_s=poll_s)
+    except KeyboardInterrupt:
+        pass
+
+
+def start_workers(count: int = JOB_WORKERS, poll_s: float = JOB_POLL_S) -> list:
+    """
+    Starts worker processes (spawned, so no app state is copied) and stops them at exit. Not
+    daemonic: a worker converting a long PDF starts its own page conversion pool.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_worker_main, args=(poll_s,), name=f"receipt-worker-{n}")
+                 for n in range(count)]
+    for process in processes:
+        process.start()
+    atexit.register(stop_workers, processes)
+    return processes
+
+
+def stop_workers(processes, timeout: float = 10.0):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="worker processes")
+    parser.add_argument("--poll", type=float, default=JOB_POLL_S, help="seconds between polls of an empty queue")
+    args = parser.parse_args()
+    if get_job_queue() is None:
+        raise SystemExit("JOB_QUEUE_DB is empty: set it to the queue file the app uses")
+    processes = start_workers(args.workers, args.poll)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers(processes)
+
+
+if __name__ == "__main__":
+    main()
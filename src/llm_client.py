@@ -0,0 +1,172 @@
+import logging
+import random
+import threading
+import time
+from src.config import (OPENAI_API_KEY, MODEL, LLM_BACKEND, LLM_MAX_CONNECTIONS, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_S,
+                        LLM_MAX_RETRIES, LLM_RETRY_BASE_S, LLM_RETRY_MAX_S, LLM_BACKEND_EXTRACTION, LLM_BACKEND_SQL,
+                        LLM_BACKEND_REPORT, LOCAL_LLM_BASE_URL, LOCAL_LLM_MODEL, LOCAL_LLM_API_KEY,
+                        LOCAL_LLM_MAX_CONCURRENCY)
+from src.llm_usage import chat_completion, llm_call
+from src.tracing import usage_callback, set_attributes
+
+logger = logging.getLogger(__name__)
+
+# openai exceptions worth retrying; matched by name so this module doesn't depend on the SDK's classes
+RETRYABLE_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+RETRYABLE_STATUS = (408, 409, 429)
+
+BACKENDS = ("openai", "local", "fake")
+# Pipeline stages that can run on their own backend; other calls use LLM_BACKEND
+STAGE_BACKENDS = {
+    "extraction": LLM_BACKEND_EXTRACTION,
+    "sql": LLM_BACKEND_SQL,
+    "report": LLM_BACKEND_REPORT,
+}
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after_seconds(error: BaseException):
+    """The server's Retry-After hint in seconds, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    Process-wide access to the LLM. Both the raw chat-completions API (used by the report
+    agents) and the LangChain chat model (used by extraction and chat) share one HTTP connection
+    pool, a limit on concurrent requests and one retry policy: exponential backoff with full
+    jitter on rate limits, timeouts and server errors, honouring Retry-After.
+    """
+
+    def __init__(self, openai_client, chat_model, backend="openai", model=MODEL, max_concurrency=LLM_MAX_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES, retry_base_s=LLM_RETRY_BASE_S, retry_max_s=LLM_RETRY_MAX_S,
+                 sleep=time.sleep, rng=None):
+        self.openai_client = openai_client
+        self.chat_model = chat_model
+        self.backend = backend
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+
+    def backoff_seconds(self, retry: int, error=None) -> float:
+        delay = self._rng.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** retry))
+        hint = retry_after_seconds(error) if error is not None else None
+        return max(delay, min(hint, self.retry_max_s)) if hint else delay
+
+    def _with_retries(self, name: str, call):
+        for retry in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    return call(retry + 1)
+            except Exception as e:
+                if retry == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_seconds(retry, e)
+                logger.warning("%s failed (%s), retry %d/%d in %.1fs", name, type(e).__name__, retry + 1,
+                               self.max_retries, delay)
+                set_attributes(llm__retries=retry + 1)
+                self._sleep(delay)
+
+    def chat(self, name: str, messages, model=None, attempt=None, **kwargs) -> str:
+        """Sends OpenAI-style messages and returns the answer text."""
+        model = model or self.model
+
+        def call(try_number):
+            return chat_completion(self.openai_client, name, attempt=attempt if attempt is not None else try_number,
+                                   model=model, messages=messages, **kwargs)
+        response = self._with_retries(name, call)
+        return response.choices[0].message.content
+
+    def invoke(self, name: str, runnable, runnable_input, model=None):
+        """Invokes a LangChain runnable built on chat_model (e.g. prompt | chat_model) as one accounted call."""
+        model = model or self.model
+
+        def call(try_number):
+            with llm_call(name, model, attempt=try_number):
+                return runnable.invoke(runnable_input, config={"callbacks": [usage_callback()]})
+        return self._with_retries(name, call)
+
+
+def build_llm_client(backend=LLM_BACKEND, **fake_options) -> LLMClient:
+    """
+    Creates the client for a backend: 'openai', 'local' (an OpenAI-compatible server at
+    LOCAL_LLM_BASE_URL) or 'fake' (src.llm_fake, offline; fake_options go to FakeChatModel).
+    The OpenAI SDK client and ChatOpenAI share one pool of httpx connections.
+    """
+    if backend == "fake":
+        from src.llm_fake import FakeChatModel, FakeOpenAIClient
+        chat_model = FakeChatModel(**fake_options)
+        # Accounted as MODEL, the model it stands in for, so benchmarks show what the tokens would cost
+        return LLMClient(FakeOpenAIClient(chat_model), chat_model, backend="fake", model=MODEL)
+    if backend == "openai":
+        model, api_key, base_url, max_concurrency = MODEL, OPENAI_API_KEY, None, LLM_MAX_CONCURRENCY
+    elif backend == "local":
+        model, api_key, base_url = LOCAL_LLM_MODEL, LOCAL_LLM_API_KEY, LOCAL_LLM_BASE_URL
+        # A CPU model server works through one request at a time; more in flight only queue there
+        max_concurrency = LOCAL_LLM_MAX_CONCURRENCY
+    else:
+        raise ValueError(f"Unknown LLM backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    import httpx
+    import openai
+    from langchain_openai import ChatOpenAI
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        timeout=httpx.Timeout(LLM_TIMEOUT_S, connect=10.0),
+    )
+    # Retries are handled by LLMClient so both APIs follow the same policy
+    openai_client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+    chat_model = ChatOpenAI(model=model, api_key=api_key, base_url=base_url, temperature=0.1,
+                            http_client=http_client, max_retries=0)
+    return LLMClient(openai_client, chat_model, backend=backend, model=model, max_concurrency=max_concurrency)
+
+
+def stage_backend(stage=None) -> str:
+    """The backend configured for a stage ('extraction', 'sql', 'report'), defaulting to LLM_BACKEND."""
+    return STAGE_BACKENDS.get(stage) or LLM_BACKEND
+
+
+_clients = {}
+_overrides = {}
+_client_lock = threading.Lock()
+
+
+def get_llm_client(stage=None) -> LLMClient:
+    """
+    Returns the process-wide client for a stage's backend, creating it on first use. Stages on
+    the same backend share one client, so they also share its connections and concurrency limit.
+    """
+    with _client_lock:
+        client = _overrides.get(stage) or _overrides.get(None)
+        if client is None:
+            backend = stage_backend(stage)
+            client = _clients.get(backend)
+            if client is None:
+                client = _clients[backend] = build_llm_client(backend)
+        return client
+
+
+def set_llm_client(client, stage=None):
+    """
+    Replaces the client of one stage, or of every stage when stage is None (e.g. with a fake
+    backend in tests and benchmarks). Passing None as the client restores the configured backends.
+    """
+    with _client_lock:
+        if stage is None:
+            _overrides.clear()
+        _overrides[stage] = client
@@ -0,0 +1,89 @@
+"""Local stand-ins for the LLM: the 'fake' LLM backend used by tests and benchmarks."""
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+
+def default_responder(prompt: str) -> str:
+    """Answers every prompt with a fixed text; tests and benchmarks pass their own responder."""
+    return "This is a response from the fake LLM backend."
+
+
+def approx_tokens(text: str) -> int:
+    """Approximates the token count of a text (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with responder(prompt) after a configurable latency.
+    Latency is latency_s + per_token_s * prompt tokens + per_output_token_s * completion tokens,
+    plus uniform jitter, seeded for repeatability.
+    """
+
+    responder: Callable[[str], str] = default_responder
+    latency_s: float = 0.0
+    per_token_s: float = 0.0
+    per_output_token_s: float = 0.0
+    jitter_s: float = 0.0
+    seed: int = 0
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    rng: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        prompt = "\n".join(str(message.content) for message in messages)
+        prompt_tokens = approx_tokens(prompt)
+        text = self.responder(prompt)
+        completion_tokens = approx_tokens(text)
+        delay = self.latency_s + self.per_token_s * prompt_tokens + self.per_output_token_s * completion_tokens
+        if self.jitter_s:
+            delay += self.rng.uniform(0, self.jitter_s)
+        time.sleep(delay)
+
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        message = AIMessage(content=text, usage_metadata=usage,
+                            response_metadata={"token_usage": {"prompt_tokens": prompt_tokens,
+                                                               "completion_tokens": completion_tokens}})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema, **kwargs):
+        """Parses the responder's JSON answer into the schema, like the tool-calling models do."""
+        return self | RunnableLambda(lambda message: schema(**json.loads(message.content)))
+
+
+class FakeOpenAIClient:
+    """
+    Stand-in for openai.OpenAI exposing chat.completions.create, answered by a FakeChatModel
+    so the raw-client agents and the LangChain code share latency settings and token counters.
+    """
+
+    def __init__(self, model: FakeChatModel):
+        self.model = model
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=(), **kwargs):
+        prompt_tokens, completion_tokens = self.model.prompt_tokens, self.model.completion_tokens
+        reply = self.model.invoke([(message["role"], message["content"]) for message in messages])
+        usage = SimpleNamespace(prompt_tokens=self.model.prompt_tokens - prompt_tokens,
+                                completion_tokens=self.model.completion_tokens - completion_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply.content))],
+                               usage=usage)
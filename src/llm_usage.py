@@ -0,0 +1,223 @@
+import contextlib
+import contextvars
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from src.config import (MODEL, LLM_USAGE_DB, LLM_BUDGET_USD_RECEIPT, LLM_BUDGET_USD_CHAT, LLM_BUDGET_USD_REPORT,
+                        LLM_MAX_CALLS_REPORT)
+from src.tracing import span, record_token_usage
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (input, output); models missing here are counted with zero cost
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Budget (USD, max LLM calls) per scope kind; None means unlimited
+SCOPE_BUDGETS = {
+    "receipt": (LLM_BUDGET_USD_RECEIPT, None),
+    "chat": (LLM_BUDGET_USD_CHAT, None),
+    "report": (LLM_BUDGET_USD_REPORT, LLM_MAX_CALLS_REPORT),
+}
+
+_current_scope = contextvars.ContextVar("llm_usage_scope", default=None)
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised before an LLM call when its receipt, chat turn or report has used up its budget."""
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class UsageScope:
+    """Totals of the LLM calls made for one receipt, chat turn or report."""
+
+    def __init__(self, kind: str, budget_usd=None, max_calls=None):
+        self.kind = kind
+        self.scope_id = uuid.uuid4().hex
+        self.budget_usd = budget_usd or None
+        self.max_calls = max_calls or None
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    def check_budget(self):
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            raise BudgetExceededError(f"The {self.kind} reached its limit of {self.max_calls} LLM calls")
+        if self.budget_usd is not None and self.cost_usd >= self.budget_usd:
+            raise BudgetExceededError(
+                f"The {self.kind} used ${self.cost_usd:.4f} of its ${self.budget_usd:.2f} LLM budget"
+            )
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost_usd: float):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost_usd += cost_usd
+
+
+@contextlib.contextmanager
+def usage_scope(kind: str, budget_usd=None, max_calls=None):
+    """
+    Groups the LLM calls made inside the block (one receipt, chat turn or report) and enforces
+    its budget. Defaults come from SCOPE_BUDGETS; a scope opened inside another one reuses it.
+    """
+    active = _current_scope.get()
+    if active is not None:
+        yield active
+        return
+    default_budget, default_calls = SCOPE_BUDGETS.get(kind, (None, None))
+    scope = UsageScope(kind, budget_usd if budget_usd is not None else default_budget,
+                       max_calls if max_calls is not None else default_calls)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        logger.info("%s used %d LLM call(s), %d+%d tokens, $%.4f", kind, scope.calls, scope.prompt_tokens,
+                    scope.completion_tokens, scope.cost_usd)
+
+
+def current_scope():
+    return _current_scope.get()
+
+
+class UsageStore:
+    """SQLite table with one row per LLM call, queryable with plain SQL."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT NOT NULL,
+        scope_kind TEXT,
+        scope_id TEXT,
+        trace_id TEXT,
+        call_name TEXT NOT NULL,
+        model TEXT,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        latency_ms REAL NOT NULL,
+        cost_usd REAL NOT NULL,
+        status TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls (ts);
+    CREATE INDEX IF NOT EXISTS llm_calls_scope ON llm_calls (scope_id);
+    """
+
+    def __init__(self, path=LLM_USAGE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def record(self, **row):
+        row.setdefault("ts", datetime.datetime.now().isoformat(timespec="seconds"))
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        with self._lock:
+            connection = self._connect()
+            connection.execute(f"INSERT INTO llm_calls ({columns}) VALUES ({placeholders})", tuple(row.values()))
+            connection.commit()
+
+    def query(self, sql_query: str, params=()):
+        """Runs a SELECT on the usage table and returns a DataFrame."""
+        import pandas as pd
+        with self._lock:
+            return pd.read_sql_query(sql_query, self._connect(), params=params)
+
+    def summary(self, since: str, group_by: str = "scope_kind"):
+        """Calls, tokens, cost and latency since an ISO timestamp, grouped by a column."""
+        if group_by not in ("scope_kind", "call_name", "model"):
+            raise ValueError(f"Cannot group by {group_by}")
+        return self.query(
+            f"SELECT {group_by}, COUNT(DISTINCT scope_id) AS scopes, COUNT(*) AS calls, "
+            "SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, "
+            "ROUND(SUM(cost_usd), 4) AS cost_usd, "
+            "ROUND(SUM(cost_usd) / MAX(COUNT(DISTINCT scope_id), 1), 4) AS cost_per_scope_usd, "
+            "ROUND(AVG(latency_ms), 1) AS avg_latency_ms, SUM(status != 'ok') AS errors "
+            f"FROM llm_calls WHERE ts >= ? GROUP BY {group_by} ORDER BY cost_usd DESC",
+            params=(since,),
+        )
+
+
+_usage_store = None
+
+
+def get_usage_store():
+    """The process-wide usage store, or None when LLM_USAGE_DB is empty."""
+    global _usage_store
+    if _usage_store is None and LLM_USAGE_DB:
+        _usage_store = UsageStore()
+    return _usage_store
+
+
+def set_usage_store(store):
+    global _usage_store
+    _usage_store = store
+
+
+@contextlib.contextmanager
+def llm_call(name: str, model=MODEL, attempt=None):
+    """
+    Wraps one LLM call: checks the active scope's budget first, records it as an 'llm.<name>'
+    span and, once the tokens are known, adds tokens, latency and cost to the scope and the
+    usage table. Token counts are read from the span, where the call sites record them.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check_budget()
+    with span(f"llm.{name}", gen_ai__request__model=model, llm__attempt=attempt) as current:
+        status = "ok"
+        try:
+            yield current
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            prompt_tokens = current.attributes.get("gen_ai.usage.input_tokens", 0)
+            completion_tokens = current.attributes.get("gen_ai.usage.output_tokens", 0)
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
+            current.set_attribute("llm.cost_usd", cost)
+            if scope is not None:
+                scope.add(prompt_tokens, completion_tokens, cost)
+            store = get_usage_store()
+            if store is not None:
+                try:
+                    store.record(scope_kind=scope.kind if scope else None, scope_id=scope.scope_id if scope else None,
+                                 trace_id=current.trace_id, call_name=name, model=model,
+                                 prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                 latency_ms=current.duration_s * 1000, cost_usd=cost, status=status)
+                except Exception as e:
+                    # Accounting must never fail the call it observes
+                    logger.warning("Could not record LLM usage: %s", e)
+
+
+def chat_completion(client, name: str, attempt=None, **kwargs):
+    """Calls client.chat.completions.create through llm_call, recording the response's token usage."""
+    with llm_call(name, kwargs.get("model", MODEL), attempt) as current:
+        current.set_attribute("gen_ai.system", "openai")
+        response = client.chat.completions.create(**kwargs)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record_token_usage(current, getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+        return response
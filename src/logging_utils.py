@@ -0,0 +1,169 @@
+import atexit
+import collections
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from src.config import LOG_LEVEL, LOG_FORMAT, LOG_PATH, LOG_MAX_CHARS
+from src.tracing import current_span
+
+# Traces whose log volume is remembered for the diagnostics page
+MAX_TRACKED_TRACES = 1000
+
+_listener = None
+_queue = None
+_handler = None
+_configure_lock = threading.Lock()
+_bytes_lock = threading.Lock()
+_bytes_by_trace = collections.OrderedDict()
+_total_bytes = 0
+
+
+class Truncated:
+    """
+    Defers str() of a log argument until the record is formatted, which only happens when the
+    level is enabled, and cuts the text at max_chars.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value, max_chars=None):
+        self.value = value
+        self.max_chars = LOG_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self):
+        text = str(self.value)
+        if self.max_chars and len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} more chars]"
+        return text
+
+
+def truncate(value, max_chars=None) -> Truncated:
+    """Wraps a potentially large log payload (prompt, SQL, report, DataFrame)."""
+    return Truncated(value, max_chars)
+
+
+class TraceContextFilter(logging.Filter):
+    """Tags records with the active trace and span ids; runs in the thread that logs."""
+
+    def filter(self, record):
+        active = current_span()
+        record.trace_id = active.trace_id if active else None
+        record.span_id = active.span_id if active else None
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are. The stock QueueHandler formats the message in the
+    calling thread so the record can be pickled; the listener runs in this process, so message
+    formatting and truncation are left to it.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the level, logger, message and trace context."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ByteCountingHandler(logging.Handler):
+    """Formats and writes records on the listener thread and counts the bytes per trace."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def emit(self, record):
+        global _total_bytes
+        try:
+            line = self.format(record) + "\n"
+            self.stream.write(line)
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+            return
+        size = len(line.encode("utf-8"))
+        with _bytes_lock:
+            _total_bytes += size
+            trace_id = getattr(record, "trace_id", None)
+            if trace_id:
+                _bytes_by_trace[trace_id] = _bytes_by_trace.pop(trace_id, 0) + size
+                while len(_bytes_by_trace) > MAX_TRACKED_TRACES:
+                    _bytes_by_trace.popitem(last=False)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, path=LOG_PATH):
+    """
+    Routes the root logger through a queue to a listener thread that formats and writes the
+    records, so logging calls on hot paths only enqueue. Safe to call more than once.
+    """
+    global _listener, _queue, _handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+        stream = open(path, "a", encoding="utf-8") if path else sys.stderr
+        output = ByteCountingHandler(stream)
+        if fmt == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        _queue = queue.Queue()
+        _handler = DeferredQueueHandler(_queue)
+        _handler.addFilter(TraceContextFilter())
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Writes the queued records, stops the listener and detaches the queue handler."""
+    global _listener, _queue, _handler
+    with _configure_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        for output in _listener.handlers:
+            if output.stream is not sys.stderr:
+                output.stream.close()
+        _listener = _queue = _handler = None
+
+
+def flush_logs():
+    """Blocks until every queued record has been written."""
+    if _queue is not None:
+        _queue.join()
+
+
+def log_bytes(trace_id) -> int:
+    """Bytes of log output written for a trace so far (0 when unknown)."""
+    with _bytes_lock:
+        return _bytes_by_trace.get(trace_id, 0)
+
+
+def total_log_bytes() -> int:
+    with _bytes_lock:
+        return _total_bytes
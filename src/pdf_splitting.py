@@ -0,0 +1,114 @@
+"""
+Page-level PDF conversion and receipt splitting.
+
+Scanned batches hold several receipts in one PDF and long receipts span pages, so the pages of a
+PDF are converted separately (in a shared pool of worker processes when there are several) and
+their markdown is cut into one document per receipt. A receipt ends with its totals and access
+key; the store header (name and CNPJ line) that follows starts the next one.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.config import PDF_WORKERS
+from src.conversion_cache import cache_key, get_cached, put_cached
+from src.receipt_files import document_source, open_source, spooled_path
+from src.receipt_parser import ACCESS_KEY_PATTERN, CNPJ_PATTERN, TOTAL_PATTERN
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+_converter = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def page_converter():
+    """The docling converter of this process, created on first use so its models load once."""
+    global _converter
+    if _converter is None:
+        from docling.document_converter import DocumentConverter
+        _converter = DocumentConverter()
+    return _converter
+
+
+def count_pages(source) -> int:
+    import pypdfium2
+    document = pypdfium2.PdfDocument(open_source(source))
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def convert_page(source, page_no: int) -> str:
+    """The markdown of one page (1-based) of a PDF, given as a path or an upload."""
+    result = page_converter().convert(document_source(source), page_range=(page_no, page_no))
+    return result.document.export_to_markdown()
+
+
+def get_pool(workers: int = PDF_WORKERS) -> ProcessPoolExecutor:
+    """The shared conversion pool; spawned rather than forked so no model or thread state is copied."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def convert_pages(source, workers: int = PDF_WORKERS) -> list:
+    """The markdown of every page of a PDF (path or upload), converted in parallel when it has several pages."""
+    with span("docling.convert_pages", pdf__workers=workers) as current:
+        key = cache_key(source, "pdf:pages")
+        cached = get_cached(key)
+        if cached is not None:
+            current.set_attributes(document__pages=len(cached), conversion__cache_hit=True)
+            return cached
+        start = time.perf_counter()
+        pages = count_pages(source)
+        if pages <= 1 or workers <= 1:
+            markdown = [convert_page(source, page_no) for page_no in range(1, pages + 1)]
+        else:
+            # Workers open the file rather than each receiving a pickled copy of the upload
+            with spooled_path(source) as path:
+                markdown = list(get_pool(workers).map(convert_page, [path] * pages, range(1, pages + 1)))
+        elapsed = time.perf_counter() - start
+        current.set_attributes(document__pages=pages, document__markdown_chars=sum(map(len, markdown)),
+                               pdf__pages_per_sec=pages / elapsed if elapsed else 0.0, conversion__cache_hit=False)
+    put_cached(key, markdown)
+    return markdown
+
+
+def is_store_header(line: str) -> bool:
+    # The consumer's CNPJ can be printed in the footer of a receipt
+    return CNPJ_PATTERN.search(line) is not None and "CONSUMIDOR" not in line.upper()
+
+
+def split_receipts(pages) -> list:
+    """Cuts the markdown of consecutive pages into one markdown document per receipt."""
+    receipts, current, completed_at = [], [], None
+    for page in pages:
+        for line in page.splitlines():
+            if completed_at is not None and is_store_header(line):
+                # The store name is the last text line before the CNPJ line, after the previous receipt's end
+                start = max((i for i, text in enumerate(current) if text.strip()), default=len(current))
+                start = max(start, completed_at + 1)
+                receipts.append(current[:start])
+                current, completed_at = current[start:], None
+            current.append(line)
+            if ACCESS_KEY_PATTERN.search(line) or TOTAL_PATTERN.search(line):
+                completed_at = len(current) - 1
+    receipts.append(current)
+    documents = ["\n".join(lines).strip() for lines in receipts]
+    return [document for document in documents if document]
@@ -0,0 +1,194 @@
+"""
+Lookup table from receipt item descriptions to the product fields the LLM would otherwise be
+asked for (product, full_product_name, volume, category), learned from approved invoices rows.
+
+Descriptions are matched per store first, then across stores, then fuzzily through a trigram
+index so typos and other sizes of a product ('LTE ITALAC ZER0 1L', 'CERV BLUE MOON 600ML') still
+hit. The size is left out of the fuzzy comparison: the caller reads it from the description.
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from src.config import PRODUCT_MATCH_THRESHOLD, PRODUCT_DICTIONARY_RELOAD_S
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_FIELDS = ("product", "full_product_name", "volume", "category")
+SIZE_PATTERN = re.compile(r"\b\d+(?:[.,]\d+)?(?:ML|L|KG|G|UN)\b")
+
+
+def normalize_description(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().upper()
+    text = re.sub(r"(\d)\s+(ML|L|KG|G|UN)\b", r"\1\2", text)
+    return " ".join(re.sub(r"[^A-Z0-9,.]", " ", text).split())
+
+
+def without_size(key: str) -> str:
+    return " ".join(SIZE_PATTERN.sub(" ", key).split())
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductDictionary:
+    """
+    In-memory product lookup with hit counters. learn() adds approved rows; lookup() returns the
+    fields of the best match (the most frequent ones when a description was approved differently)
+    or None.
+    """
+
+    def __init__(self, match_threshold=PRODUCT_MATCH_THRESHOLD):
+        self.match_threshold = match_threshold
+        # description -> store -> Counter of field tuples
+        self._entries = defaultdict(lambda: defaultdict(Counter))
+        # Fuzzy index over the descriptions without their size
+        self._trigrams = defaultdict(set)
+        self._gram_counts = {}
+        self._variants = defaultdict(set)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.exact_hits + self.fuzzy_hits) / self.lookups if self.lookups else 0.0
+
+    def replace(self, rows):
+        """Replaces the learned descriptions with rows, keeping the hit counters."""
+        with self._lock:
+            self._entries.clear()
+            self._trigrams.clear()
+            self._gram_counts.clear()
+            self._variants.clear()
+        self.learn(rows)
+
+    def learn(self, rows):
+        """Adds (supermarket_name, description, product, full_product_name, volume, category[, count]) rows."""
+        with self._lock:
+            for row in rows:
+                store, description, *fields = row
+                count = fields.pop() if len(fields) > len(PRODUCT_FIELDS) else 1
+                if not description or not fields[0]:
+                    continue
+                key = normalize_description(description)
+                base = without_size(key)
+                if base not in self._variants:
+                    grams = trigrams(base)
+                    for gram in grams:
+                        self._trigrams[gram].add(base)
+                    self._gram_counts[base] = len(grams)
+                self._variants[base].add(key)
+                self._entries[key][store][tuple(fields)] += count
+
+    def _fields(self, key, store):
+        by_store = self._entries[key]
+        counts = by_store.get(store) or sum(by_store.values(), Counter())
+        return dict(zip(PRODUCT_FIELDS, counts.most_common(1)[0][0]))
+
+    def _closest(self, key):
+        grams = trigrams(without_size(key))
+        shared = Counter(candidate for gram in grams for candidate in self._trigrams.get(gram, ()))
+        best, best_score = None, 0.0
+        for candidate, overlap in shared.items():
+            score = overlap / (len(grams) + self._gram_counts[candidate] - overlap)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best_score < self.match_threshold:
+            return None
+        # Of the sizes approved for the product, the one approved most often
+        return max(self._variants[best],
+                   key=lambda variant: sum(sum(counts.values()) for counts in self._entries[variant].values()))
+
+    def lookup(self, description: str, store=None):
+        """The product fields for a description, or None when nothing close enough was approved yet."""
+        key = normalize_description(description)
+        with self._lock:
+            self.lookups += 1
+            if key in self._entries:
+                self.exact_hits += 1
+                return self._fields(key, store)
+            match = self._closest(key)
+            if match is None:
+                return None
+            self.fuzzy_hits += 1
+            return self._fields(match, store)
+
+
+def load_product_rows(engine):
+    """The distinct approved (store, description, product fields, count) rows of the invoices table."""
+    import sqlalchemy
+    query = sqlalchemy.text(
+        "SELECT supermarket_name, description, product, full_product_name, volume, category, COUNT(*) "
+        "FROM invoices GROUP BY supermarket_name, description, product, full_product_name, volume, category"
+    )
+    with engine.connect() as connection:
+        return connection.execute(query).fetchall()
+
+
+_dictionary = None
+_engine = None
+_stale = True
+_loaded_at = 0.0
+_dictionary_lock = threading.Lock()
+
+
+def get_product_dictionary() -> ProductDictionary:
+    """
+    The process-wide dictionary, loaded from the invoices table on first use, after
+    invalidate_product_dictionary() and every PRODUCT_DICTIONARY_RELOAD_S seconds.
+    """
+    global _dictionary, _engine, _stale, _loaded_at
+    with _dictionary_lock:
+        if _dictionary is None:
+            _dictionary = ProductDictionary()
+        if PRODUCT_DICTIONARY_RELOAD_S and time.monotonic() - _loaded_at >= PRODUCT_DICTIONARY_RELOAD_S:
+            _stale = True
+        if _stale:
+            try:
+                if _engine is None:
+                    from src.database import create_db_engine
+                    _engine = create_db_engine()
+                _dictionary.replace(load_product_rows(_engine))
+                logger.info("Product dictionary loaded with %d descriptions", len(_dictionary))
+            except Exception as e:
+                logger.warning("Could not load the product dictionary: %s", e)
+            _stale = False
+            _loaded_at = time.monotonic()
+        return _dictionary
+
+
+def learn_saved_rows(rows):
+    """
+    Adds the rows of a saved receipt (dicts keyed by INVOICE_COLUMNS) to the loaded dictionary,
+    so its products are reused without reloading the whole table. A dictionary not loaded yet
+    reads them from the table anyway.
+    """
+    with _dictionary_lock:
+        if _dictionary is None or _stale:
+            return
+        _dictionary.learn((row.get("supermarket_name"), row.get("description"),
+                           *(row.get(field) for field in PRODUCT_FIELDS)) for row in rows)
+
+
+def invalidate_product_dictionary():
+    """Marks the dictionary for reloading, e.g. after rows were removed or the schema changed."""
+    global _stale
+    _stale = True
+
+
+def set_product_dictionary(dictionary):
+    """Replaces the process-wide dictionary without loading it; None loads a new one on next use."""
+    global _dictionary, _stale, _loaded_at
+    with _dictionary_lock:
+        _dictionary = dictionary
+        _stale = dictionary is None
+        _loaded_at = time.monotonic()
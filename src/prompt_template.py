@@ -43,4 +43,31 @@ invoice_prompt = """
         
     Cupom fiscal:
     {receipt}
-    """
\ No newline at end of file
+    """
+
+# Local copy of the langchain-ai/sql-query-system-prompt hub prompt, used when the hub is unreachable
+sql_query_system_prompt = """
+Given an input question, create a syntactically correct {dialect} query to run to help find the answer. Unless the user specifies in his question a specific number of examples they wish to obtain, always limit your query to at most {top_k} results. You can order the results by a relevant column to return the most interesting examples in the database.
+
+Never query for all the columns from a specific table, only ask for a the few relevant columns given the question.
+
+Pay attention to use only the column names that you can see in the schema description. Be careful to not query for columns that do not exist. Also, pay attention to which column is in which table.
+
+Only use the following tables:
+{table_info}
+"""
+
+item_enrichment_prompt = """
+    Você receberá abaixo as descrições dos itens de um **cupom fiscal**, uma por linha e numeradas.
+    Para **cada item**, identifique:
+        - product: nome genérico, como Leite, Detergente, Frango, etc.
+        - full_product_name: nome genérico mais a marca, como Leite Italac, Detergente Ypê, Frango Sadia. Quando for produto natural, como alho, cebola, uva, manter apenas o nome.
+        - category: categoria do produto, como Laticínios, Bebidas, Hortifruti, Limpeza, Mercearia
+
+    **Regras obrigatórias para a resposta:**
+        - A saída deve ser **apenas uma lista JSON**, com um objeto por item e na mesma ordem dos itens, sem explicações e sem ```
+        - Exemplo: [{{"product": "Leite", "full_product_name": "Leite Italac", "category": "Laticínios"}}]
+
+    Itens:
+    {items}
+    """
@@ -0,0 +1,170 @@
+import os
+import re
+import threading
+import time
+import pandas as pd
+from src.config import (QUERY_ENGINE, DUCKDB_SOURCE, DUCKDB_PATH, DUCKDB_REFRESH_SECONDS, SNAPSHOT_PATH,
+                        QUERY_TIMEOUT_MS, QUERY_MAX_ROWS)
+from src.sql_guard import validate_select_query, run_readonly_query
+from src.tracing import span
+
+# PostgreSQL TO_CHAR patterns and their strftime equivalents, longest first
+TO_CHAR_PATTERNS = [
+    ("YYYY", "%Y"), ("Month", "%B"), ("month", "%B"), ("HH24", "%H"), ("Mon", "%b"), ("mon", "%b"),
+    ("Day", "%A"), ("YY", "%y"), ("MM", "%m"), ("DD", "%d"), ("MI", "%M"), ("SS", "%S"),
+]
+
+
+# The PostgreSQL column types the agents' SQL is written against. DuckDB decimals stop at 38
+# digits, so the 44-digit access keys stay VARCHAR and key literals in the SQL are quoted
+# (translate_postgres_sql); the pandas loaders' float32 amounts are cast back to exact decimals.
+INVOICE_TYPES = (
+    "CAST(invoice_id AS VARCHAR) AS invoice_id, CAST(datetime AS DATE) AS datetime, "
+    "CAST(supermarket_name AS VARCHAR) AS supermarket_name, CAST(unit AS VARCHAR) AS unit, "
+    "CAST(category AS VARCHAR) AS category, CAST(quantity AS DECIMAL(10,4)) AS quantity, "
+    "CAST(unitary_value AS DECIMAL(10,2)) AS unitary_value, CAST(total_value AS DECIMAL(10,2)) AS total_value"
+)
+# A bare 44-digit number: an access key compared with the invoice_id column
+ACCESS_KEY_LITERAL = re.compile(r"(?<![\w'.])(\d{44})(?![\w'.])")
+
+
+def _strftime_format(pg_format: str) -> str:
+    pattern = re.compile("|".join(re.escape(token) for token, _ in TO_CHAR_PATTERNS))
+    mapping = dict(TO_CHAR_PATTERNS)
+    return pattern.sub(lambda match: mapping[match.group(0)], pg_format)
+
+
+def translate_postgres_sql(sql_query: str) -> str:
+    """
+    Rewrites the PostgreSQL constructs the agents generate that DuckDB does not accept or
+    reads differently: TO_CHAR, and access keys written as numbers (DuckDB would compare them
+    as doubles). EXTRACT, DATE_TRUNC, INTERVAL, ILIKE, :: casts and CURRENT_DATE work unchanged.
+    """
+    sql_query = re.sub(
+        r"\bTO_CHAR\s*\((.+?),\s*'([^']*)'\s*\)",
+        lambda match: f"strftime({match.group(1)}, '{_strftime_format(match.group(2))}')",
+        sql_query,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+    return ACCESS_KEY_LITERAL.sub(r"'\1'", sql_query)
+
+
+class DuckDBEngine:
+    """
+    Local DuckDB copy of the invoices history, fed from the Parquet snapshot or from PostgreSQL.
+    The parquet source is re-attached whenever a new snapshot is exported; the postgres source
+    is reloaded every DUCKDB_REFRESH_SECONDS.
+    """
+
+    def __init__(self, source=DUCKDB_SOURCE, database=DUCKDB_PATH, snapshot_path=SNAPSHOT_PATH,
+                 refresh_seconds=DUCKDB_REFRESH_SECONDS):
+        import duckdb
+
+        self.source = source
+        self.snapshot_path = os.path.abspath(snapshot_path)
+        self.refresh_seconds = refresh_seconds
+        self.connection = duckdb.connect(database)
+        # The agents' SQL must not read local files (read_text('.env'), read_csv, glob, ...): only
+        # the snapshot stays readable, and the settings are locked so SQL cannot lift this
+        allowed = [self.snapshot_path] if source == "parquet" else []
+        self.connection.execute("SET allowed_directories = $1", [allowed])
+        self.connection.execute("SET enable_external_access = false")
+        self.connection.execute("SET lock_configuration = true")
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        if self.source == "parquet":
+            from src.database import snapshot_info
+            info = snapshot_info(self.snapshot_path)
+            if info is None:
+                raise RuntimeError(f"No Parquet snapshot found at {self.snapshot_path}")
+            return info["exported_at"]
+        if self._version is None or time.monotonic() - self._version > self.refresh_seconds:
+            return time.monotonic()
+        return self._version
+
+    def refresh(self, force=False):
+        """Makes sure the invoices relation reflects the current source data."""
+        with self._lock:
+            version = self._current_version()
+            if not force and version == self._version:
+                return
+            if self.source == "parquet":
+                files = f"{self.snapshot_path}/**/*.parquet".replace("'", "''")
+                self.connection.execute(
+                    f"CREATE OR REPLACE VIEW invoices AS SELECT * EXCLUDE (month) REPLACE ({INVOICE_TYPES}) "
+                    f"FROM read_parquet('{files}', hive_partitioning = true)"
+                )
+            else:
+                from src.database import create_db_engine, load_invoice_data
+                frame = load_invoice_data(create_db_engine())
+                self.connection.register("invoices_frame", frame)
+                self.connection.execute(
+                    f"CREATE OR REPLACE TABLE invoices AS SELECT * REPLACE ({INVOICE_TYPES}) FROM invoices_frame"
+                )
+                self.connection.unregister("invoices_frame")
+            self._version = version
+
+    def query(self, sql_query: str, timeout_ms=QUERY_TIMEOUT_MS, max_rows=QUERY_MAX_ROWS) -> pd.DataFrame:
+        """Runs validated, translated SQL and returns at most max_rows rows."""
+        sql_query = translate_postgres_sql(validate_select_query(sql_query))
+        self.refresh()
+        cursor = self.connection.cursor()
+        timer = threading.Timer(timeout_ms / 1000, cursor.interrupt)
+        timer.start()
+        try:
+            result = cursor.execute(sql_query)
+            columns = [column[0] for column in result.description]
+            rows = result.fetchmany(max_rows + 1)
+        finally:
+            timer.cancel()
+            cursor.close()
+        df = pd.DataFrame(rows[:max_rows], columns=columns)
+        df.attrs["plan_cost"] = None
+        df.attrs["truncated"] = len(rows) > max_rows
+        return df
+
+
+_duckdb_engine = None
+
+
+def get_duckdb_engine() -> DuckDBEngine:
+    """Returns the process-wide DuckDB engine."""
+    global _duckdb_engine
+    if _duckdb_engine is None:
+        _duckdb_engine = DuckDBEngine()
+    return _duckdb_engine
+
+
+def run_query(engine, sql_query: str) -> pd.DataFrame:
+    """Runs agent-generated SQL on the engine selected by QUERY_ENGINE."""
+    system = "duckdb" if QUERY_ENGINE == "duckdb" else engine.dialect.name
+    with span("db.query", db__system=system, db__statement=sql_query) as current:
+        if QUERY_ENGINE == "duckdb":
+            df = get_duckdb_engine().query(sql_query)
+        else:
+            df = run_readonly_query(engine, sql_query)
+        current.set_attributes(db__rows=len(df), db__truncated=bool(df.attrs.get("truncated")),
+                               db__plan_cost=df.attrs.get("plan_cost"))
+        return df
+
+
+def group_sum(df: pd.DataFrame, group_cols, value_col: str) -> pd.DataFrame:
+    """Sums value_col per group, in DuckDB when QUERY_ENGINE is 'duckdb' and in pandas otherwise."""
+    group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+    if QUERY_ENGINE != "duckdb":
+        return df.groupby(group_cols, observed=True)[value_col].sum().reset_index()
+
+    frame = df[group_cols + [value_col]]
+    keys = ", ".join(f'"{column}"' for column in group_cols)
+    # A cursor of the engine's database: registered frames stay local to it, without starting
+    # a new DuckDB instance per call
+    connection = get_duckdb_engine().connection.cursor()
+    try:
+        connection.register("frame", frame)
+        return connection.execute(
+            f'SELECT {keys}, SUM("{value_col}") AS "{value_col}" FROM frame GROUP BY {keys} ORDER BY {keys}'
+        ).df()
+    finally:
+        connection.close()
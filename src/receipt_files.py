@@ -0,0 +1,57 @@
+"""
+Receipt files given either as a path or as an upload held in memory.
+
+Uploads are processed from their bytes: docling reads them as a DocumentStream, pypdfium2 and
+PIL from a buffer. Only the page conversion pool needs a file (so the document is not pickled to
+every worker), and it gets a uniquely named temporary copy that is removed afterwards.
+"""
+import contextlib
+import io
+import os
+import tempfile
+from typing import NamedTuple
+
+
+class Upload(NamedTuple):
+    """An uploaded receipt: its original file name (for the type) and its content."""
+    name: str
+    data: bytes
+
+
+def source_name(source) -> str:
+    return source.name if isinstance(source, Upload) else source
+
+
+def read_bytes(source) -> bytes:
+    if isinstance(source, Upload):
+        return source.data
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def open_source(source):
+    """What PIL and pypdfium2 open: the path, or a buffer over the upload."""
+    return io.BytesIO(source.data) if isinstance(source, Upload) else source
+
+
+def document_source(source):
+    """What docling converts: the path, or a new DocumentStream over the upload (streams are read once)."""
+    if not isinstance(source, Upload):
+        return source
+    from docling.datamodel.base_models import DocumentStream
+    return DocumentStream(name=os.path.basename(source.name), stream=io.BytesIO(source.data))
+
+
+@contextlib.contextmanager
+def spooled_path(source):
+    """A path to the file: the source itself, or a temporary copy of an upload, unique per call."""
+    if not isinstance(source, Upload):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(prefix="receipt_", suffix=os.path.splitext(source.name)[1].lower())
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source.data)
+        yield path
+    finally:
+        os.remove(path)
@@ -0,0 +1,198 @@
+"""
+Identifying an NFC-e receipt before converting it.
+
+Every NFC-e carries a 44-digit access key, printed under the items and encoded in its QR code
+(the consultation URL's chNFe or p parameter). The key is read from the PDF text layer, which
+takes milliseconds, or decoded from the QR code of a scanned page or photo when OpenCV is
+installed. With the key, a receipt already in the invoices table is skipped, and one whose
+authorized XML is in XML_DROP_DIR is read from the XML, both without docling or the extraction
+prompt.
+"""
+import datetime
+import functools
+import logging
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from decimal import Decimal
+from src.config import XML_DROP_DIR
+from src.receipt_files import open_source
+from src.receipt_parser import ACCESS_KEY_PATTERN, parse_volume
+
+logger = logging.getLogger(__name__)
+
+QR_KEY_PATTERN = re.compile(r"(?:chNFe=|[?&]p=)(\d{44})")
+XML_KEY_PATTERN = re.compile(rb'Id="NFe(\d{44})"')
+NFE_NAMESPACE = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
+# Pages searched for a QR code, and the render scale (72 dpi units)
+QR_PAGES = 2
+QR_RENDER_SCALE = 2.0
+
+
+def check_digit(key43: str) -> int:
+    """The modulo 11 check digit of the first 43 digits of an access key."""
+    total = sum(int(digit) * (2 + i % 8) for i, digit in enumerate(reversed(key43)))
+    remainder = total % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def is_valid_access_key(key: str) -> bool:
+    return len(key) == 44 and key.isdigit() and check_digit(key[:43]) == int(key[43])
+
+
+def keys_in_text(text: str) -> list:
+    """The valid access keys printed in a text or in QR URLs inside it, in order of appearance."""
+    found = [re.sub(r"\s", "", match) for match in ACCESS_KEY_PATTERN.findall(text)]
+    found += QR_KEY_PATTERN.findall(text)
+    return [key for key in dict.fromkeys(found) if is_valid_access_key(key)]
+
+
+def decode_qr_keys(image) -> list:
+    """The access keys in the QR codes of a PIL image; empty when OpenCV is not installed."""
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return []
+    gray = np.asarray(image.convert("L"))
+    ok, texts, _, _ = cv2.QRCodeDetector().detectAndDecodeMulti(gray)
+    return keys_in_text(" ".join(texts)) if ok else []
+
+
+def read_access_keys(source) -> list:
+    """
+    The access keys of a PDF or photo (path or upload), read without converting it: the PDF text
+    layer first, then the QR codes of the first pages (or of the photo).
+    """
+    from src.image_receipts import is_image
+    if is_image(source):
+        from PIL import Image
+        with Image.open(open_source(source)) as image:
+            image.thumbnail((2000, 2000))
+            return decode_qr_keys(image)
+
+    import pypdfium2
+    document = pypdfium2.PdfDocument(open_source(source))
+    try:
+        text = "\n".join(page.get_textpage().get_text_range() for page in document)
+        keys = keys_in_text(text)
+        if not keys:
+            for page in list(document)[:QR_PAGES]:
+                keys += decode_qr_keys(page.render(scale=QR_RENDER_SCALE).to_pil())
+        return list(dict.fromkeys(keys))
+    finally:
+        document.close()
+
+
+@functools.cache
+def get_engine():
+    from src.database import create_db_engine
+    return create_db_engine()
+
+
+def stored_invoice_ids(keys, engine=None) -> set:
+    """The keys among the given ones that are already stored (in the receipts table)."""
+    import sqlalchemy
+    keys = list(keys)
+    if not keys:
+        return set()
+    engine = engine or get_engine()
+    if engine.dialect.name == "postgresql":
+        # NUMERIC(44,0): compare as exact decimals
+        query = sqlalchemy.text("SELECT invoice_id FROM receipts WHERE invoice_id IN :keys").bindparams(
+            sqlalchemy.bindparam("keys", expanding=True))
+        params = {"keys": [Decimal(key) for key in keys]}
+    else:
+        query = sqlalchemy.text("SELECT CAST(invoice_id AS TEXT) FROM receipts "
+                                "WHERE CAST(invoice_id AS TEXT) IN :keys").bindparams(
+            sqlalchemy.bindparam("keys", expanding=True))
+        params = {"keys": keys}
+    with engine.connect() as connection:
+        return {str(row[0]) for row in connection.execute(query, params)}
+
+
+_xml_index = {}
+_xml_index_lock = threading.Lock()
+
+
+def xml_index(folder: str) -> dict:
+    """Access key -> XML file for the folder, rebuilt when the folder changes."""
+    mtime = os.stat(folder).st_mtime_ns
+    with _xml_index_lock:
+        cached = _xml_index.get(folder)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    index = {}
+    for name in os.listdir(folder):
+        if not name.lower().endswith(".xml"):
+            continue
+        path = os.path.join(folder, name)
+        with open(path, "rb") as f:
+            match = XML_KEY_PATTERN.search(f.read(4096))
+        if match:
+            index[match.group(1).decode()] = path
+    with _xml_index_lock:
+        _xml_index[folder] = (mtime, index)
+    return index
+
+
+def find_nfe_xml(key: str, folder: str = XML_DROP_DIR):
+    """The path of the receipt's XML in the drop folder, or None."""
+    if not folder or not os.path.isdir(folder):
+        return None
+    for name in (f"{key}.xml", f"{key}-procNFe.xml", f"{key}-nfe.xml"):
+        if os.path.isfile(os.path.join(folder, name)):
+            return os.path.join(folder, name)
+    return xml_index(folder).get(key)
+
+
+def _quantity(text: str) -> Decimal:
+    """A quantity without the trailing zeros of the XML's fixed decimals ('2.0000' -> 2, '0.7340' -> 0.734)."""
+    value = Decimal(text)
+    return value.quantize(Decimal(1)) if value == value.to_integral_value() else value.normalize()
+
+
+def parse_nfe_xml(path: str):
+    """
+    Reads an NFC-e XML (nfeProc or NFe) into the same shape as parse_receipt: layout, invoice_id,
+    supermarket_name, datetime (ISO date) and items. Returns None when it is not an NFC-e and
+    raises ValueError when it is malformed or an item lacks a required tag.
+    """
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError as e:
+        raise ValueError(f"Malformed XML: {e}") from e
+    info = root.find(".//nfe:infNFe", NFE_NAMESPACE)
+    if info is None or not info.get("Id", "").startswith("NFe"):
+        return None
+
+    def text(element, tag):
+        found = element.find(f"nfe:{tag}", NFE_NAMESPACE)
+        return found.text.strip() if found is not None and found.text else None
+
+    emit, ide = info.find("nfe:emit", NFE_NAMESPACE), info.find("nfe:ide", NFE_NAMESPACE)
+    emitted = text(ide, "dhEmi") or text(ide, "dEmi") if ide is not None else None
+    items = []
+    for n, product in enumerate(info.findall("nfe:det/nfe:prod", NFE_NAMESPACE), 1):
+        missing = [tag for tag in ("xProd", "qCom", "vUnCom", "vProd") if text(product, tag) is None]
+        if missing:
+            raise ValueError(f"Item {n} has no {', '.join(missing)}")
+        description = " ".join((text(product, "xProd") or "").split())
+        items.append({
+            "description": description,
+            "quantity": _quantity(text(product, "qCom")),
+            "unit": text(product, "uCom"),
+            "unitary_value": Decimal(text(product, "vUnCom")).quantize(Decimal("0.01")),
+            "total_value": Decimal(text(product, "vProd")),
+            "volume": parse_volume(description),
+        })
+    if emit is None or not emitted or not items:
+        return None
+    return {
+        "layout": "xml",
+        "invoice_id": info.get("Id")[3:],
+        "supermarket_name": text(emit, "xNome"),
+        "datetime": datetime.date.fromisoformat(emitted[:10]).isoformat(),
+        "items": items,
+    }
@@ -0,0 +1,200 @@
+"""
+Deterministic parser for the docling markdown of NFC-e receipts.
+
+NFC-e receipts print their items in one of a few fixed table layouts. When the item table
+matches a known layout and the amounts add up, the line items, access key, store and date are
+read directly from the markdown and only the enrichment fields (product, full product name,
+category) are left to the LLM. Anything else returns None so the caller falls back to the
+full LLM extraction.
+
+Receipts in other layouts can still be split into lines: split_receipt_lines separates item lines
+(description, quantity, unit and prices on one line) from the rest, so known items can be
+resolved locally and only the unknown lines sent to the LLM.
+"""
+import datetime
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+# Item table layouts: the normalized header of each column mapped to the field it holds, and
+# optionally the store CNPJs the layout is limited to (None matches any store)
+LAYOUTS = [
+    {
+        "name": "nfce_codigo",
+        "columns": {"codigo": "code", "descricao": "description", "qtde": "quantity", "un": "unit",
+                    "vl unit": "unitary_value", "vl total": "total_value"},
+        "stores": None,
+    },
+    {
+        "name": "nfce_item_cod",
+        "columns": {"item": "item", "cod": "code", "descricao": "description", "qtd": "quantity", "un": "unit",
+                    "vl unit": "unitary_value", "vl total": "total_value"},
+        "stores": None,
+    },
+    {
+        "name": "nfce_vl_item",
+        "columns": {"codigo": "code", "descricao": "description", "qtd": "quantity", "un": "unit",
+                    "vl un": "unitary_value", "vl item": "total_value"},
+        "stores": None,
+    },
+]
+
+ACCESS_KEY_PATTERN = re.compile(r"(?<!\d)\d{4}(?:\s?\d{4}){10}(?!\d)")
+CNPJ_PATTERN = re.compile(r"CNPJ:?\s*(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})")
+DATE_PATTERN = re.compile(r"Emiss[ãa]o:?\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE)
+TOTAL_PATTERN = re.compile(r"Valor total R\$:?\s*([\d.]+,\d{2})", re.IGNORECASE)
+# An item on one line: [item no.] [code] description quantity unit [X] unit price total
+ITEM_LINE_PATTERN = re.compile(
+    r"^(?:\d{1,3}\s+)?(?:\d{6,14}\s+)?(?P<description>\S.*?)\s+(?P<quantity>\d+(?:,\d{1,3})?)\s+"
+    r"(?P<unit>[A-Za-z]{1,3})\s+(?:X\s+)?(?P<unitary_value>[\d.]*\d,\d{2})\s+(?P<total_value>[\d.]*\d,\d{2})$"
+)
+VOLUME_PATTERN = re.compile(r"(?<![\w,.])(\d+(?:[.,]\d+)?)\s?(ML|L|KG|G|UN)\b")
+# Rounding allowed between quantity x unit price and the item total, and between the items and the receipt total
+ITEM_TOLERANCE = Decimal("0.02")
+TOTAL_TOLERANCE = Decimal("0.05")
+
+
+def normalize_header(cell: str) -> str:
+    text = unicodedata.normalize("NFKD", cell).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"r\$|[^a-z ]", " ", text)
+    return " ".join(text.split())
+
+
+def parse_brl(text: str):
+    """Parses a Brazilian number such as '1.234,56' or '0,734'; returns None if it is not one."""
+    text = text.strip().replace(".", "").replace(",", ".") if "," in text else text.strip()
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def parse_volume(description: str):
+    """The package size in the description (e.g. 1L, 500ML, 1KG), or None."""
+    match = VOLUME_PATTERN.search(description.upper())
+    return f"{match.group(1)}{match.group(2)}" if match else None
+
+
+def markdown_tables(markdown: str):
+    """Yields (header cells, row cells) for every markdown table in the text."""
+    header, rows = None, []
+    for line in markdown.splitlines() + [""]:
+        line = line.strip()
+        if line.startswith("|") and line.endswith("|"):
+            cells = [cell.strip() for cell in line[1:-1].split("|")]
+            if header is None:
+                header = cells
+            elif not all(re.fullmatch(r":?-+:?", cell) for cell in cells):
+                rows.append(cells)
+            continue
+        if header is not None:
+            yield header, rows
+        header, rows = None, []
+
+
+def match_layout(header, cnpj=None):
+    normalized = [normalize_header(cell) for cell in header]
+    for layout in LAYOUTS:
+        if layout["stores"] is not None and cnpj not in layout["stores"]:
+            continue
+        if normalized == list(layout["columns"]):
+            return layout
+    return None
+
+
+def parse_store(markdown: str):
+    """The store name: the last text line before the CNPJ line."""
+    name = None
+    for line in markdown.splitlines():
+        if "CNPJ" in line:
+            return name
+        text = line.strip().strip("#|").strip()
+        if text:
+            name = text
+    return None
+
+
+def make_item(values: dict):
+    """An item from its description, quantity, unit and price texts, or None if they do not add up."""
+    quantity = parse_brl(values["quantity"])
+    unitary_value = parse_brl(values["unitary_value"])
+    total_value = parse_brl(values["total_value"])
+    description = " ".join(values["description"].split())
+    if None in (quantity, unitary_value, total_value) or not description:
+        return None
+    if abs(quantity * unitary_value - total_value) > ITEM_TOLERANCE:
+        return None
+    return {
+        "description": description,
+        "quantity": quantity,
+        "unit": values["unit"].strip(),
+        "unitary_value": unitary_value,
+        "total_value": total_value,
+        "volume": parse_volume(description),
+    }
+
+
+def parse_items(layout, rows):
+    fields = list(layout["columns"].values())
+    items = []
+    for cells in rows:
+        item = make_item(dict(zip(fields, cells))) if len(cells) == len(fields) else None
+        if item is None:
+            return None
+        items.append(item)
+    return items
+
+
+def parse_item_line(line: str):
+    """The item on a single receipt line (plain text or a table row), or None."""
+    text = " ".join(line.strip().strip("|").replace("|", " ").split())
+    match = ITEM_LINE_PATTERN.match(text)
+    return make_item(match.groupdict()) if match else None
+
+
+def parse_header(markdown: str) -> dict:
+    """The access key, store and ISO emission date of a receipt; each is None when not found."""
+    keys = {re.sub(r"\s", "", match) for match in ACCESS_KEY_PATTERN.findall(markdown)}
+    date = DATE_PATTERN.search(markdown)
+    return {
+        "invoice_id": keys.pop() if len(keys) == 1 else None,
+        "supermarket_name": parse_store(markdown),
+        "datetime": datetime.datetime.strptime(date.group(1), "%d/%m/%Y").date().isoformat() if date else None,
+    }
+
+
+def split_receipt_lines(markdown: str):
+    """Splits a receipt into its other lines (header, totals, footer) and (line, item) pairs for item lines."""
+    other_lines, item_lines = [], []
+    for line in markdown.splitlines():
+        item = parse_item_line(line)
+        if item is not None:
+            item_lines.append((line, item))
+        elif not re.fullmatch(r"\|?[\s:|-]*", line):
+            other_lines.append(line)
+    return other_lines, item_lines
+
+
+def parse_receipt(markdown: str):
+    """
+    Parses a receipt with a known item layout. Returns a dict with the layout name, invoice_id,
+    supermarket_name, datetime (ISO date) and items, or None when the layout is unknown, a field
+    is missing or the amounts do not add up.
+    """
+    fields = parse_header(markdown)
+    cnpj = CNPJ_PATTERN.search(markdown)
+    if None in fields.values():
+        return None
+
+    for header, rows in markdown_tables(markdown):
+        layout = match_layout(header, cnpj.group(1) if cnpj else None)
+        if layout is None:
+            continue
+        items = parse_items(layout, rows)
+        if not items:
+            return None
+        total = TOTAL_PATTERN.search(markdown)
+        if total and abs(sum(item["total_value"] for item in items) - parse_brl(total.group(1))) > TOTAL_TOLERANCE:
+            return None
+        return {"layout": layout["name"], **fields, "items": items}
+    return None
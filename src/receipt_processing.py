@@ -1,19 +1,231 @@
-from docling.document_converter import DocumentConverter
+import contextvars
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from langchain.prompts import PromptTemplate
-from src.config import llm
-from src.prompt_template import invoice_prompt
-def process_pdf(path: str) -> str:
-    """Convert PDF receipt to markdown."""
-    converter = DocumentConverter()
-    result = converter.convert(path)
-    return result.document.export_to_markdown()
-
-def extract_receipt_data(receipt_text: str) -> str:
+from src.config import (RECEIPT_FAST_PATH, PRODUCT_DICTIONARY, PARTIAL_EXTRACTION, LLM_MAX_CONCURRENCY,
+                        RECEIPT_KEY_LOOKUP, XML_DROP_DIR)
+from src.prompt_template import invoice_prompt, item_enrichment_prompt
+from src.tracing import span, set_attributes
+from src.llm_client import get_llm_client
+from src.receipt_parser import parse_receipt, parse_header, split_receipt_lines
+from src.invoice_rows import build_insert_query, parse_insert_query
+from src.product_dictionary import get_product_dictionary
+from src.pdf_splitting import convert_pages, page_converter, split_receipts
+from src.image_receipts import is_image, process_image
+from src.receipt_files import document_source, source_name
+from src.receipt_identity import read_access_keys, stored_invoice_ids, find_nfe_xml, parse_nfe_xml
+
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_FIELDS = ("product", "full_product_name", "category")
+
+
+def process_pdf(source) -> str:
+    """Convert PDF receipt (path or upload) to markdown."""
+    converter = page_converter()
+    with span("docling.convert") as current:
+        result = converter.convert(document_source(source))
+        markdown = result.document.export_to_markdown()
+        current.set_attributes(document__pages=len(getattr(result.document, "pages", None) or {}),
+                               document__markdown_chars=len(markdown))
+    return markdown
+
+def process_pdf_receipts(source) -> list:
+    """
+    Convert a PDF page by page (or OCR a receipt photo), given as a path or an in-memory upload,
+    and return the markdown of each receipt in it.
+    """
+    pages = [process_image(source)] if is_image(source) else convert_pages(source)
+    receipts = split_receipts(pages)
+    set_attributes(document__pages=len(pages), document__receipts=len(receipts))
+    return receipts
+
+def enrich_items(descriptions):
+    """Ask the LLM for product, full_product_name and category of each item; None if the answer is unusable."""
+    template = PromptTemplate(template=item_enrichment_prompt)
+    client = get_llm_client("extraction")
+    items = "\n".join(f"{n}. {description}" for n, description in enumerate(descriptions, 1))
+    response = client.invoke("enrich_items", template | client.chat_model, {"items": items})
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", response.content.strip())
+    try:
+        enriched = json.loads(text)
+    except ValueError:
+        logger.warning("Item enrichment did not return JSON")
+        return None
+    if (not isinstance(enriched, list) or len(enriched) != len(descriptions)
+            or not all(isinstance(item, dict) and all(item.get(f) for f in ENRICHMENT_FIELDS) for item in enriched)):
+        logger.warning("Item enrichment returned %s for %d items", type(enriched).__name__, len(descriptions))
+        return None
+    return enriched
+
+def lookup_products(items, store):
+    """Product fields per item from the product dictionary, None for descriptions not approved before."""
+    if not PRODUCT_DICTIONARY:
+        return [None] * len(items)
+    dictionary = get_product_dictionary()
+    known = [dictionary.lookup(item["description"], store) for item in items]
+    set_attributes(products__lookups=len(items), products__hits=sum(fields is not None for fields in known))
+    return known
+
+def item_row(receipt_fields, item, fields):
+    """An invoices row for a parsed item and its product fields."""
+    # The size printed in the description wins over the one of a similar approved product
+    return {**receipt_fields, **item, **{field: fields[field] for field in ENRICHMENT_FIELDS},
+            "volume": item["volume"] or fields.get("volume")}
+
+def extract_partial(receipt_text: str):
+    """
+    Extraction for receipts without a known layout: item lines already in the product dictionary
+    become rows locally and the LLM only sees the other lines plus the unknown items. Returns the
+    INSERT query, or None when no item line is known and the full prompt should be used.
+    """
+    other_lines, item_lines = split_receipt_lines(receipt_text)
+    header = parse_header(receipt_text)
+    if not item_lines or not PRODUCT_DICTIONARY:
+        return None
+    known = lookup_products([item for _, item in item_lines], header["supermarket_name"])
+    if not any(known):
+        return None
+    unknown_lines = [line for (line, _), fields in zip(item_lines, known) if fields is None]
+
+    llm_rows = []
+    if unknown_lines or None in header.values():
+        template = PromptTemplate(template=invoice_prompt)
+        client = get_llm_client("extraction")
+        # Item lines are kept in receipt order, after the header lines
+        kept = set(other_lines) | set(unknown_lines)
+        prompt_lines = [line for line in receipt_text.splitlines() if line in kept]
+        response = client.invoke("extract_receipt_data", template | client.chat_model,
+                                 {"receipt": "\n".join(prompt_lines)})
+        try:
+            llm_rows = parse_insert_query(response.content)
+        except ValueError as e:
+            logger.warning("Partial extraction returned an unusable INSERT: %s", e)
+            return None
+        if unknown_lines and len(llm_rows) != len(unknown_lines):
+            logger.warning("Partial extraction returned %d rows for %d item lines", len(llm_rows), len(unknown_lines))
+            return None
+
+    receipt_fields = {key: header[key] or (llm_rows[0][key] if llm_rows else None) for key in header}
+    if None in receipt_fields.values():
+        return None
+    # The LLM rows follow the unknown lines in order
+    extracted = iter(llm_rows if unknown_lines else [])
+    rows = [item_row(receipt_fields, item, fields) if fields else {**next(extracted), **receipt_fields}
+            for (_, item), fields in zip(item_lines, known)]
+    set_attributes(extraction__path="partial", extraction__items=len(rows), extraction__llm_items=len(unknown_lines))
+    return build_insert_query(rows)
+
+def rows_from_parsed(parsed, path: str = "parser"):
+    """
+    The INSERT query of a receipt read without the extraction prompt (known layout or XML), with the
+    product fields from the dictionary or the enrichment prompt; None if enrichment fails.
+    """
+    items = parsed["items"]
+    known = lookup_products(items, parsed["supermarket_name"])
+    unseen = list(dict.fromkeys(item["description"] for item, fields in zip(items, known) if fields is None))
+    enriched = enrich_items(unseen) if unseen else []
+    if enriched is None:
+        return None
+    by_description = dict(zip(unseen, enriched))
+    set_attributes(extraction__path=path, extraction__layout=parsed["layout"], extraction__items=len(items))
+    receipt_fields = {key: parsed[key] for key in ("invoice_id", "supermarket_name", "datetime")}
+    rows = [item_row(receipt_fields, item, fields or by_description[item["description"]])
+            for item, fields in zip(items, known)]
+    return build_insert_query(rows)
+
+def extract_xml_receipt(path: str):
+    """Generate the SQL INSERT query of a receipt from its NFC-e XML; None if the file is not a usable NFC-e."""
+    try:
+        parsed = parse_nfe_xml(path)
+    except (OSError, ValueError, ArithmeticError) as e:
+        logger.warning("Could not read the receipt XML %s: %s", path, e)
+        return None
+    return rows_from_parsed(parsed, path="xml") if parsed is not None else None
+
+def lookup_stored(keys) -> set:
+    """The given access keys that are already stored; none when the database cannot be reached."""
+    try:
+        return stored_invoice_ids(keys)
+    except Exception as e:
+        logger.warning("Could not look up stored receipts: %s", e)
+        return set()
+
+def already_stored_message(keys) -> str:
+    return f"Receipt {', '.join(keys)} is already stored." if len(keys) == 1 else \
+        f"All {len(keys)} receipts in this file are already stored."
+
+def identify_receipt(source, xml_folder: str = XML_DROP_DIR) -> dict:
+    """
+    Reads the access keys of a receipt file without converting it. Returns {"duplicate": True, "result": ...}
+    when every receipt in it is already stored, {"result": query} when its XML is in the drop folder,
+    and an empty dict when it has to be converted.
+    """
+    if not RECEIPT_KEY_LOOKUP:
+        return {}
+    with span("receipt.identify") as current:
+        try:
+            keys = read_access_keys(source)
+        except Exception as e:
+            # Damaged or unreadable files are reported by the conversion
+            logger.warning("Could not read the access key of %s: %s", source_name(source), e)
+            keys = []
+        current.set_attributes(receipt__keys=len(keys))
+        if not keys:
+            return {}
+        if len(lookup_stored(keys)) == len(keys):
+            current.set_attributes(receipt__identified="stored")
+            return {"duplicate": True, "result": already_stored_message(keys)}
+        xml = find_nfe_xml(keys[0], xml_folder) if len(keys) == 1 else None
+        query = extract_xml_receipt(xml) if xml else None
+        if query is not None:
+            current.set_attributes(receipt__identified="xml")
+            return {"result": query}
+    return {}
+
+def drop_stored_receipts(receipts):
+    """
+    Splits off the converted receipts that are already stored, for files whose keys could not be
+    read up front. Returns the receipts to extract and the stored keys.
+    """
+    if not RECEIPT_KEY_LOOKUP:
+        return receipts, []
+    keys = [parse_header(receipt)["invoice_id"] for receipt in receipts]
+    stored = lookup_stored([key for key in keys if key])
+    kept = [receipt for receipt, key in zip(receipts, keys) if key not in stored]
+    set_attributes(document__stored_receipts=len(receipts) - len(kept))
+    return kept, [key for key in keys if key in stored]
+
+def extract_receipt_data(receipt_text: str, partial: bool = PARTIAL_EXTRACTION) -> str:
     """Generate SQL INSERT query from receipt markdown."""
+    parsed = parse_receipt(receipt_text) if RECEIPT_FAST_PATH else None
+    if parsed is not None:
+        query = rows_from_parsed(parsed)
+        if query is not None:
+            return query
+    elif partial:
+        query = extract_partial(receipt_text)
+        if query is not None:
+            return query
+    set_attributes(extraction__path="llm")
+
     template = PromptTemplate(
         template=invoice_prompt
     )
 
-    chain = template | llm
-    response = chain.invoke({"receipt": receipt_text})
-    return response.content
\ No newline at end of file
+    client = get_llm_client("extraction")
+    chain = template | client.chat_model
+    response = client.invoke("extract_receipt_data", chain, {"receipt": receipt_text})
+    return response.content
+
+def extract_receipts_data(receipts) -> str:
+    """Generate the SQL INSERT queries of several receipts, extracting them concurrently."""
+    if len(receipts) == 1:
+        return extract_receipt_data(receipts[0])
+    with ThreadPoolExecutor(max_workers=min(len(receipts), LLM_MAX_CONCURRENCY)) as executor:
+        # Each receipt runs in a copy of the caller's context so its spans and LLM usage stay attributed
+        futures = [executor.submit(contextvars.copy_context().run, extract_receipt_data, receipt)
+                   for receipt in receipts]
+        return "\n".join(future.result() for future in futures)
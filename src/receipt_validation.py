@@ -0,0 +1,102 @@
+"""
+Checks that an extracted receipt can be saved without a person reviewing it.
+
+The extracted INSERT is compared with the receipt it came from: every row needs a valid
+44-digit access key and an ISO date, every item's quantity times its unit price has to match
+its total, and the items of each receipt have to add up to the total printed on it (within the
+parser's rounding tolerances).
+"""
+import datetime
+import re
+from collections import defaultdict
+from src.invoice_rows import build_insert_query, parse_insert_query, parse_insert_statements
+from src.receipt_identity import is_valid_access_key
+from src.receipt_parser import ITEM_TOLERANCE, TOTAL_TOLERANCE, TOTAL_PATTERN, parse_brl, parse_header
+
+# The day-first date the extraction prompt asks for
+DAY_FIRST_DATE = re.compile(r"(\d{2})[/-](\d{2})[/-](\d{4})")
+
+
+def normalize_dates(result: str) -> str:
+    """
+    Rewrites the day-first dates of an extracted INSERT (as the extraction prompt writes them) as
+    ISO dates; the INSERT is returned unchanged when it has none or cannot be parsed.
+    """
+    try:
+        statements = parse_insert_statements(result or "")
+    except ValueError:
+        return result
+    changed = False
+    for rows in statements:
+        for row in rows:
+            match = DAY_FIRST_DATE.fullmatch(str(row.get("datetime") or "").strip())
+            if match:
+                day, month, year = match.groups()
+                row["datetime"] = f"{year}-{month}-{day}"
+                changed = True
+    # One statement per receipt, as extract_receipts_data joins them
+    return "\n".join(build_insert_query(rows) for rows in statements) if changed else result
+
+
+def field_problems(rows) -> list:
+    """Invalid access keys and dates that are not ISO dates, once per receipt."""
+    problems = []
+    for key in dict.fromkeys(str(row.get("invoice_id")) for row in rows):
+        if not is_valid_access_key(key):
+            problems.append(f"{key} is not a valid 44-digit access key")
+    for date in dict.fromkeys(str(row.get("datetime")) for row in rows):
+        try:
+            datetime.date.fromisoformat(date)
+        except ValueError:
+            problems.append(f"{date} is not an ISO date")
+    return problems
+
+
+def item_problems(rows) -> list:
+    problems = []
+    for n, row in enumerate(rows, 1):
+        quantity, unitary_value, total_value = row.get("quantity"), row.get("unitary_value"), row.get("total_value")
+        if None in (quantity, unitary_value, total_value):
+            problems.append(f"Item {n} ({row.get('description')}) has no quantity, unit price or total")
+        elif abs(quantity * unitary_value - total_value) > ITEM_TOLERANCE:
+            problems.append(f"Item {n} ({row.get('description')}): {quantity} x {unitary_value} is not {total_value}")
+    return problems
+
+
+def total_problems(rows, receipts) -> list:
+    """The items of each receipt against the total printed on it."""
+    by_key = defaultdict(list)
+    for row in rows:
+        by_key[str(row.get("invoice_id"))].append(row)
+    problems = []
+    for receipt in receipts:
+        total = TOTAL_PATTERN.search(receipt)
+        key = parse_header(receipt)["invoice_id"]
+        # A receipt whose key was not read can only be matched when it is the only one
+        receipt_rows = by_key.get(key) if key else (rows if len(receipts) == 1 else None)
+        name = f"Receipt {key}" if key else "The receipt"
+        if total is None:
+            problems.append(f"{name} has no total to reconcile the items with")
+        elif not receipt_rows:
+            problems.append(f"{name} has no extracted items")
+        else:
+            items_total = sum(row["total_value"] or 0 for row in receipt_rows)
+            if abs(items_total - parse_brl(total.group(1))) > TOTAL_TOLERANCE:
+                problems.append(f"{name}: the items add up to {items_total}, the receipt says {total.group(1)}")
+    return problems
+
+
+def validate_receipts(result: str, receipts) -> list:
+    """
+    Problems that keep the extracted INSERTs (result, one per receipt) of the given receipt
+    markdowns from being saved without review; empty when it passes every check. Receipts read from their NFC-e XML
+    have no markdown (receipts is empty), so their totals are not reconciled.
+    """
+    try:
+        rows = parse_insert_query(result or "")
+    except ValueError as e:
+        return [f"The extraction is not a valid INSERT: {e}"]
+    if not rows:
+        return ["The extraction has no items"]
+    problems = field_problems(rows) + item_problems(rows)
+    return problems + total_problems(rows, receipts) if receipts else problems
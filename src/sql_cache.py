@@ -0,0 +1,212 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from src.config import SQL_CACHE_PATH, SQL_CACHE_THRESHOLD
+
+# "no" is kept: in English it negates ("no sugar"), which changes the SQL
+STOPWORDS = {
+    "a", "an", "the", "of", "on", "in", "at", "for", "to", "by", "with", "and", "or",
+    "how", "what", "which", "much", "many", "did", "do", "does", "have", "has", "had", "i", "my", "me", "is", "are", "was",
+    "o", "os", "as", "de", "da", "dos", "das", "em", "na", "com", "e", "eu", "meu", "minha",
+    "quanto", "quantos", "qual", "quais", "que",
+}
+
+# Words that change the meaning of the generated SQL even when the rest of the
+# question is identical ("last month" vs "this month"), so they must match exactly.
+GUARD_WORDS = {
+    "today", "yesterday", "week", "month", "year", "last", "this", "next", "previous", "current",
+    "hoje", "ontem", "semana", "mes", "ano", "ultimo", "ultima", "passado", "passada", "atual",
+    "average", "avg", "media", "total", "sum", "count", "max", "min", "top",
+}
+
+# Words folded into one before comparing: irregular verb forms and synonyms
+SYNONYMS = {
+    "spent": "spend", "cost": "spend", "expense": "spend", "gastei": "spend", "gastou": "spend",
+    "gasto": "spend", "gastar": "spend", "bought": "buy", "purchase": "buy", "comprei": "buy",
+    "comprou": "buy", "comprar": "buy", "compra": "buy", "paid": "pay", "paguei": "pay", "pagou": "pay",
+    "pagar": "pay", "beverage": "drink", "bebida": "drink", "shop": "store", "market": "store",
+    "supermarket": "store", "mercado": "store", "supermercado": "store", "loja": "store",
+}
+
+# The wording of a question, as opposed to its filter values: these words may differ between
+# similar questions and are left to the similarity score; every other word (a category, store,
+# product, sort order, negation, ...) has to match
+QUESTION_WORDS = {
+    "spend", "buy", "pay", "money", "amount", "value", "price", "preco", "valor", "store", "category",
+    "categoria", "product", "produto", "item", "each", "per", "every", "cada", "por", "all", "show", "list",
+    "give", "tell", "get", "see", "mostre", "liste", "sort", "order", "ordenado", "ordem",
+}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases, strips accents/punctuation and drops stopwords."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    words = re.findall(r"[a-z0-9]+", text)
+    return " ".join(w for w in words if w not in STOPWORDS)
+
+
+def _features(normalized: str) -> Counter:
+    """Word unigrams plus character trigrams, so 'spend'/'spent' still overlap."""
+    features = Counter(normalized.split())
+    for word in normalized.split():
+        padded = f"#{word}#"
+        features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def _stem(word: str) -> str:
+    """Strips plural and verb endings."""
+    if word.isdigit():
+        return word
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    return word[:-1] if len(word) > 3 and word.endswith("e") else word
+
+
+_SYNONYM_STEMS = {_stem(word): _stem(canonical) for word, canonical in SYNONYMS.items()}
+
+
+def _fold(word: str) -> str:
+    stem = _stem(word)
+    return _SYNONYM_STEMS.get(stem, stem)
+
+
+_QUESTION_STEMS = {_fold(word) for word in QUESTION_WORDS}
+
+
+def _folded(normalized: str) -> str:
+    return " ".join(_fold(w) for w in normalized.split())
+
+
+def _guard_tokens(normalized: str) -> frozenset:
+    """Time and aggregation words and numbers as written, and the filter values folded."""
+    words = normalized.split()
+    exact = {w for w in words if w in GUARD_WORDS or w.isdigit()}
+    filters = {f"~{_fold(w)}" for w in words if _fold(w) not in _QUESTION_STEMS and w not in exact}
+    return frozenset(exact | filters)
+
+
+def _fingerprint(schema: str) -> str:
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+class SQLQueryCache:
+    """
+    Question -> SQL cache with a local TF-IDF similarity index.
+
+    A cached question is a candidate only when its filter values match the asked question's
+    (see _guard_tokens); among candidates, the wording (folded for plurals and synonyms) is
+    scored and the best one is reused when it reaches the threshold.
+
+    Entries are grouped by namespace; each namespace remembers the fingerprint of the
+    schema (plus any prompt context) it was built against and is dropped when that changes.
+    """
+
+    def __init__(self, path=None, threshold=0.8):
+        self.path = path
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._namespaces = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._namespaces = json.load(f)
+
+    def _entries(self, namespace: str, schema: str) -> list:
+        fingerprint = _fingerprint(schema)
+        bucket = self._namespaces.get(namespace)
+        if bucket is None or bucket["fingerprint"] != fingerprint:
+            bucket = {"fingerprint": fingerprint, "entries": []}
+            self._namespaces[namespace] = bucket
+        return bucket["entries"]
+
+    def get(self, question: str, schema: str, namespace: str = "default"):
+        """Returns the cached SQL for the most similar question, or None."""
+        normalized = normalize_question(question)
+        with self._lock:
+            entries = self._entries(namespace, schema)
+            best_sql, best_score = None, 0.0
+            for entry in entries:
+                if entry["question"] == normalized:
+                    best_sql, best_score = entry["sql"], 1.0
+                    break
+            if best_sql is None and entries:
+                best_sql, best_score = self._most_similar(normalized, entries)
+
+            if best_sql is not None and best_score >= self.threshold:
+                self.hits += 1
+                return best_sql
+            self.misses += 1
+            return None
+
+    def _most_similar(self, normalized: str, entries: list):
+        # Similar wording is not enough: a different filter value, store, sort order or an
+        # added "not" changes the SQL, so only questions with the same guard tokens are scored
+        guards = _guard_tokens(normalized)
+        documents = [_features(_folded(entry["question"])) for entry in entries]
+        document_frequency = Counter()
+        for doc in documents:
+            document_frequency.update(doc.keys())
+        n_docs = len(documents) + 1
+
+        def vectorize(features):
+            vector = {
+                term: count * (math.log(n_docs / (1 + document_frequency[term])) + 1)
+                for term, count in features.items()
+            }
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            return {term: v / norm for term, v in vector.items()}
+
+        query_vector = vectorize(_features(_folded(normalized)))
+        best_sql, best_score = None, 0.0
+        for entry, doc in zip(entries, documents):
+            if _guard_tokens(entry["question"]) != guards:
+                continue
+            doc_vector = vectorize(doc)
+            score = sum(weight * doc_vector.get(term, 0.0) for term, weight in query_vector.items())
+            if score > best_score:
+                best_sql, best_score = entry["sql"], score
+        return best_sql, best_score
+
+    def put(self, question: str, schema: str, sql: str, namespace: str = "default"):
+        """Stores the SQL generated for a question."""
+        normalized = normalize_question(question)
+        with self._lock:
+            entries = self._entries(namespace, schema)
+            entries[:] = [e for e in entries if e["question"] != normalized]
+            entries.append({"question": normalized, "sql": sql})
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._namespaces = {}
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._namespaces, f)
+        os.replace(tmp_path, self.path)
+
+
+_sql_cache = None
+
+
+def get_sql_cache() -> SQLQueryCache:
+    """Returns the process-wide question -> SQL cache."""
+    global _sql_cache
+    if _sql_cache is None:
+        _sql_cache = SQLQueryCache(SQL_CACHE_PATH, SQL_CACHE_THRESHOLD)
+    return _sql_cache
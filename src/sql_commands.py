@@ -1,5 +1,6 @@
-sql_commands = [
-    """
+# The receipts as one wide table, before the normalized layout below; kept as the starting point
+# of the migration and as the baseline of benchmarks/bench_normalized_schema.py
+invoices_table = """
     CREATE TABLE invoices (
         invoice_id NUMERIC(44,0) NOT NULL,
         supermarket_name TEXT NOT NULL,
@@ -12,6 +13,128 @@ sql_commands = [
         product TEXT NOT NULL,
         full_product_name TEXT NOT NULL,
         volume VARCHAR(10),
-        category TEXT NOT NULL
+        category TEXT NOT NULL,
+        line_number INTEGER NOT NULL,
+        UNIQUE (invoice_id, line_number)
+    );
+    """
+
+# Stores, categories and products are stored once and referenced by integer keys; a receipt's
+# access key, store and date are stored once in receipts, and each line item only keeps what
+# varies per line. The invoices view joins them back into the wide rows the agents' SQL, the
+# dashboard loaders and the product dictionary read.
+sql_commands = [
+    """
+    CREATE TABLE stores (
+        store_id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    """,
+    """
+    CREATE TABLE categories (
+        category_id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    """,
+    """
+    CREATE TABLE products (
+        product_id SERIAL PRIMARY KEY,
+        product TEXT NOT NULL,
+        full_product_name TEXT NOT NULL,
+        -- '' for products sold without a volume, so the unique key can include it
+        volume VARCHAR(10) NOT NULL DEFAULT '',
+        category_id INTEGER NOT NULL REFERENCES categories (category_id),
+        UNIQUE (product, full_product_name, volume, category_id)
+    );
+    """,
+    """
+    CREATE TABLE receipts (
+        receipt_id SERIAL PRIMARY KEY,
+        invoice_id NUMERIC(44,0) NOT NULL UNIQUE,
+        store_id INTEGER NOT NULL REFERENCES stores (store_id),
+        datetime DATE NOT NULL
     );
-    """]
\ No newline at end of file
+    """,
+    """
+    CREATE TABLE line_items (
+        receipt_id INTEGER NOT NULL REFERENCES receipts (receipt_id) ON DELETE CASCADE,
+        line_number INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        quantity NUMERIC(10,4) NOT NULL,
+        unit VARCHAR(10) NOT NULL,
+        unitary_value DECIMAL(10,2) NOT NULL,
+        total_value DECIMAL(10,2) NOT NULL,
+        product_id INTEGER NOT NULL REFERENCES products (product_id),
+        PRIMARY KEY (receipt_id, line_number)
+    );
+    """,
+    "CREATE INDEX line_items_product_id ON line_items (product_id);",
+    "CREATE INDEX receipts_store_id ON receipts (store_id);",
+    "CREATE INDEX receipts_datetime ON receipts (datetime);",
+    """
+    CREATE VIEW invoices AS
+    SELECT r.invoice_id, s.name AS supermarket_name, r.datetime, l.description, l.quantity, l.unit,
+           l.unitary_value, l.total_value, p.product, p.full_product_name, NULLIF(p.volume, '') AS volume,
+           c.name AS category, l.line_number
+    FROM line_items l
+    JOIN receipts r ON r.receipt_id = l.receipt_id
+    JOIN stores s ON s.store_id = r.store_id
+    JOIN products p ON p.product_id = l.product_id
+    JOIN categories c ON c.category_id = p.category_id;
+    """]
+
+# Moves the rows of the wide invoices table into the normalized tables and replaces the table by
+# the view. A receipt whose lines disagree on its store or date keeps the lowest store id and date.
+normalize_migrations = [
+    "ALTER TABLE invoices RENAME TO invoices_wide;",
+    *sql_commands,
+    "INSERT INTO stores (name) SELECT DISTINCT supermarket_name FROM invoices_wide;",
+    "INSERT INTO categories (name) SELECT DISTINCT category FROM invoices_wide;",
+    """
+    INSERT INTO products (product, full_product_name, volume, category_id)
+    SELECT DISTINCT w.product, w.full_product_name, COALESCE(w.volume, ''), c.category_id
+    FROM invoices_wide w JOIN categories c ON c.name = w.category;
+    """,
+    """
+    INSERT INTO receipts (invoice_id, store_id, datetime)
+    SELECT w.invoice_id, MIN(s.store_id), MIN(w.datetime)
+    FROM invoices_wide w JOIN stores s ON s.name = w.supermarket_name
+    GROUP BY w.invoice_id;
+    """,
+    """
+    INSERT INTO line_items (receipt_id, line_number, description, quantity, unit, unitary_value, total_value,
+                            product_id)
+    SELECT r.receipt_id, w.line_number, w.description, w.quantity, w.unit, w.unitary_value, w.total_value,
+           p.product_id
+    FROM invoices_wide w
+    JOIN receipts r ON r.invoice_id = w.invoice_id
+    JOIN categories c ON c.name = w.category
+    JOIN products p ON p.product = w.product AND p.full_product_name = w.full_product_name
+                   AND p.volume = COALESCE(w.volume, '') AND p.category_id = c.category_id;
+    """,
+    "DROP TABLE invoices_wide;",
+]
+
+# Brings a database created by an earlier version up to date (python -m src.database migrate),
+# in one transaction: the rows of each receipt are numbered in the order they were stored, then
+# the wide table is normalized
+migrations = [
+    "ALTER TABLE invoices ADD COLUMN IF NOT EXISTS line_number INTEGER;",
+    """
+    UPDATE invoices SET line_number = numbered.n
+    FROM (SELECT ctid, ROW_NUMBER() OVER (PARTITION BY invoice_id ORDER BY ctid) AS n FROM invoices) AS numbered
+    WHERE invoices.ctid = numbered.ctid AND invoices.line_number IS NULL;
+    """,
+    "ALTER TABLE invoices ALTER COLUMN line_number SET NOT NULL;",
+    "CREATE UNIQUE INDEX IF NOT EXISTS invoices_invoice_id_line_number ON invoices (invoice_id, line_number);",
+    *normalize_migrations,
+]
+
+
+def sqlite_commands(commands) -> list:
+    """
+    The commands for SQLite, the stand-in for PostgreSQL in the benchmarks and tests: integer
+    keys become rowid aliases and access keys are kept as text (SQLite would round 44 digits).
+    """
+    return [command.replace("SERIAL PRIMARY KEY", "INTEGER PRIMARY KEY").replace("NUMERIC(44,0)", "TEXT")
+            for command in commands]
@@ -0,0 +1,104 @@
+import json
+import re
+import pandas as pd
+from sqlalchemy import text
+from src.config import QUERY_TIMEOUT_MS, QUERY_MAX_ROWS, QUERY_MAX_COST
+
+FORBIDDEN_KEYWORDS = (
+    "insert", "update", "delete", "merge", "upsert", "drop", "create", "alter", "truncate",
+    "grant", "revoke", "copy", "vacuum", "analyze", "call", "do", "execute", "prepare",
+    "lock", "listen", "notify", "set", "reset", "comment", "refresh", "cluster", "reindex",
+)
+FORBIDDEN_FUNCTIONS = ("pg_sleep", "pg_read_file", "pg_read_binary_file", "pg_ls_dir", "lo_import",
+                       "lo_export", "dblink", "pg_terminate_backend", "pg_cancel_backend", "set_config")
+
+
+class UnsafeQueryError(ValueError):
+    """Raised when generated SQL is not a single read-only SELECT."""
+
+
+class QueryTooExpensiveError(RuntimeError):
+    """Raised when the planner estimates a query above the configured cost limit."""
+
+
+def _strip_comments_and_literals(sql_query: str) -> str:
+    """Removes comments and blanks string literals and quoted names so keywords inside them are ignored."""
+    sql_query = re.sub(r"--[^\n]*", " ", sql_query)
+    sql_query = re.sub(r"/\*.*?\*/", " ", sql_query, flags=re.DOTALL)
+    sql_query = re.sub(r"'(?:[^']|'')*'", "''", sql_query)
+    return re.sub(r'"(?:[^"]|"")*"', '""', sql_query)
+
+
+def validate_select_query(sql_query: str) -> str:
+    """Checks that the SQL is a single read-only SELECT and returns it without the trailing ';'."""
+    if not sql_query or not sql_query.strip():
+        raise UnsafeQueryError("Empty SQL query")
+
+    cleaned = _strip_comments_and_literals(sql_query).strip().rstrip(";").strip()
+    if ";" in cleaned:
+        raise UnsafeQueryError("Only a single SQL statement is allowed")
+
+    words = re.findall(r"[a-z_]+", cleaned.lower())
+    if not words or words[0] not in ("select", "with"):
+        raise UnsafeQueryError("Only SELECT queries are allowed")
+
+    # Statements start the query or a parenthesized (sub)query, such as a data-modifying CTE;
+    # elsewhere the same words are column names or aliases ("AS comment", "SUM(x) AS set")
+    statements = re.findall(r"(?:^|\()\s*([a-z_]+)", cleaned.lower())
+    functions = re.findall(r"\b([a-z_]+)\s*\(", cleaned.lower())
+    forbidden = sorted(set(statements).intersection(FORBIDDEN_KEYWORDS)
+                       | set(functions).intersection(FORBIDDEN_FUNCTIONS))
+    if forbidden:
+        raise UnsafeQueryError(f"Query contains forbidden keywords: {', '.join(forbidden)}")
+    if re.search(r"\binto\b", cleaned, re.IGNORECASE):
+        raise UnsafeQueryError("SELECT ... INTO is not allowed")
+    if re.search(r"\bfor\s+(no\s+key\s+)?(update|share|key\s+share)\b", cleaned, re.IGNORECASE):
+        raise UnsafeQueryError("Row locks (SELECT ... FOR UPDATE/SHARE) are not allowed")
+
+    return sql_query.strip().rstrip(";").strip()
+
+
+def estimate_query_cost(connection, sql_query: str) -> float:
+    """Returns the planner's total cost estimate for a query (PostgreSQL only)."""
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql_query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def run_readonly_query(engine, sql_query: str, timeout_ms=None, max_rows=None, max_cost=None) -> pd.DataFrame:
+    """
+    Runs validated SQL in a read-only transaction with a statement timeout, streaming rows
+    through a server-side cursor and returning at most max_rows of them.
+    The DataFrame's attrs carry the plan cost and whether the result was truncated.
+    """
+    timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    max_rows = QUERY_MAX_ROWS if max_rows is None else max_rows
+    max_cost = QUERY_MAX_COST if max_cost is None else max_cost
+    sql_query = validate_select_query(sql_query)
+
+    with engine.connect() as connection:
+        with connection.begin():
+            cost = None
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SET TRANSACTION READ ONLY"))
+                connection.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+                cost = estimate_query_cost(connection, sql_query)
+                if max_cost and cost > max_cost:
+                    raise QueryTooExpensiveError(
+                        f"Estimated query cost {cost:.0f} exceeds the limit of {max_cost:.0f}; "
+                        "add filters or aggregations to reduce the rows scanned"
+                    )
+
+            result = connection.execution_options(stream_results=True, max_row_buffer=1000).execute(
+                text(sql_query)
+            )
+            rows = result.fetchmany(max_rows + 1)
+            columns = list(result.keys())
+            result.close()
+
+    truncated = len(rows) > max_rows
+    df = pd.DataFrame(rows[:max_rows], columns=columns)
+    df.attrs["plan_cost"] = cost
+    df.attrs["truncated"] = truncated
+    return df
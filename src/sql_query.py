@@ -1,32 +1,110 @@
+import functools
+import logging
+import threading
+import time
 from langchain import hub
-from src.config import llm
-from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.messages import AIMessage, HumanMessage
-from src.database import get_sql_database
+from langchain_core.prompts import ChatPromptTemplate
+from src.database import get_sql_database, create_db_engine
+from src.query_engine import run_query
+from src.sql_cache import get_sql_cache
+from src.prompt_template import sql_query_system_prompt
+from src.llm_client import get_llm_client
+from src.config import SQL_SCHEMA_REFRESH_SECONDS
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 class QueryOutput(BaseModel):
     query: str
 
-db = get_sql_database()
-query_prompt_template = hub.pull("langchain-ai/sql-query-system-prompt")
+# The database, engine and hub prompt are created on first use so importing this module
+# (e.g. through agents.invoice_agent for receipt ingestion) needs no network or database.
+@functools.cache
+def get_db():
+    return get_sql_database()
+
+@functools.cache
+def get_engine():
+    return create_db_engine()
+
+@functools.cache
+def get_query_prompt_template():
+    try:
+        return hub.pull("langchain-ai/sql-query-system-prompt")
+    except Exception as e:
+        logger.warning("Could not pull the SQL prompt from the hub (%s), using the local copy", e)
+        return ChatPromptTemplate.from_messages([("system", sql_query_system_prompt), ("user", "Question: {input}")])
+
+# The table info is re-read every SQL_SCHEMA_REFRESH_SECONDS, so a schema change (such as
+# python -m src.database migrate) reaches the prompt and the SQL cache fingerprint without a restart
+_table_info = {"text": None, "read_at": 0.0}
+_table_info_lock = threading.Lock()
+
+def get_table_info() -> str:
+    """Table definitions plus sample rows, re-read every SQL_SCHEMA_REFRESH_SECONDS."""
+    with _table_info_lock:
+        if _table_info["text"] is None or time.monotonic() - _table_info["read_at"] >= SQL_SCHEMA_REFRESH_SECONDS:
+            # SQLDatabase reflects the tables when it is created, so a new one is needed
+            get_db.cache_clear()
+            _table_info["text"] = get_db().get_table_info()
+            _table_info["read_at"] = time.monotonic()
+        return _table_info["text"]
+
+def refresh_table_info():
+    """Makes the next get_table_info() read the schema again."""
+    with _table_info_lock:
+        _table_info["text"] = None
+
+def schema_fingerprint_source() -> str:
+    """The CREATE TABLE part of the table info, without the sample rows."""
+    return get_table_info().split("/*")[0]
+
+def question_text(question) -> str:
+    """Returns the plain text of a question given as a string or a list of messages."""
+    if isinstance(question, str):
+        return question
+    return " ".join(str(getattr(message, "content", message)) for message in question)
+
+def lookup_cached_query(question) -> str | None:
+    """Returns previously generated SQL for a near-identical question, if any."""
+    return get_sql_cache().get(question_text(question), schema_fingerprint_source(), namespace="chat")
+
+def cache_query(question, query: str):
+    """Remembers SQL that executed successfully for a question."""
+    get_sql_cache().put(question_text(question), schema_fingerprint_source(), query, namespace="chat")
 
 def write_query(question: str) -> str:
     """Generate SQL query for a given user question."""
-    prompt = query_prompt_template.invoke({
-        "dialect": db.dialect,
+    prompt = get_query_prompt_template().invoke({
+        "dialect": get_db().dialect,
         "top_k": 10,
-        "table_info": db.get_table_info(),
+        "table_info": get_table_info(),
         "input": question
     })
-    structured_llm = llm.with_structured_output(QueryOutput)
-    result = structured_llm.invoke(prompt)
+    client = get_llm_client("sql")
+    structured_llm = client.chat_model.with_structured_output(QueryOutput)
+    result = client.invoke("write_query", structured_llm, prompt)
     return result.query
 
+def execute_query_with_cost(query: str) -> tuple[str, float | None]:
+    """
+    Run generated SQL through the read-only guard and return the rows as text, with the
+    planner's cost estimate (None off PostgreSQL or when the query failed).
+    """
+    try:
+        df = run_query(get_engine(), query)
+    except Exception as e:
+        return f"Error: {e}", None
+    result = str(list(df.itertuples(index=False, name=None)))
+    if df.attrs.get("truncated"):
+        result += f"\n(Result truncated to the first {len(df)} rows)"
+    return result, df.attrs.get("plan_cost")
+
 def execute_query(query: str) -> str:
-    tool = QuerySQLDatabaseTool(db=db)
-    return tool.invoke(query)
+    """Run generated SQL through the read-only guard and return the rows as text."""
+    return execute_query_with_cost(query)[0]
 
 def generate_answer(question: str, query: str, result: str) -> str:
     prompt = (
@@ -35,4 +113,5 @@ def generate_answer(question: str, query: str, result: str) -> str:
         f"SQL Result: {result}\n"
         "If result has >2 rows, return as markdown table, else return plain text."
     )
-    return llm.invoke(prompt).content
\ No newline at end of file
+    client = get_llm_client()
+    return client.invoke("generate_answer", client.chat_model, prompt).content
\ No newline at end of file
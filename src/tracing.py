@@ -0,0 +1,285 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from src.config import TRACING_ENABLED, TRACE_PATH, TRACE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "smart-receipt-assistant"
+MAX_ATTRIBUTE_LENGTH = 2000
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation (a graph node, an LLM call, a query). Spans opened while another one
+    is active become its children and share its trace id.
+    """
+
+    def __init__(self, name: str, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = {}
+        self.events = []
+        self.status = "OK"
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.set_attributes(**(attributes or {}))
+
+    def set_attribute(self, key: str, value):
+        if value is None:
+            return
+        if isinstance(value, str) and len(value) > MAX_ATTRIBUTE_LENGTH:
+            value = value[:MAX_ATTRIBUTE_LENGTH] + "..."
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key.replace("__", "."), value)
+
+    def add_to(self, key: str, amount=1):
+        """Adds amount to a numeric attribute, starting from zero."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"[:MAX_ATTRIBUTE_LENGTH]
+        self.add_event("exception", **{"exception.type": type(error).__name__,
+                                       "exception.message": str(error)[:MAX_ATTRIBUTE_LENGTH]})
+
+    @property
+    def duration_s(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict:
+        """The span in OTLP/JSON form."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "events": [{"name": event["name"], "timeUnixNano": str(event["time_ns"]),
+                        "attributes": [{"key": key, "value": _otlp_value(value)}
+                                       for key, value in event["attributes"].items()]}
+                       for event in self.events],
+            "status": {"code": 2 if self.status == "ERROR" else 1, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _python_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_python_value(item) for item in value["arrayValue"].get("values", [])]
+    for key in ("boolValue", "doubleValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+class JsonlSpanExporter:
+    """
+    Appends one OTLP/JSON ExportTraceServiceRequest per finished trace to a file, the format
+    read by the OpenTelemetry Collector's otlpjsonfile receiver. The file is rotated to
+    '<path>.1' once it grows past max_bytes.
+    """
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        line = json.dumps(payload, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_exporter = None
+_export_failed = False
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def set_exporter(exporter):
+    """Replaces the exporter that receives finished traces (None disables exporting)."""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None and TRACING_ENABLED:
+        _exporter = JsonlSpanExporter()
+    return _exporter
+
+
+def _finish(finished: Span):
+    with _pending_lock:
+        spans = _pending.setdefault(finished.trace_id, [])
+        spans.append(finished)
+        if finished.parent_span_id is not None:
+            return
+        del _pending[finished.trace_id]
+
+    global _export_failed
+    exporter = get_exporter()
+    if exporter is None:
+        return
+    try:
+        exporter.export(spans)
+    except Exception as e:
+        # Tracing must never break the request it observes
+        if not _export_failed:
+            logger.warning("Could not export trace: %s", e)
+        _export_failed = True
+
+
+def _is_control_flow(error: BaseException) -> bool:
+    # LangGraph signals interrupt()/Command jumps with GraphBubbleUp subclasses; those are not failures
+    return any(cls.__name__ == "GraphBubbleUp" for cls in type(error).__mro__)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Times the enclosed block as a span. Keyword arguments become attributes, with '__' standing
+    for '.' (e.g. db__system="postgresql").
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        if _is_control_flow(e):
+            current.add_event("interrupted")
+        else:
+            current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _finish(current)
+
+
+def current_span():
+    """The active span, or None outside any span."""
+    return _current_span.get()
+
+
+def set_attributes(**attributes):
+    """Sets attributes on the active span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.set_attributes(**attributes)
+
+
+def traced_node(name: str, func):
+    """Wraps a LangGraph node so each run is recorded as a 'node.<name>' span."""
+    @functools.wraps(func)
+    def wrapper(state, *args, **kwargs):
+        with span(f"node.{name}", graph__node=name) as current:
+            result = func(state, *args, **kwargs)
+            if isinstance(result, dict):
+                current.set_attribute("graph.updated_keys", sorted(result))
+            return result
+    return wrapper
+
+
+def record_token_usage(target: Span, prompt_tokens, completion_tokens):
+    if target is None:
+        return
+    target.add_to("gen_ai.usage.input_tokens", prompt_tokens or 0)
+    target.add_to("gen_ai.usage.output_tokens", completion_tokens or 0)
+
+
+@functools.cache
+def usage_callback():
+    """
+    A LangChain callback handler that adds the token usage of every chat model call to the
+    active span. Pass it as config={"callbacks": [usage_callback()]}.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TokenUsageCallback(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage:
+                        record_token_usage(current_span(), usage.get("input_tokens"), usage.get("output_tokens"))
+                        return
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            record_token_usage(current_span(), usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+    return TokenUsageCallback()
+
+
+def read_spans(path=TRACE_PATH, max_traces=200) -> list:
+    """Reads the spans of the last max_traces traces from an exporter file as flat dicts."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()[-max_traces:]
+
+    spans = []
+    for line in lines:
+        try:
+            payload = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        for resource in payload.get("resourceSpans", []):
+            for scope in resource.get("scopeSpans", []):
+                for item in scope.get("spans", []):
+                    start_ns, end_ns = int(item["startTimeUnixNano"]), int(item["endTimeUnixNano"])
+                    spans.append({
+                        "trace_id": item["traceId"],
+                        "span_id": item["spanId"],
+                        "parent_span_id": item.get("parentSpanId"),
+                        "name": item["name"],
+                        "start_ns": start_ns,
+                        "duration_ms": (end_ns - start_ns) / 1e6,
+                        "status": "ERROR" if item.get("status", {}).get("code") == 2 else "OK",
+                        "status_message": item.get("status", {}).get("message", ""),
+                        "attributes": {attr["key"]: _python_value(attr["value"])
+                                       for attr in item.get("attributes", [])},
+                    })
+    return spans
@@ -0,0 +1,376 @@
+"""
+Long-running ingestion of the receipts dropped into a folder (e.g. a scanner's or a mail
+rule's output folder).
+
+New files are picked up with inotify on Linux and by scanning the folder elsewhere, and are
+only read once their size and modification time have not changed for WATCH_DEBOUNCE_S, so a
+file still being copied is not converted half-written. Ready files are run through the invoice
+graph in batches of WATCH_BATCH_SIZE on WATCH_WORKERS threads. A receipt that passes the graph's
+validation (src/receipt_validation.py) is saved right away; any other one is left for review, on
+the app's approval list when JOB_QUEUE_DB is set. Every file is recorded by content
+hash in WATCH_STATE_DB, so a restart does not process a file again and a file that was being
+processed when the daemon stopped is retried.
+
+    python -m src.watch_folder /path/to/receipts
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import logging
+import os
+import select
+import signal
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from src.config import (WATCH_DIR, WATCH_STATE_DB, WATCH_WORKERS, WATCH_BATCH_SIZE, WATCH_DEBOUNCE_S, WATCH_POLL_S,
+                        WATCH_AUTO_APPROVE, JOB_MAX_ATTEMPTS)
+from src.image_receipts import IMAGE_TYPES
+from src.job_queue import get_job_queue
+from src.job_worker import APPROVAL_FIELDS, check_saved
+from src.llm_usage import usage_scope
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_EXTENSIONS = ("pdf", *IMAGE_TYPES)
+# Statuses after which a file is not processed again
+FINISHED_STATUSES = ("saved", "review", "duplicate")
+
+
+def is_receipt_file(path: str) -> bool:
+    """PDFs and photos, without the hidden and partial files that downloads and editors leave around."""
+    name = os.path.basename(path)
+    return (not name.startswith((".", "~")) and os.path.isfile(path)
+            and os.path.splitext(name)[1].lower().lstrip(".") in RECEIPT_EXTENSIONS)
+
+
+def scan_folder(folder: str) -> list:
+    with os.scandir(folder) as entries:
+        return [entry.path for entry in entries if is_receipt_file(entry.path)]
+
+
+def content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PollingWatcher:
+    """Reports every receipt file in the folder on each scan."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def changes(self, timeout: float) -> list:
+        time.sleep(timeout)
+        return scan_folder(self.folder)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Reports the files created, written or moved into the folder, from Linux inotify events."""
+
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x002, 0x008, 0x080, 0x100
+    IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+
+    def changes(self, timeout: float) -> list:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths, offset = set(), 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+            offset += self.EVENT.size + length
+            if name:
+                paths.add(os.path.join(self.folder, os.fsdecode(name)))
+        return [path for path in paths if is_receipt_file(path)]
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(folder: str, mode: str = "auto"):
+    """inotify where available (mode auto or inotify), else folder scans."""
+    if mode != "poll" and hasattr(select, "select") and os.uname().sysname == "Linux":
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            if mode == "inotify":
+                raise
+            logger.warning("inotify is not available (%s); scanning %s instead", e, folder)
+    return PollingWatcher(folder)
+
+
+class Debouncer:
+    """Holds back files until their size and modification time have not changed for quiet_s."""
+
+    def __init__(self, quiet_s: float = WATCH_DEBOUNCE_S):
+        self.quiet_s = quiet_s
+        self.pending = {}
+
+    def observe(self, path: str):
+        self.pending.setdefault(path, None)
+
+    def ready(self, now: float = None) -> list:
+        """The (path, size, mtime_ns) of the files that have settled; they stop being tracked."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, seen in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            # A file last written before it was seen (e.g. there when the daemon started) is ready at once
+            settled = seen is None and time.time() - stat.st_mtime >= self.quiet_s
+            if not settled and (seen is None or seen[0] != signature):
+                self.pending[path] = (signature, now)
+            elif stat.st_size and (settled or now - seen[1] >= self.quiet_s):
+                ready.append((path, *signature))
+                del self.pending[path]
+        return ready
+
+
+class FileCheckpoint:
+    """SQLite record of the files processed, by content hash, with their outcome."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS watched_files (
+        content_hash TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        problems TEXT,
+        error TEXT,
+        job_id TEXT,
+        started_at REAL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS watched_files_path ON watched_files (path, size, mtime_ns);
+    CREATE INDEX IF NOT EXISTS watched_files_finished ON watched_files (finished_at);
+    """
+
+    def __init__(self, path: str = WATCH_STATE_DB, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(self.SCHEMA)
+
+    def _execute(self, sql_query: str, params=()):
+        with self._lock:
+            return self._connection.execute(sql_query, params).fetchall()
+
+    def _done(self, row) -> bool:
+        return row["status"] in FINISHED_STATUSES or (row["status"] == "failed" and row["attempts"] >= self.max_attempts)
+
+    def seen(self, path: str, size: int, mtime_ns: int) -> bool:
+        """Whether this very file (same path, size and modification time) needs no processing."""
+        rows = self._execute("SELECT status, attempts FROM watched_files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                             (path, size, mtime_ns))
+        return any(self._done(row) for row in rows)
+
+    def start(self, digest: str, path: str, size: int, mtime_ns: int) -> bool:
+        """Records an attempt at a file; False when a file with the same content needs no processing."""
+        rows = self._execute("SELECT status, attempts FROM watched_files WHERE content_hash = ?", (digest,))
+        if rows and self._done(rows[0]):
+            return False
+        self._execute(
+            "INSERT INTO watched_files (content_hash, path, size, mtime_ns, status, attempts, started_at) "
+            "VALUES (?, ?, ?, ?, 'processing', 1, ?) ON CONFLICT (content_hash) DO UPDATE SET path = excluded.path, "
+            "size = excluded.size, mtime_ns = excluded.mtime_ns, status = 'processing', attempts = attempts + 1, "
+            "error = NULL, started_at = excluded.started_at",
+            (digest, path, size, mtime_ns, time.time()))
+        return True
+
+    def finish(self, digest: str, status: str, result=None, problems=(), error=None, job_id=None):
+        self._execute(
+            "UPDATE watched_files SET status = ?, result = ?, problems = ?, error = ?, job_id = ?, finished_at = ? "
+            "WHERE content_hash = ?",
+            (status, result, json.dumps(list(problems)) if problems else None, error, job_id, time.time(), digest))
+
+    def counts(self) -> dict:
+        return {row["status"]: row["n"] for row in
+                self._execute("SELECT status, COUNT(*) AS n FROM watched_files GROUP BY status")}
+
+    def files_per_min(self, since_s: float = 600.0) -> float:
+        """Files finished per minute over the last since_s seconds (from the first of them)."""
+        rows = self._execute("SELECT COUNT(*) AS n, MIN(started_at) AS first FROM watched_files WHERE finished_at >= ?",
+                             (time.time() - since_s,))
+        n, first = rows[0]["n"], rows[0]["first"]
+        return n * 60 / max(time.time() - first, 1e-9) if n else 0.0
+
+
+def process_file(graph, path: str, job_queue=None) -> dict:
+    """
+    Runs one receipt file through the invoice graph. Returns its status (saved, review or
+    duplicate), the INSERT, the validation problems and the approval job id, if any.
+    """
+    thread_id = uuid.uuid4().hex
+    config = {"configurable": {"thread_id": thread_id}}
+    try:
+        with span("watch.receipt", file__name=os.path.basename(path)) as current, usage_scope("receipt"):
+            graph.invoke({"path": path}, config)
+            snapshot = graph.get_state(config)
+            values = snapshot.values
+            if values.get("duplicate"):
+                current.set_attributes(watch__status="duplicate")
+                return {"status": "duplicate", "result": values.get("result")}
+            problems = values.get("problems") or []
+            current.set_attributes(watch__problems=len(problems))
+            # Validated and saved by the graph, or stopped at the approval
+            if not snapshot.next:
+                # Not saved: the file fails and is tried again
+                check_saved(values)
+                current.set_attributes(watch__status="saved")
+                return {"status": "saved", "result": values["result"]}
+            job_id = None
+            if job_queue is not None:
+                with open(path, "rb") as f:
+                    job_id = job_queue.submit_for_approval(os.path.basename(path), f.read(), values["result"],
+                                                           {field: values.get(field) for field in APPROVAL_FIELDS},
+                                                           kind="watch")
+            current.set_attributes(watch__status="review")
+            return {"status": "review", "result": values.get("result"), "problems": problems, "job_id": job_id}
+    finally:
+        graph.checkpointer.delete_thread(thread_id)
+
+
+def run_batch(graph, batch, checkpoint: FileCheckpoint, executor, job_queue=None) -> list:
+    """Processes a batch of settled files on the pool; returns the paths of failed ones to try again."""
+    started = []
+    for path, size, mtime_ns in batch:
+        try:
+            digest = content_hash(path)
+        except FileNotFoundError:
+            continue
+        if checkpoint.start(digest, path, size, mtime_ns):
+            started.append((path, digest))
+        else:
+            logger.info("Skipping %s: the same file was already processed", path)
+
+    def run(path, digest):
+        try:
+            outcome = process_file(graph, path, job_queue)
+        except Exception as e:
+            logger.exception("Could not process %s", path)
+            checkpoint.finish(digest, "failed", error=f"{type(e).__name__}: {e}")
+            return path
+        checkpoint.finish(digest, outcome["status"], outcome.get("result"), outcome.get("problems") or (),
+                          job_id=outcome.get("job_id"))
+        if outcome["status"] == "review":
+            logger.warning("%s needs review: %s", path, "; ".join(outcome["problems"]))
+        return None
+
+    futures = [executor.submit(run, path, digest) for path, digest in started]
+    return [path for future in futures if (path := future.result()) is not None]
+
+
+def watch(folder: str = WATCH_DIR, checkpoint: FileCheckpoint = None, graph=None, workers: int = WATCH_WORKERS,
+          batch_size: int = WATCH_BATCH_SIZE, debounce_s: float = WATCH_DEBOUNCE_S, poll_s: float = WATCH_POLL_S,
+          auto_approve: bool = WATCH_AUTO_APPROVE, mode: str = "auto", stop: threading.Event = None,
+          job_queue=None, max_files: int = None):
+    """
+    Processes the folder's receipts until stopped (or once max_files have been processed).
+    auto_approve applies to the invoice graph built when none is given.
+    """
+    if graph is None:
+        from agents.invoice_agent import build_graph
+        graph = build_graph(auto_approve=auto_approve)
+    checkpoint = checkpoint or FileCheckpoint()
+    stop = stop or threading.Event()
+    watcher = open_watcher(folder, mode)
+    debouncer = Debouncer(debounce_s)
+    # Files settled and handled in this run, so a folder scan does not look them up again
+    attempts, handled, processed = {}, set(), 0
+    logger.info("Watching %s with %s, %d worker(s)", folder, type(watcher).__name__, workers)
+    # Files that arrived while the daemon was not running
+    changed = scan_folder(folder)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch") as executor:
+        try:
+            while not stop.is_set() and (max_files is None or processed < max_files):
+                for path in changed:
+                    debouncer.observe(path)
+                ready = []
+                for settled in debouncer.ready():
+                    if settled not in handled:
+                        handled.add(settled)
+                        if not checkpoint.seen(*settled):
+                            ready.append(settled)
+                for start in range(0, len(ready), batch_size):
+                    batch = ready[start:start + batch_size]
+                    with span("watch.batch", batch__files=len(batch)):
+                        failed = run_batch(graph, batch, checkpoint, executor, job_queue)
+                    processed += len(batch)
+                    # A failed file is tried again on the next pass, up to the checkpoint's attempts
+                    for path in failed:
+                        attempts[path] = attempts.get(path, 0) + 1
+                        if attempts[path] < checkpoint.max_attempts:
+                            handled.difference_update({settled for settled in batch if settled[0] == path})
+                            debouncer.observe(path)
+                    logger.info("Processed %d file(s), %.1f files/min; %s", processed, checkpoint.files_per_min(),
+                                checkpoint.counts())
+                changed = watcher.changes(poll_s)
+        finally:
+            watcher.close()
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", default=WATCH_DIR)
+    parser.add_argument("--workers", type=int, default=WATCH_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=WATCH_BATCH_SIZE)
+    parser.add_argument("--mode", choices=("auto", "inotify", "poll"), default="auto")
+    parser.add_argument("--no-auto-approve", dest="auto_approve", action="store_false", default=WATCH_AUTO_APPROVE,
+                        help="leave every receipt for review")
+    args = parser.parse_args()
+    if not args.folder:
+        raise SystemExit("Give the folder to watch or set WATCH_DIR")
+    from src.logging_utils import configure_logging
+    configure_logging()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        watch(args.folder, workers=args.workers, batch_size=args.batch_size, auto_approve=args.auto_approve,
+              mode=args.mode, stop=stop, job_queue=get_job_queue())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+import tornado.httpclient
+import tornado.httpserver
+import tornado.testing
+from src import api, llm_usage, tracing
+from src.job_queue import JobQueue
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_accounting(monkeypatch):
+    llm_usage.set_usage_store(llm_usage.UsageStore(":memory:"))
+    tracing.set_exporter(DiscardExporter())
+    monkeypatch.setattr(api, "approval_command", lambda approved: approved)
+    monkeypatch.setattr(api, "question_input", lambda question: {"question": question})
+    monkeypatch.setattr(api, "get_job_queue", lambda: None)
+    yield
+    llm_usage.set_usage_store(None)
+    tracing.set_exporter(None)
+
+
+class FakeGraph:
+    """Stands in for the invoice graph: receipts stop at the approval, questions yield each node's update."""
+
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+        self.values = {}
+        self.inserted = []
+        self.checkpointer = MagicMock()
+
+    def invoke(self, inputs, config):
+        if self.release:
+            self.release.wait(5)
+        if isinstance(inputs, dict):
+            self.values = {"duplicate": False, "result": f"INSERT INTO invoices VALUES ('{inputs['file_name']}');"}
+        elif inputs:
+            self.inserted.append(self.values["result"])
+            self.values["saved"] = True
+
+    def get_state(self, config):
+        return SimpleNamespace(values=self.values, next=("human_approval",))
+
+    def stream(self, inputs, config, stream_mode=None):
+        yield {"router": {"process_data": False}}
+        yield {"write_query": {"query": "SELECT SUM(total_price) FROM invoices;"}}
+        yield {"generate_answer": {"answer": f"You asked: {inputs['question']}"}}
+
+
+async def request(app, path, method="GET", body=None, **kwargs):
+    """Serves app on a free port for one request; errors are returned, not raised."""
+    sock, port = tornado.testing.bind_unused_port()
+    server = tornado.httpserver.HTTPServer(app)
+    server.add_sockets([sock])
+    try:
+        client = tornado.httpclient.AsyncHTTPClient()
+        return await client.fetch(f"http://127.0.0.1:{port}{path}", method=method, body=body,
+                                  raise_error=False, **kwargs)
+    finally:
+        server.stop()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestApi:
+    """Tests for the headless HTTP API"""
+
+    def test_inline_receipt_then_approval(self):
+        """Test that an upload stops at the approval with its INSERT, and approving it saves it"""
+        graph = FakeGraph()
+        app = api.make_app(graph=graph, report_graph=FakeGraph(), max_concurrency=2, acquire_timeout_s=1)
+
+        async def scenario():
+            uploaded = await request(app, "/receipts?name=receipt.pdf", "POST", b"%PDF receipt")
+            receipt = json.loads(uploaded.body)
+            assert receipt["status"] == "awaiting_approval" and "receipt.pdf" in receipt["result"]
+            approved = await request(app, f"/receipts/{receipt['id']}/approval", "POST", json.dumps({"approved": True}))
+            assert json.loads(approved.body)["status"] == "done"
+            again = await request(app, f"/receipts/{receipt['id']}/approval", "POST", json.dumps({"approved": True}))
+            assert again.code == 409
+            missing = await request(app, "/receipts/abc123")
+            assert missing.code == 404
+
+        run(scenario())
+        assert graph.inserted == ["INSERT INTO invoices VALUES ('receipt.pdf');"]
+
+    def test_queued_receipt(self, tmp_path):
+        """Test that with a job queue an upload is answered 202 and approved on the job"""
+        queue = JobQueue(path=str(tmp_path / "jobs.sqlite"), max_attempts=2, lease_s=60, retry_base_s=0)
+        app = api.make_app(graph=FakeGraph(), report_graph=FakeGraph(), job_queue=queue,
+                           max_concurrency=2, acquire_timeout_s=1)
+
+        async def scenario():
+            uploaded = await request(app, "/receipts?name=receipt.pdf", "POST", b"%PDF receipt")
+            assert uploaded.code == 202
+            job_id = json.loads(uploaded.body)["id"]
+            assert json.loads((await request(app, f"/receipts/{job_id}")).body)["status"] == "queued"
+            early = await request(app, f"/receipts/{job_id}/approval", "POST", json.dumps({"approved": True}))
+            assert early.code == 409
+
+        run(scenario())
+
+    def test_question_is_streamed(self):
+        """Test that a question streams one JSON line per graph step, ending with the answer and usage"""
+        app = api.make_app(graph=FakeGraph(), report_graph=FakeGraph(), max_concurrency=2, acquire_timeout_s=1)
+        response = run(request(app, "/questions", "POST", json.dumps({"question": "How much did I spend?"})))
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response.body.decode().splitlines()]
+        assert [event["event"] for event in events] == ["router", "write_query", "generate_answer", "usage"]
+        assert events[2]["answer"] == "You asked: How much did I spend?"
+        assert run(request(app, "/questions", "POST", json.dumps({}))).code == 400
+
+    def test_requests_over_the_limit_are_rejected(self):
+        """Test that a request waiting longer than the acquire timeout for a slot gets a 503 with Retry-After"""
+        release = threading.Event()
+        app = api.make_app(graph=FakeGraph(release), report_graph=FakeGraph(), max_concurrency=1,
+                           acquire_timeout_s=0.05)
+
+        async def scenario():
+            busy = asyncio.ensure_future(request(app, "/receipts?name=a.pdf", "POST", b"%PDF a"))
+            await asyncio.sleep(0.1)
+            rejected = await request(app, "/receipts?name=b.pdf", "POST", b"%PDF b")
+            metrics = json.loads((await request(app, "/metrics")).body)["requests"]
+            release.set()
+            return rejected, metrics, await busy
+
+        rejected, metrics, busy = run(scenario())
+        assert rejected.code == 503 and rejected.headers["Retry-After"] == "1"
+        assert metrics["rejected"] == 1 and metrics["in_flight"] == 1
+        assert busy.code == 200
@@ -0,0 +1,165 @@
+import sqlite3
+from decimal import Decimal
+import pytest
+from src.database import INVOICE_COLUMNS, InsertError, get_schema, insert_receipts
+from src.invoice_rows import build_insert_query, parse_insert_query
+from src.sql_commands import invoices_table, normalize_migrations, sql_commands, sqlite_commands
+from tests.test_receipt_validation import extraction
+
+sqlite3.register_adapter(Decimal, str)
+
+class FlakyCursor(sqlite3.Cursor):
+    def execute(self, statement, params=()):
+        # After the INSERT of the same transaction has run
+        if statement.startswith("DELETE") and self.connection.failures:
+            self.connection.failures.pop()
+            raise sqlite3.OperationalError("server closed the connection unexpectedly")
+        result = super().execute(statement, params)
+        # Another append to the receipt commits its line right after this one read MAX(line_number)
+        if statement.startswith("SELECT COALESCE(MAX") and self.connection.concurrent_lines:
+            stored_max = result.fetchone()[0]
+            super().execute("INSERT INTO line_items SELECT receipt_id, ?, ?, quantity, unit, unitary_value, "
+                            "total_value, product_id FROM line_items WHERE receipt_id = ? AND line_number = 1",
+                            (stored_max + 1, self.connection.concurrent_lines.pop(), params[0]))
+            self.connection.commit()
+            return super().execute("SELECT ?", (stored_max,))
+        return result
+
+
+class FlakyConnection(sqlite3.Connection):
+    failures = []
+    concurrent_lines = []
+
+    def cursor(self, factory=FlakyCursor):
+        return super().cursor(factory)
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "invoices.db")
+    with sqlite3.connect(path) as db:
+        for command in sqlite_commands(sql_commands):
+            db.execute(command)
+    return path
+
+
+def save(path, query, failures=0, append=False, max_retries=2, concurrent_lines=()):
+    FlakyConnection.failures = [True] * failures
+    FlakyConnection.concurrent_lines = list(concurrent_lines)
+    return insert_receipts(query, lambda: sqlite3.connect(path, factory=FlakyConnection), append=append,
+                           placeholder="?", max_retries=max_retries, retry_base_s=0, sleep=lambda s: None)
+
+
+def first_line(query):
+    return build_insert_query(parse_insert_query(query)[:1])
+
+
+def as_text(row):
+    """Numbers as text, so amounts read back from SQLite compare with the parsed decimals."""
+    return tuple(str(value) if isinstance(value, (int, float, Decimal)) else value for value in row)
+
+
+def stored(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT line_number, description FROM invoices ORDER BY line_number").fetchall()
+
+
+class TestInsertReceipts:
+    """Tests for the transactional receipt upsert"""
+
+    def test_saving_again_leaves_one_copy(self, database):
+        """Test that a receipt saved twice, or again with fewer lines, is stored as saved once"""
+        query = extraction()
+        assert save(database, query) == {"receipts": 1, "rows": 2, "retries": 0}
+        save(database, query)
+        assert [line for line, _ in stored(database)] == [1, 2]
+        save(database, first_line(extraction(description="LTE ITALAC 1L")))
+        assert stored(database) == [(1, "LTE ITALAC 1L")]
+
+    def test_every_receipt_of_a_file_is_saved(self, database):
+        """Test that one INSERT per receipt, joined as a multi-receipt file is extracted, saves every receipt"""
+        first = extraction()
+        second = first.replace("12124448", "12124449")
+        assert save(database, first + "\n" + second) == {"receipts": 2, "rows": 4, "retries": 0}
+        with sqlite3.connect(database) as db:
+            keys = [key for (key,) in db.execute("SELECT invoice_id FROM receipts ORDER BY invoice_id")]
+        assert [key[-8:] for key in keys] == ["12124448", "12124449"]
+
+    def test_append_numbers_after_stored_lines(self, database):
+        """Test that a purchase added by hand is stored after the receipt's lines instead of over them"""
+        save(database, extraction())
+        save(database, first_line(extraction()), append=True)
+        assert [line for line, _ in stored(database)] == [1, 2, 3]
+
+    def test_concurrent_appends_keep_both_lines(self, database):
+        """Test that an append racing another append to the same receipt is retried instead of overwriting it"""
+        save(database, extraction())
+        summary = save(database, first_line(extraction(description="LTE ITALAC 1L")), append=True,
+                       concurrent_lines=["ADDED ELSEWHERE"])
+        assert summary["retries"] == 1
+        assert stored(database)[2:] == [(3, "ADDED ELSEWHERE"), (4, "LTE ITALAC 1L")]
+
+    def test_transient_error_is_retried(self, database):
+        """Test that a transaction failing halfway is rolled back and retried without duplicating rows"""
+        summary = save(database, extraction(), failures=2)
+        assert summary["retries"] == 2 and summary["rows"] == 2
+        assert len(stored(database)) == 2
+
+    def test_failures_are_reported(self, database):
+        """Test that retries running out, or an error that is not transient, raise InsertError and save nothing"""
+        with pytest.raises(InsertError, match="0 of 1 saved"):
+            save(database, extraction(), failures=3)
+        with pytest.raises(InsertError, match="IntegrityError"):
+            save(database, extraction(category=None))
+        assert stored(database) == []
+        with pytest.raises(ValueError):
+            save(database, "I could not read this receipt.")
+
+
+class TestNormalizedSchema:
+    """Tests for the normalized tables behind the invoices view and the migration to them"""
+
+    def test_view_returns_the_saved_rows(self, database):
+        """Test that the invoices view gives back the rows as extracted, with stores and products stored once"""
+        query = extraction()
+        save(database, query)
+        save(database, query.replace("12124448", "12124449"))
+        with sqlite3.connect(database) as db:
+            rows = db.execute(f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices "
+                              "WHERE invoice_id LIKE '%48' ORDER BY line_number").fetchall()
+            counts = [db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("stores", "categories", "products", "receipts", "line_items")]
+        expected = [tuple(row[column] for column in INVOICE_COLUMNS) for row in parse_insert_query(query)]
+        assert [as_text(row) for row in rows] == [as_text(row) for row in expected]
+        assert counts == [1, 1, 2, 2, 4]
+
+    def test_migration_from_the_wide_table(self, tmp_path):
+        """Test that migrating the wide invoices table keeps every row readable through the view"""
+        path = str(tmp_path / "wide.db")
+        rows = [(key, store, "2024-07-12", description, 1, "Un", 2.5, 2.5, product, product, volume, "Outros", n)
+                for key, store in (("3525" + "1" * 40, "SuperNova"), ("3525" + "2" * 40, "VivaBem"))
+                for n, (description, product, volume) in enumerate(
+                    [("LTE 1L", "Leite", "1L"), ("BANANA KG", "Banana", None), ("LTE 1L", "Leite", "1L")], 1)]
+        with sqlite3.connect(path) as db:
+            db.execute(sqlite_commands([invoices_table])[0])
+            db.executemany(f"INSERT INTO invoices VALUES ({', '.join(['?'] * 13)})", rows)
+        with sqlite3.connect(path) as db:
+            for command in sqlite_commands(normalize_migrations):
+                db.execute(command)
+        with sqlite3.connect(path) as db:
+            migrated = db.execute("SELECT * FROM invoices ORDER BY invoice_id, line_number").fetchall()
+            assert db.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 2
+        assert migrated == rows
+        save(path, extraction())
+        assert len(stored(path)) == 8
+
+    def test_report_schema_describes_the_view(self, tmp_path):
+        """Test that the report agents are given the invoices view, not the normalized tables, after the migration"""
+        path = str(tmp_path / "wide.db")
+        with sqlite3.connect(path) as db:
+            db.execute(sqlite_commands([invoices_table])[0])
+            for command in sqlite_commands(normalize_migrations):
+                db.execute(command)
+        schema = get_schema(f"sqlite:///{path}")
+        assert list(schema) == ["invoices"]
+        assert [column["name"] for column in schema["invoices"]] == INVOICE_COLUMNS + ["line_number"]
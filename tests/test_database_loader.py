@@ -0,0 +1,102 @@
+import datetime
+from decimal import Decimal
+from src.database import (INVOICE_COLUMNS, frames_from_cursor, concat_invoice_frames, write_invoice_snapshot,
+                          load_invoice_snapshot, readable_snapshot_info, snapshot_info)
+
+ROWS = [
+    (Decimal("35250447508411271427651040001883521912124444"), "SuperNova Alimentos", datetime.date(2025, 1, 1),
+     "LTE ITALAC ZERO 1L", Decimal("3.0000"), "Un", Decimal("5.89"), Decimal("17.67"),
+     "Leite", "Leite Italac", "1L", "Laticínios"),
+    (Decimal("35250447508411271427651040001874681561004444"), "VivaBem Supermarket", datetime.date(2025, 3, 1),
+     "CERV BLUE MOON 350ML", Decimal("1.0000"), "Un", Decimal("8.99"), Decimal("8.99"),
+     "Cerveja", "Cerveja Blue Moon", "350ML", "Bebidas"),
+    (Decimal("35250447508411271427651040001874681561004444"), "VivaBem Supermarket", datetime.date(2025, 3, 1),
+     "BANANA PRATA KG", Decimal("1.2350"), "Kg", Decimal("6.98"), Decimal("8.62"),
+     "Banana", "Banana", None, "Hortifruti"),
+]
+
+
+class FakeCursor:
+    """DB-API cursor serving fixed rows"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+class TestStreamingLoader:
+    """Tests for the chunked invoice loader helpers"""
+
+    def test_chunks_respect_chunksize(self):
+        """Test that the cursor is consumed in chunks"""
+        frames = list(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS, chunksize=2))
+        assert [len(frame) for frame in frames] == [2, 1]
+
+    def test_dtypes(self):
+        """Test that the compact dtypes are applied"""
+        df = concat_invoice_frames(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS, 2), INVOICE_COLUMNS)
+        assert str(df["supermarket_name"].dtype) == "category"
+        assert str(df["unit"].dtype) == "category"
+        assert str(df["unitary_value"].dtype) == "float32"
+        assert str(df["total_value"].dtype) == "float64"
+        assert df["datetime"].dtype.kind == "M"
+
+    def test_invoice_id_is_exact(self):
+        """Test that 44-digit access keys are not rounded"""
+        df = concat_invoice_frames(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS, 2), INVOICE_COLUMNS)
+        assert df["invoice_id"].iloc[0] == "35250447508411271427651040001883521912124444"
+
+    def test_categories_are_merged_across_chunks(self):
+        """Test that chunks with different categories concatenate to a categorical"""
+        df = concat_invoice_frames(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS, 1), INVOICE_COLUMNS)
+        assert str(df["category"].dtype) == "category"
+        assert sorted(df["category"].cat.categories) == ["Bebidas", "Hortifruti", "Laticínios"]
+
+    def test_column_projection(self):
+        """Test that only the requested columns are built"""
+        columns = ["supermarket_name", "total_value"]
+        rows = [(row[1], row[7]) for row in ROWS]
+        df = concat_invoice_frames(frames_from_cursor(FakeCursor(rows), columns), columns)
+        assert list(df.columns) == columns
+
+
+class TestInvoiceSnapshot:
+    """Tests for the month-partitioned Parquet snapshot"""
+
+    def test_round_trip_with_metadata(self, tmp_path):
+        """Test that the snapshot keeps every row and records its date range"""
+        path = str(tmp_path / "snapshot")
+        info = write_invoice_snapshot(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS, 2), path)
+        assert info["rows"] == 3
+        assert (info["min_date"], info["max_date"]) == ("2025-01-01", "2025-03-01")
+        assert snapshot_info(path)["exported_at"] == info["exported_at"]
+        assert sorted((tmp_path / "snapshot").glob("month=*")) != []
+        df = load_invoice_snapshot(path)
+        assert len(df) == 3
+        assert str(df["category"].dtype) == "category"
+
+    def test_date_range_and_projection(self, tmp_path):
+        """Test that the date range filter and column projection are applied"""
+        path = str(tmp_path / "snapshot")
+        write_invoice_snapshot(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS), path)
+        df = load_invoice_snapshot(path, start_date=datetime.date(2025, 2, 1), end_date=datetime.date(2025, 3, 31),
+                                   columns=["supermarket_name", "total_value"])
+        assert list(df.columns) == ["supermarket_name", "total_value"]
+        assert set(df["supermarket_name"]) == {"VivaBem Supermarket"}
+
+    def test_missing_snapshot(self, tmp_path):
+        """Test that snapshot_info returns None without a snapshot"""
+        assert snapshot_info(str(tmp_path / "missing")) is None
+
+    def test_empty_snapshot_is_not_readable(self, tmp_path):
+        """Test that a snapshot of an empty table has no date range and is treated as missing by the pages"""
+        path = str(tmp_path / "snapshot")
+        info = write_invoice_snapshot(frames_from_cursor(FakeCursor([]), INVOICE_COLUMNS), path)
+        assert (info["rows"], info["min_date"], info["max_date"]) == (0, None, None)
+        assert snapshot_info(path) is not None
+        assert readable_snapshot_info(path) is None
+        write_invoice_snapshot(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS), path)
+        assert readable_snapshot_info(path)["rows"] == 3
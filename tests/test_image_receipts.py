@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from src.conversion_cache import cache_key, get_cached, put_cached
+from src.image_receipts import is_image, otsu_threshold, preprocess_image, process_image, skew_angle
+
+
+def receipt_photo(angle=3.0, width=1200):
+    """A receipt-like photo: dark text rows on light paper, rotated, on a darker background."""
+    paper = Image.new("L", (width // 2, width), 235)
+    draw = ImageDraw.Draw(paper)
+    for y in range(40, width - 40, 30):
+        draw.rectangle((30, y, width // 2 - 60, y + 10), fill=30)
+    paper = paper.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=90)
+    photo = Image.new("L", (width, paper.height + 200), 90)
+    photo.paste(paper, ((width - paper.width) // 2, 100))
+    return photo.convert("RGB")
+
+
+class TestPreprocessImage:
+    """Tests for preparing receipt photos for OCR"""
+
+    def test_crops_and_deskews(self):
+        """Test that the photo is cropped to the paper and its text rows straightened"""
+        prepared = preprocess_image(receipt_photo(angle=3.0), max_side=2000)
+        assert prepared.mode == "L"
+        assert prepared.width < 700
+        assert skew_angle(prepared) == 0
+        # Mostly paper left, not the dark background
+        assert np.asarray(prepared).mean() > 150
+
+    def test_downscales_large_photos(self):
+        """Test that the longest side is limited to max_side"""
+        prepared = preprocess_image(receipt_photo(width=3000), max_side=800)
+        assert max(prepared.size) <= 800
+
+    def test_otsu_threshold(self):
+        """Test that the threshold falls between the two brightness classes"""
+        pixels = np.array([40] * 100 + [220] * 100, dtype=np.uint8)
+        assert 40 <= otsu_threshold(pixels) < 220
+
+
+class TestProcessImage:
+    """Tests for the photo receipt entry point"""
+
+    def test_is_image(self):
+        """Test that photos are told apart from PDFs by their extension"""
+        assert is_image("receipt.JPG") and is_image("receipt.png")
+        assert not is_image("receipt.pdf")
+
+    def test_unknown_engine(self, tmp_path):
+        """Test that an unknown OCR engine is rejected"""
+        with pytest.raises(ValueError):
+            process_image(str(tmp_path / "receipt.png"), engine="paddle")
+
+
+class TestConversionCache:
+    """Tests for the on-disk cache of converted documents"""
+
+    def test_round_trip(self, tmp_path):
+        """Test that converted pages are stored per content and conversion settings"""
+        path = tmp_path / "receipt.pdf"
+        path.write_bytes(b"%PDF-1.4 receipt")
+        key = cache_key(str(path), "pdf:pages")
+        assert get_cached(key, cache_dir=str(tmp_path / "cache")) is None
+        put_cached(key, ["page 1", "página 2"], cache_dir=str(tmp_path / "cache"))
+        assert get_cached(key, cache_dir=str(tmp_path / "cache")) == ["page 1", "página 2"]
+        assert cache_key(str(path), "image:tesseract:2000") != key
+
+    def test_disabled(self, tmp_path):
+        """Test that an empty cache directory disables the cache"""
+        put_cached("abc", ["page"], cache_dir="")
+        assert get_cached("abc", cache_dir="") is None
@@ -73,18 +73,20 @@ class MockStateGraph:
             raise e
 
 
-# Set up mock modules without relying on patch.dict
+# Set up mock modules
 # Create mock for langgraph module and its submodules
 langgraph_mock = MagicMock()
 langgraph_graph_mock = MagicMock()
 langgraph_checkpoint_mock = MagicMock()
 langgraph_checkpoint_memory_mock = MagicMock()
 
-# Set up the mock module hierarchy
-sys.modules['langgraph'] = langgraph_mock
-sys.modules['langgraph.graph'] = langgraph_graph_mock
-sys.modules['langgraph.checkpoint'] = langgraph_checkpoint_mock
-sys.modules['langgraph.checkpoint.memory'] = langgraph_checkpoint_memory_mock
+# Set up the mock module hierarchy (installed in sys.modules by the fixture below)
+mocked_modules = {
+    'langgraph': langgraph_mock,
+    'langgraph.graph': langgraph_graph_mock,
+    'langgraph.checkpoint': langgraph_checkpoint_mock,
+    'langgraph.checkpoint.memory': langgraph_checkpoint_memory_mock,
+}
 
 # Add StateGraph, START, END to langgraph.graph
 langgraph_graph_mock.StateGraph = MockStateGraph
@@ -108,14 +110,21 @@ src_sql_query_mock.generate_answer = MagicMock(return_value="The total amount is
 src_database_mock = MagicMock()
 src_database_mock.insert_sql_query = MagicMock(return_value=None)
 
-# Add src modules to sys.modules
-sys.modules['src.receipt_processing'] = src_receipt_processing_mock
-sys.modules['src.sql_query'] = src_sql_query_mock
-sys.modules['src.database'] = src_database_mock
+# Add src modules to the mocked modules
+mocked_modules['src.receipt_processing'] = src_receipt_processing_mock
+mocked_modules['src.sql_query'] = src_sql_query_mock
+mocked_modules['src.database'] = src_database_mock
 
 # Mock typing_extensions
 typing_extensions_mock = MagicMock()
-sys.modules['typing_extensions'] = typing_extensions_mock
+mocked_modules['typing_extensions'] = typing_extensions_mock
+
+
+@pytest.fixture(autouse=True, scope="module")
+def mock_modules():
+    """Install the mocked modules only while this module's tests run, so other test modules import the real ones"""
+    with patch.dict(sys.modules, mocked_modules):
+        yield
 
 
 # Define our own GraphState for testing purposes
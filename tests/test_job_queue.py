@@ -0,0 +1,171 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from src import llm_usage, tracing
+from src.job_queue import JobQueue
+from src import job_worker
+from src.job_worker import run_job
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_accounting():
+    llm_usage.set_usage_store(llm_usage.UsageStore(":memory:"))
+    tracing.set_exporter(DiscardExporter())
+    yield
+    llm_usage.set_usage_store(None)
+    tracing.set_exporter(None)
+
+
+@pytest.fixture(autouse=True)
+def plain_approval(monkeypatch):
+    monkeypatch.setattr(job_worker, "approval_command", lambda approved: approved)
+
+
+def make_queue(path):
+    return JobQueue(path=path, max_attempts=2, lease_s=60, retry_base_s=0)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return make_queue(str(tmp_path / "jobs.sqlite"))
+
+
+class FakeGraph:
+    """Stands in for the invoice graph: the extract step yields node updates, the insert step records the approval."""
+
+    def __init__(self, result="INSERT INTO invoices VALUES (1);", duplicate=False, error=None, auto_approved=False,
+                 save_error=None):
+        self.values = {"process_data": True, "duplicate": duplicate, "result": result, "auto_approved": auto_approved,
+                       "saved": auto_approved and not save_error, "save_error": save_error or ""}
+        self.error = error
+        self.save_error = save_error
+        self.inserted = []
+        self.checkpointer = MagicMock()
+
+    def stream(self, inputs, config, stream_mode=None):
+        assert inputs["file_bytes"] == b"%PDF receipt"
+        for node in ("router", "process_pdf_receipt", "extract_data", "validate_data"):
+            if self.error and node == "process_pdf_receipt":
+                raise self.error
+            yield {node: {}}
+        if self.values["saved"]:
+            self.inserted.append(self.values["result"])
+
+    def get_state(self, config):
+        waiting = not self.values["duplicate"] and not self.values["auto_approved"]
+        return SimpleNamespace(values=self.values, next=("human_approval",) if waiting else ())
+
+    def update_state(self, config, values, as_node=None):
+        assert as_node == "validate_data" and not values["auto_approved"]
+        self.pending = values
+
+    def invoke(self, command, config):
+        if command is not None and not self.save_error:
+            self.inserted.append(self.pending["result"])
+            self.values["saved"] = True
+
+
+class TestJobQueue:
+    """Tests for the SQLite receipt job queue"""
+
+    def test_enqueue_once_per_content(self, queue):
+        """Test that the same upload is not queued twice while it is being processed"""
+        first = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        assert queue.enqueue("copy.pdf", b"%PDF receipt") == first
+        assert queue.enqueue("other.pdf", b"%PDF other") != first
+        assert queue.metrics()["queued"] == 2
+
+    def test_extract_then_approve_then_insert(self, queue):
+        """Test that a job waits for approval with its INSERT, then is inserted by a worker"""
+        job_id = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        graph = FakeGraph()
+        run_job(queue, graph, queue.claim("w1"), "w1")
+        job = queue.get(job_id)
+        assert job["status"] == "awaiting_approval" and job["result"] == graph.values["result"]
+        assert queue.claim("w1") is None
+
+        # A new queue object, as after an app restart
+        queue = make_queue(queue.path)
+        assert queue.approve(job_id)
+        claimed = queue.claim("w2")
+        assert claimed["step"] == "insert" and claimed["state"]["result"] == graph.values["result"]
+        run_job(queue, graph, claimed, "w2")
+        assert queue.get(job_id)["status"] == "done"
+        assert graph.inserted == [graph.values["result"]]
+
+    def test_validated_receipt_is_saved_without_approval(self, queue):
+        """Test that a receipt the graph validated and saved finishes in the extract step"""
+        job_id = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        graph = FakeGraph(auto_approved=True)
+        run_job(queue, graph, queue.claim("w1"), "w1")
+        assert queue.get(job_id)["status"] == "done"
+        assert graph.inserted == [graph.values["result"]]
+        assert queue.claim("w1") is None
+
+    def test_unsaved_receipt_is_retried(self, queue):
+        """Test that a receipt insert_data could not save fails the step, with the reason, for an insert retry"""
+        job_id = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        graph = FakeGraph(auto_approved=True, save_error="InsertError: connection lost")
+        run_job(queue, graph, queue.claim("w1"), "w1")
+        job = queue.get(job_id)
+        assert job["status"] == "approved" and "connection lost" in job["error"]
+
+        # The retry only repeats the insert, with the extraction kept on the job
+        claimed = queue.claim("w1")
+        assert claimed["step"] == "insert" and claimed["state"]["result"] == graph.values["result"]
+        retry = FakeGraph(auto_approved=True)
+        retry.stream = MagicMock(side_effect=AssertionError("extraction repeated"))
+        run_job(queue, retry, claimed, "w1")
+        assert queue.get(job_id)["status"] == "done"
+        assert retry.inserted == [graph.values["result"]]
+
+    def test_duplicate_and_rejected(self, queue):
+        """Test that stored receipts finish without approval and discarded ones are not inserted"""
+        duplicate = queue.enqueue("stored.pdf", b"%PDF receipt")
+        run_job(queue, FakeGraph(result="Receipt 1 is already stored.", duplicate=True), queue.claim("w1"), "w1")
+        assert queue.get(duplicate)["status"] == "duplicate"
+
+        rejected = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        run_job(queue, FakeGraph(), queue.claim("w1"), "w1")
+        assert queue.approve(rejected, approved=False)
+        assert queue.get(rejected)["status"] == "rejected"
+        assert not queue.approve(rejected)
+
+    def test_retries_then_fails(self, queue):
+        """Test that a failing job is retried up to max_attempts and then marked failed"""
+        job_id = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        graph = FakeGraph(error=RuntimeError("docling crashed"))
+        run_job(queue, graph, queue.claim("w1"), "w1")
+        assert queue.get(job_id)["status"] == "queued"
+        run_job(queue, graph, queue.claim("w1"), "w1")
+        job = queue.get(job_id)
+        assert job["status"] == "failed" and job["attempts"] == 2
+        assert "docling crashed" in job["error"]
+
+    def test_expired_lease_is_reclaimed(self, queue):
+        """Test that the job of a worker that stopped is taken over after its lease expires"""
+        queue.lease_s = 0.01
+        job_id = queue.enqueue("receipt.pdf", b"%PDF receipt")
+        assert queue.claim("w1")["id"] == job_id
+        time.sleep(0.02)
+        reclaimed = queue.claim("w2")
+        assert reclaimed["id"] == job_id and reclaimed["attempts"] == 2
+
+    def test_metrics(self, queue):
+        """Test queue depth, wait times and worker utilization"""
+        queue.register_worker("w1")
+        queue.enqueue("a.pdf", b"a")
+        queue.enqueue("b.pdf", b"b")
+        run_job(queue, FakeGraph(), dict(queue.claim("w1"), file_bytes=b"%PDF receipt"), "w1")
+        queue.worker_heartbeat("w1", busy_s=0.5)
+        metrics = queue.metrics()
+        assert metrics["queued"] == 1
+        assert metrics["depth"]["awaiting_approval"] == 1
+        assert metrics["steps"] == 1 and metrics["wait_p50_s"] >= 0
+        assert metrics["workers"] == 1 and metrics["utilization"] > 0
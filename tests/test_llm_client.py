@@ -0,0 +1,176 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from src import llm_client, llm_usage, tracing
+from src.llm_client import LLMClient, build_llm_client, get_llm_client, is_retryable, set_llm_client
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                           usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+
+def fake_openai(*outcomes):
+    """An OpenAI-style client answering with each outcome in turn; exceptions are raised."""
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return completion(outcome)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)), calls=calls)
+
+
+class FixedRandom:
+    def uniform(self, low, high):
+        return high
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_accounting():
+    llm_usage.set_usage_store(llm_usage.UsageStore(":memory:"))
+    tracing.set_exporter(DiscardExporter())
+    yield
+    llm_usage.set_usage_store(None)
+    tracing.set_exporter(None)
+
+
+def make_client(openai_client, sleeps, **kwargs):
+    kwargs.setdefault("max_retries", 3)
+    return LLMClient(openai_client, chat_model=None, max_concurrency=kwargs.pop("max_concurrency", 4),
+                     retry_base_s=1.0, retry_max_s=8.0, sleep=sleeps.append, rng=FixedRandom(), **kwargs)
+
+
+class TestRetries:
+    """Tests for the shared retry policy"""
+
+    def test_retries_rate_limits_with_backoff(self):
+        """Test that rate limits are retried with growing delays until the call succeeds"""
+        sleeps = []
+        openai_client = fake_openai(RateLimitError(), RateLimitError(), "SELECT 1")
+        client = make_client(openai_client, sleeps)
+        assert client.chat("sql_agent", [{"role": "user", "content": "q"}], model="gpt-4o") == "SELECT 1"
+        assert len(openai_client.calls) == 3
+        assert sleeps == [1.0, 2.0]
+
+    def test_honours_retry_after(self):
+        """Test that the server's Retry-After hint sets the minimum delay"""
+        sleeps = []
+        client = make_client(fake_openai(RateLimitError(retry_after="5"), "ok"), sleeps)
+        client.chat("supervisor", [], model="gpt-4o")
+        assert sleeps == [5.0]
+
+    def test_gives_up_after_max_retries(self):
+        """Test that the last error is raised once the retries are used up"""
+        sleeps = []
+        openai_client = fake_openai(StatusError(503))
+        client = make_client(openai_client, sleeps, max_retries=2)
+        with pytest.raises(StatusError):
+            client.chat("report_writer", [], model="gpt-4o")
+        assert len(openai_client.calls) == 3
+        assert sleeps == [1.0, 2.0]
+
+    def test_client_errors_are_not_retried(self):
+        """Test that errors such as a bad request are raised immediately"""
+        sleeps = []
+        openai_client = fake_openai(StatusError(400))
+        with pytest.raises(StatusError):
+            make_client(openai_client, sleeps).chat("sql_agent", [], model="gpt-4o")
+        assert len(openai_client.calls) == 1
+        assert sleeps == []
+
+    def test_budget_errors_are_not_retried(self):
+        """Test that an exhausted budget stops the call without retrying"""
+        assert not is_retryable(llm_usage.BudgetExceededError("over budget"))
+        assert is_retryable(StatusError(429))
+
+
+class TestConcurrency:
+    """Tests for the limit on concurrent LLM requests"""
+
+    def test_limits_concurrent_requests(self):
+        """Test that no more than max_concurrency requests are in flight at once"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def create(**kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return completion("ok")
+
+        openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        client = make_client(openai_client, [], max_concurrency=2)
+        threads = [threading.Thread(target=client.chat, args=("chat", []), kwargs={"model": "gpt-4o"})
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(peak) == 6
+        assert max(peak) <= 2
+
+
+@pytest.fixture
+def stage_backends(monkeypatch):
+    """Routes extraction to 'local' and everything else to 'openai', building placeholder clients."""
+    monkeypatch.setattr(llm_client, "STAGE_BACKENDS", {"extraction": "local", "sql": "", "report": ""})
+    monkeypatch.setattr(llm_client, "LLM_BACKEND", "openai")
+    monkeypatch.setattr(llm_client, "build_llm_client", lambda backend: SimpleNamespace(backend=backend))
+    monkeypatch.setattr(llm_client, "_clients", {})
+    monkeypatch.setattr(llm_client, "_overrides", {})
+
+
+class TestStageBackends:
+    """Tests for choosing the LLM backend per pipeline stage"""
+
+    def test_stages_share_clients_per_backend(self, stage_backends):
+        """Test that each stage gets its backend and stages on one backend share a client"""
+        assert get_llm_client("extraction").backend == "local"
+        assert get_llm_client("sql").backend == "openai"
+        assert get_llm_client("sql") is get_llm_client("report") is get_llm_client()
+
+    def test_override_one_stage(self, stage_backends):
+        """Test that a client set for one stage leaves the other stages alone"""
+        fake = SimpleNamespace(backend="fake")
+        set_llm_client(fake, stage="sql")
+        assert get_llm_client("sql") is fake
+        assert get_llm_client("report").backend == "openai"
+
+    def test_override_all_stages(self, stage_backends):
+        """Test that a client set without a stage replaces every stage until it is reset"""
+        fake = SimpleNamespace(backend="fake")
+        set_llm_client(fake)
+        assert get_llm_client("extraction") is fake
+        set_llm_client(None)
+        assert get_llm_client("extraction").backend == "local"
+
+    def test_unknown_backend(self):
+        """Test that a misspelled backend is rejected"""
+        with pytest.raises(ValueError, match="Unknown LLM backend"):
+            build_llm_client("gpt4all")
@@ -0,0 +1,95 @@
+import pytest
+from types import SimpleNamespace
+from src import tracing
+from src.llm_usage import (BudgetExceededError, UsageStore, chat_completion, estimate_cost, llm_call,
+                           set_usage_store, usage_scope)
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+def fake_client(prompt_tokens=1000, completion_tokens=200):
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+
+
+@pytest.fixture
+def store():
+    store = UsageStore(":memory:")
+    set_usage_store(store)
+    tracing.set_exporter(DiscardExporter())
+    yield store
+    set_usage_store(None)
+    tracing.set_exporter(None)
+
+
+class TestEstimateCost:
+    """Tests for the per-model price table"""
+
+    def test_known_model(self):
+        """Test that gpt-4o is priced per million input and output tokens"""
+        assert estimate_cost("gpt-4o", 1_000_000, 100_000) == pytest.approx(3.50)
+
+    def test_unknown_model_is_free(self):
+        """Test that a model without a price counts tokens but no cost"""
+        assert estimate_cost("local-llama", 5000, 500) == 0.0
+
+
+class TestLLMUsage:
+    """Tests for per-call accounting and scope budgets"""
+
+    def test_chat_completion_is_recorded(self, store):
+        """Test that an OpenAI-style call lands in the usage table with its scope"""
+        with usage_scope("report", budget_usd=0, max_calls=0) as scope:
+            chat_completion(fake_client(), "supervisor", attempt=2, model="gpt-4o", messages=[])
+        assert (scope.calls, scope.prompt_tokens, scope.completion_tokens) == (1, 1000, 200)
+        assert scope.cost_usd == pytest.approx(0.0045)
+
+        rows = store.query("SELECT scope_kind, scope_id, call_name, prompt_tokens, status FROM llm_calls")
+        assert rows.to_dict("records") == [{"scope_kind": "report", "scope_id": scope.scope_id,
+                                            "call_name": "supervisor", "prompt_tokens": 1000, "status": "ok"}]
+
+    def test_tokens_recorded_on_the_span(self, store):
+        """Test that tokens recorded by a callback inside llm_call are accounted"""
+        with usage_scope("chat", budget_usd=0) as scope:
+            with llm_call("write_query", "gpt-4o-mini"):
+                tracing.record_token_usage(tracing.current_span(), 300, 20)
+        assert scope.prompt_tokens == 300
+        assert store.summary("2000-01-01", "call_name")["calls"].tolist() == [1]
+
+    def test_call_budget_aborts_runaway_loops(self, store):
+        """Test that the call limit stops further LLM calls in the scope"""
+        client = fake_client()
+        with usage_scope("report", budget_usd=0, max_calls=3):
+            for _ in range(3):
+                chat_completion(client, "supervisor", model="gpt-4o", messages=[])
+            with pytest.raises(BudgetExceededError):
+                chat_completion(client, "supervisor", model="gpt-4o", messages=[])
+
+    def test_cost_budget(self, store):
+        """Test that a scope stops once its cost budget is spent"""
+        with usage_scope("receipt", budget_usd=0.005, max_calls=0):
+            chat_completion(fake_client(), "extract_receipt_data", model="gpt-4o", messages=[])
+            chat_completion(fake_client(), "extract_receipt_data", model="gpt-4o", messages=[])
+            with pytest.raises(BudgetExceededError, match="budget"):
+                chat_completion(fake_client(), "extract_receipt_data", model="gpt-4o", messages=[])
+
+    def test_failed_call_is_recorded(self, store):
+        """Test that a failing call is stored with an error status and re-raised"""
+        def fail(**kwargs):
+            raise TimeoutError("timed out")
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fail)))
+        with pytest.raises(TimeoutError):
+            chat_completion(client, "report_writer", model="gpt-4o", messages=[])
+        assert store.query("SELECT status FROM llm_calls")["status"].tolist() == ["error"]
+
+    def test_nested_scope_reuses_outer(self, store):
+        """Test that a scope opened inside another one accounts to the outer scope"""
+        with usage_scope("report", budget_usd=0, max_calls=0) as outer:
+            with usage_scope("chat") as inner:
+                chat_completion(fake_client(), "sql_agent", model="gpt-4o", messages=[])
+        assert inner is outer
+        assert outer.calls == 1
@@ -0,0 +1,74 @@
+import json
+import logging
+import pytest
+from src import logging_utils
+from src.logging_utils import configure_logging, flush_logs, log_bytes, shutdown_logging, truncate
+from src.tracing import set_exporter, span
+
+
+class CountingPayload:
+    def __init__(self):
+        self.rendered = 0
+
+    def __str__(self):
+        self.rendered += 1
+        return "x" * 1000
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+@pytest.fixture
+def json_log(tmp_path):
+    path = tmp_path / "app.log"
+    set_exporter(DiscardExporter())
+    configure_logging(level="INFO", fmt="json", path=str(path))
+    yield path
+    shutdown_logging()
+    set_exporter(None)
+
+
+class TestTruncate:
+    """Tests for lazy, size-limited log payloads"""
+
+    def test_cuts_long_payloads(self):
+        """Test that payloads are cut at max_chars with a note of what was dropped"""
+        assert str(truncate("a" * 30, max_chars=10)) == "aaaaaaaaaa... [20 more chars]"
+        assert str(truncate("short", max_chars=10)) == "short"
+
+    def test_not_rendered_when_level_disabled(self, json_log):
+        """Test that a DEBUG payload is never converted to text at INFO level"""
+        payload = CountingPayload()
+        logging.getLogger("tests.lazy").debug("prompt: %s", truncate(payload, max_chars=100))
+        flush_logs()
+        assert payload.rendered == 0
+
+
+class TestConfigureLogging:
+    """Tests for the queued, structured log output"""
+
+    def test_json_lines_with_trace_context(self, json_log):
+        """Test that records are written as JSON with the active trace id"""
+        with span("chat.question") as root:
+            logging.getLogger("tests.json").info("Generated SQL: %s", truncate("SELECT 1", max_chars=100))
+        flush_logs()
+        entry = json.loads(json_log.read_text(encoding="utf-8").splitlines()[-1])
+        assert entry["message"] == "Generated SQL: SELECT 1"
+        assert entry["level"] == "INFO"
+        assert entry["trace_id"] == root.trace_id
+
+    def test_counts_bytes_per_trace(self, json_log):
+        """Test that the bytes written while a trace is active are attributed to it"""
+        with span("report.generate") as root:
+            logging.getLogger("tests.bytes").info("Report generated (%d chars)", 1234)
+        flush_logs()
+        assert log_bytes(root.trace_id) == len(json_log.read_bytes())
+        assert log_bytes("unknown") == 0
+
+    def test_configure_is_idempotent(self, json_log):
+        """Test that configuring twice keeps a single queue handler"""
+        configure_logging()
+        handlers = [h for h in logging.getLogger().handlers if isinstance(h, logging_utils.DeferredQueueHandler)]
+        assert len(handlers) == 1
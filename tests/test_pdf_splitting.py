@@ -0,0 +1,34 @@
+from src.pdf_splitting import split_receipts
+from tests.test_receipt_parser import RECEIPT
+
+OTHER_RECEIPT = (RECEIPT.replace("## SuperNova Alimentos", "## Mercado Central")
+                 .replace("4444\n", "5555\n"))
+
+
+class TestSplitReceipts:
+    """Tests for cutting converted pages into one document per receipt"""
+
+    def test_receipts_on_one_page(self):
+        """Test that two receipts on the same page are split at the second store header"""
+        documents = split_receipts([RECEIPT + "\n" + OTHER_RECEIPT])
+        assert len(documents) == 2
+        assert documents[0].startswith("## SuperNova Alimentos") and documents[0].endswith("4444")
+        assert documents[1].startswith("## Mercado Central") and documents[1].endswith("5555")
+
+    def test_receipt_spanning_pages(self):
+        """Test that the pages of one receipt are joined until its totals and access key"""
+        first, second = RECEIPT.split("| 7890000000008 |")
+        documents = split_receipts([first, "| 7890000000008 |" + second, OTHER_RECEIPT])
+        assert len(documents) == 2
+        assert "BANANA PRATA KG" in documents[0] and "LTE ITALAC ZERO 1L" in documents[0]
+
+    def test_consumer_cnpj_in_footer(self):
+        """Test that the consumer's CNPJ after the total does not start a new receipt"""
+        receipt = RECEIPT.replace("Valor total R$ 22,79\n", "Valor total R$ 22,79\n\nCONSUMIDOR CNPJ: 12.345.678/0001-90\n")
+        assert split_receipts([receipt]) == [receipt.strip()]
+
+    def test_header_right_after_access_key(self):
+        """Test that the access key stays with its receipt when the next one has no store name line"""
+        documents = split_receipts([RECEIPT + "CNPJ: 11.222.333/0001-44 RUA A, 1\n"])
+        assert documents[0].endswith("4444")
+        assert documents[1].startswith("CNPJ: 11.222.333")
@@ -0,0 +1,82 @@
+import time
+import pytest
+from src import product_dictionary
+from src.product_dictionary import ProductDictionary, normalize_description
+
+ROWS = [
+    ("SuperNova Alimentos", "LTE ITALAC ZERO 1L", "Leite", "Leite Italac", "1L", "Laticínios", 5),
+    ("SuperNova Alimentos", "CERV BLUE MOON 350ML", "Cerveja", "Cerveja Blue Moon", "350ML", "Bebidas", 2),
+    ("Mercado Central", "CERV BLUE MOON 350ML", "Cerveja", "Cerveja Blue Moon Witbier", "350ML", "Bebidas", 1),
+    ("Mercado Central", "BANANA PRATA KG", "Banana", "Banana", None, "Hortifruti", 3),
+]
+
+
+@pytest.fixture
+def dictionary():
+    dictionary = ProductDictionary(match_threshold=0.75)
+    dictionary.learn(ROWS)
+    return dictionary
+
+
+class TestProductDictionary:
+    """Tests for the product lookup learned from approved rows"""
+
+    def test_exact_match(self, dictionary):
+        """Test that a known description returns its approved product fields"""
+        assert dictionary.lookup("LTE ITALAC ZERO 1L") == {
+            "product": "Leite", "full_product_name": "Leite Italac", "volume": "1L", "category": "Laticínios"}
+
+    def test_store_specific_fields(self, dictionary):
+        """Test that the store's own approval wins over other stores"""
+        assert dictionary.lookup("CERV BLUE MOON 350ML", "Mercado Central")["full_product_name"] == \
+            "Cerveja Blue Moon Witbier"
+        assert dictionary.lookup("CERV BLUE MOON 350ML", "VivaBem Supermarket")["full_product_name"] == \
+            "Cerveja Blue Moon"
+
+    def test_fuzzy_match(self, dictionary):
+        """Test that small spelling differences hit through the trigram index"""
+        assert dictionary.lookup("LTE ITALAC ZER0 1L")["product"] == "Leite"
+        assert dictionary.lookup("CERV BLUE MOON 600ML", "SuperNova Alimentos")["product"] == "Cerveja"
+        assert dictionary.lookup("LTE ITALAC INTEGRAL 1L") is None
+        assert dictionary.lookup("DET YPE NEUTRO 500ML") is None
+
+    def test_hit_rate(self, dictionary):
+        """Test that exact and fuzzy hits are counted"""
+        dictionary.lookup("LTE ITALAC ZERO 1L")
+        dictionary.lookup("LTE ITALAC ZER0 1L")
+        dictionary.lookup("ARROZ CAMIL T1 5KG")
+        dictionary.lookup("FEIJAO KICALDO 1KG")
+        assert (dictionary.exact_hits, dictionary.fuzzy_hits, dictionary.lookups) == (1, 1, 4)
+        assert dictionary.hit_rate == 0.5
+
+    def test_replace_keeps_counters(self, dictionary):
+        """Test that reloading the rows keeps the hit counters"""
+        dictionary.lookup("LTE ITALAC ZERO 1L")
+        dictionary.replace(ROWS[3:])
+        assert dictionary.lookup("LTE ITALAC ZERO 1L") is None
+        assert len(dictionary) == 1
+        assert dictionary.lookups == 2
+
+    def test_normalize_description(self):
+        """Test that accents, case and extra whitespace are ignored"""
+        assert normalize_description("  Feijão  kicaldo 1 kg ") == "FEIJAO KICALDO 1KG"
+
+    def test_saved_rows_are_learned_without_reload(self, dictionary, monkeypatch):
+        """Test that a saved receipt's products are added in place, and the table is reloaded only on schedule"""
+        loads = []
+        monkeypatch.setattr(product_dictionary, "load_product_rows", lambda engine: loads.append(engine) or ROWS)
+        monkeypatch.setattr(product_dictionary, "_engine", "engine")
+        monkeypatch.setattr(product_dictionary, "PRODUCT_DICTIONARY_RELOAD_S", 3600)
+        product_dictionary.set_product_dictionary(dictionary)
+        try:
+            product_dictionary.learn_saved_rows([{
+                "supermarket_name": "Mercado Central", "description": "ARROZ CAMIL T1 5KG", "product": "Arroz",
+                "full_product_name": "Arroz Camil Tipo 1", "volume": "5KG", "category": "Mercearia"}])
+            assert product_dictionary.get_product_dictionary().lookup("ARROZ CAMIL T1 5KG")["product"] == "Arroz"
+            assert loads == []
+
+            monkeypatch.setattr(product_dictionary, "_loaded_at", time.monotonic() - 3600)
+            assert product_dictionary.get_product_dictionary().lookup("ARROZ CAMIL T1 5KG") is None
+            assert loads == ["engine"]
+        finally:
+            product_dictionary.set_product_dictionary(None)
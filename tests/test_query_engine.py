@@ -0,0 +1,92 @@
+import datetime
+from decimal import Decimal
+import pytest
+import src.query_engine as query_engine
+from src.query_engine import translate_postgres_sql, DuckDBEngine, group_sum
+from src.database import INVOICE_COLUMNS, concat_invoice_frames, frames_from_cursor, write_invoice_snapshot
+from tests.test_database_loader import FakeCursor, ROWS
+
+
+class TestTranslatePostgresSQL:
+    """Tests for the PostgreSQL -> DuckDB SQL rewrites"""
+
+    def test_to_char(self):
+        """Test that TO_CHAR is rewritten to strftime"""
+        sql = "SELECT TO_CHAR(datetime, 'YYYY-MM') AS month FROM invoices"
+        assert translate_postgres_sql(sql) == "SELECT strftime(datetime, '%Y-%m') AS month FROM invoices"
+
+    def test_to_char_with_nested_call(self):
+        """Test that TO_CHAR around a function call keeps the inner expression"""
+        sql = "SELECT to_char(DATE_TRUNC('month', datetime), 'Mon YYYY') FROM invoices"
+        assert translate_postgres_sql(sql) == "SELECT strftime(DATE_TRUNC('month', datetime), '%b %Y') FROM invoices"
+
+    def test_other_sql_is_unchanged(self):
+        """Test that constructs DuckDB already supports are left alone"""
+        sql = "SELECT EXTRACT(YEAR FROM datetime)::int, SUM(total_value) FROM invoices WHERE category ILIKE '%beb%' GROUP BY 1"
+        assert translate_postgres_sql(sql) == sql
+
+    def test_access_key_literals_are_quoted(self):
+        """Test that access keys written as numbers become string literals, quoted ones are left alone"""
+        key = "35250447508411271427651040001883521912124444"
+        sql = f"SELECT * FROM invoices WHERE invoice_id IN ({key}, '{key}') AND total_value > 10.5"
+        assert translate_postgres_sql(sql) == (
+            f"SELECT * FROM invoices WHERE invoice_id IN ('{key}', '{key}') AND total_value > 10.5")
+
+
+class TestDuckDBEngine:
+    """Tests for the DuckDB engine over a Parquet snapshot"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        pytest.importorskip("duckdb")
+        path = str(tmp_path / "snapshot")
+        write_invoice_snapshot(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS), path)
+        return DuckDBEngine(source="parquet", database=":memory:", snapshot_path=path, refresh_seconds=300)
+
+    def test_report_query(self, engine):
+        """Test a monthly aggregation written in PostgreSQL dialect"""
+        df = engine.query(
+            "SELECT TO_CHAR(datetime, 'YYYY-MM') AS month, SUM(total_value) AS total FROM invoices GROUP BY 1 ORDER BY 1;",
+            timeout_ms=5000, max_rows=100)
+        assert df["month"].tolist() == ["2025-01", "2025-03"]
+        assert df["total"].tolist() == [Decimal("17.67"), Decimal("17.61")]
+
+    def test_row_cap(self, engine):
+        """Test that results are capped at max_rows"""
+        df = engine.query("SELECT * FROM invoices", timeout_ms=5000, max_rows=2)
+        assert len(df) == 2
+        assert df.attrs["truncated"] is True
+        assert df["datetime"].iloc[0] in {datetime.date(2025, 1, 1), datetime.date(2025, 3, 1)}
+
+    def test_filters_match_postgres_types(self, engine):
+        """Test that a numeric access key matches one receipt and amounts compare as exact decimals"""
+        df = engine.query("SELECT description FROM invoices WHERE invoice_id = 35250447508411271427651040001883521912124444",
+                          timeout_ms=5000, max_rows=100)
+        assert df["description"].tolist() == ["LTE ITALAC ZERO 1L"]
+        df = engine.query("SELECT description, quantity FROM invoices WHERE unitary_value = 6.98 AND total_value = 8.62",
+                          timeout_ms=5000, max_rows=100)
+        assert df["description"].tolist() == ["BANANA PRATA KG"]
+        assert df["quantity"].tolist() == [Decimal("1.2350")]
+
+    def test_group_sum_uses_the_engine_database(self, engine, monkeypatch):
+        """Test that dashboard group-bys run on cursors of the engine's connection, not new databases"""
+        monkeypatch.setattr(query_engine, "QUERY_ENGINE", "duckdb")
+        monkeypatch.setattr(query_engine, "_duckdb_engine", engine)
+        monkeypatch.setattr("duckdb.connect", lambda *args, **kwargs: pytest.fail("opened a new database"))
+        df = concat_invoice_frames(frames_from_cursor(FakeCursor(ROWS), INVOICE_COLUMNS), INVOICE_COLUMNS)
+        for _ in range(2):
+            totals = group_sum(df, "supermarket_name", "total_value")
+        assert totals["supermarket_name"].tolist() == ["SuperNova Alimentos", "VivaBem Supermarket"]
+        assert totals["total_value"].round(2).tolist() == [17.67, 17.61]
+
+    def test_local_files_cannot_be_read(self, engine, tmp_path):
+        """Test that agent SQL cannot read files outside the snapshot, nor re-enable file access"""
+        secret = tmp_path / ".env"
+        secret.write_text("OPENAI_API_KEY=sk-test\n")
+        for sql in [f"SELECT * FROM read_text('{secret}')", f"SELECT * FROM read_csv_auto('{secret}')",
+                    f"SELECT * FROM glob('{tmp_path}/*')"]:
+            with pytest.raises(Exception, match="Permission"):
+                engine.query(sql, timeout_ms=5000, max_rows=100)
+        with pytest.raises(Exception):
+            engine.connection.execute("SET enable_external_access = true")
+        assert len(engine.query("SELECT * FROM invoices", timeout_ms=5000, max_rows=100)) == 3
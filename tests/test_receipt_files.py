@@ -0,0 +1,47 @@
+import io
+import os
+import pypdfium2
+from src.conversion_cache import cache_key
+from src.image_receipts import is_image
+from src.pdf_splitting import count_pages
+from src.receipt_files import Upload, read_bytes, spooled_path
+
+
+def blank_pdf(pages: int) -> bytes:
+    document = pypdfium2.PdfDocument.new()
+    for _ in range(pages):
+        document.new_page(595, 842)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    document.close()
+    return buffer.getvalue()
+
+
+class TestUploads:
+    """Tests for processing receipts uploaded in memory"""
+
+    def test_same_cache_key_as_file(self, tmp_path):
+        """Test that an upload and the same file on disk share their conversion cache entry"""
+        path = tmp_path / "receipt.pdf"
+        path.write_bytes(b"%PDF-1.4 receipt")
+        upload = Upload("Receipt.PDF", read_bytes(str(path)))
+        assert cache_key(upload, "pdf:pages") == cache_key(str(path), "pdf:pages")
+
+    def test_type_from_name(self):
+        """Test that the type of an upload comes from its original file name"""
+        assert is_image(Upload("IMG_0042.JPG", b""))
+        assert not is_image(Upload("receipt.pdf", b""))
+
+    def test_count_pages_from_memory(self):
+        """Test that a PDF upload is read without writing it to disk"""
+        assert count_pages(Upload("receipt.pdf", blank_pdf(3))) == 3
+
+    def test_spooled_path(self):
+        """Test that each spool of an upload is a separate temporary file, removed afterwards"""
+        upload = Upload("receipt.pdf", b"%PDF-1.4 receipt")
+        with spooled_path(upload) as first, spooled_path(upload) as second:
+            assert first != second and first.endswith(".pdf")
+            assert read_bytes(first) == upload.data
+        assert not os.path.exists(first) and not os.path.exists(second)
+        with spooled_path("receipt.pdf") as path:
+            assert path == "receipt.pdf"
@@ -0,0 +1,101 @@
+import datetime
+from decimal import Decimal
+import pytest
+import sqlalchemy
+from src.receipt_identity import (check_digit, find_nfe_xml, is_valid_access_key, keys_in_text, parse_nfe_xml,
+                                  stored_invoice_ids)
+from src.sql_commands import sql_commands, sqlite_commands
+
+KEY43 = "3525034750841100012765001000012345100012345"
+KEY = KEY43 + str(check_digit(KEY43))
+
+NFE_XML = f"""<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">
+  <NFe><infNFe Id="NFe{KEY}" versao="4.00">
+    <ide><dhEmi>2025-03-14T18:22:05-03:00</dhEmi></ide>
+    <emit><xNome>SuperNova Alimentos</xNome></emit>
+    <det nItem="1"><prod><cProd>7891</cProd><xProd>LTE ITALAC  ZERO 1L</xProd><uCom>Un</uCom>
+      <qCom>2.0000</qCom><vUnCom>5.8900000000</vUnCom><vProd>11.78</vProd></prod></det>
+    <det nItem="2"><prod><cProd>12</cProd><xProd>BANANA PRATA KG</xProd><uCom>Kg</uCom>
+      <qCom>0.7340</qCom><vUnCom>6.9800000000</vUnCom><vProd>5.12</vProd></prod></det>
+  </infNFe></NFe>
+</nfeProc>
+"""
+
+
+class TestAccessKeys:
+    """Tests for finding and validating NFC-e access keys"""
+
+    def test_check_digit(self):
+        """Test that a key is valid only with its modulo 11 check digit"""
+        assert is_valid_access_key(KEY)
+        assert not is_valid_access_key(KEY43 + str((int(KEY[-1]) + 1) % 10))
+        assert not is_valid_access_key(KEY[:-1])
+
+    def test_keys_in_text(self):
+        """Test that printed (grouped) keys and QR consultation URLs are found once each"""
+        grouped = " ".join(KEY[i:i + 4] for i in range(0, 44, 4))
+        text = f"Chave de acesso\n{grouped}\nhttps://www.nfce.fazenda.sp.gov.br/qrcode?p={KEY}|2|1|1|ABC"
+        assert keys_in_text(text) == [KEY]
+
+    def test_invalid_key_ignored(self):
+        """Test that a 44-digit number with a wrong check digit is not taken as a key"""
+        assert keys_in_text(f"chNFe={KEY43}{(int(KEY[-1]) + 1) % 10}") == []
+
+
+class TestNfeXml:
+    """Tests for reading receipts from the XML drop folder"""
+
+    def test_parse_nfe_xml(self, tmp_path):
+        """Test that the XML is read into the same shape as a parsed receipt"""
+        path = tmp_path / "receipt.xml"
+        path.write_text(NFE_XML, encoding="utf-8")
+        parsed = parse_nfe_xml(str(path))
+        assert parsed["layout"] == "xml"
+        assert parsed["invoice_id"] == KEY
+        assert parsed["supermarket_name"] == "SuperNova Alimentos"
+        assert parsed["datetime"] == datetime.date(2025, 3, 14).isoformat()
+        milk, banana = parsed["items"]
+        assert milk["description"] == "LTE ITALAC ZERO 1L"
+        assert (milk["quantity"], milk["unitary_value"], milk["volume"]) == (Decimal(2), Decimal("5.89"), "1L")
+        assert banana["quantity"] == Decimal("0.734") and banana["total_value"] == Decimal("5.12")
+
+    def test_find_nfe_xml(self, tmp_path):
+        """Test that an XML is found by its key whatever its file name"""
+        (tmp_path / "download (3).xml").write_text(NFE_XML, encoding="utf-8")
+        assert find_nfe_xml(KEY, str(tmp_path)) == str(tmp_path / "download (3).xml")
+        assert find_nfe_xml("9" * 44, str(tmp_path)) is None
+        assert find_nfe_xml(KEY, "") is None
+
+    def test_not_an_nfe(self, tmp_path):
+        """Test that other XML files are not taken as receipts"""
+        path = tmp_path / "other.xml"
+        path.write_text("<root><item/></root>", encoding="utf-8")
+        assert parse_nfe_xml(str(path)) is None
+
+
+    def test_malformed_xml(self, tmp_path):
+        """Test that a truncated XML or an item without its quantity raises ValueError (conversion is used instead)"""
+        truncated, incomplete = tmp_path / "truncated.xml", tmp_path / "incomplete.xml"
+        truncated.write_text(NFE_XML[:len(NFE_XML) // 2], encoding="utf-8")
+        incomplete.write_text(NFE_XML.replace("<qCom>2.0000</qCom>", ""), encoding="utf-8")
+        with pytest.raises(ValueError, match="Malformed XML"):
+            parse_nfe_xml(str(truncated))
+        with pytest.raises(ValueError, match="Item 1 has no qCom"):
+            parse_nfe_xml(str(incomplete))
+
+
+class TestStoredInvoiceIds:
+    """Tests for checking access keys against the stored receipts"""
+
+    def test_stored_keys(self):
+        """Test that only the keys already in the receipts table are returned"""
+        engine = sqlalchemy.create_engine("sqlite://")
+        with engine.begin() as connection:
+            for command in sqlite_commands(sql_commands):
+                connection.execute(sqlalchemy.text(command))
+            connection.execute(sqlalchemy.text("INSERT INTO stores (name) VALUES ('SuperNova')"))
+            connection.execute(sqlalchemy.text("INSERT INTO receipts (invoice_id, store_id, datetime) "
+                                               "VALUES (:key, 1, '2025-03-14')"), {"key": KEY})
+        assert stored_invoice_ids([KEY, "9" * 44], engine=engine) == {KEY}
+        assert stored_invoice_ids([], engine=engine) == set()
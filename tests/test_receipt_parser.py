@@ -0,0 +1,154 @@
+from decimal import Decimal
+import pytest
+from src.invoice_rows import build_insert_query, parse_insert_query
+from src.receipt_parser import parse_brl, parse_item_line, parse_receipt, parse_volume, split_receipt_lines
+
+RECEIPT = """## SuperNova Alimentos
+
+CNPJ: 47.508.411/2714-27 AV PAULISTA, 1000, BELA VISTA, SAO PAULO, SP
+
+Documento Auxiliar da Nota Fiscal de Consumidor Eletrônica
+
+| Código | Descrição | Qtde | UN | Vl Unit | Vl Total |
+|---|---|---|---|---|---|
+| 7890000000000 | LTE ITALAC ZERO 1L | 3 | Un | 5,89 | 17,67 |
+| 7890000000008 | BANANA PRATA KG | 0,734 | Kg | 6,98 | 5,12 |
+
+Qtd. total de itens 2
+
+Valor total R$ 22,79
+
+NFC-e nº 000012345 Série 001 Emissão 12/07/2024 10:21:33 - Via Consumidor
+
+3525 0447 5084 1127 1427 6510 4000 1883 5219 1212 4444
+"""
+
+
+class TestParseReceipt:
+    """Tests for the rule-based receipt parser"""
+
+    def test_known_layout(self):
+        """Test that the receipt fields and line items are read from a known layout"""
+        parsed = parse_receipt(RECEIPT)
+        assert parsed["layout"] == "nfce_codigo"
+        assert parsed["invoice_id"] == "35250447508411271427651040001883521912124444"
+        assert parsed["supermarket_name"] == "SuperNova Alimentos"
+        assert parsed["datetime"] == "2024-07-12"
+        assert parsed["items"][0] == {"description": "LTE ITALAC ZERO 1L", "quantity": Decimal("3"), "unit": "Un",
+                                      "unitary_value": Decimal("5.89"), "total_value": Decimal("17.67"),
+                                      "volume": "1L"}
+        assert parsed["items"][1]["quantity"] == Decimal("0.734")
+
+    def test_numbered_layout(self):
+        """Test that the layout with an item number column is recognised"""
+        receipt = RECEIPT.replace(
+            "| Código | Descrição | Qtde | UN | Vl Unit | Vl Total |\n|---|---|---|---|---|---|",
+            "| Item | Cód | Descrição | Qtd | Un | Vl Unit R$ | Vl Total R$ |\n|---|---|---|---|---|---|---|",
+        ).replace("| 7890000000000 |", "| 001 | 7890000000000 |").replace("| 7890000000008 |", "| 002 | 7890000000008 |")
+        assert parse_receipt(receipt)["layout"] == "nfce_item_cod"
+
+    def test_unknown_layout(self):
+        """Test that an unknown item table is left to the LLM"""
+        assert parse_receipt(RECEIPT.replace("| Código | Descrição |", "| Produto | Descrição |")) is None
+
+    @pytest.mark.parametrize("broken", [
+        RECEIPT.replace("| 17,67 |", "| 18,67 |"),
+        RECEIPT.replace("Valor total R$ 22,79", "Valor total R$ 30,00"),
+        RECEIPT.replace("Emissão 12/07/2024", ""),
+    ])
+    def test_inconsistent_receipt(self, broken):
+        """Test that amounts that do not add up or a missing date send the receipt to the LLM"""
+        assert parse_receipt(broken) is None
+
+
+class TestItemLines:
+    """Tests for reading line items from receipts without a known table layout"""
+
+    def test_plain_text_line(self):
+        """Test that an item printed on one text line is parsed"""
+        item = parse_item_line("003 7890000000002 SASSAMI SADIA 1kg 2 PC X 24,77 49,54")
+        assert item == {"description": "SASSAMI SADIA 1kg", "quantity": Decimal("2"), "unit": "PC",
+                        "unitary_value": Decimal("24.77"), "total_value": Decimal("49.54"), "volume": "1KG"}
+
+    def test_table_row(self):
+        """Test that a row of an unknown item table is parsed too"""
+        assert parse_item_line("| 7890000000008 | BANANA PRATA KG | 0,734 | Kg | 6,98 | 5,12 |")["quantity"] == \
+            Decimal("0.734")
+
+    @pytest.mark.parametrize("line", [
+        "Valor total R$ 22,79",
+        "Qtd. total de itens 2",
+        "001 7890000000002 SASSAMI SADIA 1kg 2 PC X 24,77 59,54",
+    ])
+    def test_other_lines(self, line):
+        """Test that totals and items whose amounts do not add up are not taken as items"""
+        assert parse_item_line(line) is None
+
+    def test_split_receipt_lines(self):
+        """Test that the item lines are separated from the header and totals"""
+        other_lines, item_lines = split_receipt_lines(RECEIPT)
+        assert [item["description"] for _, item in item_lines] == ["LTE ITALAC ZERO 1L", "BANANA PRATA KG"]
+        assert "Valor total R$ 22,79" in other_lines
+        assert "|---|---|---|---|---|---|" not in other_lines
+
+
+class TestParseInsertQuery:
+    """Tests for reading the rows of an extracted INSERT back"""
+
+    def test_round_trip(self):
+        """Test that a built INSERT parses back into the same values"""
+        row = {
+            "invoice_id": "35250447508411271427651040001883521912124444", "supermarket_name": "Mercado D'Ouro",
+            "datetime": "2024-07-12", "description": "BANANA, PRATA KG", "quantity": Decimal("0.734"), "unit": "Kg",
+            "unitary_value": Decimal("6.98"), "total_value": Decimal("5.12"), "product": "Banana",
+            "full_product_name": "Banana", "volume": None, "category": "Hortifruti",
+        }
+        assert parse_insert_query(build_insert_query([row, row])) == [row, row]
+
+    @pytest.mark.parametrize("query", [
+        "SELECT 1",
+        "INSERT INTO invoices (invoice_id, quantity) VALUES (1, 'abc');",
+        "INSERT INTO invoices (invoice_id, quantity) VALUES (1, 2, 3);",
+        "INSERT INTO invoices (invoice_id, description) VALUES (1, 'unterminated);",
+    ])
+    def test_malformed(self, query):
+        """Test that anything but a well-formed INSERT INTO invoices is rejected"""
+        with pytest.raises(ValueError):
+            parse_insert_query(query)
+
+
+class TestParsingHelpers:
+    """Tests for number and volume parsing"""
+
+    def test_parse_brl(self):
+        """Test that Brazilian decimals and thousands separators are parsed"""
+        assert parse_brl("1.234,56") == Decimal("1234.56")
+        assert parse_brl("3") == Decimal("3")
+        assert parse_brl("abc") is None
+
+    def test_parse_volume(self):
+        """Test that the package size is read from the description"""
+        assert parse_volume("P QJ SIBERI 1kg TRAD") == "1KG"
+        assert parse_volume("CERV BLUE MOON 350ML") == "350ML"
+        assert parse_volume("BANANA PRATA KG") is None
+
+
+class TestBuildInsertQuery:
+    """Tests for building the INSERT statement from parsed rows"""
+
+    def test_formats_values(self):
+        """Test that text is quoted and escaped, numbers are bare and missing values are NULL"""
+        query = build_insert_query([{
+            "invoice_id": "35250447508411271427651040001883521912124444", "supermarket_name": "Mercado D'Ouro",
+            "datetime": "2024-07-12", "description": "BANANA PRATA KG", "quantity": Decimal("0.734"), "unit": "Kg",
+            "unitary_value": Decimal("6.98"), "total_value": Decimal("5.12"), "product": "Banana",
+            "full_product_name": "Banana", "volume": None, "category": "Hortifruti",
+        }])
+        assert query.startswith("INSERT INTO invoices (invoice_id, supermarket_name, datetime,")
+        assert ("(35250447508411271427651040001883521912124444, 'Mercado D''Ouro', '2024-07-12', 'BANANA PRATA KG', "
+                "0.734, 'Kg', 6.98, 5.12, 'Banana', 'Banana', NULL, 'Hortifruti');") in query
+
+    def test_rejects_empty_receipt(self):
+        """Test that a receipt without items is rejected"""
+        with pytest.raises(ValueError):
+            build_insert_query([])
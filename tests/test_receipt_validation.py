@@ -0,0 +1,63 @@
+from src.invoice_rows import build_insert_query, parse_insert_query, parse_insert_statements
+from src.receipt_parser import parse_receipt
+from src.receipt_validation import normalize_dates, validate_receipts
+from tests.test_receipt_parser import RECEIPT as PARSER_RECEIPT
+
+# The parser's test receipt with the check digit of its access key fixed
+RECEIPT = PARSER_RECEIPT.replace("1212 4444", "1212 4448")
+
+
+def extraction(receipt=RECEIPT, **changes):
+    """The INSERT of the test receipt, with some item fields changed."""
+    parsed = parse_receipt(receipt)
+    rows = [{"invoice_id": parsed["invoice_id"], "supermarket_name": parsed["supermarket_name"],
+             "datetime": parsed["datetime"], "product": "Produto", "full_product_name": "Produto",
+             "category": "Outros", **item} for item in parsed["items"]]
+    rows[0].update(changes)
+    return build_insert_query(rows)
+
+
+class TestValidateReceipts:
+    """Tests for the checks that let an extraction be saved without review"""
+
+    def test_reconciled_receipt_passes(self):
+        """Test that items matching their amounts and the receipt total pass"""
+        assert validate_receipts(extraction(), [RECEIPT]) == []
+
+    def test_item_and_total_mismatches(self):
+        """Test that a misread item total is reported both on the item and against the receipt total"""
+        problems = validate_receipts(extraction(total_value="18.67"), [RECEIPT])
+        assert len(problems) == 2
+        assert "3 x 5.89 is not 18.67" in problems[0]
+        assert "the receipt says 22,79" in problems[1]
+
+    def test_unusable_extraction(self):
+        """Test that an answer that is not an INSERT, or a receipt without a total, needs review"""
+        assert "not a valid INSERT" in validate_receipts("I could not read this receipt.", [RECEIPT])[0]
+        no_total = RECEIPT.replace("Valor total R$ 22,79", "")
+        assert "no total" in validate_receipts(extraction(), [no_total])[0]
+
+    def test_access_key_and_date(self):
+        """Test that a key failing its check digit and a date that is not ISO are reported"""
+        problems = validate_receipts(extraction(PARSER_RECEIPT, datetime="12/07/2024"), [PARSER_RECEIPT])
+        assert "35250447508411271427651040001883521912124444 is not a valid 44-digit access key" in problems
+        assert "12/07/2024 is not an ISO date" in problems
+
+    def test_day_first_dates_are_normalized(self):
+        """Test that the day-first dates the extraction prompt asks for are rewritten as ISO dates"""
+        query = extraction(datetime="12/07/2024").replace("'2024-07-12'", "12/07/2024")
+        normalized = normalize_dates(query)
+        assert {row["datetime"] for row in parse_insert_query(normalized)} == {"2024-07-12"}
+        assert validate_receipts(normalized, [RECEIPT]) == []
+        assert normalize_dates(extraction()) == extraction()
+
+    def test_every_receipt_of_a_file_is_checked(self):
+        """Test that with one INSERT per receipt, later receipts are normalized and checked too"""
+        day_first = extraction(datetime="12/07/2024").replace("'2024-07-12'", "12/07/2024")
+        query = day_first + "\n" + day_first.replace("4448", "4444")
+        normalized = normalize_dates(query)
+        statements = parse_insert_statements(normalized)
+        assert len(statements) == 2
+        assert {row["datetime"] for rows in statements for row in rows} == {"2024-07-12"}
+        problems = validate_receipts(normalized, [RECEIPT, PARSER_RECEIPT])
+        assert problems == ["35250447508411271427651040001883521912124444 is not a valid 44-digit access key"]
@@ -0,0 +1,105 @@
+import pytest
+from src.sql_cache import SQLQueryCache, normalize_question
+
+SCHEMA = "CREATE TABLE invoices (invoice_id NUMERIC, category TEXT, total_value DECIMAL)"
+SQL = "SELECT SUM(total_value) FROM invoices WHERE category = 'Bebidas'"
+
+
+class TestNormalizeQuestion:
+    """Tests for question normalization"""
+
+    def test_strips_case_accents_and_punctuation(self):
+        """Test that normalization is case, accent and punctuation insensitive"""
+        assert normalize_question("Quanto gastei em Bebidas no MÊS passado?") == "gastei bebidas no mes passado"
+
+    def test_drops_stopwords(self):
+        """Test that English stopwords are removed"""
+        assert normalize_question("How much did I spend on the drinks") == "spend drinks"
+
+    def test_keeps_negation(self):
+        """Test that 'no' is kept, since in English it negates ("no sugar")"""
+        assert normalize_question("Products with no sugar") == "products no sugar"
+
+
+class TestSQLQueryCache:
+    """Tests for the question -> SQL cache"""
+
+    def test_exact_hit(self):
+        """Test that the same question returns the cached SQL"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend on drinks last month?", SCHEMA, SQL)
+        assert cache.get("how much did i spend on drinks last month", SCHEMA) == SQL
+        assert cache.hits == 1
+
+    def test_similar_question_hit(self):
+        """Test that a near-identical question is served from the cache"""
+        cache = SQLQueryCache(threshold=0.75)
+        cache.put("How much did I spend on drinks last month?", SCHEMA, SQL)
+        assert cache.get("how much have I spent on drinks last month", SCHEMA) == SQL
+
+    def test_guard_words_must_match(self):
+        """Test that 'last month' never reuses SQL cached for 'this month'"""
+        cache = SQLQueryCache(threshold=0.5)
+        cache.put("How much did I spend on drinks last month?", SCHEMA, SQL)
+        assert cache.get("How much did I spend on drinks this month?", SCHEMA) is None
+
+    @pytest.mark.parametrize("question", [
+        "How much did I spend in the category snacks at Carrefour each month, sorted descending?",
+        "How much did I spend in the category drinks at Extra each month, sorted descending?",
+        "How much did I spend in the category drinks at Carrefour each month, sorted ascending?",
+        "How much did I spend not in the category drinks at Carrefour each month, sorted descending?",
+    ])
+    def test_filter_values_must_match(self, question):
+        """Test that a long question differing in a category, store, sort order or negation is a miss"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend in the category drinks at Carrefour each month, sorted descending?",
+                  SCHEMA, SQL)
+        assert cache.get(question, SCHEMA) is None
+
+    def test_inflections_still_hit(self):
+        """Test that plurals and verb forms of the same words are still served from the cache"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend in the category drinks at Carrefour each month, sorted descending?",
+                  SCHEMA, SQL)
+        assert cache.get("How much have I spent in categories drink at Carrefour each month sorted descending",
+                         SCHEMA) == SQL
+
+    def test_synonyms_hit(self):
+        """Test that the same question in other words ("beverage spend" for "spend on drinks") is a hit"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend on drinks last month?", SCHEMA, SQL)
+        assert cache.get("What was my beverage spend last month?", SCHEMA) == SQL
+        assert cache.get("What did drinks cost me last month?", SCHEMA) == SQL
+
+    def test_wording_is_scored(self):
+        """Test that questions sharing their filter values but asking something else stay below the threshold"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend on milk?", SCHEMA, SQL)
+        assert cache.get("Show the price of each milk product per store", SCHEMA) is None
+
+    def test_unrelated_question_misses(self):
+        """Test that an unrelated question is a miss"""
+        cache = SQLQueryCache()
+        cache.put("How much did I spend on drinks last month?", SCHEMA, SQL)
+        assert cache.get("Which supermarket sells the cheapest milk?", SCHEMA) is None
+        assert cache.misses == 1
+
+    def test_schema_change_invalidates(self):
+        """Test that entries are dropped when the schema fingerprint changes"""
+        cache = SQLQueryCache()
+        cache.put("total spend", SCHEMA, SQL)
+        assert cache.get("total spend", SCHEMA + ", volume TEXT") is None
+        assert cache.get("total spend", SCHEMA) is None
+
+    def test_namespaces_are_independent(self):
+        """Test that a schema change in one namespace keeps the others"""
+        cache = SQLQueryCache()
+        cache.put("total spend", SCHEMA, SQL, namespace="chat")
+        cache.put("total spend", "other schema", "SELECT 1", namespace="report")
+        assert cache.get("total spend", SCHEMA, namespace="chat") == SQL
+
+    def test_persists_to_disk(self, tmp_path):
+        """Test that the cache survives a restart when a path is given"""
+        path = str(tmp_path / "sql_cache.json")
+        SQLQueryCache(path).put("total spend", SCHEMA, SQL)
+        assert SQLQueryCache(path).get("total spend", SCHEMA) == SQL
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, text
+from src.sql_guard import validate_select_query, run_readonly_query, UnsafeQueryError
+
+
+@pytest.fixture
+def sqlite_engine():
+    """In-memory SQLite engine with a small invoices table"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE invoices (category TEXT, total_value REAL)"))
+        for i in range(20):
+            connection.execute(text("INSERT INTO invoices VALUES (:c, :v)"), {"c": f"cat{i % 3}", "v": i})
+    return engine
+
+
+class TestValidateSelectQuery:
+    """Tests for the generated SQL validation"""
+
+    def test_accepts_select_and_strips_semicolon(self):
+        """Test that a plain SELECT is accepted"""
+        assert validate_select_query("SELECT * FROM invoices;") == "SELECT * FROM invoices"
+
+    def test_accepts_cte(self):
+        """Test that WITH ... SELECT is accepted"""
+        sql = "WITH t AS (SELECT category FROM invoices) SELECT * FROM t"
+        assert validate_select_query(sql) == sql
+
+    def test_keywords_inside_literals_are_ignored(self):
+        """Test that a forbidden word inside a string literal does not trigger the guard"""
+        sql = "SELECT * FROM invoices WHERE description = 'DELETE; DROP'"
+        assert validate_select_query(sql) == sql
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT category AS set, SUM(total_value) AS analyze FROM invoices GROUP BY category",
+        'SELECT description AS "comment", quantity AS do FROM invoices',
+        "SELECT * FROM invoices WHERE description ILIKE '%do set%' ORDER BY datetime",
+    ])
+    def test_keywords_as_names_are_accepted(self, sql):
+        """Test that statement keywords used as aliases, quoted names or inside literals are not rejected"""
+        assert validate_select_query(sql) == sql
+
+    @pytest.mark.parametrize("sql", [
+        "DELETE FROM invoices",
+        "SELECT 1; DROP TABLE invoices",
+        "WITH d AS (DELETE FROM invoices RETURNING *) SELECT * FROM d",
+        "SELECT * INTO backup FROM invoices",
+        "SELECT pg_sleep(100)",
+        "SELECT * FROM (UPDATE invoices SET total_value = 0 RETURNING *) t",
+        "SELECT * FROM invoices FOR UPDATE",
+        "",
+    ])
+    def test_rejects_unsafe_sql(self, sql):
+        """Test that writes, multiple statements and dangerous functions are rejected"""
+        with pytest.raises(UnsafeQueryError):
+            validate_select_query(sql)
+
+
+class TestRunReadonlyQuery:
+    """Tests for the guarded query execution"""
+
+    def test_returns_dataframe(self, sqlite_engine):
+        """Test that results come back as a DataFrame"""
+        df = run_readonly_query(sqlite_engine, "SELECT category, SUM(total_value) AS total FROM invoices GROUP BY category",
+                                timeout_ms=1000, max_rows=100, max_cost=0)
+        assert list(df.columns) == ["category", "total"]
+        assert len(df) == 3
+        assert df.attrs["truncated"] is False
+
+    def test_caps_rows(self, sqlite_engine):
+        """Test that at most max_rows rows are returned"""
+        df = run_readonly_query(sqlite_engine, "SELECT * FROM invoices", timeout_ms=1000, max_rows=5, max_cost=0)
+        assert len(df) == 5
+        assert df.attrs["truncated"] is True
+
+    def test_rejects_before_touching_the_database(self, sqlite_engine):
+        """Test that unsafe SQL is never executed"""
+        with pytest.raises(UnsafeQueryError):
+            run_readonly_query(sqlite_engine, "DROP TABLE invoices", timeout_ms=1000, max_rows=5, max_cost=0)
+        assert len(run_readonly_query(sqlite_engine, "SELECT * FROM invoices", 1000, 100, 0)) == 20
@@ -0,0 +1,119 @@
+import json
+import pytest
+from src import tracing
+from src.tracing import JsonlSpanExporter, read_spans, span, traced_node
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(list(spans))
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+class GraphBubbleUp(Exception):
+    pass
+
+
+class TestSpans:
+    """Tests for span nesting and export"""
+
+    def test_children_share_the_trace(self, exporter):
+        """Test that nested spans share the trace id and are exported with the root"""
+        with span("root") as root:
+            with span("child", db__system="sqlite") as child:
+                pass
+        assert len(exporter.traces) == 1
+        assert child.trace_id == root.trace_id
+        assert child.parent_span_id == root.span_id
+        assert child.attributes == {"db.system": "sqlite"}
+        assert [s.name for s in exporter.traces[0]] == ["child", "root"]
+
+    def test_error_status(self, exporter):
+        """Test that an exception marks the span as failed and is re-raised"""
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+        failed = exporter.traces[0][0]
+        assert failed.status == "ERROR"
+        assert "boom" in failed.status_message
+
+    def test_graph_interrupt_is_not_an_error(self, exporter):
+        """Test that LangGraph control-flow exceptions leave the span OK"""
+        node = traced_node("human_approval", lambda state: (_ for _ in ()).throw(GraphBubbleUp()))
+        with pytest.raises(GraphBubbleUp):
+            node({})
+        assert exporter.traces[0][0].status == "OK"
+
+    def test_traced_node(self, exporter):
+        """Test that a wrapped node keeps its result and records the updated keys"""
+        def write_query_node(state):
+            return {"query": "SELECT 1"}
+
+        node = traced_node("write_query", write_query_node)
+        assert node({}) == {"query": "SELECT 1"}
+        assert node.__name__ == "write_query_node"
+        recorded = exporter.traces[0][0]
+        assert recorded.name == "node.write_query"
+        assert recorded.attributes["graph.updated_keys"] == ["query"]
+
+    def test_export_failure_is_swallowed(self):
+        """Test that a broken exporter never breaks the traced code"""
+        class Broken:
+            def export(self, spans):
+                raise OSError("disk full")
+
+        tracing.set_exporter(Broken())
+        try:
+            with span("root"):
+                value = 42
+        finally:
+            tracing.set_exporter(None)
+        assert value == 42
+
+
+class TestJsonlSpanExporter:
+    """Tests for the OTLP/JSON file exporter"""
+
+    def test_round_trip(self, tmp_path):
+        """Test that exported traces are read back with their attributes"""
+        path = str(tmp_path / "traces.jsonl")
+        tracing.set_exporter(JsonlSpanExporter(path))
+        try:
+            with span("chat.question"):
+                with span("db.query", db__rows=3, db__truncated=False):
+                    pass
+        finally:
+            tracing.set_exporter(None)
+
+        payload = json.loads(open(path, encoding="utf-8").readline())
+        otlp_spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert {s["name"] for s in otlp_spans} == {"chat.question", "db.query"}
+
+        spans = read_spans(path)
+        query = next(s for s in spans if s["name"] == "db.query")
+        assert query["attributes"] == {"db.rows": 3, "db.truncated": False}
+        assert query["parent_span_id"] is not None
+        assert query["duration_ms"] >= 0
+
+    def test_rotation(self, tmp_path):
+        """Test that the file is rotated once it exceeds max_bytes"""
+        path = str(tmp_path / "traces.jsonl")
+        tracing.set_exporter(JsonlSpanExporter(path, max_bytes=10))
+        try:
+            for _ in range(2):
+                with span("root"):
+                    pass
+        finally:
+            tracing.set_exporter(None)
+        assert (tmp_path / "traces.jsonl.1").exists()
+        assert len(read_spans(path)) == 1
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from src import llm_usage, tracing
+from src.job_queue import JobQueue
+from src.receipt_validation import validate_receipts
+from src.watch_folder import Debouncer, FileCheckpoint, InotifyWatcher, watch
+from tests.test_receipt_validation import RECEIPT, extraction
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_accounting():
+    llm_usage.set_usage_store(llm_usage.UsageStore(":memory:"))
+    tracing.set_exporter(DiscardExporter())
+    yield
+    llm_usage.set_usage_store(None)
+    tracing.set_exporter(None)
+
+
+class FakeGraph:
+    """Stands in for the invoice graph: files named bad* are misread, validated receipts are inserted."""
+
+    def __init__(self):
+        self.processed = []
+        self.inserted = []
+        self.values = {}
+        self.checkpointer = MagicMock()
+
+    def invoke(self, inputs, config):
+        name = os.path.basename(inputs["path"])
+        self.processed.append(name)
+        result = extraction(total_value="18.67") if name.startswith("bad") else extraction()
+        problems = validate_receipts(result, [RECEIPT])
+        if not problems:
+            self.inserted.append(result)
+        self.values[config["configurable"]["thread_id"]] = {"duplicate": False, "receipts": [RECEIPT],
+                                                            "result": result, "problems": problems,
+                                                            "saved": not problems}
+
+    def get_state(self, config):
+        values = self.values[config["configurable"]["thread_id"]]
+        return SimpleNamespace(values=values, next=("human_approval",) if values["problems"] else ())
+
+
+def drop(folder, name, data=b"%PDF receipt", age_s=60):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (time.time() - age_s, time.time() - age_s))
+    return path
+
+
+class TestWatchFolder:
+    """Tests for the watch-folder ingestion daemon"""
+
+    def test_debounce_partial_writes(self, tmp_path):
+        """Test that a file is only ready once it has stopped changing for the quiet period"""
+        path = str(tmp_path / "receipt.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF part")
+        debouncer = Debouncer(quiet_s=1.0)
+        debouncer.observe(path)
+        assert debouncer.ready(now=0.0) == []
+        with open(path, "ab") as f:
+            f.write(b" and the rest")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1000))
+        assert debouncer.ready(now=0.5) == []
+        assert debouncer.ready(now=1.2) == []
+        assert [ready[0] for ready in debouncer.ready(now=1.6)] == [path]
+
+    def test_auto_approve_and_review(self, tmp_path):
+        """Test that reconciled receipts are saved and the others are put on the approval list"""
+        folder = tmp_path / "inbox"
+        folder.mkdir()
+        drop(str(folder), "good.pdf", b"%PDF good")
+        drop(str(folder), "bad.pdf", b"%PDF bad")
+        drop(str(folder), "notes.txt", b"not a receipt")
+        queue = JobQueue(path=str(tmp_path / "jobs.sqlite"), max_attempts=2, lease_s=60, retry_base_s=0)
+        checkpoint = FileCheckpoint(str(tmp_path / "watch.sqlite"), max_attempts=2)
+        graph = FakeGraph()
+        watch(str(folder), checkpoint, graph, workers=2, batch_size=8, debounce_s=0.1, poll_s=0.01, auto_approve=True,
+              mode="poll", job_queue=queue, max_files=2)
+        assert sorted(graph.processed) == ["bad.pdf", "good.pdf"]
+        assert graph.inserted == [extraction()]
+        assert checkpoint.counts() == {"saved": 1, "review": 1}
+        (review,) = queue.jobs(["awaiting_approval"])
+        assert review["file_name"] == "bad.pdf" and review["kind"] == "watch"
+
+    def test_restart_skips_processed_files(self, tmp_path):
+        """Test that a restarted daemon does not process files again, even when copied under another name"""
+        inbox = str(tmp_path / "inbox")
+        os.mkdir(inbox)
+        drop(inbox, "good.pdf")
+        state = str(tmp_path / "watch.sqlite")
+        watch(inbox, FileCheckpoint(state, max_attempts=2), FakeGraph(), workers=1, batch_size=8, debounce_s=0.1,
+              poll_s=0.01, auto_approve=True, mode="poll", max_files=1)
+
+        drop(inbox, "copy of good.pdf")
+        drop(inbox, "other.pdf", b"%PDF other")
+        graph = FakeGraph()
+        watch(inbox, FileCheckpoint(state, max_attempts=2), graph, workers=1, batch_size=8, debounce_s=0.1,
+              poll_s=0.01, auto_approve=True, mode="poll", max_files=2)
+        assert graph.processed == ["other.pdf"]
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+    def test_inotify_reports_new_files(self, tmp_path):
+        """Test that inotify reports receipts written or moved into the folder"""
+        watcher = InotifyWatcher(str(tmp_path))
+        try:
+            drop(str(tmp_path), "receipt.pdf", age_s=0)
+            (tmp_path / "upload.part").write_bytes(b"%PDF")
+            os.rename(tmp_path / "upload.part", tmp_path / "moved.pdf")
+            assert sorted(os.path.basename(path) for path in watcher.changes(1.0)) == ["moved.pdf", "receipt.pdf"]
+            assert watcher.changes(0.01) == []
+        finally:
+            watcher.close()